@@ -6,11 +6,87 @@ VALIDATED_SIGNALS_TOPIC = os.getenv("VALIDATED_SIGNALS_TOPIC", "validated-signal
 KAFKA_CONSUMER_GROUP = os.getenv("AI_LAYER_CONSUMER_GROUP", "ai-analysis-service")
 KAFKA_AUTO_OFFSET_RESET = os.getenv("AI_LAYER_AUTO_OFFSET_RESET", "earliest")
 
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+# Worker pool: up to AI_LAYER_CONCURRENCY Gemini calls run at once, and at most
+# AI_LAYER_MAX_IN_FLIGHT payloads are held (waiting in the scheduler, running or parked;
+# fetching pauses beyond that). The scheduler ranks everything waiting, so this is how far
+# into a backlog priority reaches; its deadline check keeps a deep backlog from going stale
+# unnoticed. Offsets are committed per partition up to the highest contiguous finished
+# payload, so a crash replays at most this many analyses.
+ANALYSIS_CONCURRENCY = max(1, int(os.getenv("AI_LAYER_CONCURRENCY", "4")))
+MAX_IN_FLIGHT = max(ANALYSIS_CONCURRENCY, int(os.getenv("AI_LAYER_MAX_IN_FLIGHT", "256")))
+POLL_TIMEOUT_MS = int(os.getenv("AI_LAYER_POLL_TIMEOUT_MS", "500"))
+
+# Polled payloads wait for a worker in priority order (confluence count, technical score,
+# age). One whose event is older than AI_LAYER_DEADLINE_SECONDS (0 disables) is dropped
+# or downgraded behind fresh payloads, per AI_LAYER_STALE_POLICY (drop|downgrade).
+DEADLINE_SECONDS = float(os.getenv("AI_LAYER_DEADLINE_SECONDS", "300"))
+STALE_POLICY = os.getenv("AI_LAYER_STALE_POLICY", "downgrade").strip().lower()
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3.1-pro")
 GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0.2"))
 GEMINI_RESPONSE_MIME_TYPE = "application/json"
+# The static prompt preamble is sent as the system instruction ("system"), or registered
+# once per model as cached content and referenced by each call ("cached"; needs a model
+# whose minimum cacheable size the preamble meets, otherwise it falls back to "system").
+# Cached entries are extended GEMINI_PREAMBLE_REFRESH_SECONDS before their TTL runs out.
+GEMINI_PREAMBLE_MODE = os.getenv("GEMINI_PREAMBLE_MODE", "system").strip().lower()
+GEMINI_PREAMBLE_CACHE_TTL_SECONDS = float(os.getenv("GEMINI_PREAMBLE_CACHE_TTL_SECONDS", "3600"))
+GEMINI_PREAMBLE_REFRESH_SECONDS = float(os.getenv("GEMINI_PREAMBLE_REFRESH_SECONDS", "300"))
+# Where to request JSON output with the analysis response schema: "ungrounded" (default;
+# older models reject a JSON response type combined with the search tool), "all" or "off".
+# Responses are repaired locally before any retry either way.
+GEMINI_STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "ungrounded").strip().lower()
+# Failed analyses are parked and retried after GEMINI_INITIAL_BACKOFF_SECONDS, doubling up
+# to GEMINI_MAX_BACKOFF_SECONDS, for at most GEMINI_MAX_RETRIES attempts. Their partitions
+# are paused meanwhile; no thread sleeps. After GEMINI_BREAKER_FAILURES consecutive
+# upstream failures the circuit breaker fails fast and pauses all fetching for
+# GEMINI_BREAKER_RESET_SECONDS before letting a probe call through.
 GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
 GEMINI_INITIAL_BACKOFF_SECONDS = float(os.getenv("GEMINI_INITIAL_BACKOFF_SECONDS", "1"))
+GEMINI_MAX_BACKOFF_SECONDS = float(os.getenv("GEMINI_MAX_BACKOFF_SECONDS", "60"))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+
+# Search grounding: "adaptive" grounds only payloads that need a search (see grounding.py),
+# "always" grounds every call, "never" none. A ticker searched within
+# GEMINI_GROUNDING_RECENT_SECONDS gets a plain call that reuses the earlier result.
+GEMINI_GROUNDING = os.getenv("GEMINI_GROUNDING", "adaptive").strip().lower()
+GEMINI_GROUNDING_RECENT_SECONDS = float(os.getenv("GEMINI_GROUNDING_RECENT_SECONDS", "1800"))
+
+# Cascade mode: GEMINI_SCREEN_MODEL (ungrounded) scores every payload first and only
+# scores within AI_LAYER_ESCALATION_BAND points of AI_MIN_CONVICTION_SCORE are re-scored
+# by GEMINI_MODEL, grounded unless the grounding policy skips the search.
+CASCADE_ENABLED = os.getenv("AI_LAYER_CASCADE", "false").strip().lower() == "true"
+GEMINI_SCREEN_MODEL = os.getenv("GEMINI_SCREEN_MODEL", "gemini-3.1-flash-lite")
+ESCALATION_BAND = int(os.getenv("AI_LAYER_ESCALATION_BAND", "15"))
+
+# Adaptive rate limit shared by all workers: requests/second start at GEMINI_RATE_LIMIT_RPS,
+# grow by GEMINI_RATE_INCREASE_RPS per successful call up to GEMINI_MAX_RPS, and are
+# multiplied by GEMINI_RATE_DECREASE_FACTOR (as is the concurrency limit) on a 429.
+GEMINI_RATE_LIMIT_RPS = float(os.getenv("GEMINI_RATE_LIMIT_RPS", "1"))
+GEMINI_MAX_RPS = float(os.getenv("GEMINI_MAX_RPS", "5"))
+GEMINI_MIN_RPS = float(os.getenv("GEMINI_MIN_RPS", "0.05"))
+GEMINI_RATE_INCREASE_RPS = float(os.getenv("GEMINI_RATE_INCREASE_RPS", "0.05"))
+GEMINI_RATE_DECREASE_FACTOR = float(os.getenv("GEMINI_RATE_DECREASE_FACTOR", "0.5"))
+GEMINI_RATE_REPORT_SECONDS = float(os.getenv("GEMINI_RATE_REPORT_SECONDS", "60"))
+
+# Analysis cache: payloads with the same fingerprint (ticker, sources, bucketed liquidity,
+# signal contents) reuse the earlier analysis for AI_LAYER_CACHE_TTL_SECONDS (0 disables).
+# Entries are also shared through Redis unless AI_LAYER_CACHE_REDIS=false.
+# GEMINI_COST_PER_CALL_USD only feeds the "dollars saved" figure in the periodic report.
+ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv("AI_LAYER_CACHE_TTL_SECONDS", "900"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("AI_LAYER_CACHE_MAX_ENTRIES", "1024"))
+ANALYSIS_CACHE_REDIS = os.getenv("AI_LAYER_CACHE_REDIS", "true").strip().lower() == "true"
+ANALYSIS_CACHE_KEY = "ai:v1:analysis:{fingerprint}"
+GEMINI_COST_PER_CALL_USD = float(os.getenv("GEMINI_COST_PER_CALL_USD", "0.04"))
+
+# Upper bound on the estimated prompt size (about 4 characters per token). Repeated signals
+# are always deduplicated and summarized; past the budget the signal section is reduced to
+# per-source summaries and then truncated. 0 disables the budget.
+PROMPT_TOKEN_BUDGET = int(os.getenv("AI_LAYER_PROMPT_TOKEN_BUDGET", "4000"))
 
 MIN_CONVICTION_SCORE = int(os.getenv("AI_MIN_CONVICTION_SCORE", "50"))
@@ -1,42 +1,167 @@
-import json
 import logging
+import signal
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from google import genai
 from google.genai import types
+from redis import Redis
 
-from kafka import KafkaConsumer, KafkaProducer
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from messaging.codec import TRIAGE_PAYLOAD, VALIDATED_SIGNAL, MessageCodec, MessageDecodeError
+from messaging.offsets import OrderedOffsetTracker
+from messaging.producer import BatchingProducer, ticker_key
+from messaging.schemas import validated_signal_id
 
 try:
     from ai_layer.ai_config import (
+        ANALYSIS_CACHE_KEY,
+        ANALYSIS_CACHE_MAX_ENTRIES,
+        ANALYSIS_CACHE_REDIS,
+        ANALYSIS_CACHE_TTL_SECONDS,
+        ANALYSIS_CONCURRENCY,
+        CASCADE_ENABLED,
+        DEADLINE_SECONDS,
+        ESCALATION_BAND,
         GEMINI_API_KEY,
+        GEMINI_BREAKER_FAILURES,
+        GEMINI_BREAKER_RESET_SECONDS,
+        GEMINI_COST_PER_CALL_USD,
+        GEMINI_GROUNDING,
+        GEMINI_GROUNDING_RECENT_SECONDS,
         GEMINI_INITIAL_BACKOFF_SECONDS,
+        GEMINI_MAX_BACKOFF_SECONDS,
         GEMINI_MAX_RETRIES,
+        GEMINI_MAX_RPS,
+        GEMINI_MIN_RPS,
         GEMINI_MODEL,
+        GEMINI_PREAMBLE_CACHE_TTL_SECONDS,
+        GEMINI_PREAMBLE_MODE,
+        GEMINI_PREAMBLE_REFRESH_SECONDS,
+        GEMINI_RATE_DECREASE_FACTOR,
+        GEMINI_RATE_INCREASE_RPS,
+        GEMINI_RATE_LIMIT_RPS,
+        GEMINI_RATE_REPORT_SECONDS,
+        GEMINI_RESPONSE_MIME_TYPE,
+        GEMINI_SCREEN_MODEL,
+        GEMINI_STRUCTURED_OUTPUT,
         GEMINI_TEMPERATURE,
         KAFKA_AUTO_OFFSET_RESET,
         KAFKA_BOOTSTRAP_SERVERS,
         KAFKA_CONSUMER_GROUP,
+        MAX_IN_FLIGHT,
         MIN_CONVICTION_SCORE,
+        POLL_TIMEOUT_MS,
+        PROMPT_TOKEN_BUDGET,
+        REDIS_HOST,
+        REDIS_PORT,
+        STALE_POLICY,
         TRIAGE_PRIORITY_TOPIC,
         VALIDATED_SIGNALS_TOPIC,
     )
-    from ai_layer.prompt_builder import build_analysis_prompt
+    from ai_layer.analysis_cache import AnalysisCache, fingerprint
+    from ai_layer.cascade import (
+        GROUNDED_STAGE,
+        SCREEN_STAGE,
+        UNGROUNDED_STAGE,
+        CascadeStats,
+        should_escalate,
+    )
+    from ai_layer.grounding import REASON_RECENT_NEWS, GroundingPolicy
+    from ai_layer.preamble import PreambleCache
+    from ai_layer.prompt_builder import (
+        ANALYSIS_RESPONSE_SCHEMA,
+        SYSTEM_INSTRUCTION,
+        build_analysis_prompt,
+        estimate_tokens,
+    )
+    from ai_layer.rate_limiter import AdaptiveRateLimiter, QuotaExceededError
+    from ai_layer.response_parser import ResponseParseError, parse_analysis_json
+    from ai_layer.response_parser import strip_code_fences as _strip_code_fences
+    from ai_layer.retry import (
+        AnalysisRetryError,
+        CircuitBreaker,
+        DelayedRetryQueue,
+        ParkedRecord,
+        backoff_delay,
+        is_permanent_error,
+    )
+    from ai_layer.scheduler import AnalysisScheduler
 except ImportError:
     from ai_config import (
+        ANALYSIS_CACHE_KEY,
+        ANALYSIS_CACHE_MAX_ENTRIES,
+        ANALYSIS_CACHE_REDIS,
+        ANALYSIS_CACHE_TTL_SECONDS,
+        ANALYSIS_CONCURRENCY,
+        CASCADE_ENABLED,
+        DEADLINE_SECONDS,
+        ESCALATION_BAND,
         GEMINI_API_KEY,
+        GEMINI_BREAKER_FAILURES,
+        GEMINI_BREAKER_RESET_SECONDS,
+        GEMINI_COST_PER_CALL_USD,
+        GEMINI_GROUNDING,
+        GEMINI_GROUNDING_RECENT_SECONDS,
         GEMINI_INITIAL_BACKOFF_SECONDS,
+        GEMINI_MAX_BACKOFF_SECONDS,
         GEMINI_MAX_RETRIES,
+        GEMINI_MAX_RPS,
+        GEMINI_MIN_RPS,
         GEMINI_MODEL,
+        GEMINI_PREAMBLE_CACHE_TTL_SECONDS,
+        GEMINI_PREAMBLE_MODE,
+        GEMINI_PREAMBLE_REFRESH_SECONDS,
+        GEMINI_RATE_DECREASE_FACTOR,
+        GEMINI_RATE_INCREASE_RPS,
+        GEMINI_RATE_LIMIT_RPS,
+        GEMINI_RATE_REPORT_SECONDS,
+        GEMINI_RESPONSE_MIME_TYPE,
+        GEMINI_SCREEN_MODEL,
+        GEMINI_STRUCTURED_OUTPUT,
         GEMINI_TEMPERATURE,
         KAFKA_AUTO_OFFSET_RESET,
         KAFKA_BOOTSTRAP_SERVERS,
         KAFKA_CONSUMER_GROUP,
+        MAX_IN_FLIGHT,
         MIN_CONVICTION_SCORE,
+        POLL_TIMEOUT_MS,
+        PROMPT_TOKEN_BUDGET,
+        REDIS_HOST,
+        REDIS_PORT,
+        STALE_POLICY,
         TRIAGE_PRIORITY_TOPIC,
         VALIDATED_SIGNALS_TOPIC,
     )
-    from prompt_builder import build_analysis_prompt
+    from analysis_cache import AnalysisCache, fingerprint
+    from cascade import (
+        GROUNDED_STAGE,
+        SCREEN_STAGE,
+        UNGROUNDED_STAGE,
+        CascadeStats,
+        should_escalate,
+    )
+    from grounding import REASON_RECENT_NEWS, GroundingPolicy
+    from preamble import PreambleCache
+    from prompt_builder import (
+        ANALYSIS_RESPONSE_SCHEMA,
+        SYSTEM_INSTRUCTION,
+        build_analysis_prompt,
+        estimate_tokens,
+    )
+    from rate_limiter import AdaptiveRateLimiter, QuotaExceededError
+    from response_parser import ResponseParseError, parse_analysis_json
+    from response_parser import strip_code_fences as _strip_code_fences
+    from retry import (
+        AnalysisRetryError,
+        CircuitBreaker,
+        DelayedRetryQueue,
+        ParkedRecord,
+        backoff_delay,
+        is_permanent_error,
+    )
+    from scheduler import AnalysisScheduler
 
 
 logging.basicConfig(
@@ -58,6 +183,24 @@ MODEL_ALIASES = {
 }
 
 
+class DrainOnRevokeListener(ConsumerRebalanceListener):
+    """Finishes in-flight analyses and commits them before partitions move to another pod."""
+
+    def __init__(self, service):
+        self.service = service
+
+    def on_partitions_revoked(self, revoked):
+        if revoked:
+            self.service.release_partitions(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(
+            "Assigned %s partitions %s",
+            TRIAGE_PRIORITY_TOPIC,
+            sorted(tp.partition for tp in assigned),
+        )
+
+
 class AIAnalysisService:
     def __init__(self):
         if not GEMINI_API_KEY:
@@ -66,12 +209,84 @@ class AIAnalysisService:
         model_name = self.resolve_model_name(GEMINI_MODEL)
         self.client = genai.Client(api_key=GEMINI_API_KEY)
         tools = [types.Tool(google_search=types.GoogleSearch())]
+        # The static preamble goes out as the system instruction; contents carry only the
+        # per-ticker prompt.
         self.generation_config = types.GenerateContentConfig(
             temperature=GEMINI_TEMPERATURE,
             tools=tools,
+            system_instruction=SYSTEM_INSTRUCTION,
+            **self.structured_output_args(grounded=True),
         )
         self.model_name = model_name
         logger.info("Using Gemini model %s", model_name)
+        # Plain calls skip search grounding: payloads the grounding policy clears, and the
+        # screening stage (that is most of its savings).
+        self.plain_config = types.GenerateContentConfig(
+            temperature=GEMINI_TEMPERATURE,
+            system_instruction=SYSTEM_INSTRUCTION,
+            **self.structured_output_args(grounded=False),
+        )
+        self.grounding = GroundingPolicy(GEMINI_GROUNDING, GEMINI_GROUNDING_RECENT_SECONDS)
+        self.screen_model_name = self.resolve_model_name(GEMINI_SCREEN_MODEL)
+        self.screen_config = self.plain_config
+        self.preamble = None
+        if GEMINI_PREAMBLE_MODE == "cached":
+            self.preamble = PreambleCache(
+                self.client,
+                SYSTEM_INSTRUCTION,
+                GEMINI_PREAMBLE_CACHE_TTL_SECONDS,
+                GEMINI_PREAMBLE_REFRESH_SECONDS,
+            )
+        logger.info(
+            "Static preamble: ~%s tokens sent as %s",
+            estimate_tokens(SYSTEM_INSTRUCTION),
+            "cached content" if self.preamble else "the system instruction",
+        )
+        # Response parsing since the last report: [responses, repaired locally, parse retries].
+        self.parse_counts = [0, 0, 0]
+        self.parse_counts_lock = threading.Lock()
+        self.cascade_stats = CascadeStats()
+        if CASCADE_ENABLED:
+            logger.info(
+                "Cascade mode: screening with %s, escalating scores within %s of %s",
+                self.screen_model_name,
+                ESCALATION_BAND,
+                MIN_CONVICTION_SCORE,
+            )
+        self.triage_codec = MessageCodec(TRIAGE_PAYLOAD)
+
+        # Gemini calls run on a bounded pool; the poll loop stays on this thread because
+        # KafkaConsumer is not thread-safe.
+        self.executor = ThreadPoolExecutor(
+            max_workers=ANALYSIS_CONCURRENCY, thread_name_prefix="gemini"
+        )
+        self.offsets = OrderedOffsetTracker()
+        self.in_flight = set()
+        self.active = 0
+        self.in_flight_lock = threading.Lock()
+        self.scheduler = AnalysisScheduler(DEADLINE_SECONDS, STALE_POLICY)
+        self.retries = DelayedRetryQueue()
+        self.breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET_SECONDS)
+
+        # One limiter for the whole pool so every worker sees the same quota feedback.
+        self.limiter = AdaptiveRateLimiter(
+            rate=GEMINI_RATE_LIMIT_RPS,
+            max_rate=GEMINI_MAX_RPS,
+            min_rate=GEMINI_MIN_RPS,
+            max_concurrency=ANALYSIS_CONCURRENCY,
+            rate_increase=GEMINI_RATE_INCREASE_RPS,
+            decrease_factor=GEMINI_RATE_DECREASE_FACTOR,
+        )
+        self.analysis_cache = AnalysisCache(
+            ANALYSIS_CACHE_TTL_SECONDS,
+            ANALYSIS_CACHE_MAX_ENTRIES,
+            redis=self.build_cache_redis(),
+            key_template=ANALYSIS_CACHE_KEY,
+        )
+        self.last_report = time.monotonic()
+        # Prompt sizes since the last report: [prompts, total tokens, max tokens].
+        self.prompt_tokens = [0, 0, 0]
+        self.prompt_tokens_lock = threading.Lock()
 
         # Kafka connections with basic retry to handle transient bootstrap issues.
         kafka_backoff = 1
@@ -79,16 +294,18 @@ class AIAnalysisService:
         for attempt in range(1, 4):
             try:
                 self.consumer = KafkaConsumer(
-                    TRIAGE_PRIORITY_TOPIC,
                     bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
                     auto_offset_reset=KAFKA_AUTO_OFFSET_RESET,
                     enable_auto_commit=False,
                     group_id=KAFKA_CONSUMER_GROUP,
-                    value_deserializer=lambda value: json.loads(value.decode("utf-8")),
                 )
-                self.producer = KafkaProducer(
+                self.producer = BatchingProducer(
                     bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-                    value_serializer=lambda value: json.dumps(value).encode("utf-8"),
+                    codecs={
+                        VALIDATED_SIGNALS_TOPIC: MessageCodec.for_topic(
+                            VALIDATED_SIGNAL, VALIDATED_SIGNALS_TOPIC
+                        )
+                    },
                 )
                 break
             except Exception as exc:
@@ -105,26 +322,402 @@ class AIAnalysisService:
         if last_error is not None and not hasattr(self, "consumer"):
             raise RuntimeError("Failed to initialize Kafka consumer/producer") from last_error
 
+        self.consumer.subscribe([TRIAGE_PRIORITY_TOPIC], listener=DrainOnRevokeListener(self))
+
+    @staticmethod
+    def structured_output_args(grounded):
+        if GEMINI_STRUCTURED_OUTPUT == "all" or (
+            GEMINI_STRUCTURED_OUTPUT == "ungrounded" and not grounded
+        ):
+            return {
+                "response_mime_type": GEMINI_RESPONSE_MIME_TYPE,
+                "response_schema": ANALYSIS_RESPONSE_SCHEMA,
+            }
+        return {}
+
+    def build_cache_redis(self):
+        """Shared cache tier; without Redis the cache stays per-process rather than failing."""
+        if not ANALYSIS_CACHE_REDIS or ANALYSIS_CACHE_TTL_SECONDS <= 0:
+            return None
+        try:
+            redis = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+            redis.ping()
+            return redis
+        except Exception as exc:
+            logger.warning(
+                "Analysis cache Redis at %s:%s unavailable (%s); using in-process cache only",
+                REDIS_HOST,
+                REDIS_PORT,
+                exc,
+            )
+            return None
+
     def run(self):
         logger.info(
-            "Listening on %s and publishing to %s",
+            "Listening on %s and publishing to %s (concurrency=%s, max_in_flight=%s)",
             TRIAGE_PRIORITY_TOPIC,
             VALIDATED_SIGNALS_TOPIC,
+            ANALYSIS_CONCURRENCY,
+            MAX_IN_FLIGHT,
+        )
+        try:
+            while True:
+                self.poll_once()
+        finally:
+            self.shutdown()
+
+    def poll_once(self):
+        """Re-queue due retries, fill free buffer slots from Kafka, commit what finished."""
+        for parked in self.retries.pop_due():
+            self.scheduler.push(parked.tp, parked.offset, parked.payload, parked.attempt)
+        self.fill_workers()
+        free_slots = MAX_IN_FLIGHT - self.in_flight_count()
+        self.apply_backpressure(free_slots <= 0)
+        records = self.consumer.poll(timeout_ms=POLL_TIMEOUT_MS, max_records=max(free_slots, 1))
+        for tp, messages in records.items():
+            for message in messages:
+                self.dispatch(tp, message)
+        self.commit_finished()
+        self.maybe_report()
+
+    def maybe_report(self):
+        now = time.monotonic()
+        if now - self.last_report < GEMINI_RATE_REPORT_SECONDS:
+            return
+        self.last_report = now
+        stats = self.limiter.snapshot()
+        logger.info(
+            "Gemini limiter: rate=%.2f rps concurrency=%s active=%s successes=%s throttles=%s",
+            stats["rate"],
+            stats["concurrency"],
+            stats["active"],
+            stats["successes"],
+            stats["throttles"],
+        )
+        if self.retries or self.breaker.trips:
+            logger.info(
+                "Gemini retries: breaker=%s trips=%s parked=%s",
+                self.breaker.state,
+                self.breaker.trips,
+                len(self.retries),
+            )
+        scheduler = self.scheduler.snapshot(reset=True)
+        if scheduler["scheduled"] or scheduler["dropped"]:
+            logger.info(
+                "Scheduler: %s scheduled, %.2fs avg wait, %.2fs max, %s queued, "
+                "%s stale dropped, %s stale downgraded",
+                scheduler["scheduled"],
+                scheduler["avg_wait_seconds"],
+                scheduler["max_wait_seconds"],
+                scheduler["queued"],
+                scheduler["dropped"],
+                scheduler["downgraded"],
+            )
+        cache = self.analysis_cache.stats()
+        if cache["hits"] or cache["misses"]:
+            logger.info(
+                "Analysis cache: hit_rate=%.1f%% hits=%s (shared=%s) misses=%s "
+                "entries=%s saved=$%.2f",
+                cache["hit_rate"] * 100,
+                cache["hits"],
+                cache["shared_hits"],
+                cache["misses"],
+                cache["entries"],
+                cache["hits"] * GEMINI_COST_PER_CALL_USD,
+            )
+        cascade = self.cascade_stats.snapshot(reset=True)
+        for stage, latency in sorted(cascade["stages"].items()):
+            logger.info(
+                "Stage %s: %s calls (%s failed), %.2fs avg, %.2fs max",
+                stage,
+                latency["calls"],
+                latency["failures"],
+                latency["avg_seconds"],
+                latency["max_seconds"],
+            )
+        grounding = self.grounding.snapshot(reset=True)
+        if grounding["total"]:
+            logger.info(
+                "Grounding: %s of %s analyses grounded (%.1f%%), by reason %s",
+                grounding["grounded"],
+                grounding["total"],
+                grounding["grounded_ratio"] * 100,
+                grounding["decisions"],
+            )
+        if cascade["screened"]:
+            logger.info(
+                "Cascade: %s screened, %s escalated (%.1f%%)",
+                cascade["screened"],
+                cascade["escalated"],
+                cascade["escalation_rate"] * 100,
+            )
+        with self.parse_counts_lock:
+            responses, repaired, parse_retries = self.parse_counts
+            self.parse_counts = [0, 0, 0]
+        if responses:
+            logger.info(
+                "Responses: %s received, %s repaired locally, %s unparseable "
+                "(parse-retry rate %.1f%%)",
+                responses,
+                repaired,
+                parse_retries,
+                parse_retries / responses * 100,
+            )
+        with self.prompt_tokens_lock:
+            prompts, total_tokens, max_tokens = self.prompt_tokens
+            self.prompt_tokens = [0, 0, 0]
+        if prompts:
+            logger.info(
+                "Prompts: %s built, ~%s tokens avg, ~%s max (budget %s)",
+                prompts,
+                total_tokens // prompts,
+                max_tokens,
+                PROMPT_TOKEN_BUDGET or "unlimited",
+            )
+
+    def apply_backpressure(self, saturated):
+        """Pause what should not be fetched now; poll() keeps the group membership alive.
+
+        Everything is paused while the pool is full or the breaker is open. Otherwise only
+        the partitions with parked retries are paused, until those retries are due.
+        """
+        assigned = set(self.consumer.assignment())
+        if saturated or self.breaker.is_open():
+            wanted = assigned
+        else:
+            wanted = self.retries.partitions() & assigned
+        paused = set(self.consumer.paused())
+        if wanted - paused:
+            self.consumer.pause(*(wanted - paused))
+        if paused - wanted:
+            self.consumer.resume(*(paused - wanted))
+
+    def dispatch(self, tp, message):
+        self.offsets.start(tp, message.offset)
+        try:
+            triage_payload = self.triage_codec.decode_record(message)
+        except MessageDecodeError as exc:
+            logger.warning(
+                "Skipping undecodable triage payload at offset %s: %s", message.offset, exc
+            )
+            self.offsets.finish(tp, message.offset)
+            return
+        self.scheduler.push(tp, message.offset, triage_payload)
+        self.fill_workers()
+
+    def fill_workers(self):
+        """Hand the best queued payloads to idle workers; called on dispatch and completion."""
+        while True:
+            with self.in_flight_lock:
+                if self.active >= ANALYSIS_CONCURRENCY:
+                    return
+                item, dropped = self.scheduler.pop()
+                if item is not None:
+                    self.active += 1
+                    future = self.executor.submit(
+                        self.analyze_record, item.tp, item.offset, item.payload, item.attempt
+                    )
+                    self.in_flight.add(future)
+            for stale in dropped:
+                logger.info(
+                    "Dropped stale payload for %s at offset %s (older than %ss)",
+                    stale.payload.get("ticker", "unknown"),
+                    stale.offset,
+                    DEADLINE_SECONDS,
+                )
+                self.offsets.finish(stale.tp, stale.offset)
+            if item is None:
+                return
+            future.add_done_callback(self.on_analysis_done)
+
+    def analyze_record(self, tp, offset, triage_payload, attempt=1):
+        # Runs on a worker thread. A record that published a validated signal is finished
+        # by the send's callback once the broker acknowledges it (commit_finished() flushes
+        # first), and parked again if delivery fails. Any other record is finished before
+        # the future resolves, so drain() followed by commit_finished() sees it; a failed
+        # analysis still counts as processed once its attempts are used up. A parked
+        # record stays unfinished.
+        parked = False
+        delivery = None
+        try:
+            delivery = self.process_event(triage_payload)
+        except AnalysisRetryError as exc:
+            parked = self.park(tp, offset, triage_payload, attempt, exc)
+        except Exception:
+            logger.exception("Analysis worker failed at offset %s", offset)
+        finally:
+            if delivery is not None:
+                delivery.add_callback(lambda _metadata: self.offsets.finish(tp, offset))
+                delivery.add_errback(
+                    lambda exc: self.redeliver(tp, offset, triage_payload, attempt, exc)
+                )
+            elif not parked:
+                self.offsets.finish(tp, offset)
+            with self.in_flight_lock:
+                self.active -= 1
+
+    def redeliver(self, tp, offset, triage_payload, attempt, exc):
+        """Producer callback for an undelivered validated signal: process the record again.
+
+        The analysis cache usually answers the second attempt without a Gemini call.
+        """
+        error = AnalysisRetryError(f"validated signal was not delivered: {exc!r}")
+        if not self.park(tp, offset, triage_payload, attempt, error):
+            self.offsets.finish(tp, offset)
+
+    def park(self, tp, offset, triage_payload, attempt, exc):
+        """Queue a failed analysis for a later attempt; False once attempts are used up."""
+        ticker = triage_payload.get("ticker", "unknown")
+        if exc.circuit_open:
+            # Fast failure: the call was never made, so it does not use up an attempt.
+            next_attempt, delay = attempt, exc.delay
+        else:
+            if attempt >= GEMINI_MAX_RETRIES:
+                logger.error(
+                    "Gemini analysis failed for %s after %s attempts: %s", ticker, attempt, exc
+                )
+                return False
+            next_attempt = attempt + 1
+            delay = max(
+                exc.delay or 0.0,
+                backoff_delay(attempt, GEMINI_INITIAL_BACKOFF_SECONDS, GEMINI_MAX_BACKOFF_SECONDS),
+            )
+            logger.warning(
+                "Gemini attempt %s/%s for %s failed: %s. Retrying in %.1fs",
+                attempt,
+                GEMINI_MAX_RETRIES,
+                ticker,
+                exc,
+                delay,
+            )
+        self.retries.park(ParkedRecord(tp, offset, triage_payload, next_attempt), delay)
+        return True
+
+    def on_analysis_done(self, future):
+        with self.in_flight_lock:
+            self.in_flight.discard(future)
+        self.fill_workers()
+
+    def in_flight_count(self):
+        """Queued, running and parked analyses; each holds an unfinished offset."""
+        with self.in_flight_lock:
+            return self.active + len(self.scheduler) + len(self.retries)
+
+    def drain(self):
+        """Block until every queued and running analysis has finished."""
+        while True:
+            with self.in_flight_lock:
+                pending = list(self.in_flight)
+            if not pending:
+                return
+            wait(pending)
+
+    def commit_finished(self, sync=False):
+        """Commit each partition's highest contiguous finished offset once its output is acked.
+
+        Records that published a signal only finish when the broker acknowledges it, so the
+        producer is flushed before the committable offsets are read.
+        """
+        if self.producer.flush():
+            logger.warning("Skipping Kafka commit: validated signals were not acknowledged")
+            return
+        offsets = self.offsets.committable()
+        if not offsets:
+            return
+        try:
+            if sync:
+                self.consumer.commit(offsets)
+            else:
+                self.consumer.commit_async(offsets, callback=self.on_commit)
+        except Exception as exc:
+            logger.warning("Kafka commit failed: %s", exc)
+            return
+        self.offsets.mark_committed(offsets)
+
+    @staticmethod
+    def on_commit(offsets, response):
+        if isinstance(response, Exception):
+            logger.warning("Async Kafka commit failed: %s", response)
+
+    def release_partitions(self, revoked):
+        logger.info(
+            "Releasing %s partitions %s; draining %s in-flight analyses",
+            TRIAGE_PRIORITY_TOPIC,
+            sorted(tp.partition for tp in revoked),
+            self.in_flight_count(),
         )
-        for message in self.consumer:
-            self.process_event(message.value)
+        queued = self.scheduler.forget(revoked)
+        if queued:
+            logger.info("Dropped %s queued payloads; the new owner will replay them", queued)
+        self.drain()
+        # Undelivered signals are parked during this flush, so retries are forgotten after.
+        self.commit_finished(sync=True)
+        dropped = self.retries.forget(revoked)
+        if dropped:
+            logger.info("Dropped %s parked retries; the new owner will replay them", dropped)
+        self.offsets.forget(revoked)
+
+    def shutdown(self):
+        queued = self.scheduler.clear()
+        logger.info(
+            "Shutting down: waiting for %s running analyses; %s queued payloads and %s parked "
+            "retries will be replayed",
+            self.active,
+            queued,
+            len(self.retries),
+        )
+        self.executor.shutdown(wait=True)
+        self.commit_finished(sync=True)
+        self.producer.close()
+        if self.preamble is not None:
+            self.preamble.close()
+        try:
+            self.consumer.close(autocommit=False)
+        except Exception as exc:
+            logger.warning("Kafka consumer close failed: %s", exc)
 
     def process_event(self, triage_payload):
-        prompt = build_analysis_prompt(triage_payload)
+        """Analyze one payload; returns the send future of the validated signal, if any."""
         try:
-            analysis = self.analyze_with_retry(prompt)
+            cache_key = fingerprint(triage_payload)
         except Exception as exc:
-            logger.error(
-                "Gemini analysis failed for %s: %s",
+            # The cache is only an optimization: analyze the payload uncached.
+            logger.warning(
+                "Could not fingerprint %s, skipping the analysis cache: %s",
                 triage_payload.get("ticker", "unknown"),
                 exc,
             )
-            return
+            cache_key = None
+        analysis = None if cache_key is None else self.analysis_cache.get(cache_key)
+        cached = analysis is not None
+        if cached:
+            logger.info("Reusing cached analysis for %s", triage_payload.get("ticker", "unknown"))
+        else:
+            grounded, reason = self.grounding.decide(triage_payload)
+            recent_search = None
+            if reason == REASON_RECENT_NEWS:
+                recent_search = self.grounding.recent_search(triage_payload.get("ticker"))
+            prompt = self.build_prompt(triage_payload, grounded, recent_search)
+            self.record_prompt_size(triage_payload, prompt)
+            if not grounded:
+                logger.info(
+                    "Skipping search grounding for %s (%s)",
+                    triage_payload.get("ticker", "unknown"),
+                    reason,
+                )
+            try:
+                analysis = self.analyze(triage_payload, prompt, grounded)
+            except AnalysisRetryError:
+                raise  # parked by analyze_record
+            except Exception as exc:
+                logger.error(
+                    "Gemini analysis failed for %s: %s",
+                    triage_payload.get("ticker", "unknown"),
+                    exc,
+                )
+                return
+            if cache_key is not None:
+                self.analysis_cache.put(cache_key, analysis)
 
         conviction_score = analysis.get("conviction_score", 0)
         if conviction_score < MIN_CONVICTION_SCORE:
@@ -136,56 +729,168 @@ class AIAnalysisService:
             )
             return
 
-        validated_signal = self.merge_payload(triage_payload, analysis)
-        self.producer.send(VALIDATED_SIGNALS_TOPIC, validated_signal)
-        self.producer.flush()
-        # Commit offsets only after successful processing to avoid message loss.
-        try:
-            self.consumer.commit()
-        except Exception as exc:
-            logger.warning("Kafka commit failed after publishing validated signal: %s", exc)
+        validated_signal = self.merge_payload(triage_payload, analysis, cached=cached)
+        # The caller finishes this offset once the broker acknowledges the signal.
+        future = self.producer.send(
+            VALIDATED_SIGNALS_TOPIC, validated_signal, key=ticker_key(validated_signal)
+        )
         logger.info(
             "Published validated signal for %s with conviction %s",
             validated_signal["ticker"],
             conviction_score,
         )
+        return future
 
-    def analyze_with_retry(self, prompt):
-        backoff_seconds = GEMINI_INITIAL_BACKOFF_SECONDS
-        last_error = None
+    def build_prompt(self, triage_payload, grounded, recent_search=None):
+        return build_analysis_prompt(
+            triage_payload,
+            token_budget=PROMPT_TOKEN_BUDGET or None,
+            grounded=grounded,
+            recent_search=recent_search,
+        )
+
+    def record_prompt_size(self, triage_payload, prompt):
+        tokens = estimate_tokens(prompt)
+        with self.prompt_tokens_lock:
+            self.prompt_tokens[0] += 1
+            self.prompt_tokens[1] += tokens
+            self.prompt_tokens[2] = max(self.prompt_tokens[2], tokens)
+        logger.info(
+            "Prompt for %s: ~%s tokens from %s signals",
+            triage_payload.get("ticker", "unknown"),
+            tokens,
+            len(triage_payload.get("signals") or []),
+        )
+
+    def analyze(self, triage_payload, prompt, grounded=True):
+        if not CASCADE_ENABLED:
+            return self.final_analysis(triage_payload, prompt, grounded)
+
+        ticker = triage_payload.get("ticker", "unknown")
+        # The screen model has no search tool, so it gets the prompt of an ungrounded call;
+        # the grounded prompt is kept for the escalation.
+        screen_prompt = prompt
+        if grounded:
+            recent_search = self.grounding.recent_search(triage_payload.get("ticker"))
+            screen_prompt = self.build_prompt(triage_payload, False, recent_search)
+        try:
+            screen = self.timed_analysis(SCREEN_STAGE, screen_prompt)
+        except Exception as exc:
+            # A failed screen says nothing about the payload; let the main model decide.
+            logger.warning("Screening failed for %s, escalating: %s", ticker, exc)
+            self.cascade_stats.record_screening(escalated=True)
+            return self.final_analysis(triage_payload, prompt, grounded)
+
+        score = screen["conviction_score"]
+        escalate = should_escalate(score, MIN_CONVICTION_SCORE, ESCALATION_BAND)
+        self.cascade_stats.record_screening(escalate)
+        if not escalate:
+            logger.info("Screened %s at %s; skipping grounded analysis", ticker, score)
+            return screen
+        logger.info("Screened %s at %s; escalating to %s", ticker, score, self.model_name)
+        return self.final_analysis(triage_payload, prompt, grounded)
+
+    def final_analysis(self, triage_payload, prompt, grounded):
+        """The main model's analysis; a grounded one is remembered for later plain calls."""
+        if not grounded:
+            return self.timed_analysis(UNGROUNDED_STAGE, prompt)
+        analysis = self.timed_analysis(GROUNDED_STAGE, prompt)
+        self.grounding.record_search(triage_payload.get("ticker"), analysis)
+        return analysis
 
+    def timed_analysis(self, stage, prompt):
+        if stage == SCREEN_STAGE:
+            model_name, config = self.screen_model_name, self.screen_config
+        elif stage == UNGROUNDED_STAGE:
+            model_name, config = self.model_name, self.plain_config
+        else:
+            model_name, config = self.model_name, self.generation_config
+        if self.preamble is not None:
+            config = self.preamble.config_for(stage, model_name, config)
+        started = time.perf_counter()
+        try:
+            analysis = self.analyze_with_retry(prompt, model_name, config)
+        except Exception:
+            self.cascade_stats.record_call(stage, time.perf_counter() - started, failed=True)
+            raise
+        self.cascade_stats.record_call(stage, time.perf_counter() - started)
+        return analysis
+
+    def analyze_with_retry(self, prompt, model_name=None, config=None):
+        """One Gemini call; only an unparseable answer is re-asked, and straight away.
+
+        Upstream failures raise AnalysisRetryError without sleeping, so the record can be
+        parked and retried later.
+        """
+        last_error = None
         for attempt in range(1, GEMINI_MAX_RETRIES + 1):
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt,
-                    config=self.generation_config,
+            if not self.breaker.allow():
+                raise AnalysisRetryError(
+                    "Gemini circuit breaker is open",
+                    delay=self.breaker.retry_in(),
+                    circuit_open=True,
                 )
-                raw_text = getattr(response, "text", "")
-                cleaned_text = self.strip_code_fences(raw_text)
-                parsed = json.loads(cleaned_text)
-                return self.normalize_analysis(parsed)
+            try:
+                with self.limiter.slot():
+                    response = self.client.models.generate_content(
+                        model=model_name or self.model_name,
+                        contents=prompt,
+                        config=config or self.generation_config,
+                    )
+            except QuotaExceededError as exc:
+                # Throttled, not down: the limiter has already cut the shared rate.
+                self.breaker.record_success()
+                raise AnalysisRetryError(f"quota exceeded: {exc}") from exc
             except Exception as exc:
+                if is_permanent_error(exc):
+                    self.breaker.record_success()
+                    raise
+                if self.breaker.record_failure():
+                    logger.error(
+                        "Gemini circuit breaker opened after %s consecutive failures; "
+                        "pausing for %ss",
+                        GEMINI_BREAKER_FAILURES,
+                        GEMINI_BREAKER_RESET_SECONDS,
+                    )
+                raise AnalysisRetryError(str(exc)) from exc
+            self.breaker.record_success()
+
+            try:
+                parsed = self.parse_response(getattr(response, "text", ""))
+            except ResponseParseError as exc:
+                # The model answered but not in JSON; re-ask at once, no backoff is needed.
                 last_error = exc
-                if attempt == GEMINI_MAX_RETRIES:
-                    break
-                logger.warning(
-                    "Gemini attempt %s/%s failed: %s. Retrying in %ss",
-                    attempt,
-                    GEMINI_MAX_RETRIES,
-                    exc,
-                    backoff_seconds,
-                )
-                time.sleep(backoff_seconds)
-                backoff_seconds *= 2
+                if attempt < GEMINI_MAX_RETRIES:
+                    logger.warning(
+                        "Gemini attempt %s/%s returned unparseable JSON; retrying",
+                        attempt,
+                        GEMINI_MAX_RETRIES,
+                    )
+                continue
+            return self.normalize_analysis(parsed)
 
-        # Preserve original exception type and traceback for observability.
-        if last_error is not None:
-            raise RuntimeError("Gemini analysis failed after max retries") from last_error
-        raise RuntimeError("Gemini analysis failed after max retries with unknown error")
+        raise RuntimeError("Gemini returned unparseable JSON after max retries") from last_error
 
-    def merge_payload(self, triage_payload, analysis):
+    def parse_response(self, text):
+        try:
+            parsed, repaired = parse_analysis_json(text)
+        except ResponseParseError:
+            with self.parse_counts_lock:
+                self.parse_counts[0] += 1
+                self.parse_counts[2] += 1
+            raise
+        with self.parse_counts_lock:
+            self.parse_counts[0] += 1
+            self.parse_counts[1] += int(repaired)
+        return parsed
+
+    def merge_payload(self, triage_payload, analysis, cached=False):
         return {
+            "signal_id": validated_signal_id(
+                triage_payload.get("ticker"),
+                triage_payload.get("timestamp_utc"),
+                triage_payload.get("confluence_sources"),
+            ),
             "ticker": triage_payload.get("ticker"),
             "timestamp_utc": triage_payload.get("timestamp_utc"),
             "confluence_count": triage_payload.get("confluence_count", 0),
@@ -193,19 +898,12 @@ class AIAnalysisService:
             "liquidity_metrics": triage_payload.get("liquidity_metrics", {}),
             "signals": triage_payload.get("signals", []),
             **analysis,
+            "analysis_cached": cached,
         }
 
     @staticmethod
     def strip_code_fences(text):
-        cleaned = (text or "").strip()
-        if cleaned.startswith("```"):
-            lines = cleaned.splitlines()
-            if lines:
-                lines = lines[1:]
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]
-            cleaned = "\n".join(lines).strip()
-        return cleaned
+        return _strip_code_fences(text)
 
     @staticmethod
     def normalize_analysis(parsed):
@@ -263,5 +961,11 @@ class AIAnalysisService:
         return MODEL_ALIASES.get(model_name, model_name)
 
 
+def exit_on_sigterm(_signum, _frame):
+    # Unwind through run()'s finally block so finished analyses are committed.
+    raise SystemExit(0)
+
+
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
     AIAnalysisService().run()
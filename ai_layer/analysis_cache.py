@@ -0,0 +1,202 @@
+"""
+Fingerprint-keyed cache of Gemini analyses.
+
+Once the gatekeeper's sent-window expires it forwards the same ticker again, usually with
+nearly the same signals. fingerprint() reduces a triage payload to what the analysis
+actually depends on:
+
+- the ticker
+- the set of confluence sources
+- bucketed liquidity (price to two significant figures, volume by power of two, relative
+  volume in half steps)
+- a hash of the distinct signal contents, with floats rounded and timestamps dropped
+
+Payloads with the same fingerprint reuse the earlier normalized analysis instead of paying
+for another grounded call.
+
+AnalysisCache keeps a per-process LRU with a TTL in front of an optional Redis tier. The
+Redis tier is shared by every AI-layer replica. Redis errors are logged and treated as
+misses, because the cache is only an optimization.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("ai-layer")
+
+FINGERPRINT_VERSION = 1
+
+# Per-observation fields that differ between otherwise identical signals.
+VOLATILE_SIGNAL_KEYS = frozenset(
+    {"timestamp", "timestamp_utc", "created_at", "filing_date", "scraped_at", "fetched_at"}
+)
+
+
+def round_significant(value, digits=2):
+    if not value:
+        return 0
+    if not math.isfinite(value):
+        return non_finite(value)
+    return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def non_finite(value):
+    """Sentinel for NaN and infinities, which have no bucket of their own."""
+    return str(value)
+
+
+def bucket_liquidity(liquidity_metrics):
+    liquidity_metrics = liquidity_metrics or {}
+    price = float(liquidity_metrics.get("price") or 0)
+    volume = float(liquidity_metrics.get("volume") or 0)
+    relative_volume = float(liquidity_metrics.get("relative_volume") or 0)
+    if not math.isfinite(volume):
+        volume_bucket = non_finite(volume)
+    else:
+        volume_bucket = int(math.log2(volume)) if volume >= 1 else 0
+    if not math.isfinite(relative_volume):
+        relative_volume_bucket = non_finite(relative_volume)
+    else:
+        relative_volume_bucket = math.floor(relative_volume * 2) / 2
+    return [round_significant(price), volume_bucket, relative_volume_bucket]
+
+
+def canonical_value(value):
+    if isinstance(value, float):
+        return round_significant(value, 3)
+    if isinstance(value, dict):
+        return {
+            key: canonical_value(item)
+            for key, item in value.items()
+            if key not in VOLATILE_SIGNAL_KEYS
+        }
+    if isinstance(value, list):
+        return [canonical_value(item) for item in value]
+    return value
+
+
+def signal_digest(signals):
+    """Order-independent hash of the distinct signal contents."""
+    distinct = {
+        json.dumps(canonical_value(signal), sort_keys=True, default=str) for signal in signals or []
+    }
+    digest = hashlib.sha256()
+    for encoded in sorted(distinct):
+        digest.update(encoded.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def fingerprint(triage_payload):
+    key = {
+        "v": FINGERPRINT_VERSION,
+        "ticker": str(triage_payload.get("ticker") or "").upper(),
+        "sources": sorted(set(triage_payload.get("confluence_sources") or [])),
+        "liquidity": bucket_liquidity(triage_payload.get("liquidity_metrics")),
+        "signals": signal_digest(triage_payload.get("signals")),
+    }
+    encoded = json.dumps(key, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class AnalysisCache:
+    """Thread-safe LRU + TTL cache with an optional shared Redis tier."""
+
+    def __init__(
+        self,
+        ttl_seconds,
+        max_entries,
+        redis=None,
+        key_template="ai:v1:analysis:{fingerprint}",
+        clock=time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis = redis
+        self.key_template = key_template
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, analysis = entry
+                if expires_at > self.clock():
+                    self.entries.move_to_end(key)
+                    self.local_hits += 1
+                    return dict(analysis)
+                del self.entries[key]
+
+        analysis = self.get_shared(key)
+        with self._lock:
+            if analysis is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self.store_local(key, analysis)
+        return dict(analysis)
+
+    def put(self, key, analysis):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.store_local(key, analysis)
+        if self.redis is not None:
+            try:
+                self.redis.set(
+                    self.key_template.format(fingerprint=key),
+                    json.dumps(analysis),
+                    ex=max(1, int(self.ttl_seconds)),
+                )
+            except Exception as exc:
+                logger.warning("Analysis cache write to Redis failed: %s", exc)
+
+    def get_shared(self, key):
+        if self.redis is None:
+            return None
+        try:
+            cached = self.redis.get(self.key_template.format(fingerprint=key))
+        except Exception as exc:
+            logger.warning("Analysis cache read from Redis failed: %s", exc)
+            return None
+        if cached is None:
+            return None
+        try:
+            return json.loads(cached)
+        except ValueError:
+            return None
+
+    def store_local(self, key, analysis):
+        self.entries[key] = (self.clock() + self.ttl_seconds, dict(analysis))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+            }
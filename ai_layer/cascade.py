@@ -0,0 +1,78 @@
+"""
+Two-stage model cascade bookkeeping.
+
+In cascade mode a cheap, ungrounded screening model scores every payload first. Only
+scores inside the escalation band around the conviction threshold are sent on to the
+grounded model. Clear rejects and clear accepts keep the screening result. CascadeStats
+records per-stage latency and the escalation rate for the periodic report. The ungrounded
+stage is the main model without search, used when the grounding policy skips it.
+"""
+
+import threading
+
+SCREEN_STAGE = "screen"
+GROUNDED_STAGE = "grounded"
+UNGROUNDED_STAGE = "ungrounded"
+
+
+def should_escalate(conviction_score, threshold, band):
+    """True when a first-pass score is too close to the threshold to trust."""
+    return threshold - band <= conviction_score < threshold + band
+
+
+class StageLatency:
+    __slots__ = ("calls", "failures", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+class CascadeStats:
+    """Thread-safe counters, reset each time they are reported."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.screened = 0
+        self.escalated = 0
+
+    def record_call(self, stage, seconds, failed=False):
+        with self._lock:
+            latency = self.stages.get(stage)
+            if latency is None:
+                latency = self.stages[stage] = StageLatency()
+            latency.calls += 1
+            latency.failures += int(failed)
+            latency.total_seconds += seconds
+            latency.max_seconds = max(latency.max_seconds, seconds)
+
+    def record_screening(self, escalated):
+        with self._lock:
+            self.screened += 1
+            self.escalated += int(escalated)
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            snapshot = {
+                "stages": {stage: latency.as_dict() for stage, latency in self.stages.items()},
+                "screened": self.screened,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.screened if self.screened else 0.0,
+            }
+            if reset:
+                self.reset()
+            return snapshot
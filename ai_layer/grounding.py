@@ -0,0 +1,136 @@
+"""
+Per-payload choice between a grounded (Google Search) and a plain Gemini call.
+
+Grounded calls are much slower and more expensive than plain ones. Many payloads gain
+little from a search. GroundingPolicy.decide() skips it when:
+
+- the ticker was searched within ``recent_seconds``. The earlier result's news sentiment
+  and rationale are passed to the plain call instead.
+- a catalyst signal already carries the facts a search would look up: a drifter signal
+  with actual and estimated EPS and revenue, or a biotech signal with its event date.
+
+Everything else is grounded. In "always" and "never" mode the policy is bypassed.
+"""
+
+import threading
+import time
+
+GROUNDING_ADAPTIVE = "adaptive"
+GROUNDING_ALWAYS = "always"
+GROUNDING_NEVER = "never"
+
+REASON_ALWAYS = "always"
+REASON_NEVER = "never"
+REASON_RECENT_NEWS = "recent_news"
+REASON_COMPLETE_CATALYST = "complete_catalyst"
+REASON_NEEDS_SEARCH = "needs_search"
+
+# Signal fields that make a source's catalyst self-explanatory.
+CATALYST_FIELDS = {
+    "drifter": ("eps_actual", "eps_estimate", "revenue_actual", "revenue_estimate"),
+    "biotech": ("event_date",),
+}
+
+
+def has_complete_catalyst(triage_payload):
+    for signal in triage_payload.get("signals") or []:
+        if not isinstance(signal, dict):
+            continue
+        required = CATALYST_FIELDS.get(signal.get("source_hunter"))
+        signal_data = signal.get("signal_data") or {}
+        if required and all(signal_data.get(field) not in (None, "") for field in required):
+            return True
+    return False
+
+
+class RecentNews:
+    __slots__ = ("searched_at", "news_sentiment", "rationale")
+
+    def __init__(self, searched_at, news_sentiment, rationale):
+        self.searched_at = searched_at
+        self.news_sentiment = news_sentiment
+        self.rationale = rationale
+
+
+class GroundingPolicy:
+    """Thread-safe grounding decisions plus a per-ticker cache of recent search results."""
+
+    def __init__(self, mode=GROUNDING_ADAPTIVE, recent_seconds=1800, clock=time.monotonic):
+        self.mode = mode
+        self.recent_seconds = recent_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.recent = {}
+        self.decisions = {}
+
+    def decide(self, triage_payload):
+        """Return ``(grounded, reason)`` for one payload and count the decision."""
+        if self.mode == GROUNDING_ALWAYS:
+            decision = (True, REASON_ALWAYS)
+        elif self.mode == GROUNDING_NEVER:
+            decision = (False, REASON_NEVER)
+        elif self.recent_news(triage_payload.get("ticker")) is not None:
+            decision = (False, REASON_RECENT_NEWS)
+        elif has_complete_catalyst(triage_payload):
+            decision = (False, REASON_COMPLETE_CATALYST)
+        else:
+            decision = (True, REASON_NEEDS_SEARCH)
+        with self._lock:
+            self.decisions[decision[1]] = self.decisions.get(decision[1], 0) + 1
+        return decision
+
+    def recent_news(self, ticker):
+        """The last search result for ``ticker`` if it is still fresh, else None."""
+        if not ticker or self.recent_seconds <= 0:
+            return None
+        with self._lock:
+            news = self.recent.get(ticker)
+            if news is None:
+                return None
+            if self.clock() - news.searched_at > self.recent_seconds:
+                del self.recent[ticker]
+                return None
+            return news
+
+    def recent_search(self, ticker):
+        """The recent search result as build_analysis_prompt() takes it, or None."""
+        news = self.recent_news(ticker)
+        if news is None:
+            return None
+        return {
+            "age_minutes": int((self.clock() - news.searched_at) // 60),
+            "news_sentiment": news.news_sentiment or "unknown",
+            "rationale": news.rationale or "no rationale recorded.",
+        }
+
+    def record_search(self, ticker, analysis):
+        """Remember what a grounded analysis of ``ticker`` found."""
+        if not ticker or self.recent_seconds <= 0:
+            return
+        now = self.clock()
+        news = RecentNews(now, analysis.get("news_sentiment"), analysis.get("rationale"))
+        with self._lock:
+            self.recent[ticker] = news
+            for stale in [
+                key
+                for key, entry in self.recent.items()
+                if now - entry.searched_at > self.recent_seconds
+            ]:
+                del self.recent[stale]
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            total = sum(self.decisions.values())
+            grounded = self.decisions.get(REASON_ALWAYS, 0) + self.decisions.get(
+                REASON_NEEDS_SEARCH, 0
+            )
+            snapshot = {
+                "decisions": dict(self.decisions),
+                "total": total,
+                "grounded": grounded,
+                "grounded_ratio": grounded / total if total else 0.0,
+                "recent_tickers": len(self.recent),
+            }
+            if reset:
+                self.decisions = {}
+            return snapshot
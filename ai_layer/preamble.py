@@ -0,0 +1,121 @@
+"""
+Registration of the static prompt preamble with Gemini.
+
+Every request carries the same SYSTEM_INSTRUCTION. In the default "system" mode it is sent
+as the system instruction: the API can then reuse the identical prefix, and the per-call
+contents carry only the ticker block. In "cached" mode the preamble is registered once per
+(stage, model) as cached content, together with that stage's tools, and calls only
+reference it.
+
+Each cache entry is refreshed refresh_margin_seconds before its TTL runs out. If
+registration fails (for example because the preamble is below the model's minimum
+cacheable size), calls fall back to the system instruction and registration is retried
+after one TTL.
+"""
+
+import logging
+import threading
+import time
+
+from google.genai import types
+
+logger = logging.getLogger("ai-layer")
+
+
+class CachedPreamble:
+    __slots__ = ("name", "expires_at")
+
+    def __init__(self, name, expires_at):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class PreambleCache:
+    def __init__(
+        self, client, system_instruction, ttl_seconds, refresh_margin_seconds, clock=time.monotonic
+    ):
+        self.client = client
+        self.system_instruction = system_instruction
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = min(refresh_margin_seconds, ttl_seconds / 2)
+        self.clock = clock
+        # Held across the API calls so concurrent workers register each preamble only once.
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.retry_at = {}
+
+    def config_for(self, stage, model_name, base_config):
+        """The stage's config pointing at cached content, or base_config to fall back on."""
+        name = self.cached_name(stage, model_name, base_config)
+        if name is None:
+            return base_config
+        # Cached content already carries the system instruction and tools.
+        return base_config.model_copy(
+            update={"cached_content": name, "system_instruction": None, "tools": None}
+        )
+
+    def cached_name(self, stage, model_name, base_config):
+        key = (stage, model_name)
+        with self._lock:
+            now = self.clock()
+            entry = self.entries.get(key)
+            if entry is not None and now < entry.expires_at - self.refresh_margin_seconds:
+                return entry.name
+            if entry is not None and now < entry.expires_at and self.extend(entry, now):
+                return entry.name
+            self.entries.pop(key, None)
+            if now < self.retry_at.get(key, 0.0):
+                return None
+            return self.register(key, model_name, base_config, now)
+
+    def extend(self, entry, now):
+        try:
+            self.client.caches.update(
+                name=entry.name, config=types.UpdateCachedContentConfig(ttl=self.ttl())
+            )
+        except Exception as exc:
+            logger.warning("Could not extend cached preamble %s: %s", entry.name, exc)
+            return False
+        entry.expires_at = now + self.ttl_seconds
+        return True
+
+    def register(self, key, model_name, base_config, now):
+        stage = key[0]
+        try:
+            cached = self.client.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"catalyst-preamble-{stage}",
+                    system_instruction=self.system_instruction,
+                    tools=base_config.tools,
+                    ttl=self.ttl(),
+                ),
+            )
+        except Exception as exc:
+            logger.warning(
+                "Could not cache the %s preamble for %s (%s); sending it as the system "
+                "instruction for the next %ss",
+                stage,
+                model_name,
+                exc,
+                int(self.ttl_seconds),
+            )
+            self.retry_at[key] = now + self.ttl_seconds
+            return None
+        logger.info("Cached %s preamble for %s as %s", stage, model_name, cached.name)
+        self.entries[key] = CachedPreamble(cached.name, now + self.ttl_seconds)
+        return cached.name
+
+    def ttl(self):
+        return f"{int(self.ttl_seconds)}s"
+
+    def close(self):
+        """Delete registered caches instead of paying storage until their TTL runs out."""
+        with self._lock:
+            entries = list(self.entries.values())
+            self.entries = {}
+        for entry in entries:
+            try:
+                self.client.caches.delete(name=entry.name)
+            except Exception as exc:
+                logger.warning("Could not delete cached preamble %s: %s", entry.name, exc)
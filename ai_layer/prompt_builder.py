@@ -1,10 +1,176 @@
+"""
+Prompt construction for the AI layer.
+
+A hot ticker can carry up to 200 accumulated signals, most of them repeats of the same
+hunter row. To keep prompt size bounded, signals are compacted before they are rendered:
+
+- identical payloads are deduplicated
+- a source with more than SUMMARY_THRESHOLD distinct payloads is collapsed into one
+  summary with a count, numeric ranges and distinct values
+- all JSON is emitted compact
+
+With a token budget, the signal section is rendered at decreasing levels of detail until
+the whole prompt fits, and is truncated as a last resort. estimate_tokens() is the same
+rough count the service reports per prompt.
+
+The static instructions (role, guides, calibration, output schema) live in
+SYSTEM_INSTRUCTION and are sent once per call as the system instruction, or referenced as
+cached content. build_analysis_prompt() only renders the per-ticker part, including
+search instructions that match whether the call is grounded.
+"""
+
 import json
+import math
 from textwrap import dedent
 
+CHARS_PER_TOKEN = 4
+SUMMARY_THRESHOLD = 3
+MAX_DISTINCT_VALUES = 5
+
+# Signal detail levels, tried in order until the prompt fits the token budget.
+DETAIL_FULL = 0  # small sources listed row by row, large ones summarized
+DETAIL_SUMMARY = 1  # every source summarized
+DETAIL_RANGES = 2  # summaries keep counts, numeric ranges and constant fields only
+
+# The OUTPUT SCHEMA section below as a Gemini response schema. It sticks to the OpenAPI
+# subset google-genai accepts for the Gemini API (no ordering or numeric bounds). Used as
+# response_schema where structured output is enabled; the prompt text covers other calls.
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "conviction_score": {"type": "INTEGER"},
+        "catalyst_type": {
+            "type": "STRING",
+            "enum": ["SUPERNOVA", "SCALPER", "FOLLOWER", "DRIFTER", "UNKNOWN"],
+        },
+        "is_trap": {"type": "BOOLEAN"},
+        "trap_reason": {"type": "STRING", "nullable": True},
+        "rationale": {"type": "STRING"},
+        "news_sentiment": {"type": "STRING", "enum": ["bullish", "bearish", "neutral", "unknown"]},
+        "risk_level": {"type": "STRING", "enum": ["low", "medium", "high", "extreme"]},
+        "suggested_timeframe": {"type": "STRING", "enum": ["scalp", "intraday", "swing"]},
+        "key_risks": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "raw_signals_summary": {"type": "STRING"},
+        "suggested_entry_zone": {"type": "STRING"},
+        "suggested_stop": {"type": "STRING"},
+    },
+    "required": [
+        "conviction_score",
+        "catalyst_type",
+        "is_trap",
+        "rationale",
+        "news_sentiment",
+        "risk_level",
+        "suggested_timeframe",
+        "key_risks",
+    ],
+}
+
+# Static instructions, identical for every payload. Sent as the system instruction (or
+# registered once as cached content), so each call only carries the per-ticker prompt.
+SYSTEM_INSTRUCTION = dedent(
+    """
+    ROLE:
+    You are a rigorous trading signal analyst for Catalyst. You are not a hype machine.
+    Bad analysis costs real money. Only classify what the evidence supports and keep the
+    answer grounded in the supplied signals.
+
+    CATALYST TYPE GUIDE:
+    - SUPERNOVA: high short interest + squeeze conditions + unusual volume
+    - SCALPER: imminent binary event (FDA, earnings)
+    - FOLLOWER: C-suite insider purchase, large dollar amount
+    - DRIFTER: post-earnings beat, swing setup
+    - UNKNOWN: cannot classify with confidence
+
+    TRAP GUIDE:
+    Set is_trap=true when the signals conflict in a way that makes the setup dangerous.
+    Examples:
+    - Insider BUY but options flow is Puts
+    - High short interest but earnings were catastrophically bad
+    - Whale Calls but stock is already up 40%+ and extended
+    - Dark pool bullish but insider is selling large blocks
+
+    CONVICTION CALIBRATION:
+    - 90-100: Multiple confirming signals, no contradictions
+    - 70-89: Strong, most signals align
+    - 50-69: Moderate, single dominant signal
+    - Below 50: Do not trade
+    - If is_trap=true, conviction_score must be below 40
+    - Binary events (FDA PDUFA decision, earnings same day): single-source signals can
+      score 80+ if the event is confirmed imminent via search or signal data
 
-def build_analysis_prompt(triage_payload):
+    OUTPUT SCHEMA:
+    Return ONLY a JSON object with this exact shape and no markdown:
+    {
+      "conviction_score": 0,
+      "catalyst_type": "SUPERNOVA|SCALPER|FOLLOWER|DRIFTER|UNKNOWN",
+      "is_trap": false,
+      "trap_reason": null,
+      "rationale": "1-2 sentences explaining the edge",
+      "news_sentiment": "bullish|bearish|neutral|unknown (only populate from grounded search results; if no search results, return 'unknown')",
+      "risk_level": "low|medium|high|extreme",
+      "suggested_timeframe": "scalp|intraday|swing",
+      "key_risks": ["string", "string"],
+      "raw_signals_summary": "one sentence digest of the hunter data",
+      "suggested_entry_zone": "string describing price range or 'no clear level'",
+      "suggested_stop": "string describing stop logic or 'no clear level'"
+    }
+    """
+).strip()
+
+PROMPT_TEMPLATE = dedent(
+    """
+    TRIAGE METADATA:
+    {metadata_block}
+
+    GROUNDING INSTRUCTION:
+    {grounding_instruction}
+
+    SIGNAL DATA:
+    {signal_blocks}
+    """
+).strip()
+
+SEARCH_INSTRUCTION = dedent(
+    """
+    You have access to Google Search. Before scoring, search for:
+    - "{ticker} news today"
+    - "{ticker} SEC filing" if an insider signal is present
+    - "{ticker} short squeeze" if a squeeze signal is present
+    Use search results to populate news_sentiment and inform is_trap. If search returns
+    nothing relevant, say so in the rationale.
+    """
+).strip()
+
+NO_SEARCH_INSTRUCTION = (
+    "Search is not available for this call. Score from the signal data and set\n"
+    'news_sentiment to "unknown".'
+)
+
+RECENT_SEARCH_INSTRUCTION = dedent(
+    """
+    Search is not available for this call. A search for {ticker} {age_minutes} minutes ago
+    found news_sentiment={news_sentiment}: {rationale}
+    Reuse that news_sentiment unless the signal data contradicts it.
+    """
+).strip()
+
+
+def build_analysis_prompt(triage_payload, token_budget=None, grounded=True, recent_search=None):
+    """The per-ticker part of the request; SYSTEM_INSTRUCTION is sent separately.
+
+    token_budget bounds the estimated input of the whole call, system instruction included.
+    A prompt for an ungrounded call carries ``recent_search`` (a dict with age_minutes,
+    news_sentiment and rationale) when the ticker was searched recently.
+    """
     ticker = triage_payload.get("ticker", "UNKNOWN")
-    signal_blocks = format_signal_blocks(triage_payload.get("signals", []))
+    if grounded:
+        grounding_instruction = SEARCH_INSTRUCTION.format(ticker=ticker)
+    elif recent_search:
+        grounding_instruction = RECENT_SEARCH_INSTRUCTION.format(ticker=ticker, **recent_search)
+    else:
+        grounding_instruction = NO_SEARCH_INSTRUCTION
+    signals = triage_payload.get("signals", [])
     metadata = {
         "ticker": ticker,
         "timestamp_utc": triage_payload.get("timestamp_utc"),
@@ -14,94 +180,119 @@ def build_analysis_prompt(triage_payload):
         "market_cap": triage_payload.get("market_cap"),
         "float_shares": triage_payload.get("float_shares"),
     }
+    metadata_block = compact_json(metadata)
+
+    def render(signal_blocks):
+        return PROMPT_TEMPLATE.format(
+            metadata_block=metadata_block,
+            grounding_instruction=grounding_instruction,
+            signal_blocks=signal_blocks,
+        )
+
+    prompt = render(format_signal_blocks(signals))
+    if token_budget is None or estimate_input_tokens(prompt) <= token_budget:
+        return prompt
+    for detail in (DETAIL_SUMMARY, DETAIL_RANGES):
+        prompt = render(format_signal_blocks(signals, detail))
+        if estimate_input_tokens(prompt) <= token_budget:
+            return prompt
+
+    # Still too large: keep as many summary lines as fit.
+    lines = format_signal_blocks(signals, DETAIL_RANGES).splitlines()
+    prompt_budget = token_budget - estimate_tokens(SYSTEM_INSTRUCTION)
+    budget_chars = prompt_budget * CHARS_PER_TOKEN - len(render(""))
+    return render(truncate_lines(lines, budget_chars))
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English and JSON)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
 
-    metadata_block = json.dumps(
-        metadata,
-        indent=2,
-        sort_keys=True,
-    )
-
-    return dedent(
-        f"""
-        ROLE:
-        You are a rigorous trading signal analyst for Catalyst. You are not a hype machine.
-        Bad analysis costs real money. Only classify what the evidence supports and keep the
-        answer grounded in the supplied signals.
-
-        TRIAGE METADATA:
-        {metadata_block}
-
-        GROUNDING INSTRUCTION:
-        You have access to Google Search. Before scoring, search for:
-        - "{ticker} news today"
-        - "{ticker} SEC filing" if an insider signal is present
-        - "{ticker} short squeeze" if a squeeze signal is present
-        Use search results to populate news_sentiment and inform is_trap. If search returns
-        nothing relevant, say so in the rationale.
-
-        SIGNAL DATA:
-        {signal_blocks}
-
-        CATALYST TYPE GUIDE:
-        - SUPERNOVA: high short interest + squeeze conditions + unusual volume
-        - SCALPER: imminent binary event (FDA, earnings)
-        - FOLLOWER: C-suite insider purchase, large dollar amount
-        - DRIFTER: post-earnings beat, swing setup
-        - UNKNOWN: cannot classify with confidence
-
-        TRAP GUIDE:
-        Set is_trap=true when the signals conflict in a way that makes the setup dangerous.
-        Examples:
-        - Insider BUY but options flow is Puts
-        - High short interest but earnings were catastrophically bad
-        - Whale Calls but stock is already up 40%+ and extended
-        - Dark pool bullish but insider is selling large blocks
-
-        CONVICTION CALIBRATION:
-        - 90-100: Multiple confirming signals, no contradictions
-        - 70-89: Strong, most signals align
-        - 50-69: Moderate, single dominant signal
-        - Below 50: Do not trade
-        - If is_trap=true, conviction_score must be below 40
-        - Binary events (FDA PDUFA decision, earnings same day): single-source signals can
-          score 80+ if the event is confirmed imminent via search or signal data
-
-        OUTPUT SCHEMA:
-        Return ONLY a JSON object with this exact shape and no markdown:
-        {{
-          "conviction_score": 0,
-          "catalyst_type": "SUPERNOVA|SCALPER|FOLLOWER|DRIFTER|UNKNOWN",
-          "is_trap": false,
-          "trap_reason": null,
-          "rationale": "1-2 sentences explaining the edge",
-          "news_sentiment": "bullish|bearish|neutral|unknown (only populate from grounded search results; if no search results, return 'unknown')",
-          "risk_level": "low|medium|high|extreme",
-          "suggested_timeframe": "scalp|intraday|swing",
-          "key_risks": ["string", "string"],
-          "raw_signals_summary": "one sentence digest of the hunter data",
-          "suggested_entry_zone": "string describing price range or 'no clear level'",
-          "suggested_stop": "string describing stop logic or 'no clear level'"
-        }}
-        """
-    ).strip()
-
-
-def format_signal_blocks(signals):
+def estimate_input_tokens(prompt):
+    """Estimated input of one call: the system instruction plus the per-ticker prompt."""
+    return estimate_tokens(SYSTEM_INSTRUCTION) + estimate_tokens(prompt)
+
+
+def compact_json(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def format_signal_blocks(signals, detail=DETAIL_FULL):
     if not signals:
         return "No accumulated signals were provided."
 
-    blocks = []
-    for index, signal in enumerate(signals, start=1):
+    distinct = dedupe_signals(signals)
+    lines = [f"{len(signals)} signals, {len(distinct)} distinct, grouped by source:"]
+    for source, payloads in group_by_source(distinct).items():
+        if detail == DETAIL_FULL and len(payloads) <= SUMMARY_THRESHOLD:
+            lines.extend(f"- {source}: {compact_json(payload)}" for payload in payloads)
+            continue
+        summary = summarize_payloads(payloads, keep_varying=detail != DETAIL_RANGES)
+        lines.append(f"- {source} x{len(payloads)} (summary): {compact_json(summary)}")
+    return "\n".join(lines)
+
+
+def dedupe_signals(signals):
+    """Drop signals whose source and payload repeat an earlier one, keeping first-seen order."""
+    seen = set()
+    distinct = []
+    for signal in signals:
+        key = compact_json([signal.get("source_hunter", "unknown"), signal.get("signal_data", {})])
+        if key not in seen:
+            seen.add(key)
+            distinct.append(signal)
+    return distinct
+
+
+def group_by_source(signals):
+    groups = {}
+    for signal in signals:
         source = signal.get("source_hunter", "unknown")
-        signal_data = json.dumps(signal.get("signal_data", {}), indent=2, sort_keys=True)
-        blocks.append(
-            dedent(
-                f"""
-                Signal {index}:
-                Source: {source}
-                Payload:
-                {signal_data}
-                """
-            ).strip()
-        )
-    return "\n\n".join(blocks)
+        groups.setdefault(source, []).append(signal.get("signal_data") or {})
+    return groups
+
+
+def summarize_payloads(payloads, keep_varying=True):
+    """Collapse same-source payloads: numeric fields become ranges, others distinct values.
+
+    Payloads are newest first, the order the gatekeeper delivers signals in, so "latest" is
+    the first value of a numeric field.
+    With keep_varying=False, non-numeric fields that vary are reduced to their distinct count.
+    """
+    fields = {}
+    keys = sorted({key for payload in payloads for key in payload})
+    for key in keys:
+        values = [payload[key] for payload in payloads if payload.get(key) is not None]
+        if not values:
+            continue
+        if all(is_number(value) for value in values):
+            low, high = min(values), max(values)
+            fields[key] = low if low == high else {"min": low, "max": high, "latest": values[0]}
+            continue
+        distinct = list({compact_json(value): value for value in values}.values())
+        if len(distinct) == 1:
+            fields[key] = distinct[0]
+        elif keep_varying:
+            fields[key] = {"distinct": len(distinct), "values": distinct[:MAX_DISTINCT_VALUES]}
+        else:
+            fields[key] = {"distinct": len(distinct)}
+    return {"count": len(payloads), "fields": fields}
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def truncate_lines(lines, budget_chars):
+    kept = []
+    used = 0
+    for index, line in enumerate(lines):
+        remaining = len(lines) - index
+        note = f"... {remaining} more lines omitted to fit the token budget"
+        if used + len(line) + 1 + len(note) > budget_chars:
+            kept.append(note)
+            break
+        kept.append(line)
+        used += len(line) + 1
+    return "\n".join(kept)
@@ -0,0 +1,188 @@
+"""
+Adaptive rate limiting for Gemini calls.
+
+Every worker thread takes a slot from one shared AdaptiveRateLimiter before calling the
+API. A slot needs a token from a token bucket (requests per second) and a free place under
+the concurrency limit. Both limits follow AIMD (additive increase, multiplicative decrease):
+each successful call nudges them up a little, and a quota error (HTTP 429 /
+RESOURCE_EXHAUSTED) cuts them by a factor. Throughput settles just under the quota instead
+of repeatedly overshooting it. A retry delay sent with the quota error (Retry-After header
+or google.rpc.RetryInfo) blocks new calls until it passes.
+
+Calls that were already in flight when a cut happened do not cut again, so one burst of
+429s from a full pool counts as a single congestion signal.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+QUOTA_STATUSES = {"RESOURCE_EXHAUSTED"}
+
+
+class QuotaExceededError(RuntimeError):
+    """A Gemini call was rejected for quota; the limiter has already backed off."""
+
+
+def is_quota_error(exc):
+    """True for 429 / RESOURCE_EXHAUSTED errors from the google-genai client."""
+    code = getattr(exc, "code", None)
+    status = getattr(exc, "status", None)
+    return code == 429 or (isinstance(status, str) and status.upper() in QUOTA_STATUSES)
+
+
+def retry_after_seconds(exc):
+    """Server-suggested delay for a quota error, or None when it did not send one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is not None:
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+
+    # google.rpc.RetryInfo in the error body: {"retryDelay": "17s"}
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    if not isinstance(details, list):
+        return None
+    for detail in details:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return max(0.0, float(delay[:-1]))
+            except ValueError:
+                continue
+    return None
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket plus concurrency limit, both tuned by AIMD."""
+
+    def __init__(
+        self,
+        rate,
+        max_rate,
+        min_rate,
+        max_concurrency,
+        rate_increase,
+        decrease_factor=0.5,
+        burst=None,
+        clock=time.monotonic,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = min(max(rate, self.min_rate), max_rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(self.max_concurrency)
+        self.rate_increase = rate_increase
+        self.decrease_factor = decrease_factor
+        self.burst = burst if burst is not None else float(self.max_concurrency)
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self.tokens = min(1.0, self.burst)
+        self.refilled_at = clock()
+        self.blocked_until = 0.0
+        self.last_decrease = float("-inf")
+        self.active = 0
+        self.successes = 0
+        self.throttles = 0
+
+    @property
+    def concurrency_limit(self):
+        return max(1, int(self.concurrency))
+
+    def _refill(self, now):
+        elapsed = now - self.refilled_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.refilled_at = now
+
+    def try_acquire(self):
+        """Take a slot without blocking.
+
+        Returns ``(started_at, 0.0)`` on success, or ``(None, wait_seconds)`` with a hint for
+        how long to wait before trying again.
+        """
+        with self._cond:
+            return self._try_acquire_locked()
+
+    def _try_acquire_locked(self):
+        now = self.clock()
+        self._refill(now)
+        if now < self.blocked_until:
+            return None, self.blocked_until - now
+        if self.active >= self.concurrency_limit:
+            return None, None  # woken by release()
+        if self.tokens < 1.0:
+            return None, (1.0 - self.tokens) / self.rate
+        self.tokens -= 1.0
+        self.active += 1
+        return now, 0.0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                started_at, wait_seconds = self._try_acquire_locked()
+                if started_at is not None:
+                    return started_at
+                self._cond.wait(wait_seconds)
+
+    def release(self, started_at, throttled=False, retry_after=None):
+        with self._cond:
+            self.active -= 1
+            if throttled:
+                self._on_throttle(started_at, retry_after)
+            else:
+                self._on_success()
+            self._cond.notify_all()
+
+    def _on_success(self):
+        self.successes += 1
+        self.rate = min(self.max_rate, self.rate + self.rate_increase)
+        # +1 concurrency per "window" of concurrency_limit successful calls.
+        self.concurrency = min(
+            float(self.max_concurrency), self.concurrency + 1.0 / self.concurrency_limit
+        )
+
+    def _on_throttle(self, started_at, retry_after):
+        self.throttles += 1
+        now = self.clock()
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        if started_at < self.last_decrease:
+            return  # already backed off for this burst
+        self.last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.concurrency = max(1.0, self.concurrency * self.decrease_factor)
+        self.tokens = min(self.tokens, 0.0)
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for one API call; quota errors shrink the limits and propagate."""
+        started_at = self.acquire()
+        try:
+            yield
+        except Exception as exc:
+            if is_quota_error(exc):
+                self.release(started_at, throttled=True, retry_after=retry_after_seconds(exc))
+                raise QuotaExceededError(str(exc)) from exc
+            # Other failures say nothing about the quota; free the slot unchanged.
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+            raise
+        self.release(started_at)
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "rate": round(self.rate, 3),
+                "concurrency": self.concurrency_limit,
+                "active": self.active,
+                "successes": self.successes,
+                "throttles": self.throttles,
+            }
@@ -0,0 +1,98 @@
+"""
+Parsing of Gemini analysis responses, with cheap local repairs.
+
+Re-running a grounded generation because of a stray code fence or a trailing comma costs
+seconds. parse_analysis_json() therefore tries a few local fixes before giving up, in
+order:
+
+1. strip markdown fences and parse
+2. cut the object out of any prose around it
+3. normalise smart quotes and drop trailing commas
+4. close strings and brackets left open by a truncated response
+
+Only when all of these fail does the caller spend a network retry.
+"""
+
+import json
+import re
+
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class ResponseParseError(ValueError):
+    """The response text could not be turned into a JSON object, even after repair."""
+
+
+def strip_code_fences(text):
+    cleaned = (text or "").strip()
+    if cleaned.startswith("```"):
+        lines = cleaned.splitlines()
+        if lines:
+            lines = lines[1:]
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]
+        cleaned = "\n".join(lines).strip()
+    return cleaned
+
+
+def parse_analysis_json(text, required_key="conviction_score"):
+    """Return ``(parsed, repaired)``; raise ResponseParseError if no repair works.
+
+    A repaired object must still contain ``required_key``, so that a truncated response
+    cannot be turned into a valid but empty analysis.
+    """
+    cleaned = strip_code_fences(text)
+    parsed = try_load(cleaned)
+    if parsed is not None:
+        return parsed, False
+
+    start = cleaned.find("{")
+    tail = cleaned[start:] if start >= 0 else cleaned
+    extracted = extract_object(tail)
+    for candidate in (extracted, fix_punctuation(extracted), close_brackets(fix_punctuation(tail))):
+        parsed = try_load(candidate)
+        if parsed is not None and required_key in parsed:
+            return parsed, True
+    raise ResponseParseError(f"unparseable analysis response: {cleaned[:120]!r}")
+
+
+def try_load(text):
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def extract_object(text):
+    end = text.rfind("}")
+    return text[: end + 1] if end >= 0 else text
+
+
+def fix_punctuation(text):
+    return TRAILING_COMMA.sub(r"\1", text.translate(SMART_QUOTES))
+
+
+def close_brackets(text):
+    """Append the closers a response cut off mid-object would have needed."""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    repaired = text + ('"' if in_string else "")
+    repaired = TRAILING_COMMA.sub(r"\1", repaired.rstrip().rstrip(",") + "".join(reversed(stack)))
+    return repaired
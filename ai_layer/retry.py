@@ -0,0 +1,178 @@
+"""
+Non-blocking retries for failed Gemini analyses.
+
+A worker never sleeps on a failure. It raises AnalysisRetryError and the record is parked
+in DelayedRetryQueue with a due time. Its offset stays unfinished, so the commit
+watermark cannot pass it. The poll loop pauses the partitions that have parked records,
+keeps polling (and so heartbeating), and re-dispatches each record when its timer fires.
+
+CircuitBreaker turns a run of consecutive upstream failures into fast failures. While it
+is open no calls are made, every partition is paused, and parked records wait for it to
+half-open. After reset_seconds fetching resumes and one probe call decides whether the
+breaker closes or stays open.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from kafka.structs import TopicPartition
+
+# 4xx codes that are worth retrying; any other 4xx means the request itself is bad.
+RETRYABLE_CLIENT_CODES = {408, 429}
+
+
+class AnalysisRetryError(RuntimeError):
+    """The analysis failed for an upstream reason and should be retried after ``delay``.
+
+    ``circuit_open`` marks fast failures from an open breaker; they do not use up one of
+    the record's attempts.
+    """
+
+    def __init__(self, message, delay=None, circuit_open=False):
+        super().__init__(message)
+        self.delay = delay
+        self.circuit_open = circuit_open
+
+
+def is_permanent_error(exc):
+    """True for client errors (bad request, auth, not found) that a retry cannot fix."""
+    code = getattr(exc, "code", None)
+    return isinstance(code, int) and 400 <= code < 500 and code not in RETRYABLE_CLIENT_CODES
+
+
+def backoff_delay(attempt, initial_seconds, max_seconds):
+    """Exponential backoff before retry number ``attempt`` (1-based)."""
+    return min(max_seconds, initial_seconds * 2 ** (attempt - 1))
+
+
+class ParkedRecord:
+    __slots__ = ("tp", "offset", "payload", "attempt")
+
+    def __init__(self, tp, offset, payload, attempt):
+        self.tp = tp
+        self.offset = offset
+        self.payload = payload
+        self.attempt = attempt
+
+
+class DelayedRetryQueue:
+    """Thread-safe: workers park records, the poll loop takes the due ones."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def park(self, record, delay):
+        with self._lock:
+            heapq.heappush(self._heap, (self.clock() + delay, next(self._sequence), record))
+
+    def pop_due(self):
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def partitions(self):
+        with self._lock:
+            return {
+                TopicPartition(record.tp.topic, record.tp.partition) for *_, record in self._heap
+            }
+
+    def forget(self, topic_partitions):
+        """Drop parked records of revoked partitions; their new owner replays them."""
+        revoked = {TopicPartition(tp.topic, tp.partition) for tp in topic_partitions}
+        with self._lock:
+            kept = [
+                entry
+                for entry in self._heap
+                if TopicPartition(entry[2].tp.topic, entry[2].tp.partition) not in revoked
+            ]
+            dropped = len(self._heap) - len(kept)
+            heapq.heapify(kept)
+            self._heap = kept
+        return dropped
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold, reset_seconds, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.trips = 0
+
+    def allow(self):
+        """True if a call may go out now; in half-open state only one probe is let through."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self):
+        """True while calls fail fast: before a probe is due, and while a probe is out.
+
+        Once reset_seconds have passed this turns False even though no call has moved the
+        breaker to half-open yet, so the poll loop resumes fetching and the next record
+        becomes the probe.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                return self.clock() - self.opened_at < self.reset_seconds
+            return self.state == self.HALF_OPEN and self.probe_in_flight
+
+    def retry_in(self):
+        """Seconds until the breaker lets a probe through.
+
+        While a probe is out nobody knows when it will settle, so callers turned away are told
+        to wait a full reset_seconds rather than retrying straight away.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            if self.state == self.HALF_OPEN:
+                return float(self.reset_seconds) if self.probe_in_flight else 0.0
+            return max(0.0, self.opened_at + self.reset_seconds - self.clock())
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """Count an upstream failure; returns True if this one opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self.probe_in_flight = False
+                self.trips += 1
+                return True
+            return False
@@ -0,0 +1,174 @@
+"""
+Priority- and deadline-aware ordering of triage payloads waiting for a Gemini worker.
+
+Polled payloads wait in AnalysisScheduler until a worker is free, instead of running
+strictly in offset order. When a backlog builds, the payload most worth a grounded call
+goes first. Ranking, best first:
+
+1. fresh payloads before stale ones
+2. more confluence sources
+3. higher technical score (the strongest one reported by any of the signals)
+4. earliest deadline, i.e. the oldest event
+
+A payload whose event is older than the deadline when it reaches the front is stale. It is
+either dropped, so its offset counts as processed without an analysis, or downgraded
+behind every fresh payload. Both outcomes are counted for the periodic report.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+from kafka.structs import TopicPartition
+
+STALE_DROP = "drop"
+STALE_DOWNGRADE = "downgrade"
+
+FRESH_TIER = 0
+STALE_TIER = 1
+
+
+def event_time(triage_payload):
+    """Epoch seconds of the payload's timestamp_utc, or None if it has none we can read."""
+    value = triage_payload.get("timestamp_utc")
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def technical_score(triage_payload):
+    scores = [triage_payload.get("technical_score")]
+    for signal in triage_payload.get("signals") or []:
+        signal_data = signal.get("signal_data") if isinstance(signal, dict) else None
+        if isinstance(signal_data, dict):
+            scores.append(signal_data.get("technical_score"))
+    numeric = [float(score) for score in scores if isinstance(score, (int, float))]
+    return max(numeric, default=0.0)
+
+
+class ScheduledPayload:
+    __slots__ = ("tp", "offset", "payload", "attempt", "event_time", "queued_at", "tier")
+
+    def __init__(self, tp, offset, payload, attempt, event_time, queued_at):
+        self.tp = tp
+        self.offset = offset
+        self.payload = payload
+        self.attempt = attempt
+        self.event_time = event_time
+        self.queued_at = queued_at
+        self.tier = FRESH_TIER
+
+
+class AnalysisScheduler:
+    """Thread-safe priority queue of payloads; the poll loop pushes, workers pop."""
+
+    def __init__(self, deadline_seconds, stale_policy=STALE_DOWNGRADE, clock=time.time):
+        self.deadline_seconds = deadline_seconds
+        self.stale_policy = stale_policy
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._heap = []
+        self._sequence = itertools.count()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.scheduled = 0
+        self.dropped = 0
+        self.downgraded = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def push(self, tp, offset, triage_payload, attempt=1):
+        now = self.clock()
+        timestamp = event_time(triage_payload)
+        item = ScheduledPayload(
+            tp, offset, triage_payload, attempt, now if timestamp is None else timestamp, now
+        )
+        with self._lock:
+            self._push_locked(item)
+
+    def _push_locked(self, item):
+        key = (
+            item.tier,
+            -int(item.payload.get("confluence_count") or 0),
+            -technical_score(item.payload),
+            item.event_time,
+            next(self._sequence),
+        )
+        heapq.heappush(self._heap, (key, item))
+
+    def is_stale(self, item, now):
+        return self.deadline_seconds > 0 and now - item.event_time > self.deadline_seconds
+
+    def pop(self):
+        """Best payload to analyze next, plus the stale ones dropped on the way to it.
+
+        Returns ``(item_or_None, dropped)``. Staleness is checked when a payload reaches the
+        front, so each payload is checked against the clock at most once per tier.
+        """
+        dropped = []
+        with self._lock:
+            now = self.clock()
+            while self._heap:
+                _, item = heapq.heappop(self._heap)
+                if item.tier == FRESH_TIER and self.is_stale(item, now):
+                    if self.stale_policy == STALE_DROP:
+                        self.dropped += 1
+                        dropped.append(item)
+                        continue
+                    self.downgraded += 1
+                    item.tier = STALE_TIER
+                    self._push_locked(item)
+                    continue
+                waited = now - item.queued_at
+                self.scheduled += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+                return item, dropped
+        return None, dropped
+
+    def forget(self, topic_partitions):
+        """Drop queued payloads of revoked partitions; their new owner replays them."""
+        revoked = {TopicPartition(tp.topic, tp.partition) for tp in topic_partitions}
+        with self._lock:
+            kept = [
+                entry
+                for entry in self._heap
+                if TopicPartition(entry[1].tp.topic, entry[1].tp.partition) not in revoked
+            ]
+            dropped = len(self._heap) - len(kept)
+            heapq.heapify(kept)
+            self._heap = kept
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            dropped = len(self._heap)
+            self._heap = []
+        return dropped
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            snapshot = {
+                "queued": len(self._heap),
+                "scheduled": self.scheduled,
+                "dropped": self.dropped,
+                "downgraded": self.downgraded,
+                "avg_wait_seconds": self.total_wait / self.scheduled if self.scheduled else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+            if reset:
+                self.reset_stats()
+            return snapshot
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
+from uuid import UUID
 from pydantic import BaseModel
 
 
@@ -57,6 +58,15 @@ class ValidatedSignalResponse(BaseModel):
     is_trap: bool = False
     confluence_sources: list[str] = []
     key_risks: list[str] = []
+    signal_id: Optional[UUID] = None
+    signal_count: int = 0
+
+
+class SignalEvidenceResponse(BaseModel):
+    """Raw hunter payloads behind one validated signal (validated_signal_evidence)."""
+    signal_id: UUID
+    timestamp_utc: datetime
+    signals: list[dict[str, Any]] = []
 
 
 # ── Price History ─────────────────────────────────────────────────
@@ -1,11 +1,17 @@
-"""Validated signals router — reads from the validated_signals hypertable (Python persistence)."""
+"""Validated signals router — reads from the validated_signals hypertable (Python persistence).
+
+List endpoints return the summary columns only. The raw hunter payloads live in
+validated_signal_evidence and are fetched per signal via /signals/{signal_id}/evidence.
+"""
 
 import json
-from fastapi import APIRouter, Depends, Query
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 import asyncpg
 
 from api.db import get_conn
-from api.models import ValidatedSignalResponse, PaginatedResponse
+from api.models import ValidatedSignalResponse, PaginatedResponse, SignalEvidenceResponse
 
 router = APIRouter(prefix="/signals", tags=["signals"])
 
@@ -24,7 +30,7 @@ async def list_signals(
         SELECT ROW_NUMBER() OVER (ORDER BY time DESC) AS id,
                ticker, time AS timestamp_utc, conviction_score,
                catalyst_type, rationale, is_trap,
-               confluence_sources, key_risks
+               confluence_sources, key_risks, signal_id, signal_count
         FROM validated_signals
         ORDER BY time DESC
         LIMIT $1 OFFSET $2
@@ -57,7 +63,7 @@ async def signals_by_ticker(
         SELECT ROW_NUMBER() OVER (ORDER BY time DESC) AS id,
                ticker, time AS timestamp_utc, conviction_score,
                catalyst_type, rationale, is_trap,
-               confluence_sources, key_risks
+               confluence_sources, key_risks, signal_id, signal_count
         FROM validated_signals
         WHERE ticker = $1
         ORDER BY time DESC
@@ -65,3 +71,25 @@ async def signals_by_ticker(
         ticker.upper(),
     )
     return [dict(r) for r in rows]
+
+
+@router.get("/{signal_id}/evidence", response_model=SignalEvidenceResponse)
+async def signal_evidence(
+    signal_id: UUID,
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    """Return the raw hunter payloads of one signal, loaded only when asked for."""
+    row = await conn.fetchrow(
+        """
+        SELECT signal_id, time AS timestamp_utc, signals
+        FROM validated_signal_evidence
+        WHERE signal_id = $1
+        """,
+        signal_id,
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="No evidence stored for this signal")
+    d = dict(row)
+    if isinstance(d["signals"], str):
+        d["signals"] = json.loads(d["signals"])
+    return d
@@ -5,16 +5,17 @@ Matches persisted rows in trade_orders by ticker + timestamp_utc (with short ret
 
 from __future__ import annotations
 
-import json
 import logging
 import time
 from datetime import datetime, timezone
 from typing import Any
 
 import httpx
-from kafka import KafkaConsumer
 from psycopg import Connection, connect
 
+from kafka import KafkaConsumer
+from messaging.codec import TRADE_ORDER, MessageCodec, MessageDecodeError
+
 try:
     from executor.config import (
         ALPACA_PAPER_BASE,
@@ -223,15 +224,20 @@ def main() -> None:
         group_id=EXECUTOR_CONSUMER_GROUP,
         auto_offset_reset=KAFKA_AUTO_OFFSET_RESET,
         enable_auto_commit=True,
-        value_deserializer=lambda b: json.loads(b.decode("utf-8")),
     )
+    codec = MessageCodec(TRADE_ORDER)
 
     with get_db() as conn:
         for msg in consumer:
             if not msg.value:
                 continue
             try:
-                process_message(conn, msg.value)
+                order = codec.decode_record(msg)
+            except MessageDecodeError as e:
+                logger.warning("Skipping undecodable trade order at offset %s: %s", msg.offset, e)
+                continue
+            try:
+                process_message(conn, order)
                 conn.commit()
             except Exception as e:
                 logger.exception("Message error: %s", e)
@@ -2,6 +2,7 @@ import type {
   TradeOrder,
   TradeExecution,
   ValidatedSignal,
+  SignalEvidence,
   OrderStats,
   PriceBar,
   PaginatedResponse,
@@ -78,6 +79,17 @@ export async function getSignals(params?: {
   return res.json();
 }
 
+/** Raw hunter payloads of one signal; null when none were stored. */
+export async function getSignalEvidence(signalId: string): Promise<SignalEvidence | null> {
+  if (USE_MOCK) return null;
+  const res = await fetch(`${apiBaseUrl()}/signals/${signalId}/evidence`, {
+    next: { revalidate: 3600 },
+  });
+  if (res.status === 404) return null;
+  if (!res.ok) throw new Error(`Failed to fetch evidence for signal ${signalId}`);
+  return res.json();
+}
+
 // ── Price History ─────────────────────────────────────────────────
 
 export async function getPriceHistory(
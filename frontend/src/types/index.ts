@@ -64,6 +64,17 @@ export interface ValidatedSignal {
   suggested_stop?: number;
   suggested_target?: number;
   key_risks: string[];
+  /** Key for GET /signals/{signal_id}/evidence; null for rows seeded without one */
+  signal_id?: string | null;
+  /** Number of raw hunter payloads stored as evidence */
+  signal_count?: number;
+}
+
+// Matches validated_signal_evidence — raw hunter payloads, fetched on demand
+export interface SignalEvidence {
+  signal_id: string;
+  timestamp_utc: string;
+  signals: Record<string, unknown>[];
 }
 
 // Price bar for TradingView Lightweight Charts
@@ -17,6 +17,45 @@ MAX_PRICE = float(os.getenv("GATEKEEPER_MAX_PRICE", "500.0"))
 CONFLUENCE_THRESHOLD = int(os.getenv("GATEKEEPER_CONFLUENCE_THRESHOLD", "2"))
 TECHNICAL_SCORE_THRESHOLD = float(os.getenv("GATEKEEPER_TECHNICAL_SCORE_THRESHOLD", "70"))
 
-REDIS_SOURCES_KEY = "gk:sources:{ticker}"
-REDIS_SIGNALS_KEY = "gk:signals:{ticker}"
-REDIS_SENT_KEY = "gk:sent:{ticker}"
+# Event-time windows: sources and signals are sorted sets scored by the event's
+# timestamp_utc (epoch seconds), the sent marker holds the event time of the last forward.
+# The v2 prefix keeps these apart from the list/set keys written by older releases.
+REDIS_SOURCES_KEY = "gk:v2:sources:{ticker}"
+REDIS_SIGNALS_KEY = "gk:v2:signals:{ticker}"
+REDIS_SENT_KEY = "gk:v2:sent:{ticker}"
+
+# Micro-batch consume mode: poll up to GATEKEEPER_BATCH_SIZE records and resolve their
+# Redis window state in one pipelined exchange. 1 keeps the per-event consume loop.
+BATCH_SIZE = int(os.getenv("GATEKEEPER_BATCH_SIZE", "1"))
+POLL_TIMEOUT_MS = int(os.getenv("GATEKEEPER_POLL_TIMEOUT_MS", "500"))
+THROUGHPUT_LOG_SECONDS = float(os.getenv("GATEKEEPER_THROUGHPUT_LOG_SECONDS", "60"))
+
+# Offsets of fully processed events (forwarded, buffered, deduped or dropped) are committed
+# asynchronously every GATEKEEPER_COMMIT_INTERVAL_SECONDS or GATEKEEPER_COMMIT_MAX_EVENTS
+# events, right after a forward, and synchronously on rebalance and shutdown. A restart
+# replays at most that much raw-events.
+COMMIT_INTERVAL_SECONDS = float(os.getenv("GATEKEEPER_COMMIT_INTERVAL_SECONDS", "5"))
+COMMIT_MAX_EVENTS = int(os.getenv("GATEKEEPER_COMMIT_MAX_EVENTS", "1000"))
+
+# Decision logging: drops, buffered events and dedupes are counted and summarized once per
+# GATEKEEPER_DECISION_SUMMARY_SECONDS. Individual lines are logged for a sampled fraction
+# of events (0 disables), or for all of them when GATEKEEPER_LOG_LEVEL is DEBUG.
+LOG_LEVEL = os.getenv("GATEKEEPER_LOG_LEVEL", "INFO").strip().upper()
+DECISION_SUMMARY_SECONDS = float(os.getenv("GATEKEEPER_DECISION_SUMMARY_SECONDS", "60"))
+DECISION_LOG_SAMPLE_RATE = float(os.getenv("GATEKEEPER_DECISION_LOG_SAMPLE_RATE", "0"))
+
+# Cap per-ticker signal history to avoid unbounded growth.
+MAX_SIGNALS_PER_WINDOW = 200
+
+# Horizontal scaling: hunters key raw-events by ticker, so every gatekeeper replica in
+# the consumer group owns the tickers of its assigned partitions. When > 0, startup makes
+# sure raw-events has at least this many partitions (the ceiling on replica parallelism).
+RAW_EVENTS_PARTITIONS = int(os.getenv("GATEKEEPER_RAW_EVENTS_PARTITIONS", "0"))
+RAW_EVENTS_REPLICATION_FACTOR = int(os.getenv("GATEKEEPER_RAW_EVENTS_REPLICATION_FACTOR", "1"))
+
+# Window state backend:
+#   redis        shared keys + atomic Lua script; safe for any number of replicas
+#   memory       in-process only; one gatekeeper, or replicas on a ticker-keyed topic
+#   write-behind in-process decisions mirrored to Redis for restarts and rebalances
+WINDOW_BACKEND = os.getenv("GATEKEEPER_WINDOW_BACKEND", "redis").strip().lower()
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("GATEKEEPER_WRITE_BEHIND_FLUSH_SECONDS", "0.5"))
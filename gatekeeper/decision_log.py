@@ -0,0 +1,99 @@
+"""
+Aggregated decision logging for the gatekeeper hot path.
+
+Every event ends in one decision: forwarded, buffered, deduped, dropped (with a reason
+code), unknown_schema or undecodable. Logging each one at burst volume costs more CPU
+than the decision itself, so DecisionCounter tallies them by decision, drop reason,
+source and ticker and emits one summary line per interval. Individual events are logged
+only when sampled or when the logger is at DEBUG.
+
+start_queue_logging moves handler I/O (and message formatting) onto a listener thread, so
+a slow stdout never stalls the consume loop.
+"""
+
+import logging
+import queue
+import random
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+TOP_TICKERS = 5
+
+
+class DecisionCounter:
+    def __init__(self, logger, interval_seconds, sample_rate=0.0, clock=time.monotonic):
+        self.logger = logger
+        self.interval_seconds = interval_seconds
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self.sample = random.random
+        self.reset(clock())
+
+    def reset(self, now):
+        self.window_start = now
+        self.decisions = Counter()
+        self.reasons = Counter()
+        self.sources = Counter()
+        self.tickers = Counter()
+
+    def record(self, decision, ticker=None, source=None, reason=None):
+        """Count a decision; returns True when this event should also be logged on its own."""
+        self.decisions[decision] += 1
+        if reason is not None:
+            self.reasons[reason] += 1
+        if source is not None:
+            self.sources[source] += 1
+        if ticker is not None:
+            self.tickers[ticker] += 1
+        return self.should_log()
+
+    def should_log(self):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            return True
+        return self.sample_rate > 0 and self.sample() < self.sample_rate
+
+    def maybe_report(self):
+        now = self.clock()
+        if now - self.window_start >= self.interval_seconds:
+            self.report(now)
+
+    def report(self, now=None):
+        """Log the summary for the current interval (if anything happened) and start a new one."""
+        now = self.clock() if now is None else now
+        if self.decisions:
+            self.logger.info(
+                "Decisions in %.1fs: %s events (%s) reasons=[%s] sources=[%s] top_tickers=[%s]",
+                now - self.window_start,
+                sum(self.decisions.values()),
+                format_counts(self.decisions),
+                format_counts(self.reasons),
+                format_counts(self.sources),
+                format_counts(self.tickers, TOP_TICKERS),
+            )
+        self.reset(now)
+
+
+def format_counts(counter, limit=None):
+    return " ".join(f"{key}={count}" for key, count in counter.most_common(limit))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats in prepare(), i.e. on the calling thread. Records stay
+    in-process here, so they are enqueued as-is; callers must not mutate logged args.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def start_queue_logging(root=None):
+    """Route the root logger's handlers through an unbounded queue; returns the listener."""
+    root = root or logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    root.handlers = [DeferredQueueHandler(log_queue)]
+    listener.start()
+    return listener
@@ -1,22 +1,38 @@
 import json
 import logging
+import signal
 import time
 from datetime import datetime, timezone
 
+from kafka.admin import NewPartitions, NewTopic
+from kafka.partitioner.default import murmur2
+from kafka.structs import TopicPartition
 from redis import Redis
 
-from kafka import KafkaConsumer, KafkaProducer
+from kafka import ConsumerRebalanceListener, KafkaAdminClient, KafkaConsumer
+from messaging.codec import RAW_EVENT, TRIAGE_PAYLOAD, MessageCodec, MessageDecodeError
+from messaging.producer import BatchingProducer, ticker_key
 
 try:
     from gatekeeper.config import (
+        BATCH_SIZE,
+        COMMIT_INTERVAL_SECONDS,
+        COMMIT_MAX_EVENTS,
         CONFLUENCE_THRESHOLD,
+        DECISION_LOG_SAMPLE_RATE,
+        DECISION_SUMMARY_SECONDS,
         KAFKA_AUTO_OFFSET_RESET,
         KAFKA_BOOTSTRAP_SERVERS,
         KAFKA_CONSUMER_GROUP,
+        LOG_LEVEL,
         MAX_PRICE,
+        MAX_SIGNALS_PER_WINDOW,
         MIN_PRICE,
         MIN_RELATIVE_VOLUME,
         MIN_VOLUME,
+        POLL_TIMEOUT_MS,
+        RAW_EVENTS_PARTITIONS,
+        RAW_EVENTS_REPLICATION_FACTOR,
         RAW_EVENTS_TOPIC,
         REDIS_HOST,
         REDIS_PORT,
@@ -25,18 +41,49 @@ try:
         REDIS_SOURCES_KEY,
         ROLLING_WINDOW_SECONDS,
         TECHNICAL_SCORE_THRESHOLD,
+        THROUGHPUT_LOG_SECONDS,
         TRIAGE_PRIORITY_TOPIC,
+        WINDOW_BACKEND,
+        WRITE_BEHIND_FLUSH_SECONDS,
+    )
+    from gatekeeper.decision_log import DecisionCounter, start_queue_logging
+    from gatekeeper.normalizer import (
+        detect_source,
+        normalize_event,
+        normalize_short_float_pct,
+        normalize_ticker,
+        normalize_timestamp,
+        to_float,
+    )
+    from gatekeeper.offsets import CommitTracker
+    from gatekeeper.window_store import (
+        DECISION_BUFFERED,
+        DECISION_DEDUPED,
+        InMemoryWindowStore,
+        RedisWindowStore,
+        SignalRequest,
+        WriteBehindWindowStore,
     )
 except ImportError:
     from config import (
+        BATCH_SIZE,
+        COMMIT_INTERVAL_SECONDS,
+        COMMIT_MAX_EVENTS,
         CONFLUENCE_THRESHOLD,
+        DECISION_LOG_SAMPLE_RATE,
+        DECISION_SUMMARY_SECONDS,
         KAFKA_AUTO_OFFSET_RESET,
         KAFKA_BOOTSTRAP_SERVERS,
         KAFKA_CONSUMER_GROUP,
+        LOG_LEVEL,
         MAX_PRICE,
+        MAX_SIGNALS_PER_WINDOW,
         MIN_PRICE,
         MIN_RELATIVE_VOLUME,
         MIN_VOLUME,
+        POLL_TIMEOUT_MS,
+        RAW_EVENTS_PARTITIONS,
+        RAW_EVENTS_REPLICATION_FACTOR,
         RAW_EVENTS_TOPIC,
         REDIS_HOST,
         REDIS_PORT,
@@ -45,48 +92,103 @@ except ImportError:
         REDIS_SOURCES_KEY,
         ROLLING_WINDOW_SECONDS,
         TECHNICAL_SCORE_THRESHOLD,
+        THROUGHPUT_LOG_SECONDS,
         TRIAGE_PRIORITY_TOPIC,
+        WINDOW_BACKEND,
+        WRITE_BEHIND_FLUSH_SECONDS,
+    )
+    from decision_log import DecisionCounter, start_queue_logging
+    from normalizer import (
+        detect_source,
+        normalize_event,
+        normalize_short_float_pct,
+        normalize_ticker,
+        normalize_timestamp,
+        to_float,
+    )
+    from offsets import CommitTracker
+    from window_store import (
+        DECISION_BUFFERED,
+        DECISION_DEDUPED,
+        InMemoryWindowStore,
+        RedisWindowStore,
+        SignalRequest,
+        WriteBehindWindowStore,
     )
 
 
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format="[%(asctime)s] %(levelname)s [gatekeeper] %(message)s",
     datefmt="%H:%M:%S",
 )
 logger = logging.getLogger("gatekeeper")
 
 
+class ThroughputMeter:
+    """Counts processed events and logs events/sec once per reporting interval."""
+
+    def __init__(self, interval_seconds):
+        self.interval_seconds = interval_seconds
+        self.window_start = time.monotonic()
+        self.window_events = 0
+
+    def record(self, count):
+        self.window_events += count
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed < self.interval_seconds:
+            return
+        logger.info(
+            "Throughput: %s events in %.1fs (%.1f events/sec)",
+            self.window_events,
+            elapsed,
+            self.window_events / elapsed if elapsed > 0 else 0.0,
+        )
+        self.window_start = now
+        self.window_events = 0
+
+
+class PartitionOwnershipListener(ConsumerRebalanceListener):
+    """Hands partitions over cleanly when gatekeeper replicas join or leave the group."""
+
+    def __init__(self, service):
+        self.service = service
+
+    def on_partitions_revoked(self, revoked):
+        if revoked:
+            self.service.release_partitions(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        self.service.assign_partitions(assigned)
+
+
 class GatekeeperService:
     def __init__(self):
-        try:
-            self.redis = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
-            # Fail fast if Redis is not reachable.
-            self.redis.ping()
-        except Exception as exc:
-            logger.error(
-                "Failed to connect to Redis at %s:%s: %s",
-                REDIS_HOST,
-                REDIS_PORT,
-                exc,
-            )
-            raise SystemExit(1) from exc
+        self.window_store = self.build_window_store()
+        self.raw_events_codec = MessageCodec(RAW_EVENT)
+        self.decisions = DecisionCounter(
+            logger, DECISION_SUMMARY_SECONDS, sample_rate=DECISION_LOG_SAMPLE_RATE
+        )
+        self.commits = CommitTracker(COMMIT_INTERVAL_SECONDS, COMMIT_MAX_EVENTS)
 
         kafka_backoff = 1
         last_error = None
         for attempt in range(1, 4):
             try:
                 self.consumer = KafkaConsumer(
-                    RAW_EVENTS_TOPIC,
                     bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
                     auto_offset_reset=KAFKA_AUTO_OFFSET_RESET,
                     enable_auto_commit=False,
                     group_id=KAFKA_CONSUMER_GROUP,
-                    value_deserializer=lambda value: json.loads(value.decode("utf-8")),
                 )
-                self.producer = KafkaProducer(
+                self.producer = BatchingProducer(
                     bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-                    value_serializer=lambda value: json.dumps(value).encode("utf-8"),
+                    codecs={
+                        TRIAGE_PRIORITY_TOPIC: MessageCodec.for_topic(
+                            TRIAGE_PAYLOAD, TRIAGE_PRIORITY_TOPIC
+                        )
+                    },
                 )
                 break
             except Exception as exc:
@@ -103,67 +205,334 @@ class GatekeeperService:
         if last_error is not None and not hasattr(self, "consumer"):
             raise RuntimeError("Failed to initialize Kafka consumer/producer") from last_error
 
+        self.unconfirmed_forwards = []
+        self.assigned_partitions = []
+        self.ensure_raw_events_partitions()
+        self.consumer.subscribe([RAW_EVENTS_TOPIC], listener=PartitionOwnershipListener(self))
+
+    def build_window_store(self):
+        window_args = (ROLLING_WINDOW_SECONDS, MAX_SIGNALS_PER_WINDOW, CONFLUENCE_THRESHOLD)
+        if WINDOW_BACKEND == "memory":
+            logger.info("Using in-memory window store")
+            return InMemoryWindowStore(*window_args)
+        if WINDOW_BACKEND not in ("redis", "write-behind"):
+            raise ValueError(f"Unknown GATEKEEPER_WINDOW_BACKEND {WINDOW_BACKEND!r}")
+
+        keys = (REDIS_SIGNALS_KEY, REDIS_SOURCES_KEY, REDIS_SENT_KEY)
+        try:
+            redis = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+            # Fail fast if Redis is not reachable.
+            redis.ping()
+            if WINDOW_BACKEND == "write-behind":
+                logger.info("Using write-behind window store mirrored to Redis")
+                return WriteBehindWindowStore(
+                    redis, keys, *window_args, flush_interval_seconds=WRITE_BEHIND_FLUSH_SECONDS
+                )
+            return RedisWindowStore(redis, keys, *window_args)
+        except Exception as exc:
+            logger.error(
+                "Failed to connect to Redis at %s:%s: %s",
+                REDIS_HOST,
+                REDIS_PORT,
+                exc,
+            )
+            raise SystemExit(1) from exc
+
+    def ensure_raw_events_partitions(self):
+        """Grow raw-events to RAW_EVENTS_PARTITIONS so that many replicas can share the load."""
+        if RAW_EVENTS_PARTITIONS <= 0:
+            return
+        try:
+            current = self.consumer.partitions_for_topic(RAW_EVENTS_TOPIC)
+            if current is not None and len(current) >= RAW_EVENTS_PARTITIONS:
+                return
+            admin = KafkaAdminClient(bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS)
+            try:
+                if current is None:
+                    admin.create_topics(
+                        [
+                            NewTopic(
+                                RAW_EVENTS_TOPIC,
+                                num_partitions=RAW_EVENTS_PARTITIONS,
+                                replication_factor=RAW_EVENTS_REPLICATION_FACTOR,
+                            )
+                        ]
+                    )
+                else:
+                    admin.create_partitions(
+                        {RAW_EVENTS_TOPIC: NewPartitions(RAW_EVENTS_PARTITIONS)}
+                    )
+            finally:
+                admin.close()
+            logger.info(
+                "Provisioned %s with %s partitions", RAW_EVENTS_TOPIC, RAW_EVENTS_PARTITIONS
+            )
+        except Exception as exc:
+            logger.warning(
+                "Could not provision %s partitions for %s: %s",
+                RAW_EVENTS_PARTITIONS,
+                RAW_EVENTS_TOPIC,
+                exc,
+            )
+
+    def assign_partitions(self, assigned):
+        self.assigned_partitions = sorted(tp.partition for tp in assigned)
+        logger.info("Assigned %s partitions %s", RAW_EVENTS_TOPIC, self.assigned_partitions)
+        if assigned:
+            self.window_store.hydrate(self.owns_ticker_predicate(assigned))
+
+    def release_partitions(self, revoked):
+        """Flush forwards and commit progress before another replica takes these partitions."""
+        logger.info(
+            "Releasing %s partitions %s", RAW_EVENTS_TOPIC, sorted(tp.partition for tp in revoked)
+        )
+        self.commit_offsets(sync=True)
+        self.commits.forget(revoked)
+        self.window_store.evict(self.owns_ticker_predicate(revoked))
+
+    def owns_ticker_predicate(self, topic_partitions):
+        """Match tickers whose raw-events key hashes onto one of topic_partitions."""
+        partition_count = len(self.consumer.partitions_for_topic(RAW_EVENTS_TOPIC) or ())
+        owned = {tp.partition for tp in topic_partitions}
+        if partition_count <= 1:
+            return lambda ticker: bool(owned)
+
+        def owns_ticker(ticker):
+            # Same murmur2 placement as the producers' default partitioner.
+            return (murmur2(ticker.encode("utf-8")) & 0x7FFFFFFF) % partition_count in owned
+
+        return owns_ticker
+
     def run(self):
         logger.info(
             "Listening on %s and forwarding to %s",
             RAW_EVENTS_TOPIC,
             TRIAGE_PRIORITY_TOPIC,
         )
-        for message in self.consumer:
-            self.process_event(message.value)
-
-    def process_event(self, raw_event):
-        normalized = self.normalize_event(raw_event)
-        if not normalized:
-            logger.warning("Skipping event with unknown schema: %s", raw_event)
+        meter = ThroughputMeter(THROUGHPUT_LOG_SECONDS)
+        try:
+            if BATCH_SIZE > 1:
+                self.run_batched(meter)
+                return
+
+            for message in self.consumer:
+                raw_event = self.decode_message(message)
+                if raw_event is not None:
+                    self.process_event(raw_event, message)
+                self.commits.mark(message)
+                self.maybe_commit()
+                meter.record(1)
+                self.decisions.maybe_report()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Commit everything processed, then leave the group; runs on SIGTERM as well."""
+        logger.info("Shutting down: committing processed offsets")
+        self.decisions.report()
+        self.commit_offsets(sync=True)
+        self.producer.close()
+        self.window_store.close()
+        try:
+            self.consumer.close(autocommit=False)
+        except Exception as exc:
+            logger.warning("Kafka consumer close failed: %s", exc)
+
+    def run_batched(self, meter):
+        logger.info("Micro-batch mode enabled (batch_size=%s)", BATCH_SIZE)
+        while True:
+            records = self.consumer.poll(timeout_ms=POLL_TIMEOUT_MS, max_records=BATCH_SIZE)
+            messages = [
+                message for partition_messages in records.values() for message in partition_messages
+            ]
+            raw_events = []
+            sources = []
+            for message in messages:
+                raw_event = self.decode_message(message)
+                if raw_event is not None:
+                    raw_events.append(raw_event)
+                    sources.append(message)
+            if raw_events:
+                self.process_batch(raw_events, sources)
+            for message in messages:
+                self.commits.mark(message)
+            self.maybe_commit()
+            meter.record(len(messages))
+            self.decisions.maybe_report()
+
+    def maybe_commit(self):
+        if self.commits.due():
+            self.commit_offsets(sync=False)
+
+    def commit_offsets(self, sync):
+        """Commit offsets of fully processed events once their effects are durable.
+
+        Forwards must be acknowledged and write-behind window state flushed first. A
+        partition with an undelivered forward is rewound to that event (see
+        settle_forwards()), so only the events before it are committed. If write-behind
+        state cannot be flushed, or a failure cannot be traced to its event, the commit is
+        skipped and those events replay after a restart.
+        """
+        if not self.commits.offsets():
             return
-
-        drop_reason = self.get_drop_reason(normalized)
-        if drop_reason:
-            logger.info("Dropped %s: %s", normalized["ticker"], drop_reason)
+        failed = self.producer.flush()
+        untraced = self.settle_forwards(failed)
+        try:
+            self.window_store.flush()
+        except Exception as exc:
+            logger.warning("Skipping Kafka commit: window state flush failed: %s", exc)
+            self.commits.attempted()
+            return
+        if untraced:
+            logger.warning("Skipping Kafka commit: triage payloads were not acknowledged")
+            self.commits.attempted()
             return
+        offsets = self.commits.offsets()
+        try:
+            if sync:
+                self.consumer.commit(offsets)
+            else:
+                self.consumer.commit_async(offsets, callback=self.on_commit)
+        except Exception as exc:
+            logger.warning("Kafka commit failed: %s", exc)
+            self.commits.attempted()
+            return
+        self.commits.committed()
+
+    def settle_forwards(self, failed):
+        """Replay the events whose forwards the broker did not acknowledge.
+
+        Each such event's partition is sought back to it and its commit held there, so
+        the event is processed and forwarded again. The window store set the ticker's
+        sent marker when it decided to forward; it is cleared, or the replay would be
+        deduped against a payload that never arrived. Returns True when a failure could
+        not be traced to its event, in which case nothing may be committed.
+        """
+        forwards, self.unconfirmed_forwards = self.unconfirmed_forwards, []
+        if not failed:
+            return False
+        replay = {}
+        untraced = False
+        for ticker, event_time, future, message in forwards:
+            if future.succeeded():
+                continue
+            self.window_store.clear_sent(ticker, event_time)
+            if message is None:
+                logger.warning("Cleared sent marker of undelivered %s forward", ticker)
+                untraced = True
+                continue
+            tp = TopicPartition(message.topic, message.partition)
+            replay[tp] = min(message.offset, replay.get(tp, message.offset))
+            logger.warning(
+                "Undelivered %s forward: replaying %s[%s] from offset %s",
+                ticker,
+                tp.topic,
+                tp.partition,
+                message.offset,
+            )
+        for tp, offset in replay.items():
+            self.consumer.seek(tp, offset)
+            self.commits.rewind(tp, offset)
+        return untraced or not replay
 
-        ticker = normalized["ticker"]
-        self.track_signal(ticker, normalized)
+    @staticmethod
+    def on_commit(offsets, response):
+        if isinstance(response, Exception):
+            logger.warning("Async Kafka commit failed: %s", response)
 
-        confluence_sources = self.get_sources(ticker)
-        confluence_count = len(confluence_sources)
-        technical_score = float(normalized.get("_technical_score") or 0.0)
-        should_trigger = (
-            confluence_count >= CONFLUENCE_THRESHOLD or technical_score >= TECHNICAL_SCORE_THRESHOLD
-        )
+    def decode_message(self, message):
+        """Decode a raw-events record, or log and return None when it fails its schema."""
+        try:
+            return self.raw_events_codec.decode_record(message)
+        except MessageDecodeError as exc:
+            if self.decisions.record("undecodable"):
+                logger.warning(
+                    "Skipping undecodable record at %s[%s]@%s: %s",
+                    message.topic,
+                    message.partition,
+                    message.offset,
+                    exc,
+                )
+            return None
 
-        if not should_trigger:
-            logger.info(
-                "Buffered %s from %s without trigger (confluence=%s, technical_score=%s)",
-                ticker,
-                normalized["source_hunter"],
-                confluence_count,
-                technical_score,
-            )
+    def process_event(self, raw_event, message=None):
+        self.process_batch([raw_event], [message])
+
+    def process_batch(self, raw_events, messages=None):
+        """Normalize and filter locally, then decide the whole batch in one window-store call.
+
+        The store applies events in arrival order (with the Redis backend, one pipelined
+        round trip of atomic script calls), so decisions match processing the events one
+        at a time. ``messages`` are the events' Kafka records, which an undelivered forward
+        is replayed from.
+        """
+        accepted = []
+        sources = []
+        for raw_event, message in zip(raw_events, messages or [None] * len(raw_events)):
+            normalized = self.normalize_and_filter(raw_event)
+            if normalized:
+                accepted.append(normalized)
+                sources.append(message)
+        if not accepted:
             return
 
-        if self.was_recently_sent(ticker):
-            logger.info("Deduped %s: already sent within rolling window", ticker)
-            return
+        requests = [self.signal_request(normalized) for normalized in accepted]
+        results = self.window_store.check_confluence(requests)
+        forwarded = [
+            normalized
+            for normalized, request, result, message in zip(accepted, requests, results, sources)
+            if self.apply_decision(normalized, request, result, message)
+        ]
+        if forwarded:
+            # Confirm forwards promptly rather than at the next interval.
+            self.commits.request_commit()
+
+    def signal_request(self, normalized):
+        return SignalRequest(
+            normalized["ticker"],
+            normalized["source_hunter"],
+            self.encode_signal(normalized),
+            float(normalized.get("_technical_score") or 0.0) >= TECHNICAL_SCORE_THRESHOLD,
+            self.event_time(normalized),
+        )
 
-        triage_payload = {
-            "ticker": ticker,
-            "timestamp_utc": normalized["timestamp_utc"],
-            "confluence_count": confluence_count,
-            "confluence_sources": confluence_sources,
-            "liquidity_metrics": normalized["liquidity_metrics"],
-            "signals": self.get_accumulated_signals(ticker),
-            "float_shares": normalized.get("float_shares"),
-            "market_cap": normalized.get("market_cap"),
-        }
-        self.producer.send(TRIAGE_PRIORITY_TOPIC, triage_payload)
-        self.producer.flush()
+    def apply_decision(self, normalized, request, result, message=None):
+        """Count a script decision and send the triage payload; returns True when forwarded."""
+        ticker = normalized["ticker"]
+        source_hunter = normalized["source_hunter"]
+        decision = result[0]
+
+        if decision == DECISION_BUFFERED:
+            if self.decisions.record("buffered", ticker, source_hunter):
+                logger.info(
+                    "Buffered %s from %s without trigger (confluence=%s, technical_score=%s)",
+                    ticker,
+                    source_hunter,
+                    len(result[1]),
+                    float(normalized.get("_technical_score") or 0.0),
+                )
+            return False
+        if decision == DECISION_DEDUPED:
+            if self.decisions.record("deduped", ticker, source_hunter):
+                logger.info("Deduped %s: already sent within rolling window", ticker)
+            return False
+
+        # Forwards are rare and each one costs an analysis downstream: always log them.
+        self.decisions.record("forwarded", ticker, source_hunter)
+        confluence_sources = sorted(result[1])
+        confluence_count = len(confluence_sources)
+        technical_score = float(normalized.get("_technical_score") or 0.0)
+
+        signals = [json.loads(signal) for signal in result[2]]
+        triage_payload = self.build_triage_payload(normalized, confluence_sources, signals)
         try:
-            self.consumer.commit()
-        except Exception as exc:
-            logger.warning("Kafka commit failed after forwarding triage payload: %s", exc)
-        self.mark_sent(ticker)
+            future = self.producer.send(
+                TRIAGE_PRIORITY_TOPIC, triage_payload, key=ticker_key(triage_payload)
+            )
+        except Exception:
+            self.window_store.clear_sent(ticker, request.event_time)
+            raise
+        self.unconfirmed_forwards.append((ticker, request.event_time, future, message))
         logger.info(
             "Forwarded %s to %s (confluence=%s, technical_score=%s)",
             ticker,
@@ -171,212 +540,50 @@ class GatekeeperService:
             confluence_count,
             technical_score,
         )
+        return True
 
-    def normalize_event(self, raw_event):
-        if not isinstance(raw_event, dict):
-            return None
-
-        source_hunter = self.detect_source(raw_event)
-        coercers = {
-            "squeeze": self.coerce_squeeze,
-            "insider": self.coerce_insider,
-            "whale": self.coerce_whale,
-            "biotech": self.coerce_biotech,
-            "drifter": self.coerce_drifter,
-        }
-
-        coercer = coercers.get(source_hunter)
-        if not coercer:
+    def normalize_and_filter(self, raw_event):
+        normalized = self.normalize_event(raw_event)
+        if not normalized:
+            if self.decisions.record("unknown_schema"):
+                keys = sorted(raw_event) if isinstance(raw_event, dict) else type(raw_event)
+                logger.warning("Skipping event with unknown schema (keys=%s)", keys)
             return None
 
-        normalized = coercer(raw_event)
-        if not normalized.get("ticker"):
+        drop = self.check_liquidity(normalized)
+        if drop:
+            reason_code, drop_reason = drop
+            ticker = normalized["ticker"]
+            if self.decisions.record("dropped", ticker, normalized["source_hunter"], reason_code):
+                logger.info("Dropped %s: %s", ticker, drop_reason)
             return None
         return normalized
 
-    def detect_source(self, raw_event):
-        for field in ("source_hunter", "hunter", "source"):
-            value = raw_event.get(field)
-            if isinstance(value, str) and value:
-                return value.strip().lower()
-
-        signal_data = raw_event.get("signal_data", {})
-        if isinstance(signal_data, dict):
-            value = signal_data.get("source_hunter")
-            if isinstance(value, str) and value:
-                return value.strip().lower()
-
-        if "short_float" in raw_event or "short_float_pct" in signal_data:
-            return "squeeze"
-        if "transaction_code" in raw_event or "transaction_code" in signal_data:
-            return "insider"
-        if "option_type" in raw_event or "option_type" in signal_data:
-            return "whale"
-        if "drug_name" in raw_event or "event_date" in signal_data:
-            return "biotech"
-        if "surprise_percent" in raw_event or "surprise_percent" in signal_data:
-            return "drifter"
-        return None
-
-    def coerce_squeeze(self, raw_event):
-        signal_fields = {
-            "short_float_pct": self.normalize_short_float_pct(
-                self.first(raw_event, "short_float_pct", "short_float"),
-                is_fraction=False,
-            ),
-            "days_to_cover": self.first(raw_event, "days_to_cover", "short_ratio"),
-            "borrow_fee_rate": self.first(raw_event, "borrow_fee_rate", "borrow_fee"),
-        }
-        return self.build_event("squeeze", raw_event, signal_fields)
-
-    def coerce_insider(self, raw_event):
-        signal_fields = {
-            "transaction_code": self.first(raw_event, "transaction_code", "code"),
-            "transaction_amount_usd": self.first(
-                raw_event,
-                "transaction_amount_usd",
-                "amount_usd",
-                "transaction_value_usd",
-            ),
-            "insider_name": self.first(raw_event, "insider_name", "name"),
-            "insider_title": self.first(raw_event, "insider_title", "title"),
-            "shares_traded": self.first(raw_event, "shares_traded", "shares"),
-        }
-        return self.build_event("insider", raw_event, signal_fields)
-
-    def coerce_whale(self, raw_event):
-        signal_fields = {
-            "option_type": self.first(raw_event, "option_type", "type"),
-            "strike_price": self.first(raw_event, "strike_price", "strike"),
-            "expiration_date": self.first(raw_event, "expiration_date", "expiry"),
-            "volume": self.first(raw_event, "option_volume", "contracts", "volume"),
-            "open_interest": self.first(raw_event, "open_interest", "oi"),
-            "vol_oi_ratio": self.first(raw_event, "vol_oi_ratio", "volume_open_interest_ratio"),
-            "premium_paid_usd": self.first(raw_event, "premium_paid_usd", "premium"),
-        }
-        liquidity_overrides = {
-            "volume": self.first(raw_event, "market_volume", "stock_volume", "underlying_volume"),
-        }
-        return self.build_event("whale", raw_event, signal_fields, liquidity_overrides)
-
-    def coerce_biotech(self, raw_event):
-        signal_fields = {
-            "catalyst_type": self.first(raw_event, "catalyst_type"),
-            "stage": self.first(raw_event, "stage"),
-            "drug_name": self.first(raw_event, "drug_name"),
-            "event_date": self.first(raw_event, "event_date"),
-            "notes": self.first(raw_event, "notes"),
-        }
-        return self.build_event("biotech", raw_event, signal_fields)
-
-    def coerce_drifter(self, raw_event):
-        signal_fields = {
-            "surprise_percent": self.first(
-                raw_event, "surprise_percent", "earnings_surprise_percent"
-            ),
-            "eps_estimate": self.first(raw_event, "eps_estimate"),
-            "eps_actual": self.first(raw_event, "eps_actual"),
-            "revenue_estimate": self.first(raw_event, "revenue_estimate"),
-            "revenue_actual": self.first(raw_event, "revenue_actual"),
-        }
-        return self.build_event("drifter", raw_event, signal_fields)
-
-    def build_event(self, source_hunter, raw_event, signal_fields, liquidity_overrides=None):
-        liquidity_metrics = self.extract_liquidity_metrics(raw_event, liquidity_overrides or {})
-        signal_data = self.extract_signal_data(raw_event, signal_fields)
-        technical_score = self.first(raw_event, "_technical_score", "technical_score")
-        if technical_score is None and isinstance(signal_data, dict):
-            technical_score = signal_data.get("_technical_score") or signal_data.get(
-                "technical_score"
-            )
-
-        return {
-            "source_hunter": source_hunter,
-            "ticker": self.normalize_ticker(self.first(raw_event, "ticker", "symbol")),
-            "timestamp_utc": self.normalize_timestamp(
-                self.first(raw_event, "timestamp_utc", "timestamp", "ts", "created_at")
-            ),
-            "liquidity_metrics": liquidity_metrics,
-            "signal_data": signal_data,
-            "_technical_score": self.to_float(technical_score, default=0.0),
-            "float_shares": self.to_float(self.first(raw_event, "float_shares", "float")),
-            "market_cap": self.first(raw_event, "market_cap", "cap"),
-        }
-
-    def extract_liquidity_metrics(self, raw_event, overrides):
-        nested = raw_event.get("liquidity_metrics", {})
-        if not isinstance(nested, dict):
-            nested = {}
-
-        price = self.first_from_values(
-            overrides.get("price"),
-            nested.get("price"),
-            raw_event.get("price"),
-            raw_event.get("last_price"),
-            raw_event.get("close"),
-        )
-        volume = self.first_from_values(
-            overrides.get("volume"),
-            nested.get("volume"),
-            raw_event.get("volume"),
-            raw_event.get("vol"),
-        )
-        relative_volume = self.first_from_values(
-            overrides.get("relative_volume"),
-            nested.get("relative_volume"),
-            raw_event.get("relative_volume"),
-            raw_event.get("relativeVolume"),
-            raw_event.get("rel_volume"),
-            raw_event.get("rvol"),
-        )
+    def build_triage_payload(self, normalized, confluence_sources, signals):
         return {
-            "price": self.to_float(price),
-            "volume": self.to_float(volume, default=0.0),
-            "relative_volume": self.to_float(relative_volume, default=0.0),
-        }
-
-    def extract_signal_data(self, raw_event, source_specific_fields):
-        if isinstance(raw_event.get("signal_data"), dict):
-            signal_data = dict(raw_event["signal_data"])
-        else:
-            signal_data = {}
-
-        for key, value in source_specific_fields.items():
-            if value is not None:
-                signal_data[key] = value
-
-        ignored_keys = {
-            "_technical_score",
-            "created_at",
-            "hunter",
-            "liquidity_metrics",
-            "price",
-            "relative_volume",
-            "relativeVolume",
-            "rel_volume",
-            "rvol",
-            "short_float",
-            "source",
-            "source_hunter",
-            "signal_data",
-            "symbol",
-            "ticker",
-            "technical_score",
-            "timestamp",
-            "timestamp_utc",
-            "ts",
-            "vol",
-            "volume",
+            "ticker": normalized["ticker"],
+            "timestamp_utc": normalized["timestamp_utc"],
+            "confluence_count": len(confluence_sources),
+            "confluence_sources": confluence_sources,
+            "technical_score": float(normalized.get("_technical_score") or 0.0),
+            "liquidity_metrics": normalized["liquidity_metrics"],
+            "signals": signals,
+            "float_shares": normalized.get("float_shares"),
+            "market_cap": normalized.get("market_cap"),
         }
 
-        for key, value in raw_event.items():
-            if key in ignored_keys or key in signal_data or value is None:
-                continue
-            signal_data[key] = value
+    def normalize_event(self, raw_event):
+        return normalize_event(raw_event)
 
-        return signal_data
+    def detect_source(self, raw_event):
+        return detect_source(raw_event)
 
     def get_drop_reason(self, normalized):
+        drop = self.check_liquidity(normalized)
+        return drop[1] if drop else None
+
+    def check_liquidity(self, normalized):
+        """Return ``(reason_code, reason)`` when the event fails a liquidity filter, else None."""
         liquidity = normalized["liquidity_metrics"]
         source_hunter = normalized.get("source_hunter", "")
 
@@ -386,120 +593,75 @@ class GatekeeperService:
             volume = liquidity.get("volume", 0.0)
             relative_volume = liquidity.get("relative_volume", 0.0)
             if volume < MIN_VOLUME:
-                return f"volume {volume} below minimum {MIN_VOLUME}"
+                return "low_volume", f"volume {volume} below minimum {MIN_VOLUME}"
             if relative_volume < MIN_RELATIVE_VOLUME:
-                return f"relative_volume {relative_volume} below minimum {MIN_RELATIVE_VOLUME}"
+                return (
+                    "low_relative_volume",
+                    f"relative_volume {relative_volume} below minimum {MIN_RELATIVE_VOLUME}",
+                )
 
         price = liquidity.get("price") or 0.0
         if price > 0 and price < MIN_PRICE:
-            return f"price {price} below minimum {MIN_PRICE}"
+            return "price_below_min", f"price {price} below minimum {MIN_PRICE}"
         if price > 0 and price > MAX_PRICE:
-            return f"price {price} above maximum {MAX_PRICE}"
+            return "price_above_max", f"price {price} above maximum {MAX_PRICE}"
         return None
 
     def track_signal(self, ticker, normalized):
-        signal_key = REDIS_SIGNALS_KEY.format(ticker=ticker)
-        source_key = REDIS_SOURCES_KEY.format(ticker=ticker)
+        self.window_store.track_signal(
+            ticker,
+            normalized["source_hunter"],
+            self.encode_signal(normalized),
+            self.event_time(normalized),
+        )
 
+    @staticmethod
+    def encode_signal(normalized):
         payload = {
             "source_hunter": normalized["source_hunter"],
             "signal_data": normalized["signal_data"],
         }
-
-        # Cap per-ticker signal history to avoid unbounded growth.
-        max_signals_per_window = 200
-        pipe = self.redis.pipeline()
-        pipe.lpush(signal_key, json.dumps(payload))
-        pipe.ltrim(signal_key, 0, max_signals_per_window - 1)
-        pipe.expire(signal_key, ROLLING_WINDOW_SECONDS)
-
-        pipe.sadd(source_key, normalized["source_hunter"])
-        pipe.expire(source_key, ROLLING_WINDOW_SECONDS)
-        pipe.execute()
+        return json.dumps(payload)
 
     def get_sources(self, ticker):
-        source_key = REDIS_SOURCES_KEY.format(ticker=ticker)
-        return sorted(self.redis.smembers(source_key))
+        return self.window_store.get_sources(ticker)
 
     def get_accumulated_signals(self, ticker):
-        signal_key = REDIS_SIGNALS_KEY.format(ticker=ticker)
-        raw_signals = self.redis.lrange(signal_key, 0, -1)
-        return [json.loads(signal) for signal in raw_signals]
+        return [json.loads(signal) for signal in self.window_store.get_accumulated_signals(ticker)]
 
     def was_recently_sent(self, ticker):
-        sent_key = REDIS_SENT_KEY.format(ticker=ticker)
-        return bool(self.redis.exists(sent_key))
-
-    def mark_sent(self, ticker):
-        sent_key = REDIS_SENT_KEY.format(ticker=ticker)
-        self.redis.set(sent_key, "1", ex=ROLLING_WINDOW_SECONDS)
+        return self.window_store.was_recently_sent(ticker)
 
-    @staticmethod
-    def first(raw_event, *keys):
-        signal_data = raw_event.get("signal_data", {})
-        for key in keys:
-            if key in raw_event and raw_event[key] is not None:
-                return raw_event[key]
-            if (
-                isinstance(signal_data, dict)
-                and key in signal_data
-                and signal_data[key] is not None
-            ):
-                return signal_data[key]
-        return None
+    def mark_sent(self, ticker, event_time=None):
+        self.window_store.mark_sent(ticker, time.time() if event_time is None else event_time)
 
     @staticmethod
-    def first_from_values(*values):
-        for value in values:
-            if value is not None:
-                return value
-        return None
+    def event_time(normalized):
+        """Epoch seconds of the event's timestamp_utc; wall clock when it cannot be parsed."""
+        value = normalized.get("timestamp_utc")
+        try:
+            parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            return time.time()
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
 
-    @staticmethod
-    def normalize_ticker(value):
-        if value is None:
-            return None
-        return str(value).strip().upper()
+    normalize_ticker = staticmethod(normalize_ticker)
+    normalize_timestamp = staticmethod(normalize_timestamp)
+    normalize_short_float_pct = staticmethod(normalize_short_float_pct)
+    to_float = staticmethod(to_float)
 
-    @staticmethod
-    def normalize_timestamp(value):
-        if isinstance(value, str) and value.strip():
-            return value
-        return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
-    @staticmethod
-    def normalize_short_float_pct(value, is_fraction=False):
-        numeric_value = GatekeeperService.to_float(value, default=0.0)
-        if numeric_value is None:
-            return 0.0
-
-        # Only treat as a fraction when explicitly indicated or when clearly in (0,1]
-        # and scaling would still keep the result within 0–100%.
-        if is_fraction or (0 < numeric_value <= 1.0 and numeric_value * 100.0 <= 100.0):
-            numeric_value *= 100.0
-
-        numeric_value = round(numeric_value, 4)
-        # Clamp to a realistic percentage range.
-        if numeric_value < 0.0:
-            numeric_value = 0.0
-        if numeric_value > 100.0:
-            numeric_value = 100.0
-        return numeric_value
-
-    @staticmethod
-    def to_float(value, default=None):
-        if value is None or value == "":
-            return default
-        try:
-            if isinstance(value, str):
-                cleaned = value.replace(",", "").replace("%", "").strip()
-                if cleaned == "":
-                    return default
-                value = cleaned
-            return float(value)
-        except (TypeError, ValueError):
-            return default
+def exit_on_sigterm(_signum, _frame):
+    # Unwind through run()'s finally block so processed offsets are committed.
+    raise SystemExit(0)
 
 
 if __name__ == "__main__":
-    GatekeeperService().run()
+    log_listener = start_queue_logging()
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
+    try:
+        GatekeeperService().run()
+    finally:
+        log_listener.stop()
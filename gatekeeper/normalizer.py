@@ -0,0 +1,315 @@
+"""
+Table-driven normalization of raw hunter events into the gatekeeper's common event shape.
+
+Each hunter's field aliases are turned once, at import, into one lookup per field
+(alias_lookup), so normalizing an event costs a few dict.get calls per field plus one
+filtered copy of its keys, instead of a coercer dispatch and a first() scan per field.
+Earlier aliases win, and for the same alias the top-level event wins over signal_data.
+"""
+
+from datetime import datetime, timezone
+
+# Top-level keys that never get copied into signal_data.
+IGNORED_SIGNAL_KEYS = frozenset(
+    {
+        "_technical_score",
+        "created_at",
+        "hunter",
+        "liquidity_metrics",
+        "price",
+        "relative_volume",
+        "relativeVolume",
+        "rel_volume",
+        "rvol",
+        "short_float",
+        "source",
+        "source_hunter",
+        "signal_data",
+        "symbol",
+        "ticker",
+        "technical_score",
+        "timestamp",
+        "timestamp_utc",
+        "ts",
+        "vol",
+        "volume",
+    }
+)
+
+SOURCE_TAG_FIELDS = ("source_hunter", "hunter", "source")
+
+# Untagged events: the first hunter with a marker key (top level, signal_data) wins.
+SOURCE_MARKERS = (
+    ("squeeze", "short_float", "short_float_pct"),
+    ("insider", "transaction_code", "transaction_code"),
+    ("whale", "option_type", "option_type"),
+    ("biotech", "drug_name", "event_date"),
+    ("drifter", "surprise_percent", "surprise_percent"),
+)
+
+
+def to_float(value, default=None):
+    if value.__class__ is float:
+        return value
+    if value is None or value == "":
+        return default
+    try:
+        if isinstance(value, str):
+            cleaned = value.replace(",", "").replace("%", "").strip()
+            if cleaned == "":
+                return default
+            value = cleaned
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_ticker(value):
+    if value is None:
+        return None
+    return str(value).strip().upper()
+
+
+def normalize_timestamp(value):
+    if isinstance(value, str) and value.strip():
+        return value
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def normalize_short_float_pct(value, is_fraction=False):
+    numeric_value = to_float(value, default=0.0)
+    if numeric_value is None:
+        return 0.0
+
+    # Only treat as a fraction when explicitly indicated or when clearly in (0,1]
+    # and scaling would still keep the result within 0–100%.
+    if is_fraction or (0 < numeric_value <= 1.0 and numeric_value * 100.0 <= 100.0):
+        numeric_value *= 100.0
+
+    numeric_value = round(numeric_value, 4)
+    # Clamp to a realistic percentage range.
+    if numeric_value < 0.0:
+        numeric_value = 0.0
+    if numeric_value > 100.0:
+        numeric_value = 100.0
+    return numeric_value
+
+
+# signal_data fields per hunter: (output field, aliases in precedence order, transform).
+# A transform is applied even when no alias is present; otherwise missing fields are omitted.
+SOURCE_SIGNAL_FIELDS = {
+    "squeeze": (
+        ("short_float_pct", ("short_float_pct", "short_float"), normalize_short_float_pct),
+        ("days_to_cover", ("days_to_cover", "short_ratio"), None),
+        ("borrow_fee_rate", ("borrow_fee_rate", "borrow_fee"), None),
+    ),
+    "insider": (
+        ("transaction_code", ("transaction_code", "code"), None),
+        (
+            "transaction_amount_usd",
+            ("transaction_amount_usd", "amount_usd", "transaction_value_usd"),
+            None,
+        ),
+        ("insider_name", ("insider_name", "name"), None),
+        ("insider_title", ("insider_title", "title"), None),
+        ("shares_traded", ("shares_traded", "shares"), None),
+    ),
+    "whale": (
+        ("option_type", ("option_type", "type"), None),
+        ("strike_price", ("strike_price", "strike"), None),
+        ("expiration_date", ("expiration_date", "expiry"), None),
+        ("volume", ("option_volume", "contracts", "volume"), None),
+        ("open_interest", ("open_interest", "oi"), None),
+        ("vol_oi_ratio", ("vol_oi_ratio", "volume_open_interest_ratio"), None),
+        ("premium_paid_usd", ("premium_paid_usd", "premium"), None),
+    ),
+    "biotech": (
+        ("catalyst_type", ("catalyst_type",), None),
+        ("stage", ("stage",), None),
+        ("drug_name", ("drug_name",), None),
+        ("event_date", ("event_date",), None),
+        ("notes", ("notes",), None),
+    ),
+    "drifter": (
+        ("surprise_percent", ("surprise_percent", "earnings_surprise_percent"), None),
+        ("eps_estimate", ("eps_estimate",), None),
+        ("eps_actual", ("eps_actual",), None),
+        ("revenue_estimate", ("revenue_estimate",), None),
+        ("revenue_actual", ("revenue_actual",), None),
+    ),
+}
+
+# Liquidity metrics a hunter reports under its own names (looked up like signal fields).
+# Whale events carry option volume in "volume", so stock volume has to come from elsewhere.
+LIQUIDITY_OVERRIDES = {
+    "whale": {"volume": ("market_volume", "stock_volume", "underlying_volume")},
+}
+
+# Common top-level fields, looked up in the event and then signal_data. SourceNormalizer
+# relies on this order.
+COMMON_FIELDS = (
+    ("ticker", ("ticker", "symbol")),
+    ("timestamp_utc", ("timestamp_utc", "timestamp", "ts", "created_at")),
+    ("_technical_score", ("_technical_score", "technical_score")),
+    ("float_shares", ("float_shares", "float")),
+    ("market_cap", ("market_cap", "cap")),
+)
+
+# Liquidity fallbacks read from the top level only, after liquidity_metrics.
+LIQUIDITY_FIELDS = (
+    ("price", ("price", "last_price", "close")),
+    ("volume", ("volume", "vol")),
+    ("relative_volume", ("relative_volume", "relativeVolume", "rel_volume", "rvol")),
+)
+
+EMPTY = {}
+
+
+def alias_lookup(aliases):
+    """Return lookup(get) -> value of the first alias whose get() is not None.
+
+    Built once per field. The usual one to three aliases are unrolled into plain
+    comparisons, so a lookup costs a single call plus its dict.get calls.
+    """
+    if len(aliases) == 1:
+        (key,) = aliases
+        return lambda get: get(key)
+    first, second, *rest = aliases
+    if not rest:
+
+        def lookup(get):
+            value = get(first)
+            return get(second) if value is None else value
+
+        return lookup
+    tail = alias_lookup(rest)
+
+    def lookup(get):
+        value = get(first)
+        if value is None:
+            value = get(second)
+            if value is None:
+                value = tail(get)
+        return value
+
+    return lookup
+
+
+class SourceNormalizer:
+    """Normalizer for one hunter, with its alias tables turned into lookups once."""
+
+    def __init__(self, source_hunter, signal_fields, liquidity_overrides=None):
+        overrides = liquidity_overrides or {}
+        self.source_hunter = source_hunter
+        (
+            self.ticker,
+            self.timestamp,
+            self.technical_score,
+            self.float_shares,
+            self.market_cap,
+        ) = (alias_lookup(aliases) for _, aliases in COMMON_FIELDS)
+        self.signal_fields = tuple(
+            (name, alias_lookup(aliases), transform) for name, aliases, transform in signal_fields
+        )
+        # (metric, override lookup or None, top-level fallback lookup)
+        self.liquidity_fields = tuple(
+            (
+                name,
+                alias_lookup(overrides[name]) if name in overrides else None,
+                alias_lookup(aliases),
+            )
+            for name, aliases in LIQUIDITY_FIELDS
+        )
+
+    def normalize(self, raw_event):
+        top = raw_event.get
+        nested = top("signal_data")
+        if nested.__class__ is dict and nested:
+            # One merged view, so every lookup is a single dict.get: the event wins over
+            # signal_data for the same key, as long as its value is not None.
+            merged = nested.copy()
+            merged.update((key, value) for key, value in raw_event.items() if value is not None)
+            get = merged.get
+        else:
+            nested = None
+            get = top
+
+        # Top-level extras pass through; nested signal_data and the hunter's own fields win.
+        signal_data = {
+            key: value
+            for key, value in raw_event.items()
+            if value is not None and key not in IGNORED_SIGNAL_KEYS
+        }
+        if nested:
+            signal_data.update(nested)
+        for name, lookup, transform in self.signal_fields:
+            value = lookup(get)
+            if transform is not None:
+                value = transform(value)
+            if value is not None:
+                signal_data[name] = value
+
+        metrics = top("liquidity_metrics")
+        metrics_get = metrics.get if metrics.__class__ is dict else EMPTY.get
+        liquidity = []
+        for name, override, fallback in self.liquidity_fields:
+            # Hunter override, then liquidity_metrics, then the top-level fallbacks.
+            value = None if override is None else override(get)
+            if value is None:
+                value = metrics_get(name)
+                if value is None:
+                    value = fallback(top)
+            liquidity.append(value)
+        price, volume, relative_volume = liquidity
+        return {
+            "source_hunter": self.source_hunter,
+            "ticker": normalize_ticker(self.ticker(get)),
+            "timestamp_utc": normalize_timestamp(self.timestamp(get)),
+            "liquidity_metrics": {
+                "price": to_float(price),
+                "volume": to_float(volume, 0.0),
+                "relative_volume": to_float(relative_volume, 0.0),
+            },
+            "signal_data": signal_data,
+            "_technical_score": to_float(self.technical_score(get), 0.0),
+            "float_shares": to_float(self.float_shares(get)),
+            "market_cap": self.market_cap(get),
+        }
+
+
+NORMALIZERS = {
+    source_hunter: SourceNormalizer(source_hunter, fields, LIQUIDITY_OVERRIDES.get(source_hunter))
+    for source_hunter, fields in SOURCE_SIGNAL_FIELDS.items()
+}
+
+
+def detect_source(raw_event):
+    for field in SOURCE_TAG_FIELDS:
+        value = raw_event.get(field)
+        if isinstance(value, str) and value:
+            return value.strip().lower()
+
+    signal_data = raw_event.get("signal_data")
+    if not isinstance(signal_data, dict):
+        signal_data = {}
+    value = signal_data.get("source_hunter")
+    if isinstance(value, str) and value:
+        return value.strip().lower()
+
+    for source_hunter, event_marker, signal_marker in SOURCE_MARKERS:
+        if event_marker in raw_event or signal_marker in signal_data:
+            return source_hunter
+    return None
+
+
+def normalize_event(raw_event):
+    """Map a raw hunter event onto the common shape, or None for unknown schemas."""
+    if not isinstance(raw_event, dict):
+        return None
+    normalizer = NORMALIZERS.get(detect_source(raw_event))
+    if normalizer is None:
+        return None
+    normalized = normalizer.normalize(raw_event)
+    if not normalized["ticker"]:
+        return None
+    return normalized
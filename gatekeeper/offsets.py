@@ -0,0 +1,67 @@
+"""
+Offset bookkeeping for the gatekeeper's periodic commits.
+
+The consume loop marks each record once its decision is final (forwarded, buffered,
+deduped, dropped or skipped as undecodable). CommitTracker holds the next offset to
+commit per partition and says when a commit is due: every interval_seconds, every
+max_events marked records, or right away when a forward asked for one. Committing is
+left to the service, which first makes forwards and window state durable.
+"""
+
+import time
+
+from kafka.structs import OffsetAndMetadata, TopicPartition
+
+
+class CommitTracker:
+    def __init__(self, interval_seconds, max_events, clock=time.monotonic):
+        self.interval_seconds = interval_seconds
+        self.max_events = max_events
+        self.clock = clock
+        self.pending = {}
+        self.pending_events = 0
+        self.commit_requested = False
+        self.last_attempt = clock()
+
+    def mark(self, message):
+        """Record that ``message`` is fully processed."""
+        self.pending[TopicPartition(message.topic, message.partition)] = message.offset + 1
+        self.pending_events += 1
+
+    def request_commit(self):
+        self.commit_requested = True
+
+    def due(self):
+        if not self.pending:
+            return False
+        return (
+            self.commit_requested
+            or self.pending_events >= self.max_events
+            or self.clock() - self.last_attempt >= self.interval_seconds
+        )
+
+    def offsets(self):
+        return {tp: OffsetAndMetadata(offset, "") for tp, offset in self.pending.items()}
+
+    def attempted(self):
+        """Restart the interval after a commit attempt, successful or not."""
+        self.commit_requested = False
+        self.last_attempt = self.clock()
+
+    def committed(self):
+        """Everything marked so far has been handed to the broker."""
+        self.pending = {}
+        self.pending_events = 0
+        self.attempted()
+
+    def rewind(self, tp, offset):
+        """Hold a partition's next commit at ``offset``, a record that must be processed again."""
+        tp = TopicPartition(tp.topic, tp.partition)
+        self.pending[tp] = min(offset, self.pending.get(tp, offset))
+
+    def forget(self, topic_partitions):
+        """Stop tracking partitions that were handed to another replica."""
+        for tp in topic_partitions:
+            self.pending.pop(TopicPartition(tp.topic, tp.partition), None)
+        if not self.pending:
+            self.pending_events = 0
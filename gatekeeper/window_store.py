@@ -0,0 +1,528 @@
+"""
+Per-ticker confluence window backends for the gatekeeper.
+
+Every backend answers the same question for a batch of events, in arrival order:
+track the signal, then buffer / dedupe / forward it. Results use the CONFLUENCE_SCRIPT
+shape: (decision, sources) or (decision, sources, encoded signals newest first).
+
+Windows run on event time (the signal's timestamp_utc), not on the wall clock: each
+write drops members older than event_time - window_seconds, so a ticker that keeps
+receiving events still forgets stale sources, and a backlog replays with the same
+decisions it produced live. Wall-clock TTLs only garbage-collect idle tickers.
+
+- RedisWindowStore: shared state, one atomic Lua call per event (safe for any replica layout)
+- InMemoryWindowStore: process-local ring buffers, microsecond decisions, no network
+- WriteBehindWindowStore: in-memory decisions mirrored to Redis in the background so a
+  restarted or newly assigned replica can hydrate its tickers
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+
+from redis.exceptions import NoScriptError
+
+logger = logging.getLogger("gatekeeper")
+
+DECISION_BUFFERED = 0
+DECISION_FORWARD = 1
+DECISION_DEDUPED = 2
+
+# Tracks one signal and decides buffer / dedupe / forward in a single atomic step, so
+# concurrent gatekeeper replicas can never both claim the same ticker's sent marker.
+# KEYS: signals zset (encoded signal -> event time), sources zset (hunter -> latest event
+#       time), sent marker (event time of the last forward)
+# ARGV: encoded signal, source hunter, event time (epoch seconds), window seconds,
+#       max signals per window, confluence threshold, technical trigger flag ("1" when
+#       the score alone triggers)
+CONFLUENCE_SCRIPT = """
+local event_time = tonumber(ARGV[3])
+local window = tonumber(ARGV[4])
+local stale = "(" .. (event_time - window)
+
+redis.call("ZADD", KEYS[1], ARGV[3], ARGV[1])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", stale)
+redis.call("ZREMRANGEBYRANK", KEYS[1], 0, -(tonumber(ARGV[5]) + 1))
+redis.call("EXPIRE", KEYS[1], window)
+
+local seen_at = tonumber(redis.call("ZSCORE", KEYS[2], ARGV[2]))
+if not seen_at or seen_at < event_time then
+    redis.call("ZADD", KEYS[2], ARGV[3], ARGV[2])
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", stale)
+redis.call("EXPIRE", KEYS[2], window)
+
+local sources = redis.call("ZRANGE", KEYS[2], 0, -1)
+if #sources < tonumber(ARGV[6]) and ARGV[7] ~= "1" then
+    return {0, sources}
+end
+local sent_at = tonumber(redis.call("GET", KEYS[3]))
+if sent_at and sent_at + window > event_time then
+    return {2, sources}
+end
+redis.call("SET", KEYS[3], ARGV[3], "EX", window)
+return {1, sources, redis.call("ZREVRANGE", KEYS[1], 0, -1)}
+"""
+
+# Deletes a sent marker only if it still holds the given event time, so undoing a forward
+# that was never delivered cannot clear the marker of a later one.
+# KEYS: sent marker
+# ARGV: event time of the forward to undo
+CLEAR_SENT_SCRIPT = """
+if tonumber(redis.call("GET", KEYS[1])) == tonumber(ARGV[1]) then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class SignalRequest:
+    """One filtered event waiting for a confluence decision."""
+
+    __slots__ = ("ticker", "source_hunter", "encoded", "technical_trigger", "event_time")
+
+    def __init__(self, ticker, source_hunter, encoded, technical_trigger, event_time):
+        self.ticker = ticker
+        self.source_hunter = source_hunter
+        self.encoded = encoded
+        self.technical_trigger = technical_trigger
+        self.event_time = event_time
+
+
+class WindowStore:
+    """Interface shared by all window backends. Event times are epoch seconds."""
+
+    def __init__(self, window_seconds, max_signals, confluence_threshold):
+        self.window_seconds = window_seconds
+        self.max_signals = max_signals
+        self.confluence_threshold = confluence_threshold
+
+    def check_confluence(self, requests):
+        raise NotImplementedError
+
+    def track_signal(self, ticker, source_hunter, encoded, event_time):
+        raise NotImplementedError
+
+    def get_sources(self, ticker):
+        raise NotImplementedError
+
+    def get_accumulated_signals(self, ticker):
+        raise NotImplementedError
+
+    def was_recently_sent(self, ticker):
+        raise NotImplementedError
+
+    def mark_sent(self, ticker, event_time):
+        raise NotImplementedError
+
+    def clear_sent(self, ticker, event_time):
+        """Undo the sent marker of an undelivered forward, unless a newer one replaced it."""
+        raise NotImplementedError
+
+    def hydrate(self, owns_ticker):
+        """Load state for tickers this process now owns (after a partition assignment)."""
+
+    def evict(self, owns_ticker):
+        """Drop local state for tickers matching owns_ticker (after partitions are revoked)."""
+
+    def flush(self):
+        """Persist any buffered writes."""
+
+    def close(self):
+        self.flush()
+
+
+class RedisWindowStore(WindowStore):
+    def __init__(self, redis, keys, window_seconds, max_signals, confluence_threshold):
+        super().__init__(window_seconds, max_signals, confluence_threshold)
+        self.redis = redis
+        self.signals_key, self.sources_key, self.sent_key = keys
+        self.confluence_sha = self.redis.script_load(CONFLUENCE_SCRIPT)
+        self.clear_sent_script = self.redis.register_script(CLEAR_SENT_SCRIPT)
+
+    def check_confluence(self, requests):
+        """Decide the whole batch in one pipelined round trip of EVALSHA calls."""
+        try:
+            return self.run_confluence_script(requests)
+        except NoScriptError:
+            # Redis restarted or flushed its script cache; reload once and retry.
+            self.confluence_sha = self.redis.script_load(CONFLUENCE_SCRIPT)
+            return self.run_confluence_script(requests)
+
+    def run_confluence_script(self, requests):
+        pipe = self.redis.pipeline(transaction=False)
+        for request in requests:
+            ticker = request.ticker
+            pipe.evalsha(
+                self.confluence_sha,
+                3,
+                self.signals_key.format(ticker=ticker),
+                self.sources_key.format(ticker=ticker),
+                self.sent_key.format(ticker=ticker),
+                request.encoded,
+                request.source_hunter,
+                request.event_time,
+                self.window_seconds,
+                self.max_signals,
+                self.confluence_threshold,
+                "1" if request.technical_trigger else "0",
+            )
+        return pipe.execute()
+
+    def track_signal(self, ticker, source_hunter, encoded, event_time):
+        pipe = self.redis.pipeline()
+        add_tracking_commands(
+            pipe,
+            self.signals_key.format(ticker=ticker),
+            self.sources_key.format(ticker=ticker),
+            source_hunter,
+            encoded,
+            event_time,
+            self.window_seconds,
+            self.max_signals,
+        )
+        pipe.execute()
+
+    def get_sources(self, ticker):
+        return sorted(self.redis.zrange(self.sources_key.format(ticker=ticker), 0, -1))
+
+    def get_accumulated_signals(self, ticker):
+        return self.redis.zrevrange(self.signals_key.format(ticker=ticker), 0, -1)
+
+    def was_recently_sent(self, ticker):
+        return bool(self.redis.exists(self.sent_key.format(ticker=ticker)))
+
+    def mark_sent(self, ticker, event_time):
+        self.redis.set(self.sent_key.format(ticker=ticker), event_time, ex=self.window_seconds)
+
+    def clear_sent(self, ticker, event_time):
+        self.clear_sent_script(keys=[self.sent_key.format(ticker=ticker)], args=[event_time])
+
+
+def add_tracking_commands(
+    pipe, signal_key, source_key, source_hunter, encoded, event_time, window, max_signals
+):
+    """Queue the non-atomic equivalent of the tracking half of CONFLUENCE_SCRIPT."""
+    stale = f"({event_time - window}"
+    pipe.zadd(signal_key, {encoded: event_time})
+    pipe.zremrangebyscore(signal_key, "-inf", stale)
+    pipe.zremrangebyrank(signal_key, 0, -(max_signals + 1))
+    pipe.expire(signal_key, window)
+    pipe.zadd(source_key, {source_hunter: event_time}, gt=True)
+    pipe.zremrangebyscore(source_key, "-inf", stale)
+    pipe.expire(source_key, window)
+
+
+class SignalEntry:
+    __slots__ = ("encoded", "event_time")
+
+    def __init__(self, encoded, event_time):
+        self.encoded = encoded
+        self.event_time = event_time
+
+
+class TickerWindow:
+    """Ring buffer of SignalEntry (newest event time first) plus each source's latest event time."""
+
+    __slots__ = ("signals", "sources", "expires_at")
+
+    def __init__(self, max_signals):
+        self.signals = deque(maxlen=max_signals)
+        self.sources = {}
+        self.expires_at = 0.0
+
+    def add(self, encoded, event_time):
+        signals = self.signals
+        for index, entry in enumerate(signals):
+            if entry.encoded == encoded:
+                # Same member as a Redis ZADD: one entry per distinct payload.
+                del signals[index]
+                break
+        if not signals or event_time >= signals[0].event_time:
+            signals.appendleft(SignalEntry(encoded, event_time))
+            return
+        if len(signals) == signals.maxlen:
+            if event_time < signals[-1].event_time:
+                return
+            signals.pop()
+        # Late (out-of-order) event: keep the buffer sorted by event time.
+        index = 0
+        while index < len(signals) and signals[index].event_time > event_time:
+            index += 1
+        signals.insert(index, SignalEntry(encoded, event_time))
+
+    def trim(self, cutoff):
+        signals = self.signals
+        while signals and signals[-1].event_time < cutoff:
+            signals.pop()
+        stale = [source for source, seen_at in self.sources.items() if seen_at < cutoff]
+        for source in stale:
+            del self.sources[source]
+
+
+class InMemoryWindowStore(WindowStore):
+    """Single-process window state with the same semantics as CONFLUENCE_SCRIPT.
+
+    Confluence and dedupe compare event times. Idle tickers are garbage-collected
+    window_seconds (wall clock) after their last write, like the Redis key TTLs, via a
+    time-ordered heap; refreshed entries leave stale heap items behind, which are skipped
+    when popped.
+    """
+
+    WINDOW = 0
+    SENT = 1
+
+    def __init__(self, window_seconds, max_signals, confluence_threshold, clock=time.monotonic):
+        super().__init__(window_seconds, max_signals, confluence_threshold)
+        self.clock = clock
+        self.windows = {}
+        # ticker -> (event time of the last forward, wall-clock expiry)
+        self.sent = {}
+        self.expiry_heap = []
+
+    def check_confluence(self, requests):
+        now = self.clock()
+        self.expire(now)
+        results = []
+        for request in requests:
+            window = self.append(
+                request.ticker, request.source_hunter, request.encoded, request.event_time, now
+            )
+            sources = list(window.sources)
+            if len(sources) < self.confluence_threshold and not request.technical_trigger:
+                results.append((DECISION_BUFFERED, sources))
+                continue
+            sent = self.sent.get(request.ticker)
+            if sent is not None and sent[0] + self.window_seconds > request.event_time:
+                results.append((DECISION_DEDUPED, sources))
+                continue
+            self.set_sent(request.ticker, request.event_time, now)
+            results.append((DECISION_FORWARD, sources, [entry.encoded for entry in window.signals]))
+        return results
+
+    def append(self, ticker, source_hunter, encoded, event_time, now):
+        window = self.windows.get(ticker)
+        if window is None:
+            window = self.windows[ticker] = TickerWindow(self.max_signals)
+        window.add(encoded, event_time)
+        if window.sources.get(source_hunter, event_time) <= event_time:
+            window.sources[source_hunter] = event_time
+        window.trim(event_time - self.window_seconds)
+        window.expires_at = now + self.window_seconds
+        heapq.heappush(self.expiry_heap, (window.expires_at, self.WINDOW, ticker))
+        return window
+
+    def set_sent(self, ticker, event_time, now, ttl=None):
+        expires_at = now + (self.window_seconds if ttl is None else ttl)
+        self.sent[ticker] = (event_time, expires_at)
+        heapq.heappush(self.expiry_heap, (expires_at, self.SENT, ticker))
+
+    def expire(self, now):
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now:
+            _, kind, ticker = heapq.heappop(heap)
+            if kind == self.WINDOW:
+                window = self.windows.get(ticker)
+                if window is not None and window.expires_at <= now:
+                    del self.windows[ticker]
+                continue
+            sent = self.sent.get(ticker)
+            if sent is not None and sent[1] <= now:
+                del self.sent[ticker]
+
+    def live_window(self, ticker):
+        self.expire(self.clock())
+        return self.windows.get(ticker)
+
+    def track_signal(self, ticker, source_hunter, encoded, event_time):
+        now = self.clock()
+        self.expire(now)
+        self.append(ticker, source_hunter, encoded, event_time, now)
+
+    def get_sources(self, ticker):
+        window = self.live_window(ticker)
+        return sorted(window.sources) if window else []
+
+    def get_accumulated_signals(self, ticker):
+        window = self.live_window(ticker)
+        return [entry.encoded for entry in window.signals] if window else []
+
+    def was_recently_sent(self, ticker):
+        self.expire(self.clock())
+        return ticker in self.sent
+
+    def mark_sent(self, ticker, event_time):
+        self.set_sent(ticker, event_time, self.clock())
+
+    def clear_sent(self, ticker, event_time):
+        sent = self.sent.get(ticker)
+        if sent is not None and sent[0] == event_time:
+            del self.sent[ticker]
+
+    def evict(self, owns_ticker):
+        for ticker in [ticker for ticker in self.windows if owns_ticker(ticker)]:
+            del self.windows[ticker]
+        for ticker in [ticker for ticker in self.sent if owns_ticker(ticker)]:
+            del self.sent[ticker]
+
+
+class WriteBehindWindowStore(InMemoryWindowStore):
+    """In-memory decisions with every write mirrored to the Redis keys in the background.
+
+    Correct only while each ticker has a single owner, i.e. one gatekeeper process or
+    replicas splitting a ticker-keyed raw-events topic. The mirror keeps the Redis key
+    layout of RedisWindowStore, so backends can be switched without losing state.
+    """
+
+    def __init__(
+        self,
+        redis,
+        keys,
+        window_seconds,
+        max_signals,
+        confluence_threshold,
+        flush_interval_seconds,
+        clock=time.monotonic,
+    ):
+        super().__init__(window_seconds, max_signals, confluence_threshold, clock=clock)
+        self.redis = redis
+        self.signals_key, self.sources_key, self.sent_key = keys
+        self.clear_sent_script = redis.register_script(CLEAR_SENT_SCRIPT)
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher = threading.Thread(
+            target=self.flush_periodically,
+            args=(flush_interval_seconds,),
+            name="gatekeeper-write-behind",
+            daemon=True,
+        )
+        self.flusher.start()
+
+    def check_confluence(self, requests):
+        results = super().check_confluence(requests)
+        writes = []
+        for request, result in zip(requests, results):
+            writes.append(
+                (
+                    "track",
+                    request.ticker,
+                    request.source_hunter,
+                    request.encoded,
+                    request.event_time,
+                )
+            )
+            if result[0] == DECISION_FORWARD:
+                writes.append(("sent", request.ticker, request.event_time))
+        with self.pending_lock:
+            self.pending.extend(writes)
+        return results
+
+    def track_signal(self, ticker, source_hunter, encoded, event_time):
+        super().track_signal(ticker, source_hunter, encoded, event_time)
+        with self.pending_lock:
+            self.pending.append(("track", ticker, source_hunter, encoded, event_time))
+
+    def mark_sent(self, ticker, event_time):
+        super().mark_sent(ticker, event_time)
+        with self.pending_lock:
+            self.pending.append(("sent", ticker, event_time))
+
+    def clear_sent(self, ticker, event_time):
+        super().clear_sent(ticker, event_time)
+        with self.pending_lock:
+            self.pending.append(("unsent", ticker, event_time))
+
+    def flush_periodically(self, interval_seconds):
+        while not self.stopped.wait(interval_seconds):
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.warning("Write-behind flush to Redis failed: %s", exc)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.pending_lock:
+                writes, self.pending = self.pending, []
+            if not writes:
+                return
+            try:
+                self.write_through(writes)
+            except Exception:
+                # Keep the writes (in order) for the next attempt.
+                with self.pending_lock:
+                    self.pending[:0] = writes
+                raise
+
+    def write_through(self, writes):
+        pipe = self.redis.pipeline(transaction=False)
+        for write in writes:
+            if write[0] == "sent":
+                _, ticker, event_time = write
+                pipe.set(self.sent_key.format(ticker=ticker), event_time, ex=self.window_seconds)
+                continue
+            if write[0] == "unsent":
+                _, ticker, event_time = write
+                self.clear_sent_script(
+                    keys=[self.sent_key.format(ticker=ticker)], args=[event_time], client=pipe
+                )
+                continue
+            _, ticker, source_hunter, encoded, event_time = write
+            add_tracking_commands(
+                pipe,
+                self.signals_key.format(ticker=ticker),
+                self.sources_key.format(ticker=ticker),
+                source_hunter,
+                encoded,
+                event_time,
+                self.window_seconds,
+                self.max_signals,
+            )
+        pipe.execute()
+
+    def hydrate(self, owns_ticker):
+        """Rebuild windows for owned tickers from the mirrored Redis keys."""
+        tickers = set()
+        for key_format in (self.sources_key, self.sent_key):
+            prefix = key_format.format(ticker="")
+            for key in self.redis.scan_iter(match=prefix + "*", count=500):
+                ticker = key[len(prefix) :]
+                if owns_ticker(ticker):
+                    tickers.add(ticker)
+        if not tickers:
+            return
+
+        tickers = sorted(tickers)
+        pipe = self.redis.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.zrange(self.sources_key.format(ticker=ticker), 0, -1, withscores=True)
+            pipe.zrevrange(
+                self.signals_key.format(ticker=ticker), 0, self.max_signals - 1, withscores=True
+            )
+            pipe.pttl(self.sources_key.format(ticker=ticker))
+            pipe.get(self.sent_key.format(ticker=ticker))
+            pipe.pttl(self.sent_key.format(ticker=ticker))
+        results = pipe.execute()
+
+        now = self.clock()
+        for index, ticker in enumerate(tickers):
+            sources, signals, window_ttl_ms, sent_at, sent_ttl_ms = results[
+                index * 5 : index * 5 + 5
+            ]
+            if sources and window_ttl_ms > 0:
+                window = self.windows[ticker] = TickerWindow(self.max_signals)
+                window.signals.extend(SignalEntry(encoded, score) for encoded, score in signals)
+                window.sources.update(sources)
+                window.expires_at = now + window_ttl_ms / 1000.0
+                heapq.heappush(self.expiry_heap, (window.expires_at, self.WINDOW, ticker))
+            if sent_at is not None and sent_ttl_ms > 0:
+                self.set_sent(ticker, float(sent_at), now, ttl=sent_ttl_ms / 1000.0)
+        logger.info("Hydrated window state for %s tickers from Redis", len(tickers))
+
+    def close(self):
+        self.stopped.set()
+        self.flusher.join(timeout=5)
+        self.flush()
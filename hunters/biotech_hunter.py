@@ -90,6 +90,7 @@ async def _one_sweep(kafka: KafkaClient) -> None:
             kafka.send_message(KAFKA_TOPIC_BIOTECH, entry)
             kafka.send_message(RAW_EVENTS_TOPIC, entry)
             pushed += 1
+        kafka.flush()
         logger.info("Successfully pushed %d signals to Kafka.", pushed)
 
 
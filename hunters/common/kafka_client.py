@@ -1,9 +1,16 @@
-import json
-
-from kafka import KafkaProducer
+from messaging.codec import RAW_EVENT, codecs_for
+from messaging.producer import BatchingProducer, ticker_key
 
 from .config import KAFKA_BOOTSTRAP_SERVERS
 from .logger import get_logger
+from .topics import (
+    KAFKA_TOPIC_BIOTECH,
+    KAFKA_TOPIC_DRIFTER,
+    KAFKA_TOPIC_INSIDER,
+    KAFKA_TOPIC_SQUEEZE,
+    KAFKA_TOPIC_WHALE,
+    RAW_EVENTS_TOPIC,
+)
 
 logger = get_logger("kafka_client")
 
@@ -16,9 +23,17 @@ class KafkaClient:
     def get_producer(cls):
         if cls._producer is None:
             try:
-                cls._producer = KafkaProducer(
+                cls._producer = BatchingProducer(
                     bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-                    value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+                    codecs=codecs_for(
+                        RAW_EVENT,
+                        RAW_EVENTS_TOPIC,
+                        KAFKA_TOPIC_SQUEEZE,
+                        KAFKA_TOPIC_INSIDER,
+                        KAFKA_TOPIC_WHALE,
+                        KAFKA_TOPIC_BIOTECH,
+                        KAFKA_TOPIC_DRIFTER,
+                    ),
                 )
                 logger.info(f"Connected to Kafka at {KAFKA_BOOTSTRAP_SERVERS}")
             except Exception as e:
@@ -30,13 +45,22 @@ class KafkaClient:
 
     @classmethod
     def send_message(cls, topic, data):
+        """Queue a message keyed by ticker; it is delivered in the background and confirmed by flush()."""
         producer = cls.get_producer()
         if producer:
             try:
-                producer.send(topic, data)
-                producer.flush()
-                logger.info(f"Sent message to topic '{topic}': {data.get('ticker', 'unknown')}")
+                producer.send(topic, data, key=ticker_key(data))
+                logger.debug(f"Queued message to topic '{topic}': {data.get('ticker', 'unknown')}")
             except Exception as e:
                 logger.error(f"Failed to send message to '{topic}': {e}")
         else:
             logger.warning(f"Kafka producer not available. Skipping message: {data}")
+
+    @classmethod
+    def flush(cls):
+        """Wait for queued messages at the end of a sweep; returns the delivery failure count."""
+        if cls._producer is None:
+            return 0
+        failed = cls._producer.flush()
+        logger.info(f"Flushed Kafka producer: {cls._producer.metrics.snapshot()}")
+        return failed
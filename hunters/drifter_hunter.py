@@ -142,6 +142,7 @@ async def _run_sweep(client: httpx.AsyncClient, kafka: KafkaClient) -> int:
             eps,
         )
 
+    kafka.flush()
     return pushed
 
 
@@ -330,6 +330,8 @@ async def run():
 
                         await asyncio.sleep(0.5)
 
+                    KafkaClient.flush()
+
                 else:
                     logger.error(f"SEC Feed Error: {response.status_code}")
 
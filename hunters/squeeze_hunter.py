@@ -332,6 +332,7 @@ async def run():
                 for signal in signals:
                     KafkaClient.send_message(KAFKA_TOPIC_SQUEEZE, signal)
                     KafkaClient.send_message(RAW_EVENTS_TOPIC, signal)
+                KafkaClient.flush()
             else:
                 logger.info("No signals to push.")
 
@@ -127,6 +127,7 @@ async def _one_sweep(kafka: KafkaClient) -> int:
             "Whale signal %s %s @ %s", ticker, entry.get("option_type"), entry.get("strike_price")
         )
 
+    kafka.flush()
     return pushed
 
 
@@ -0,0 +1 @@
+# Shared Kafka messaging helpers used by every Python pipeline service.
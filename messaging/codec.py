@@ -0,0 +1,135 @@
+"""
+Header-negotiated codec for the typed pipeline messages in messaging.schemas.
+
+Producers stamp every record with a content-type header (msgpack or JSON) and a schema
+header such as ``triage-payload/v1``. Consumers pick the decoder from the content type
+and validate into the topic's struct, so one consumer reads both formats during a
+rollout. Records without headers (the Java engine, kafka-console-producer, services that
+predate this codec) decode as JSON.
+"""
+
+from typing import Any
+
+import msgspec
+
+from messaging.config import KAFKA_JSON_TOPICS, KAFKA_WIRE_FORMAT
+from messaging.schemas import (
+    SCHEMA_VERSION,
+    HunterEvent,
+    TradeOrder,
+    TriagePayload,
+    ValidatedSignal,
+)
+
+CONTENT_TYPE_HEADER = "content-type"
+SCHEMA_HEADER = "schema"
+MSGPACK_CONTENT_TYPE = b"application/msgpack"
+JSON_CONTENT_TYPE = b"application/json"
+WIRE_FORMATS = {"msgpack": MSGPACK_CONTENT_TYPE, "json": JSON_CONTENT_TYPE}
+
+
+class MessageDecodeError(ValueError):
+    """A record could not be decoded or did not match its topic schema."""
+
+
+class TopicSchema:
+    """Struct type carried by a topic, plus the type used for header-less JSON records.
+
+    ``legacy_type`` lets a topic stay lenient for untyped producers (raw events are
+    injected by hand and normalized downstream); by default legacy JSON is validated
+    like everything else.
+    """
+
+    def __init__(self, name, message_type, legacy_type=None, version=SCHEMA_VERSION):
+        self.name = name
+        self.message_type = message_type
+        self.legacy_type = legacy_type or message_type
+        self.version = version
+        self.header = f"{name}/v{version}".encode()
+
+
+RAW_EVENT = TopicSchema("raw-event", HunterEvent, legacy_type=dict[str, Any])
+TRIAGE_PAYLOAD = TopicSchema("triage-payload", TriagePayload)
+VALIDATED_SIGNAL = TopicSchema("validated-signal", ValidatedSignal)
+TRADE_ORDER = TopicSchema("trade-order", TradeOrder)
+
+
+def enc_hook(value):
+    # numpy/pandas scalars (hunter output) expose .item(); json.dumps accepted the float
+    # subclasses, so keep accepting them.
+    item = getattr(value, "item", None)
+    if callable(item):
+        return item()
+    raise NotImplementedError(f"Cannot encode {type(value).__name__}")
+
+
+def header_value(headers, name):
+    for key, value in headers or ():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def wire_format_for(topic, default=KAFKA_WIRE_FORMAT):
+    return "json" if topic in KAFKA_JSON_TOPICS else default
+
+
+class MessageCodec:
+    """Encode dicts or structs for one topic schema; decode records back into dicts."""
+
+    def __init__(self, schema, wire_format=KAFKA_WIRE_FORMAT):
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format {wire_format!r}; expected msgpack or json")
+        self.schema = schema
+        self.wire_format = wire_format
+        self.headers = [
+            (CONTENT_TYPE_HEADER, WIRE_FORMATS[wire_format]),
+            (SCHEMA_HEADER, schema.header),
+        ]
+        if wire_format == "msgpack":
+            self.encoder = msgspec.msgpack.Encoder(enc_hook=enc_hook)
+        else:
+            self.encoder = msgspec.json.Encoder(enc_hook=enc_hook)
+        self.msgpack_decoder = msgspec.msgpack.Decoder(schema.message_type)
+        self.json_decoder = msgspec.json.Decoder(schema.message_type)
+        self.legacy_decoder = msgspec.json.Decoder(schema.legacy_type)
+
+    @classmethod
+    def for_topic(cls, schema, topic):
+        return cls(schema, wire_format_for(topic))
+
+    def encode(self, message):
+        """Return ``(value_bytes, headers)``; validation happens on the consumer side."""
+        return self.encoder.encode(message), self.headers
+
+    def decode(self, value, headers=None):
+        """Decode and validate a record value; raises MessageDecodeError when it does not fit."""
+        schema_header = header_value(headers, SCHEMA_HEADER)
+        if schema_header is not None and schema_header.split(b"/")[0] != self.schema.name.encode():
+            raise MessageDecodeError(
+                f"Expected {self.schema.name} record, got {schema_header.decode(errors='replace')}"
+            )
+        content_type = header_value(headers, CONTENT_TYPE_HEADER)
+        if content_type == MSGPACK_CONTENT_TYPE:
+            decoder = self.msgpack_decoder
+        elif content_type == JSON_CONTENT_TYPE:
+            decoder = self.json_decoder
+        elif content_type is None:
+            decoder = self.legacy_decoder
+        else:
+            raise MessageDecodeError(f"Unsupported content type {content_type!r}")
+        try:
+            message = decoder.decode(value)
+        except msgspec.DecodeError as exc:
+            raise MessageDecodeError(f"Invalid {self.schema.name} record: {exc}") from exc
+        if isinstance(message, msgspec.Struct):
+            return msgspec.to_builtins(message)
+        return message
+
+    def decode_record(self, record):
+        return self.decode(record.value, record.headers)
+
+
+def codecs_for(schema, *topics):
+    """Producer ``codecs`` mapping: every topic carries ``schema`` in its own wire format."""
+    return {topic: MessageCodec.for_topic(schema, topic) for topic in topics}
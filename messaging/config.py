@@ -0,0 +1,21 @@
+import os
+
+# Producer batching: hold records for up to linger_ms so a sweep or a polled batch goes
+# out in a handful of produce requests instead of one broker round trip per message.
+KAFKA_PRODUCER_LINGER_MS = int(os.getenv("KAFKA_PRODUCER_LINGER_MS", "20"))
+KAFKA_PRODUCER_BATCH_SIZE = int(os.getenv("KAFKA_PRODUCER_BATCH_SIZE", "65536"))
+# lz4 | zstd | gzip | snappy | none — falls back to none when the codec library is missing.
+KAFKA_PRODUCER_COMPRESSION = os.getenv("KAFKA_PRODUCER_COMPRESSION", "lz4")
+KAFKA_PRODUCER_ACKS = os.getenv("KAFKA_PRODUCER_ACKS", "1")
+KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS = float(
+    os.getenv("KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS", "30")
+)
+
+# Wire format for typed messages: msgpack (compact, default) or json. Topics listed in
+# KAFKA_JSON_TOPICS always carry JSON because the Java engine reads or writes them.
+KAFKA_WIRE_FORMAT = os.getenv("KAFKA_WIRE_FORMAT", "msgpack").strip().lower()
+KAFKA_JSON_TOPICS = frozenset(
+    topic.strip()
+    for topic in os.getenv("KAFKA_JSON_TOPICS", "validated-signals,trade-orders").split(",")
+    if topic.strip()
+)
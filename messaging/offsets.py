@@ -0,0 +1,76 @@
+"""
+Ordered offset tracking for consumers that finish records out of order.
+
+When records from one partition are handed to a worker pool, a later offset can finish
+before an earlier one. Committing the later offset would skip the earlier record if the
+process died before it finished, so OrderedOffsetTracker only exposes the highest
+*contiguous* finished offset per partition. Delivery stays at-least-once: after a crash
+only records at or past the first unfinished one are replayed.
+"""
+
+import threading
+from collections import deque
+
+from kafka.structs import OffsetAndMetadata, TopicPartition
+
+
+class PartitionProgress:
+    __slots__ = ("started", "finished", "watermark", "committed")
+
+    def __init__(self):
+        self.started = deque()
+        self.finished = set()
+        # Next offset to commit (last contiguous finished offset + 1).
+        self.watermark = None
+        self.committed = None
+
+
+class OrderedOffsetTracker:
+    """Thread-safe: the poll loop calls start(), worker threads call finish()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.partitions = {}
+
+    def start(self, tp, offset):
+        with self._lock:
+            progress = self.partitions.get(tp)
+            if progress is None:
+                progress = self.partitions[tp] = PartitionProgress()
+            progress.started.append(offset)
+
+    def finish(self, tp, offset):
+        with self._lock:
+            progress = self.partitions.get(tp)
+            if progress is None:
+                return  # partition was revoked while the record was in flight
+            progress.finished.add(offset)
+            while progress.started and progress.started[0] in progress.finished:
+                done = progress.started.popleft()
+                progress.finished.discard(done)
+                progress.watermark = done + 1
+
+    def in_flight(self):
+        with self._lock:
+            return sum(len(progress.started) for progress in self.partitions.values())
+
+    def committable(self):
+        """Offsets that advanced since the last commit, in KafkaConsumer.commit() form."""
+        with self._lock:
+            return {
+                TopicPartition(tp.topic, tp.partition): OffsetAndMetadata(progress.watermark, "")
+                for tp, progress in self.partitions.items()
+                if progress.watermark is not None and progress.watermark != progress.committed
+            }
+
+    def mark_committed(self, offsets):
+        with self._lock:
+            for tp, offset_and_metadata in offsets.items():
+                progress = self.partitions.get(tp)
+                if progress is not None:
+                    progress.committed = offset_and_metadata.offset
+
+    def forget(self, topic_partitions):
+        with self._lock:
+            for tp in topic_partitions:
+                self.partitions.pop(TopicPartition(tp.topic, tp.partition), None)
@@ -0,0 +1,190 @@
+"""
+Batching Kafka producer shared by the hunters, gatekeeper and AI layer.
+
+Sends are asynchronous: records accumulate in the client's buffer and go out on
+linger/batch boundaries, compressed. Callers flush only at commit points (or on
+shutdown) and use the returned failure count to decide whether offsets may advance.
+Topics registered with a MessageCodec go out in its wire format with content-type and
+schema headers; anything else is sent as plain JSON.
+"""
+
+import json
+import logging
+import threading
+from collections import Counter
+
+from kafka.codec import has_gzip, has_lz4, has_snappy, has_zstd
+from kafka.errors import KafkaTimeoutError
+
+from kafka import KafkaProducer
+from messaging.config import (
+    KAFKA_PRODUCER_ACKS,
+    KAFKA_PRODUCER_BATCH_SIZE,
+    KAFKA_PRODUCER_COMPRESSION,
+    KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS,
+    KAFKA_PRODUCER_LINGER_MS,
+)
+
+logger = logging.getLogger("messaging.producer")
+
+CODEC_CHECKS = {
+    "gzip": has_gzip,
+    "snappy": has_snappy,
+    "lz4": has_lz4,
+    "zstd": has_zstd,
+}
+
+
+def resolve_compression(compression_type):
+    """Return a codec KafkaProducer can use, or None when it is disabled or unavailable."""
+    codec = (compression_type or "").strip().lower()
+    if codec in ("", "none"):
+        return None
+    check = CODEC_CHECKS.get(codec)
+    if check is None:
+        logger.warning("Unknown Kafka compression %r; sending uncompressed", compression_type)
+        return None
+    if not check():
+        logger.warning("Kafka %s codec library not installed; sending uncompressed", codec)
+        return None
+    return codec
+
+
+def json_serializer(value):
+    if isinstance(value, bytes):
+        return value
+    return json.dumps(value).encode("utf-8")
+
+
+def key_serializer(key):
+    if key is None or isinstance(key, bytes):
+        return key
+    return str(key).encode("utf-8")
+
+
+def ticker_key(record):
+    """Partition key for a pipeline record: its ticker, normalized like the gatekeeper does.
+
+    Keying every topic by ticker keeps all events for one ticker on one partition, so
+    the consumer that owns the partition sees that ticker's events in order.
+    """
+    if not isinstance(record, dict):
+        return None
+    ticker = record.get("ticker") or record.get("symbol")
+    if ticker is None:
+        return None
+    return str(ticker).strip().upper() or None
+
+
+class ProducerMetrics:
+    """Thread-safe delivery counters updated from the producer's I/O thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.failed_by_topic = Counter()
+        self.last_error = None
+
+    def record_sent(self):
+        with self._lock:
+            self.sent += 1
+
+    def record_delivered(self):
+        with self._lock:
+            self.delivered += 1
+
+    def record_failed(self, topic, exc):
+        with self._lock:
+            self.failed += 1
+            self.failed_by_topic[topic] += 1
+            self.last_error = repr(exc)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "in_flight": self.sent - self.delivered - self.failed,
+                "failed_by_topic": dict(self.failed_by_topic),
+                "last_error": self.last_error,
+            }
+
+
+class BatchingProducer:
+    """KafkaProducer wrapper with linger/batch/compression defaults and delivery metrics."""
+
+    def __init__(
+        self,
+        bootstrap_servers,
+        value_serializer=json_serializer,
+        linger_ms=KAFKA_PRODUCER_LINGER_MS,
+        batch_size=KAFKA_PRODUCER_BATCH_SIZE,
+        compression_type=KAFKA_PRODUCER_COMPRESSION,
+        acks=KAFKA_PRODUCER_ACKS,
+        codecs=None,
+        **producer_config,
+    ):
+        self.metrics = ProducerMetrics()
+        self.codecs = dict(codecs or {})
+        self._failures_at_last_flush = 0
+        self.kafka = KafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            value_serializer=value_serializer,
+            key_serializer=key_serializer,
+            linger_ms=linger_ms,
+            batch_size=batch_size,
+            compression_type=resolve_compression(compression_type),
+            acks="all" if str(acks) == "all" else int(acks),
+            **producer_config,
+        )
+
+    def send(self, topic, value, key=None):
+        """Queue a record without waiting for the broker; delivery is tracked in metrics."""
+        try:
+            codec = self.codecs.get(topic)
+            headers = None
+            if codec is not None:
+                value, headers = codec.encode(value)
+            future = self.kafka.send(topic, value=value, key=key, headers=headers)
+        except Exception as exc:
+            self.metrics.record_failed(topic, exc)
+            raise
+        self.metrics.record_sent()
+        future.add_callback(lambda _metadata: self.metrics.record_delivered())
+        future.add_errback(lambda exc: self.metrics.record_failed(topic, exc))
+        return future
+
+    def flush(self, timeout=KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS):
+        """Block until buffered records are delivered; return failures since the last flush.
+
+        A non-zero result means at least one record was not acknowledged, so the caller
+        must not advance consumer offsets past it.
+        """
+        try:
+            self.kafka.flush(timeout=timeout)
+        except KafkaTimeoutError as exc:
+            in_flight = self.metrics.snapshot()["in_flight"]
+            logger.error("Kafka flush timed out with %s record(s) in flight: %s", in_flight, exc)
+            return max(in_flight, 1)
+        snapshot = self.metrics.snapshot()
+        failed = snapshot["failed"] - self._failures_at_last_flush
+        self._failures_at_last_flush = snapshot["failed"]
+        if failed:
+            logger.error(
+                "Kafka delivery failed for %s record(s) since last flush "
+                "(sent=%s delivered=%s failed=%s by_topic=%s last_error=%s)",
+                failed,
+                snapshot["sent"],
+                snapshot["delivered"],
+                snapshot["failed"],
+                snapshot["failed_by_topic"],
+                snapshot["last_error"],
+            )
+        return failed
+
+    def close(self, timeout=KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS):
+        self.flush(timeout=timeout)
+        self.kafka.close(timeout=timeout)
@@ -0,0 +1,173 @@
+"""
+Versioned message schemas for every pipeline topic.
+
+Each topic carries one struct type (a tagged union for raw hunter events). Consumers
+decode straight into these types, so a malformed record is rejected at the edge instead
+of surfacing as a KeyError several calls later. Fields the schema does not know are
+ignored on decode, which lets producers add fields before consumers are upgraded; add
+them here as well, or they are dropped at the next hop.
+
+Bump SCHEMA_VERSION (and keep decoding the old layout) for any change that is not a new
+optional field.
+"""
+
+import uuid
+from typing import Any
+
+import msgspec
+
+SCHEMA_VERSION = 1
+
+Number = int | float
+
+# uuid5 namespace of validated-signal ids. Changing it changes every id.
+SIGNAL_ID_NAMESPACE = uuid.UUID("5b0a3c57-3c1e-4c55-9a56-7d2f0c1f8e21")
+
+
+class Message(msgspec.Struct):
+    """Base for all pipeline messages."""
+
+
+# --- raw-events and the per-hunter topics ---------------------------------------------
+
+
+class RawEvent(Message, tag_field="hunter", omit_defaults=True):
+    """Fields shared by hunter output; liquidity is optional for hunters that skip it."""
+
+    ticker: str
+    timestamp: str | None = None
+    timestamp_utc: str | None = None
+    price: Number | None = None
+    volume: Number | None = None
+    relative_volume: Number | None = None
+    source: str | None = None
+    source_hunter: str | None = None
+
+
+class SqueezeEvent(RawEvent, tag="squeeze"):
+    short_float: Number | str | None = None
+    days_to_cover: Number | None = None
+
+
+class InsiderEvent(RawEvent, tag="insider"):
+    transaction_price_per_share: Number | None = None
+    transaction_code: str | None = None
+    transaction_amount_usd: Number | None = None
+    insider_name: str | None = None
+    insider_title: str | None = None
+    shares: Number | None = None
+    signal_strength: str | None = None
+    cik: str | None = None
+    accession_number: str | None = None
+    filing_url: str | None = None
+    company_name: str | None = None
+    is_buy: bool | None = None
+    is_sell: bool | None = None
+    shares_owned_after: Number | None = None
+
+
+class WhaleEvent(RawEvent, tag="whale"):
+    option_type: str | None = None
+    strike_price: Number | None = None
+    option_volume: int | None = None
+
+
+class BiotechEvent(RawEvent, tag="biotech"):
+    drug_name: str | None = None
+    catalyst_type: str | None = None
+    event_date: str | None = None
+
+
+class DrifterEvent(RawEvent, tag="drifter"):
+    surprise_percent: Number | None = None
+    eps_estimate: Number | None = None
+    eps_actual: Number | None = None
+    revenue_estimate: Number | None = None
+    revenue_actual: Number | None = None
+    revenue_surprise_percent: Number | None = None
+    earnings_date: str | None = None
+
+
+HunterEvent = SqueezeEvent | InsiderEvent | WhaleEvent | BiotechEvent | DrifterEvent
+
+
+# --- triage-priority --------------------------------------------------------------------
+
+
+class LiquidityMetrics(Message):
+    price: Number | None = None
+    volume: Number = 0
+    relative_volume: Number = 0
+
+
+class TriageSignal(Message):
+    source_hunter: str
+    signal_data: dict[str, Any] = {}
+
+
+class TriagePayload(Message):
+    ticker: str
+    timestamp_utc: str | None = None
+    confluence_count: int = 0
+    confluence_sources: list[str] = []
+    technical_score: Number = 0.0
+    liquidity_metrics: LiquidityMetrics = msgspec.field(default_factory=LiquidityMetrics)
+    signals: list[TriageSignal] = []
+    float_shares: Number | None = None
+    market_cap: Any = None
+
+
+# --- validated-signals ------------------------------------------------------------------
+
+
+def validated_signal_id(ticker, timestamp_utc, confluence_sources):
+    """Deterministic id of the signal for one triage event, stable across replays."""
+    key = "|".join(
+        (
+            str(ticker or "").upper(),
+            str(timestamp_utc or ""),
+            ",".join(sorted(set(confluence_sources or []))),
+        )
+    )
+    return str(uuid.uuid5(SIGNAL_ID_NAMESPACE, key))
+
+
+class ValidatedSignal(Message, kw_only=True):
+    # validated_signal_id() of ticker, timestamp_utc and confluence_sources; persistence
+    # derives it for records written before the field existed.
+    signal_id: str | None = None
+    ticker: str
+    timestamp_utc: str | None = None
+    confluence_count: int = 0
+    confluence_sources: list[str] = []
+    liquidity_metrics: LiquidityMetrics = msgspec.field(default_factory=LiquidityMetrics)
+    signals: list[TriageSignal] = []
+    conviction_score: int
+    catalyst_type: str = "UNKNOWN"
+    is_trap: bool = False
+    trap_reason: str | None = None
+    rationale: str = ""
+    news_sentiment: str = "unknown"
+    risk_level: str = "high"
+    suggested_timeframe: str = "intraday"
+    key_risks: list[str] = []
+    raw_signals_summary: str = ""
+    suggested_entry_zone: str = "no clear level"
+    suggested_stop: str = "no clear level"
+    # True when the analysis was reused from an earlier payload with the same fingerprint.
+    analysis_cached: bool = False
+
+
+# --- trade-orders -----------------------------------------------------------------------
+
+
+class TradeOrder(Message):
+    ticker: str
+    timestamp_utc: str
+    action: str
+    strategy_used: str | None = None
+    recommended_size_usd: Number | None = None
+    limit_price: Number | None = None
+    stop_loss: Number | None = None
+    target_price: Number | None = None
+    rationale: str | None = None
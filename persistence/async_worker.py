@@ -0,0 +1,497 @@
+"""
+Asyncio persistence worker with one writer per assigned partition.
+
+SignalPersister writes one batch at a time on one connection, so every database round trip
+stalls the whole consumer. Here the poll loop only fetches and decodes. Each assigned
+partition gets a PartitionWriter task with its own queue, and the writers share an
+AsyncConnectionPool. Batches of different partitions are written concurrently, while each
+writer still writes its partition's batches, and hands over their offsets, in order.
+
+Writes use psycopg pipeline mode (write_batch_pipelined). COPY is not available inside a
+pipeline, so PERSISTENCE_WRITE_METHOD does not apply here.
+
+KafkaConsumer is not thread-safe, so every consumer call runs on one executor thread.
+Offsets the writers have written are committed there before the next poll.
+
+With a spill log (spill.py), a writer whose batch fails with a connection error appends it
+to the log instead, and keeps spilling for SPILL_RETRY_SECONDS before trying the database
+again. The drainer thread loads the log back once the database answers. As in
+SignalPersister, a batch refused for any other reason is written again row by row, and
+the rows still rejected are set aside so the partition moves on.
+"""
+
+import asyncio
+import functools
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kafka.structs import OffsetAndMetadata, TopicPartition
+from psycopg import OperationalError
+from psycopg_pool import AsyncConnectionPool
+
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from messaging.codec import VALIDATED_SIGNAL, MessageCodec, MessageDecodeError
+
+try:
+    from persistence.batch_writer import (
+        SignalBatch,
+        signal_row,
+        write_batch_pipelined,
+        write_each_async,
+    )
+    from persistence.config import (
+        BATCH_MAX_WAIT_MS,
+        BATCH_SIZE,
+        KAFKA_AUTO_OFFSET_RESET,
+        KAFKA_BOOTSTRAP_SERVERS,
+        KAFKA_CONSUMER_GROUP,
+        POLL_TIMEOUT_MS,
+        POOL_SIZE,
+        SPILL_RETRY_SECONDS,
+        TIMESCALE_HOST,
+        TIMESCALE_PORT,
+        VALIDATED_SIGNALS_TOPIC,
+        WRITE_RETRY_MAX_SECONDS,
+    )
+    from persistence.consumer import (
+        REPORT_INTERVAL_SECONDS,
+        db_params,
+        get_db_conn,
+        init_schema,
+        open_spill,
+        set_aside,
+    )
+    from persistence.spill import SpillDrainer
+except ImportError:
+    from batch_writer import (
+        SignalBatch,
+        signal_row,
+        write_batch_pipelined,
+        write_each_async,
+    )
+    from config import (
+        BATCH_MAX_WAIT_MS,
+        BATCH_SIZE,
+        KAFKA_AUTO_OFFSET_RESET,
+        KAFKA_BOOTSTRAP_SERVERS,
+        KAFKA_CONSUMER_GROUP,
+        POLL_TIMEOUT_MS,
+        POOL_SIZE,
+        SPILL_RETRY_SECONDS,
+        TIMESCALE_HOST,
+        TIMESCALE_PORT,
+        VALIDATED_SIGNALS_TOPIC,
+        WRITE_RETRY_MAX_SECONDS,
+    )
+    from consumer import (
+        REPORT_INTERVAL_SECONDS,
+        db_params,
+        get_db_conn,
+        init_schema,
+        open_spill,
+        set_aside,
+    )
+    from spill import SpillDrainer
+
+logger = logging.getLogger("persistence")
+
+# A partition is paused once this many batches are queued behind its writer.
+MAX_QUEUED_BATCHES = 2
+
+STOP = None
+
+
+class PartitionWriter:
+    """Writes one partition's signals in order, one batch at a time.
+
+    ``written_offset`` is the next offset to commit once the last batch is in the
+    database, or in the spill log. Rows the database rejects are set aside. Any other
+    failed write is retried with backoff and blocks only this partition. After stop() the queued signals get one write attempt each.
+    """
+
+    def __init__(self, tp: TopicPartition, pool, clock=time.monotonic, spill=None):
+        self.tp = tp
+        self.pool = pool
+        self.clock = clock
+        self.spill = spill
+        self.spill_until = 0.0
+        self.rows_spilled = 0
+        self.queue = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        self.task = None
+        self.written_offset = None
+        self.retry_delay = 0.0
+        self.rows_written = 0
+        self.duplicates_skipped = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+
+    def start(self):
+        self.task = asyncio.create_task(self.run(), name=f"writer-{self.tp.partition}")
+        return self
+
+    def put(self, offset, row=None):
+        """Queue a row; ``row=None`` only advances the offset (an undecodable record)."""
+        self.queue.put_nowait((offset, row))
+
+    def stop(self):
+        self.stopping.set()
+        self.queue.put_nowait(STOP)
+
+    def backlogged(self):
+        return self.queue.qsize() >= MAX_QUEUED_BATCHES * BATCH_SIZE
+
+    async def run(self):
+        while True:
+            batch = await self.collect()
+            if batch is None or not await self.write(batch):
+                return
+            self.written_offset = batch.offsets[self.tp]
+
+    async def collect(self):
+        """Wait for a signal, then fill a batch until it is full or its wait is over."""
+        item = await self.queue.get()
+        if item is STOP:
+            return None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + BATCH_MAX_WAIT_MS / 1000
+        batch = SignalBatch(self.clock)
+        while item is not STOP:
+            batch.add(self.tp, *item)
+            timeout = deadline - loop.time()
+            if len(batch) >= BATCH_SIZE or timeout <= 0:
+                return batch
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except TimeoutError:
+                return batch
+        # Write what was collected; the next collect() sees the stop.
+        self.queue.put_nowait(STOP)
+        return batch
+
+    async def write(self, batch) -> bool:
+        """Write the batch, retrying until it succeeds; False if given up after stop()."""
+        if not batch.rows:
+            return True
+        while True:
+            if self.clock() < self.spill_until and await self.spill_rows(batch.rows):
+                return True
+            started = time.perf_counter()
+            try:
+                async with self.pool.connection() as conn:
+                    try:
+                        inserted = await write_batch_pipelined(conn, batch.rows)
+                        rejected = []
+                    except OperationalError:
+                        raise
+                    except Exception as exc:
+                        logger.warning(
+                            "TimescaleDB refused %s signals of partition %s, writing them "
+                            "one by one: %s",
+                            len(batch),
+                            self.tp.partition,
+                            exc,
+                        )
+                        inserted, rejected = await write_each_async(
+                            lambda row: write_batch_pipelined(conn, row), batch.rows
+                        )
+                break
+            except Exception as exc:
+                if isinstance(exc, OperationalError) and await self.spill_rows(batch.rows):
+                    self.spill_until = self.clock() + SPILL_RETRY_SECONDS
+                    logger.warning(
+                        "TimescaleDB unavailable, spilling partition %s to disk for %.0fs: %s",
+                        self.tp.partition,
+                        SPILL_RETRY_SECONDS,
+                        exc,
+                    )
+                    return True
+                if self.stopping.is_set():
+                    logger.warning(
+                        "Dropped %s unwritten signals of partition %s; they will be replayed: %s",
+                        len(batch),
+                        self.tp.partition,
+                        exc,
+                    )
+                    return False
+                self.retry_delay = min(WRITE_RETRY_MAX_SECONDS, max(1.0, self.retry_delay * 2))
+                logger.error(
+                    "Failed to write %s signals of partition %s, retrying in %.0fs: %s",
+                    len(batch),
+                    self.tp.partition,
+                    self.retry_delay,
+                    exc,
+                )
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.retry_delay)
+                except TimeoutError:
+                    pass
+        self.write_seconds += time.perf_counter() - started
+        if rejected:
+            await asyncio.to_thread(set_aside, self.spill, rejected)
+        self.retry_delay = 0.0
+        self.spill_until = 0.0
+        self.rows_written += len(batch) - len(rejected)
+        self.duplicates_skipped += len(batch) - len(rejected) - inserted
+        self.batches_written += 1
+        return True
+
+    async def spill_rows(self, rows) -> bool:
+        if self.spill is None:
+            return False
+        try:
+            if not await asyncio.to_thread(self.spill.append, rows):
+                logger.error("Spill log is full; holding signals until TimescaleDB is back")
+                return False
+        except Exception as exc:
+            logger.error("Failed to spill %s signals: %s", len(rows), exc)
+            return False
+        self.rows_spilled += len(rows)
+        return True
+
+    def snapshot(self, reset=False):
+        snapshot = {
+            "rows_written": self.rows_written,
+            "rows_spilled": self.rows_spilled,
+            "duplicates_skipped": self.duplicates_skipped,
+            "batches_written": self.batches_written,
+            "write_seconds": self.write_seconds,
+            "queued": self.queue.qsize(),
+        }
+        if reset:
+            self.rows_written = 0
+            self.rows_spilled = 0
+            self.duplicates_skipped = 0
+            self.batches_written = 0
+            self.write_seconds = 0.0
+        return snapshot
+
+
+class AsyncSignalPersister:
+    """Polls validated-signals and fans records out to per-partition writers.
+
+    Offsets are committed per partition after that partition's batch is written. A
+    partition whose writer falls MAX_QUEUED_BATCHES behind is paused; the others keep
+    flowing.
+    """
+
+    def __init__(self, pool, consumer: KafkaConsumer, clock=time.monotonic, spill=None):
+        self.pool = pool
+        self.consumer = consumer
+        self.clock = clock
+        self.spill = spill
+        self.codec = MessageCodec(VALIDATED_SIGNAL)
+        self.writers = {}
+        self.committed = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-consumer")
+        self.loop = None
+        self.last_report = clock()
+
+    async def call(self, fn, *args, **kwargs):
+        """Run a consumer call on the consumer thread."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self.poll_once()
+        finally:
+            await self.shutdown()
+
+    async def poll_once(self):
+        offsets = self.ready_offsets()
+        backlogged = {tp for tp, writer in self.writers.items() if writer.backlogged()}
+        committed, records = await self.call(self.fetch, offsets, backlogged)
+        if committed:
+            self.committed.update({tp: meta.offset for tp, meta in offsets.items()})
+        for tp, messages in records.items():
+            writer = self.writer_for(tp)
+            for message in messages:
+                writer.put(message.offset, self.decode(message))
+        await self.maybe_report()
+
+    def fetch(self, offsets, backlogged):
+        """Consumer thread: commit written offsets, pause backlogged partitions, poll."""
+        committed = self.commit(offsets)
+        paused = set(self.consumer.paused())
+        if backlogged - paused:
+            self.consumer.pause(*(backlogged - paused))
+        if paused - backlogged:
+            self.consumer.resume(*(paused - backlogged))
+        return committed, self.consumer.poll(timeout_ms=POLL_TIMEOUT_MS, max_records=BATCH_SIZE)
+
+    def commit(self, offsets) -> bool:
+        if not offsets:
+            return True
+        try:
+            self.consumer.commit(offsets)
+        except Exception as exc:
+            # The rows are in the database; a replay would write them again.
+            logger.warning("Kafka commit failed for %s partitions: %s", len(offsets), exc)
+            return False
+        return True
+
+    def decode(self, message):
+        try:
+            return signal_row(self.codec.decode_record(message), message.timestamp)
+        except (MessageDecodeError, TypeError, ValueError) as exc:
+            logger.warning("Skipping undecodable signal at offset %s: %s", message.offset, exc)
+            return None
+
+    def writer_for(self, tp):
+        tp = TopicPartition(tp.topic, tp.partition)
+        writer = self.writers.get(tp)
+        if writer is None:
+            writer = self.writers[tp] = PartitionWriter(
+                tp, self.pool, self.clock, self.spill
+            ).start()
+        return writer
+
+    def ready_offsets(self, partitions=None):
+        """Offsets written but not yet committed, as consumer.commit() takes them."""
+        return {
+            tp: OffsetAndMetadata(writer.written_offset, "")
+            for tp, writer in self.writers.items()
+            if (partitions is None or tp in partitions)
+            and writer.written_offset is not None
+            and writer.written_offset != self.committed.get(tp)
+        }
+
+    async def release_partitions(self, revoked):
+        """Let the revoked partitions' writers finish; return the offsets they wrote."""
+        revoked = {TopicPartition(tp.topic, tp.partition) for tp in revoked}
+        writers = [writer for tp, writer in self.writers.items() if tp in revoked]
+        for writer in writers:
+            writer.stop()
+        await asyncio.gather(*(writer.task for writer in writers), return_exceptions=True)
+        offsets = self.ready_offsets(revoked)
+        for tp in revoked:
+            self.writers.pop(tp, None)
+            self.committed.pop(tp, None)
+        return offsets
+
+    def highwaters(self, partitions):
+        return {tp: self.consumer.highwater(tp) for tp in partitions}
+
+    async def maybe_report(self):
+        now = self.clock()
+        if now - self.last_report < REPORT_INTERVAL_SECONDS:
+            return
+        elapsed = now - self.last_report
+        self.last_report = now
+        highwaters = await self.call(self.highwaters, list(self.writers))
+        for tp, writer in sorted(self.writers.items()):
+            stats = writer.snapshot(reset=True)
+            highwater = highwaters.get(tp)
+            lag = (
+                highwater - writer.written_offset
+                if highwater is not None and writer.written_offset is not None
+                else "unknown"
+            )
+            logger.info(
+                "Partition %s: persisted %s signals in %s batches (%.0f rows/s, %.1f ms per "
+                "batch write, %s duplicates skipped), %s spilled, %s queued, lag %s",
+                tp.partition,
+                stats["rows_written"],
+                stats["batches_written"],
+                stats["rows_written"] / elapsed,
+                stats["write_seconds"] / max(1, stats["batches_written"]) * 1000,
+                stats["duplicates_skipped"],
+                stats["rows_spilled"],
+                stats["queued"],
+                lag,
+            )
+
+    async def shutdown(self):
+        queued = sum(writer.queue.qsize() for writer in self.writers.values())
+        logger.info("Shutting down: writing %s queued signals", queued)
+        offsets = await self.release_partitions(list(self.writers))
+        await self.call(self.commit, offsets)
+        await self.call(self.consumer.close)
+        self.executor.shutdown(wait=False)
+        await self.pool.close()
+
+
+class WriteOnRevokeListener(ConsumerRebalanceListener):
+    """Finishes the revoked partitions' writes before they move to another consumer.
+
+    Rebalance callbacks run inside poll() on the consumer thread, while the event loop
+    waits for that poll, so the writers can be awaited from here.
+    """
+
+    def __init__(self, persister):
+        self.persister = persister
+
+    def on_partitions_revoked(self, revoked):
+        if revoked:
+            release = self.persister.release_partitions(revoked)
+            offsets = asyncio.run_coroutine_threadsafe(release, self.persister.loop).result()
+            self.persister.commit(offsets)
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(
+            "Assigned %s partitions %s",
+            VALIDATED_SIGNALS_TOPIC,
+            sorted(tp.partition for tp in assigned),
+        )
+
+
+async def run():
+    logger.info("Connecting to TimescaleDB at %s:%s", TIMESCALE_HOST, TIMESCALE_PORT)
+    conn = get_db_conn()
+    init_schema(conn)
+    conn.close()
+    # A short pool timeout lets writers fall back to the spill log quickly during an outage.
+    pool = AsyncConnectionPool(
+        kwargs=db_params(),
+        min_size=1,
+        max_size=POOL_SIZE,
+        timeout=SPILL_RETRY_SECONDS,
+        open=False,
+    )
+    await pool.open(wait=True)
+    spill = open_spill()
+
+    logger.info(
+        "Consuming %s and persisting to validated_signals (batch=%s rows / %s ms, "
+        "async, %s connections)",
+        VALIDATED_SIGNALS_TOPIC,
+        BATCH_SIZE,
+        BATCH_MAX_WAIT_MS,
+        POOL_SIZE,
+    )
+    consumer = KafkaConsumer(
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        auto_offset_reset=KAFKA_AUTO_OFFSET_RESET,
+        enable_auto_commit=False,
+        group_id=KAFKA_CONSUMER_GROUP,
+    )
+    persister = AsyncSignalPersister(pool, consumer, spill=spill)
+    consumer.subscribe([VALIDATED_SIGNALS_TOPIC], listener=WriteOnRevokeListener(persister))
+    drainer = None
+    if spill is not None:
+        drainer = SpillDrainer(spill, get_db_conn, SPILL_RETRY_SECONDS, BATCH_SIZE * 10)
+        drainer.start()
+    # Cancelling the task unwinds through run()'s finally block so queued signals are written.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await persister.run()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if drainer is not None:
+            await asyncio.to_thread(drainer.stop)
+            spill.close()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
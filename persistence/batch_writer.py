@@ -0,0 +1,378 @@
+"""
+Batched writes of validated signals to TimescaleDB.
+
+Polled signals are buffered in a SignalBatch with the Kafka offsets they cover. Once the
+batch is full or its oldest row has waited long enough, it is written in one transaction
+and the offsets are committed once. A replay of validated-signals therefore costs one WAL
+flush and one broker round trip per batch instead of per row.
+
+Two write methods are available:
+
+- "copy": COPY ... FROM STDIN in binary format into a temporary staging table, then one
+  INSERT ... SELECT. This is the fastest, and no SQL is parsed per row.
+- "insert": a single multi-row INSERT, for setups that cannot use COPY (for example some
+  connection poolers).
+
+The async worker (async_worker.py) cannot COPY inside a pipeline. It sends one INSERT per
+row through psycopg's pipeline mode instead; see write_batch_pipelined().
+
+A row the database refuses for its content (REJECTED_ROW_ERRORS) must not hold up the
+rows around it. When a batch fails with anything but a connection error, the workers write
+it again row by row with write_each() (write_each_async() in the async worker) and set the
+rejected rows aside. signal_row() already drops what PostgreSQL never accepts: non-finite
+numbers in JSON columns and NUL characters.
+
+Writes are idempotent. Every row carries a deterministic signal_id and time (a signal
+without timestamp_utc takes its Kafka record's timestamp), and the unique index
+on (signal_id, time) turns a redelivered or replayed signal into ON CONFLICT DO NOTHING.
+Rebuilding the table by replaying the topic from the earliest offset is therefore safe.
+
+validated_signals keeps scalar and summary columns only; signal_count says how many raw
+hunter payloads there were. The payloads themselves go to the validated_signal_evidence
+hypertable under the same (signal_id, time) key, in the same transaction, so list
+queries, compression and chunk sizes no longer carry them.
+"""
+
+import json
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+
+from kafka.structs import TopicPartition
+from psycopg import AsyncConnection, Connection, DataError, IntegrityError
+
+from messaging.schemas import validated_signal_id
+
+COLUMNS = (
+    "signal_id",
+    "time",
+    "ticker",
+    "conviction_score",
+    "catalyst_type",
+    "is_trap",
+    "trap_reason",
+    "rationale",
+    "confluence_count",
+    "confluence_sources",
+    "liquidity_metrics",
+    "signal_count",
+    "news_sentiment",
+    "risk_level",
+    "suggested_timeframe",
+    "key_risks",
+    "raw_signals_summary",
+    "suggested_entry_zone",
+    "suggested_stop",
+)
+
+# Binary COPY applies no casts, so every column's type has to be given up front.
+COPY_TYPES = (
+    "uuid",
+    "timestamptz",
+    "text",
+    "int4",
+    "text",
+    "bool",
+    "text",
+    "text",
+    "int4",
+    "jsonb",
+    "jsonb",
+    "int4",
+    "text",
+    "text",
+    "text",
+    "jsonb",
+    "text",
+    "text",
+    "text",
+)
+
+EVIDENCE_COLUMNS = ("signal_id", "time", "signals")
+EVIDENCE_COPY_TYPES = ("uuid", "timestamptz", "jsonb")
+
+# A buffered row is the validated_signals row followed by the raw hunter signals, which
+# are written to validated_signal_evidence.
+ROW_TYPES = COPY_TYPES + ("jsonb",)
+
+# Errors that blame the rows being written rather than the database; see write_each().
+REJECTED_ROW_ERRORS = (DataError, IntegrityError, TypeError, ValueError)
+
+
+class TableWriter:
+    """Idempotent batch writes into one hypertable with a unique (signal_id, time) index."""
+
+    def __init__(self, table, columns, copy_types):
+        self.table = table
+        self.copy_types = copy_types
+        self.json_columns = frozenset(
+            index for index, column_type in enumerate(copy_types) if column_type == "jsonb"
+        )
+        column_list = ", ".join(columns)
+        on_conflict = " ON CONFLICT (signal_id, time) DO NOTHING"
+        # Per-session staging table for COPY, which cannot skip conflicting rows by itself.
+        self.create_staging_sql = (
+            f"CREATE TEMP TABLE IF NOT EXISTS {table}_staging ON COMMIT DELETE ROWS AS "
+            f"SELECT {column_list} FROM {table} WITH NO DATA"
+        )
+        self.copy_sql = f"COPY {table}_staging ({column_list}) FROM STDIN (FORMAT BINARY)"
+        self.merge_staging_sql = (
+            f"INSERT INTO {table} ({column_list}) "
+            f"SELECT {column_list} FROM {table}_staging" + on_conflict
+        )
+        self.insert_prefix = f"INSERT INTO {table} ({column_list}) VALUES "
+        self.insert_row = (
+            "("
+            + ", ".join(
+                "%s::jsonb" if i in self.json_columns else "%s" for i in range(len(columns))
+            )
+            + ")"
+        )
+        self.on_conflict = on_conflict
+        self.insert_one_sql = self.insert_prefix + self.insert_row + on_conflict
+
+    def params(self, row: tuple) -> list:
+        return [
+            json.dumps(value, allow_nan=False) if index in self.json_columns else value
+            for index, value in enumerate(row)
+        ]
+
+    def copy(self, cur, rows: list[tuple]) -> int:
+        cur.execute(self.create_staging_sql)
+        with cur.copy(self.copy_sql) as copy:
+            copy.set_types(self.copy_types)
+            for row in rows:
+                copy.write_row(row)
+        cur.execute(self.merge_staging_sql)
+        return cur.rowcount
+
+    def insert(self, cur, rows: list[tuple]) -> int:
+        params = []
+        for row in rows:
+            params.extend(self.params(row))
+        sql = self.insert_prefix + ", ".join([self.insert_row] * len(rows)) + self.on_conflict
+        cur.execute(sql, params)
+        return cur.rowcount
+
+
+SIGNALS = TableWriter("validated_signals", COLUMNS, COPY_TYPES)
+EVIDENCE = TableWriter("validated_signal_evidence", EVIDENCE_COLUMNS, EVIDENCE_COPY_TYPES)
+
+WRITE_COPY = "copy"
+WRITE_INSERT = "insert"
+
+
+def parse_ts(ts_str: str | None) -> datetime | None:
+    if not ts_str:
+        return None
+    try:
+        s = str(ts_str).replace("Z", "+00:00")
+        return datetime.fromisoformat(s)
+    except (ValueError, TypeError):
+        return None
+
+
+def clean_text(value):
+    """PostgreSQL text and jsonb cannot hold NUL characters."""
+    if isinstance(value, str) and "\x00" in value:
+        return value.replace("\x00", "")
+    return value
+
+
+def clean_json(value):
+    """A copy of a JSON value that PostgreSQL accepts: NaN and infinities become null."""
+    if isinstance(value, dict):
+        return {clean_text(key): clean_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [clean_json(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return clean_text(value)
+
+
+def signal_row(payload: dict, record_timestamp_ms: int | None = None) -> tuple:
+    """One buffered row (ROW_TYPES); JSON columns hold Python values until they are written.
+
+    A signal without a usable timestamp_utc takes its Kafka record's timestamp, so a replay
+    writes the same (signal_id, time) key; with neither it raises ValueError.
+    """
+    ts = parse_ts(payload.get("timestamp_utc"))
+    if ts is None:
+        if record_timestamp_ms is None or record_timestamp_ms < 0:
+            raise ValueError("signal has no timestamp_utc and its record has no timestamp")
+        ts = datetime.fromtimestamp(record_timestamp_ms / 1000, timezone.utc)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    signal_id = payload.get("signal_id") or validated_signal_id(
+        payload.get("ticker"), payload.get("timestamp_utc"), payload.get("confluence_sources")
+    )
+    signals = payload.get("signals") or []
+    return (
+        uuid.UUID(str(signal_id)),
+        ts,
+        clean_text(payload.get("ticker", "")),
+        int(payload.get("conviction_score", 0)),
+        clean_text(str(payload.get("catalyst_type", "UNKNOWN"))),
+        bool(payload.get("is_trap", False)),
+        clean_text(payload.get("trap_reason")),
+        clean_text(payload.get("rationale") or ""),
+        int(payload.get("confluence_count", 0)),
+        clean_json(payload.get("confluence_sources", [])),
+        clean_json(payload.get("liquidity_metrics", {})),
+        len(signals),
+        clean_text(payload.get("news_sentiment")),
+        clean_text(payload.get("risk_level")),
+        clean_text(payload.get("suggested_timeframe")),
+        clean_json(payload.get("key_risks", [])),
+        clean_text(payload.get("raw_signals_summary")),
+        clean_text(payload.get("suggested_entry_zone")),
+        clean_text(payload.get("suggested_stop")),
+        clean_json(signals),
+    )
+
+
+def split_rows(rows: list[tuple]) -> tuple[list[tuple], list[tuple]]:
+    """validated_signals rows, and evidence rows for the signals that carry any."""
+    signal_rows = [row[:-1] for row in rows]
+    evidence_rows = [(row[0], row[1], row[-1]) for row in rows if row[-1]]
+    return signal_rows, evidence_rows
+
+
+def copy_rows(conn: Connection, rows: list[tuple]) -> int:
+    signal_rows, evidence_rows = split_rows(rows)
+    with conn.cursor() as cur:
+        inserted = SIGNALS.copy(cur, signal_rows)
+        if evidence_rows:
+            EVIDENCE.copy(cur, evidence_rows)
+    return inserted
+
+
+def insert_rows(conn: Connection, rows: list[tuple]) -> int:
+    signal_rows, evidence_rows = split_rows(rows)
+    with conn.cursor() as cur:
+        inserted = SIGNALS.insert(cur, signal_rows)
+        if evidence_rows:
+            EVIDENCE.insert(cur, evidence_rows)
+    return inserted
+
+
+WRITERS = {WRITE_COPY: copy_rows, WRITE_INSERT: insert_rows}
+
+
+def write_batch(conn: Connection, rows: list[tuple], method: str = WRITE_COPY) -> int:
+    """Write all rows in one transaction and return how many signals were new.
+
+    On error nothing is written. Rows already in the table are skipped.
+    """
+    try:
+        inserted = WRITERS[method](conn, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return inserted
+
+
+def write_each(write, rows: list[tuple]) -> tuple[int, list]:
+    """Call ``write([row])`` for every row, for a batch the database refused as a whole.
+
+    Returns the number of new signals and the (row, error) pairs of the rows rejected with
+    REJECTED_ROW_ERRORS. Any other error is raised; the rows written so far stay written,
+    which is safe because writes are idempotent.
+    """
+    inserted = 0
+    rejected = []
+    for row in rows:
+        try:
+            inserted += write([row])
+        except REJECTED_ROW_ERRORS as exc:
+            rejected.append((row, exc))
+    return inserted, rejected
+
+
+async def write_each_async(write, rows: list[tuple]) -> tuple[int, list]:
+    """write_each() for an async ``write``, such as write_batch_pipelined()."""
+    inserted = 0
+    rejected = []
+    for row in rows:
+        try:
+            inserted += await write([row])
+        except REJECTED_ROW_ERRORS as exc:
+            rejected.append((row, exc))
+    return inserted, rejected
+
+
+async def write_batch_pipelined(conn: AsyncConnection, rows: list[tuple]) -> int:
+    """Async write_batch(): per-row INSERTs and the commit go out in one pipeline.
+
+    The server receives every statement before the first result comes back, so a batch
+    costs about one round trip instead of one per row.
+    """
+    signal_rows, evidence_rows = split_rows(rows)
+    try:
+        # One cursor per table: executemany() resets rowcount, and in a pipeline the rows
+        # each INSERT affected are only counted once its result arrives, after the sync.
+        async with conn.cursor() as cur, conn.cursor() as evidence_cur:
+            async with conn.pipeline():
+                await cur.executemany(
+                    SIGNALS.insert_one_sql, [SIGNALS.params(row) for row in signal_rows]
+                )
+                if evidence_rows:
+                    await evidence_cur.executemany(
+                        EVIDENCE.insert_one_sql, [EVIDENCE.params(row) for row in evidence_rows]
+                    )
+                await conn.commit()
+            inserted = cur.rowcount
+    except Exception:
+        await conn.rollback()
+        raise
+    return inserted
+
+
+class SignalBatch:
+    """Rows waiting for the next write, and the next Kafka offset of each partition."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.rows = []
+        self.offsets = {}
+        self.sources = []
+        self.started_at = None
+
+    def add(self, tp, offset, row=None):
+        """Buffer a row; ``row=None`` only advances the offset (an undecodable record)."""
+        if self.started_at is None:
+            self.started_at = self.clock()
+        if row is not None:
+            self.rows.append(row)
+            self.sources.append(TopicPartition(tp.topic, tp.partition))
+        self.offsets[TopicPartition(tp.topic, tp.partition)] = offset + 1
+
+    def is_due(self, max_rows, max_wait_seconds):
+        if self.started_at is None:
+            return False
+        return len(self.rows) >= max_rows or self.clock() - self.started_at >= max_wait_seconds
+
+    def forget(self, topic_partitions):
+        """Drop what came from revoked partitions; their new owner replays it."""
+        revoked = {TopicPartition(tp.topic, tp.partition) for tp in topic_partitions}
+        kept = [
+            (row, source)
+            for row, source in zip(self.rows, self.sources, strict=True)
+            if source not in revoked
+        ]
+        self.rows = [row for row, _ in kept]
+        self.sources = [source for _, source in kept]
+        self.offsets = {tp: offset for tp, offset in self.offsets.items() if tp not in revoked}
+        if not self.offsets:
+            self.started_at = None
+
+    def clear(self):
+        self.rows = []
+        self.offsets = {}
+        self.sources = []
+        self.started_at = None
+
+    def __len__(self):
+        return len(self.rows)
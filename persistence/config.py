@@ -10,3 +10,29 @@ TIMESCALE_PORT = int(os.getenv("TIMESCALE_PORT", "5432"))
 TIMESCALE_USER = os.getenv("TIMESCALE_USER", "catalyst_user")
 TIMESCALE_PASSWORD = os.getenv("TIMESCALE_PASSWORD", "password123")
 TIMESCALE_DB = os.getenv("TIMESCALE_DB", "catalyst_db")
+
+# Signals are buffered and written in one transaction once PERSISTENCE_BATCH_SIZE rows are
+# waiting or the oldest has waited PERSISTENCE_BATCH_MAX_WAIT_MS. Kafka offsets are
+# committed once per batch, after the database commit. PERSISTENCE_WRITE_METHOD is "copy"
+# (binary COPY) or "insert" (one multi-row INSERT).
+BATCH_SIZE = max(1, int(os.getenv("PERSISTENCE_BATCH_SIZE", "500")))
+BATCH_MAX_WAIT_MS = int(os.getenv("PERSISTENCE_BATCH_MAX_WAIT_MS", "1000"))
+WRITE_METHOD = os.getenv("PERSISTENCE_WRITE_METHOD", "copy").strip().lower()
+POLL_TIMEOUT_MS = int(os.getenv("PERSISTENCE_POLL_TIMEOUT_MS", "200"))
+WRITE_RETRY_MAX_SECONDS = float(os.getenv("PERSISTENCE_WRITE_RETRY_MAX_SECONDS", "30"))
+
+# PERSISTENCE_WORKER is "async" (async_worker.py: one writer per assigned partition over a
+# pool of PERSISTENCE_POOL_SIZE connections, pipelined INSERTs) or "sync" (one connection,
+# one batch at a time, PERSISTENCE_WRITE_METHOD applies).
+WORKER = os.getenv("PERSISTENCE_WORKER", "async").strip().lower()
+POOL_SIZE = max(1, int(os.getenv("PERSISTENCE_POOL_SIZE", "4")))
+
+# While TimescaleDB is unreachable, batches are appended to a local spill log under
+# PERSISTENCE_SPILL_DIR (empty disables it) and their offsets are committed, so consumption
+# keeps going. The database is retried every PERSISTENCE_SPILL_RETRY_SECONDS, and a
+# background drainer bulk-loads the log once it answers. At PERSISTENCE_SPILL_MAX_MB the
+# workers stop spilling and fall back to retrying with backoff.
+SPILL_DIR = os.getenv("PERSISTENCE_SPILL_DIR", "spill").strip()
+SPILL_SEGMENT_BYTES = int(float(os.getenv("PERSISTENCE_SPILL_SEGMENT_MB", "64")) * 1024 * 1024)
+SPILL_MAX_BYTES = int(float(os.getenv("PERSISTENCE_SPILL_MAX_MB", "1024")) * 1024 * 1024)
+SPILL_RETRY_SECONDS = float(os.getenv("PERSISTENCE_SPILL_RETRY_SECONDS", "5"))
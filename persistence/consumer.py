@@ -1,40 +1,68 @@
 """
 TimescaleDB persistence consumer.
-Consumes validated-signals from Kafka and writes to a TimescaleDB hypertable.
+Consumes validated-signals from Kafka and writes them to a TimescaleDB hypertable in
+batches; see batch_writer.py.
 """
 
-import json
 import logging
-from datetime import datetime
+import signal
+import time
 
-from psycopg import Connection, connect
+from kafka.structs import OffsetAndMetadata
+from psycopg import Connection, OperationalError, connect
 
-from kafka import KafkaConsumer
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from messaging.codec import VALIDATED_SIGNAL, MessageCodec, MessageDecodeError
+from messaging.schemas import SIGNAL_ID_NAMESPACE
 
 try:
+    from persistence.batch_writer import SignalBatch, signal_row, write_batch, write_each
     from persistence.config import (
+        BATCH_MAX_WAIT_MS,
+        BATCH_SIZE,
         KAFKA_AUTO_OFFSET_RESET,
         KAFKA_BOOTSTRAP_SERVERS,
         KAFKA_CONSUMER_GROUP,
+        POLL_TIMEOUT_MS,
+        SPILL_DIR,
+        SPILL_MAX_BYTES,
+        SPILL_RETRY_SECONDS,
+        SPILL_SEGMENT_BYTES,
         TIMESCALE_DB,
         TIMESCALE_HOST,
         TIMESCALE_PASSWORD,
         TIMESCALE_PORT,
         TIMESCALE_USER,
         VALIDATED_SIGNALS_TOPIC,
+        WORKER,
+        WRITE_METHOD,
+        WRITE_RETRY_MAX_SECONDS,
     )
+    from persistence.spill import SpillDrainer, SpillLog
 except ImportError:
+    from batch_writer import SignalBatch, signal_row, write_batch, write_each
     from config import (
+        BATCH_MAX_WAIT_MS,
+        BATCH_SIZE,
         KAFKA_AUTO_OFFSET_RESET,
         KAFKA_BOOTSTRAP_SERVERS,
         KAFKA_CONSUMER_GROUP,
+        POLL_TIMEOUT_MS,
+        SPILL_DIR,
+        SPILL_MAX_BYTES,
+        SPILL_RETRY_SECONDS,
+        SPILL_SEGMENT_BYTES,
         TIMESCALE_DB,
         TIMESCALE_HOST,
         TIMESCALE_PASSWORD,
         TIMESCALE_PORT,
         TIMESCALE_USER,
         VALIDATED_SIGNALS_TOPIC,
+        WORKER,
+        WRITE_METHOD,
+        WRITE_RETRY_MAX_SECONDS,
     )
+    from spill import SpillDrainer, SpillLog
 
 
 logging.basicConfig(
@@ -44,25 +72,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger("persistence")
 
+REPORT_INTERVAL_SECONDS = 60
 
-def parse_ts(ts_str: str | None) -> datetime | None:
-    if not ts_str:
+# Rows the database rejects are appended to <SPILL_DIR>/signals.rejected.
+REJECTED_NAME = "signals"
+
+
+def db_params() -> dict:
+    return {
+        "host": TIMESCALE_HOST,
+        "port": TIMESCALE_PORT,
+        "user": TIMESCALE_USER,
+        "password": TIMESCALE_PASSWORD,
+        "dbname": TIMESCALE_DB,
+        "connect_timeout": 5,
+    }
+
+
+def open_spill() -> SpillLog | None:
+    if not SPILL_DIR:
         return None
+    spill = SpillLog(SPILL_DIR, SPILL_SEGMENT_BYTES, SPILL_MAX_BYTES)
+    if len(spill):
+        logger.info(
+            "Found %.1f MB of spilled signals in %s", spill.size_bytes / 1024 / 1024, SPILL_DIR
+        )
+    return spill
+
+
+def set_aside(spill: SpillLog | None, rejected) -> None:
+    """Log rows the database rejected and keep them in the spill directory if there is one."""
+    for row, exc in rejected:
+        logger.error("TimescaleDB rejected signal %s for %s at %s: %s", row[0], row[2], row[1], exc)
+    if spill is None or not rejected:
+        return
     try:
-        s = str(ts_str).replace("Z", "+00:00")
-        return datetime.fromisoformat(s)
-    except (ValueError, TypeError):
-        return None
+        spill.set_aside([row for row, _ in rejected], REJECTED_NAME)
+    except Exception as exc:
+        logger.error("Failed to set aside %s rejected signals: %s", len(rejected), exc)
 
 
 def get_db_conn() -> Connection:
-    return connect(
-        host=TIMESCALE_HOST,
-        port=TIMESCALE_PORT,
-        user=TIMESCALE_USER,
-        password=TIMESCALE_PASSWORD,
-        dbname=TIMESCALE_DB,
-    )
+    return connect(**db_params())
 
 
 def init_schema(conn: Connection) -> None:
@@ -82,14 +133,15 @@ def init_schema(conn: Connection) -> None:
             confluence_count INT NOT NULL DEFAULT 0,
             confluence_sources JSONB,
             liquidity_metrics JSONB,
-            signals JSONB,
+            signal_count INT NOT NULL DEFAULT 0,
             news_sentiment TEXT,
             risk_level TEXT,
             suggested_timeframe TEXT,
             key_risks JSONB,
             raw_signals_summary TEXT,
             suggested_entry_zone TEXT,
-            suggested_stop TEXT
+            suggested_stop TEXT,
+            signal_id UUID
         )
     """)
     conn.commit()
@@ -102,51 +154,323 @@ def init_schema(conn: Connection) -> None:
         ON validated_signals (ticker, time DESC)
     """)
     conn.commit()
+    # Tables created before signal_id existed.
+    cur.execute("ALTER TABLE validated_signals ADD COLUMN IF NOT EXISTS signal_id UUID")
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_validated_signals_signal_id
+        ON validated_signals (signal_id, time)
+    """)
+    conn.commit()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS validated_signal_evidence (
+            signal_id UUID NOT NULL,
+            time TIMESTAMPTZ NOT NULL,
+            signals JSONB NOT NULL
+        )
+    """)
+    conn.commit()
+    cur.execute("""
+        SELECT create_hypertable('validated_signal_evidence', 'time', if_not_exists => TRUE)
+    """)
+    conn.commit()
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_validated_signal_evidence_signal_id
+        ON validated_signal_evidence (signal_id, time)
+    """)
+    conn.commit()
     cur.close()
+    move_signals_to_evidence(conn)
     logger.info("Schema initialized")
 
 
-INSERT_SQL = """
-INSERT INTO validated_signals (
-    time, ticker, conviction_score, catalyst_type, is_trap, trap_reason, rationale,
-    confluence_count, confluence_sources, liquidity_metrics, signals,
-    news_sentiment, risk_level, suggested_timeframe, key_risks,
-    raw_signals_summary, suggested_entry_zone, suggested_stop
-) VALUES (
-    %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb,
-    %s, %s, %s, %s::jsonb, %s, %s, %s
-)
+MIGRATED_SIGNAL_ID_SQL = """
+    UPDATE validated_signals
+    SET signal_id = COALESCE(
+            signal_id,
+            uuid_generate_v5(
+                %s::uuid,
+                upper(ticker) || '|'
+                || to_char(
+                    time AT TIME ZONE 'UTC',
+                    CASE WHEN date_trunc('second', time) = time
+                        THEN 'YYYY-MM-DD"T"HH24:MI:SS"Z"'
+                        ELSE 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"'
+                    END
+                ) || '|'
+                || COALESCE(
+                    (
+                        SELECT string_agg(source, ',' ORDER BY source)
+                        FROM (
+                            SELECT DISTINCT value COLLATE "C" AS source
+                            FROM jsonb_array_elements_text(
+                                CASE WHEN jsonb_typeof(confluence_sources) = 'array'
+                                    THEN confluence_sources
+                                    ELSE '[]'
+                                END
+                            )
+                        ) AS sources
+                    ),
+                    ''
+                )
+            )
+        ),
+        signal_count = CASE
+            WHEN jsonb_typeof(signals) = 'array' THEN jsonb_array_length(signals)
+            ELSE 0
+        END
 """
 
 
-def persist_signal(conn: Connection, payload: dict) -> None:
-    ts = parse_ts(payload.get("timestamp_utc")) or datetime.utcnow()
-    cur = conn.cursor()
-    cur.execute(
-        INSERT_SQL,
-        (
-            ts,
-            payload.get("ticker", ""),
-            int(payload.get("conviction_score", 0)),
-            str(payload.get("catalyst_type", "UNKNOWN")),
-            bool(payload.get("is_trap", False)),
-            payload.get("trap_reason"),
-            payload.get("rationale") or "",
-            int(payload.get("confluence_count", 0)),
-            json.dumps(payload.get("confluence_sources", [])),
-            json.dumps(payload.get("liquidity_metrics", {})),
-            json.dumps(payload.get("signals", [])),
-            payload.get("news_sentiment"),
-            payload.get("risk_level"),
-            payload.get("suggested_timeframe"),
-            json.dumps(payload.get("key_risks", [])),
-            payload.get("raw_signals_summary"),
-            payload.get("suggested_entry_zone"),
-            payload.get("suggested_stop"),
-        ),
-    )
+def move_signals_to_evidence(conn: Connection) -> None:
+    """One-off migration of tables that still store the raw signals inline."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'validated_signals' AND column_name = 'signals'
+        """)
+        if cur.fetchone() is None:
+            return
+        logger.info("Moving validated_signals.signals to validated_signal_evidence")
+        cur.execute("""
+            ALTER TABLE validated_signals
+            ADD COLUMN IF NOT EXISTS signal_count INT NOT NULL DEFAULT 0
+        """)
+        # Rows written before signal_id existed need a key for their evidence. It is derived
+        # like validated_signal_id(), from the row's ticker, time (as a UTC "Z" string) and
+        # sorted sources, so running the migration twice gives the same ids. A row whose
+        # timestamp_utc was spelled differently gets another id than a replay of its record.
+        cur.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"')
+        cur.execute(MIGRATED_SIGNAL_ID_SQL, (str(SIGNAL_ID_NAMESPACE),))
+        cur.execute("""
+            INSERT INTO validated_signal_evidence (signal_id, time, signals)
+            SELECT signal_id, time, signals FROM validated_signals WHERE signal_count > 0
+            ON CONFLICT (signal_id, time) DO NOTHING
+        """)
+        cur.execute("ALTER TABLE validated_signals DROP COLUMN signals")
     conn.commit()
-    cur.close()
+
+
+class CommitOnRevokeListener(ConsumerRebalanceListener):
+    """Writes the buffered batch before its partitions move to another consumer."""
+
+    def __init__(self, persister):
+        self.persister = persister
+
+    def on_partitions_revoked(self, revoked):
+        if revoked:
+            self.persister.release_partitions(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(
+            "Assigned %s partitions %s",
+            VALIDATED_SIGNALS_TOPIC,
+            sorted(tp.partition for tp in assigned),
+        )
+
+
+class SignalPersister:
+    """Buffers polled signals and writes them to TimescaleDB one batch at a time.
+
+    Offsets are committed only after the batch's transaction commits, so a crash replays
+    at most the unwritten batch. If a write fails the batch is kept and retried with
+    backoff. Fetching is paused while a full batch waits.
+
+    A batch the database refuses for any other reason than a connection error is written
+    again row by row. Rows that are still rejected are logged and set aside (see
+    set_aside()) and their offsets committed, so one bad row cannot stall consumption.
+
+    With a spill log, a batch that fails with a connection error is appended to the log
+    instead and its offsets are committed. Later batches go straight to the log until
+    SPILL_RETRY_SECONDS have passed, then the database is tried again.
+    """
+
+    def __init__(
+        self,
+        conn: Connection,
+        consumer: KafkaConsumer,
+        connect=get_db_conn,
+        write_method: str = WRITE_METHOD,
+        clock=time.monotonic,
+        spill: SpillLog | None = None,
+    ):
+        self.conn = conn
+        self.consumer = consumer
+        self.connect = connect
+        self.write_method = write_method
+        self.clock = clock
+        self.spill = spill
+        self.codec = MessageCodec(VALIDATED_SIGNAL)
+        self.batch = SignalBatch(clock)
+        self.retry_at = 0.0
+        self.retry_delay = 0.0
+        self.spill_until = 0.0
+        self.rows_spilled = 0
+        self.rows_written = 0
+        self.duplicates_skipped = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+        self.last_report = clock()
+
+    def run(self):
+        try:
+            while True:
+                self.poll_once()
+        finally:
+            self.shutdown()
+
+    def poll_once(self):
+        self.apply_backpressure(len(self.batch) >= BATCH_SIZE)
+        records = self.consumer.poll(
+            timeout_ms=POLL_TIMEOUT_MS, max_records=max(1, BATCH_SIZE - len(self.batch))
+        )
+        for tp, messages in records.items():
+            for message in messages:
+                self.buffer(tp, message)
+        if (
+            self.batch.is_due(BATCH_SIZE, BATCH_MAX_WAIT_MS / 1000)
+            and self.clock() >= self.retry_at
+        ):
+            self.flush()
+        self.maybe_report()
+
+    def apply_backpressure(self, full):
+        """Stop fetching while a full batch cannot be written; poll() keeps the membership."""
+        paused = set(self.consumer.paused())
+        if full:
+            wanted = set(self.consumer.assignment())
+            if wanted - paused:
+                self.consumer.pause(*(wanted - paused))
+        elif paused:
+            self.consumer.resume(*paused)
+
+    def buffer(self, tp, message):
+        try:
+            signal = self.codec.decode_record(message)
+            row = signal_row(signal, message.timestamp)
+        except (MessageDecodeError, TypeError, ValueError) as exc:
+            logger.warning("Skipping undecodable signal at offset %s: %s", message.offset, exc)
+            self.batch.add(tp, message.offset)
+            return
+        self.batch.add(tp, message.offset, row)
+
+    def flush(self) -> bool:
+        """Write the batch and commit its offsets; False if the write failed."""
+        if not self.batch.offsets:
+            return True
+        rows = self.batch.rows
+        if rows and not self.write(rows):
+            return False
+
+        offsets = {tp: OffsetAndMetadata(offset, "") for tp, offset in self.batch.offsets.items()}
+        try:
+            self.consumer.commit(offsets)
+        except Exception as exc:
+            # The rows are in the database; a replay would write them again.
+            logger.warning("Kafka commit failed after writing %s signals: %s", len(rows), exc)
+        self.batch.clear()
+        return True
+
+    def write(self, rows) -> bool:
+        """Write rows to the database, or to the spill log while it is unreachable."""
+        if self.clock() < self.spill_until and self.spill_rows(rows):
+            return True
+        started = time.perf_counter()
+        try:
+            if self.conn.closed:
+                self.conn = self.connect()
+            try:
+                inserted = write_batch(self.conn, rows, self.write_method)
+                rejected = []
+            except OperationalError:
+                raise
+            except Exception as exc:
+                logger.warning(
+                    "TimescaleDB refused a batch of %s signals, writing them one by one: %s",
+                    len(rows),
+                    exc,
+                )
+                inserted, rejected = write_each(
+                    lambda row: write_batch(self.conn, row, self.write_method), rows
+                )
+        except Exception as exc:
+            if isinstance(exc, OperationalError) and self.spill_rows(rows):
+                self.spill_until = self.clock() + SPILL_RETRY_SECONDS
+                logger.warning(
+                    "TimescaleDB unavailable, spilling signals to disk for %.0fs: %s",
+                    SPILL_RETRY_SECONDS,
+                    exc,
+                )
+                return True
+            self.retry_delay = min(WRITE_RETRY_MAX_SECONDS, max(1.0, self.retry_delay * 2))
+            self.retry_at = self.clock() + self.retry_delay
+            logger.error(
+                "Failed to write %s signals, retrying in %.0fs: %s",
+                len(rows),
+                self.retry_delay,
+                exc,
+            )
+            return False
+        self.write_seconds += time.perf_counter() - started
+        set_aside(self.spill, rejected)
+        self.retry_delay = 0.0
+        self.spill_until = 0.0
+        self.rows_written += len(rows) - len(rejected)
+        self.duplicates_skipped += len(rows) - len(rejected) - inserted
+        self.batches_written += 1
+        return True
+
+    def spill_rows(self, rows) -> bool:
+        if self.spill is None:
+            return False
+        try:
+            if not self.spill.append(rows):
+                logger.error("Spill log is full; holding signals until TimescaleDB is back")
+                return False
+        except Exception as exc:
+            logger.error("Failed to spill %s signals: %s", len(rows), exc)
+            return False
+        self.rows_spilled += len(rows)
+        return True
+
+    def release_partitions(self, revoked):
+        if not self.flush():
+            self.batch.forget(revoked)
+            logger.warning("Dropped unwritten signals of revoked partitions; they will be replayed")
+
+    def maybe_report(self):
+        now = self.clock()
+        if now - self.last_report < REPORT_INTERVAL_SECONDS:
+            return
+        elapsed = now - self.last_report
+        self.last_report = now
+        if self.rows_spilled:
+            logger.info(
+                "Spilled %s signals to disk while TimescaleDB was unavailable (%.1f MB waiting)",
+                self.rows_spilled,
+                self.spill.size_bytes / 1024 / 1024,
+            )
+            self.rows_spilled = 0
+        if not self.batches_written:
+            return
+        logger.info(
+            "Persisted %s signals in %s batches (%.0f rows/s, %.1f ms per batch write, "
+            "%s duplicates skipped)",
+            self.rows_written,
+            self.batches_written,
+            self.rows_written / elapsed,
+            self.write_seconds / self.batches_written * 1000,
+            self.duplicates_skipped,
+        )
+        self.rows_written = 0
+        self.duplicates_skipped = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+
+    def shutdown(self):
+        logger.info("Shutting down: writing %s buffered signals", len(self.batch))
+        self.flush()
+        self.consumer.close()
+        self.conn.close()
 
 
 def run():
@@ -155,27 +479,45 @@ def run():
     init_schema(conn)
 
     logger.info(
-        "Consuming %s and persisting to validated_signals",
+        "Consuming %s and persisting to validated_signals (batch=%s rows / %s ms, %s)",
         VALIDATED_SIGNALS_TOPIC,
+        BATCH_SIZE,
+        BATCH_MAX_WAIT_MS,
+        WRITE_METHOD,
     )
     consumer = KafkaConsumer(
-        VALIDATED_SIGNALS_TOPIC,
         bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
         auto_offset_reset=KAFKA_AUTO_OFFSET_RESET,
         enable_auto_commit=False,
         group_id=KAFKA_CONSUMER_GROUP,
-        value_deserializer=lambda v: json.loads(v.decode("utf-8")),
     )
+    spill = open_spill()
+    persister = SignalPersister(conn, consumer, spill=spill)
+    consumer.subscribe([VALIDATED_SIGNALS_TOPIC], listener=CommitOnRevokeListener(persister))
+    drainer = None
+    if spill is not None:
+        drainer = SpillDrainer(spill, get_db_conn, SPILL_RETRY_SECONDS, BATCH_SIZE * 10)
+        drainer.start()
+    try:
+        persister.run()
+    finally:
+        if drainer is not None:
+            drainer.stop()
+            spill.close()
 
-    for message in consumer:
-        try:
-            persist_signal(conn, message.value)
-            consumer.commit()
-            logger.info("Persisted %s", message.value.get("ticker", "?"))
-        except Exception as exc:
-            logger.error("Failed to persist signal: %s", exc)
-            # Do not commit - will retry on next poll
+
+def exit_on_sigterm(_signum, _frame):
+    # Unwind through run()'s finally block so the buffered batch is written.
+    raise SystemExit(0)
 
 
 if __name__ == "__main__":
-    run()
+    if WORKER == "async":
+        try:
+            from persistence.async_worker import main
+        except ImportError:
+            from async_worker import main
+        main()
+    else:
+        signal.signal(signal.SIGTERM, exit_on_sigterm)
+        run()
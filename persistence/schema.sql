@@ -1,5 +1,9 @@
 -- TimescaleDB schema for Catalyst
 -- Run once: psql -h localhost -U catalyst_user -d catalyst_db -f schema.sql
+-- The validated_signals tables match persistence/consumer.py init_schema(), which the
+-- persistence workers run on startup; keep the two in sync.
+
+CREATE EXTENSION IF NOT EXISTS timescaledb CASCADE;
 
 -- ── trade_orders ──────────────────────────────────────────────────────────────
 -- Written by the Java strategy engine; queried by FastAPI + the dashboard.
@@ -38,7 +42,6 @@ CREATE INDEX IF NOT EXISTS idx_trade_orders_status
 -- ── validated_signals ─────────────────────────────────────────────────────────
 
 CREATE TABLE IF NOT EXISTS validated_signals (
-    id                   BIGSERIAL        PRIMARY KEY,
     time TIMESTAMPTZ NOT NULL,
     ticker TEXT NOT NULL,
     conviction_score INT NOT NULL,
@@ -49,16 +52,95 @@ CREATE TABLE IF NOT EXISTS validated_signals (
     confluence_count INT NOT NULL DEFAULT 0,
     confluence_sources JSONB,
     liquidity_metrics JSONB,
-    signals JSONB,
+    signal_count INT NOT NULL DEFAULT 0,
     news_sentiment TEXT,
     risk_level TEXT,
     suggested_timeframe TEXT,
     key_risks JSONB,
     raw_signals_summary TEXT,
     suggested_entry_zone TEXT,
-    suggested_stop TEXT
+    suggested_stop TEXT,
+    signal_id UUID
 );
 
 SELECT create_hypertable('validated_signals', 'time', if_not_exists => TRUE);
 
 CREATE INDEX IF NOT EXISTS idx_validated_signals_ticker ON validated_signals (ticker, time DESC);
+
+-- Tables created before signal_id existed.
+ALTER TABLE validated_signals ADD COLUMN IF NOT EXISTS signal_id UUID;
+
+-- Replays of validated-signals must not duplicate rows: writers skip a signal_id that
+-- already exists. Unique indexes on a hypertable have to include the time column.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_validated_signals_signal_id
+    ON validated_signals (signal_id, time);
+
+-- ── validated_signal_evidence ─────────────────────────────────────────────────
+-- Raw hunter payloads behind each validated signal, kept out of the hot
+-- validated_signals rows. Fetched on demand by GET /signals/{signal_id}/evidence.
+
+CREATE TABLE IF NOT EXISTS validated_signal_evidence (
+    signal_id UUID NOT NULL,
+    time TIMESTAMPTZ NOT NULL,
+    signals JSONB NOT NULL
+);
+
+SELECT create_hypertable('validated_signal_evidence', 'time', if_not_exists => TRUE);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_validated_signal_evidence_signal_id
+    ON validated_signal_evidence (signal_id, time);
+
+-- Tables that still store the raw signals inline: move them to validated_signal_evidence
+-- (persistence/consumer.py move_signals_to_evidence()). Rows without a signal_id get one
+-- derived like validated_signal_id() in messaging/schemas.py, with its namespace.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'validated_signals' AND column_name = 'signals'
+    ) THEN
+        RETURN;
+    END IF;
+    CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+    ALTER TABLE validated_signals ADD COLUMN IF NOT EXISTS signal_count INT NOT NULL DEFAULT 0;
+    UPDATE validated_signals
+    SET signal_id = COALESCE(
+            signal_id,
+            uuid_generate_v5(
+                '5b0a3c57-3c1e-4c55-9a56-7d2f0c1f8e21'::uuid,
+                upper(ticker) || '|'
+                || to_char(
+                    time AT TIME ZONE 'UTC',
+                    CASE WHEN date_trunc('second', time) = time
+                        THEN 'YYYY-MM-DD"T"HH24:MI:SS"Z"'
+                        ELSE 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"'
+                    END
+                ) || '|'
+                || COALESCE(
+                    (
+                        SELECT string_agg(source, ',' ORDER BY source)
+                        FROM (
+                            SELECT DISTINCT value COLLATE "C" AS source
+                            FROM jsonb_array_elements_text(
+                                CASE WHEN jsonb_typeof(confluence_sources) = 'array'
+                                    THEN confluence_sources
+                                    ELSE '[]'
+                                END
+                            )
+                        ) AS sources
+                    ),
+                    ''
+                )
+            )
+        ),
+        signal_count = CASE
+            WHEN jsonb_typeof(signals) = 'array' THEN jsonb_array_length(signals)
+            ELSE 0
+        END;
+    INSERT INTO validated_signal_evidence (signal_id, time, signals)
+    SELECT signal_id, time, signals FROM validated_signals WHERE signal_count > 0
+    ON CONFLICT (signal_id, time) DO NOTHING;
+    ALTER TABLE validated_signals DROP COLUMN signals;
+END
+$$;
@@ -0,0 +1,257 @@
+"""
+Local write-behind log for validated signals while TimescaleDB is unreachable.
+
+When a batch write fails with a connection error, the persistence workers append the
+batch to a SpillLog and commit its Kafka offsets, so consumption keeps going during a
+database restart. The log is a directory of append-only segment files, one JSON array per
+row. Each appended batch is fsynced once. A segment is sealed when it reaches
+``segment_bytes``.
+
+A SpillDrainer thread bulk-loads sealed segments with binary COPY once the database
+answers again, then deletes them. Writes are idempotent (see batch_writer.py), so a
+segment that was half drained before a crash is simply loaded again. A chunk the database
+refuses for anything but a connection error is loaded again row by row. Only the rows it
+still rejects are appended to ``<segment>.rejected`` and kept for inspection, and the rest
+of the segment is loaded.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from psycopg import OperationalError
+
+try:
+    from persistence.batch_writer import (
+        ROW_TYPES,
+        WRITE_COPY,
+        WRITE_INSERT,
+        write_batch,
+        write_each,
+    )
+except ImportError:
+    from batch_writer import ROW_TYPES, WRITE_COPY, WRITE_INSERT, write_batch, write_each
+
+logger = logging.getLogger("persistence")
+
+SEGMENT_SUFFIX = ".log"
+REJECTED_SUFFIX = ".rejected"
+
+UUID_COLUMNS = frozenset(i for i, column_type in enumerate(ROW_TYPES) if column_type == "uuid")
+TIME_COLUMNS = frozenset(
+    i for i, column_type in enumerate(ROW_TYPES) if column_type == "timestamptz"
+)
+
+
+def encode_row(row: tuple) -> bytes:
+    values = [
+        str(value) if i in UUID_COLUMNS or i in TIME_COLUMNS else value
+        for i, value in enumerate(row)
+    ]
+    return json.dumps(values, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_row(line: bytes) -> tuple:
+    values = json.loads(line)
+    if len(values) != len(ROW_TYPES):
+        raise ValueError(f"expected {len(ROW_TYPES)} columns, got {len(values)}")
+    for i in UUID_COLUMNS:
+        values[i] = uuid.UUID(values[i])
+    for i in TIME_COLUMNS:
+        values[i] = datetime.fromisoformat(values[i])
+    return tuple(values)
+
+
+class SpillLog:
+    """Thread-safe segmented append-only log of validated_signals rows."""
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, max_bytes=1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._active = None
+        self._active_path = None
+        self._sealed = sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        self.size_bytes = sum(path.stat().st_size for path in self._sealed)
+        self._next_seq = 1 + max((int(path.stem) for path in self._sealed), default=0)
+
+    def append(self, rows) -> bool:
+        """Append and fsync a batch; False if the log is full and nothing was written."""
+        data = b"".join(encode_row(row) for row in rows)
+        with self._lock:
+            if self.size_bytes + len(data) > self.max_bytes:
+                return False
+            if self._active is None:
+                self._open_segment()
+            self._active.write(data)
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self.size_bytes += len(data)
+            if self._active.tell() >= self.segment_bytes:
+                self._seal_active()
+        return True
+
+    def seal(self):
+        """Seal the active segment and return every sealed segment, oldest first."""
+        with self._lock:
+            if self._active is not None:
+                self._seal_active()
+            return list(self._sealed)
+
+    def read(self, segment):
+        """Rows of a sealed segment; a torn last line from a crash is skipped."""
+        rows = []
+        with open(segment, "rb") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    rows.append(decode_row(line))
+                except (ValueError, TypeError) as exc:
+                    logger.warning("Skipping unreadable line %s of %s: %s", number, segment, exc)
+        return rows
+
+    def remove(self, segment):
+        self._drop(segment)
+        segment.unlink(missing_ok=True)
+
+    def set_aside(self, rows, name):
+        """Append rows the database rejected to ``<name>.rejected``, which is never drained.
+
+        The file has the segment format, so it can be renamed to ``.log`` once fixed.
+        """
+        data = b"".join(encode_row(row) for row in rows)
+        with self._lock, open(self.directory / f"{name}{REJECTED_SUFFIX}", "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._active is not None:
+                self._seal_active()
+
+    def __len__(self):
+        """Number of segments waiting, including the active one."""
+        with self._lock:
+            return len(self._sealed) + (self._active is not None)
+
+    def _open_segment(self):
+        self._active_path = self.directory / f"{self._next_seq:012d}{SEGMENT_SUFFIX}"
+        self._next_seq += 1
+        self._active = open(self._active_path, "ab")
+        # Make the new directory entry durable, not only the file contents.
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _seal_active(self):
+        self._active.close()
+        self._sealed.append(self._active_path)
+        self._active = None
+        self._active_path = None
+
+    def _drop(self, segment):
+        with self._lock:
+            self._sealed.remove(segment)
+            self.size_bytes = max(0, self.size_bytes - segment.stat().st_size)
+
+
+class SpillDrainer(threading.Thread):
+    """Loads spilled segments into TimescaleDB on its own connection, every ``interval``."""
+
+    def __init__(self, spill: SpillLog, connect, interval=5.0, chunk_rows=5000):
+        super().__init__(name="spill-drainer", daemon=True)
+        self.spill = spill
+        self.connect = connect
+        self.interval = interval
+        self.chunk_rows = chunk_rows
+        self.conn = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.drain_once()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        if self.conn is not None:
+            self.conn.close()
+
+    def drain_once(self) -> int:
+        """Load every sealed segment; return the number of rows loaded."""
+        if not len(self.spill):
+            return 0
+        loaded = 0
+        try:
+            if self.conn is None or self.conn.closed:
+                self.conn = self.connect()
+            # Only seal once the database answers, so an outage doesn't leave a trail of
+            # tiny segments behind.
+            for segment in self.spill.seal():
+                loaded += self.load(segment)
+        except OperationalError as exc:
+            logger.warning(
+                "TimescaleDB still unavailable; %.1f MB of spilled signals waiting: %s",
+                self.spill.size_bytes / 1024 / 1024,
+                exc,
+            )
+            if self.conn is not None:
+                self.conn.close()
+        return loaded
+
+    def load(self, segment) -> int:
+        rows = self.spill.read(segment)
+        inserted = 0
+        rejected = []
+        try:
+            for start in range(0, len(rows), self.chunk_rows):
+                chunk = rows[start : start + self.chunk_rows]
+                try:
+                    inserted += write_batch(self.conn, chunk, WRITE_COPY)
+                except OperationalError:
+                    raise
+                except Exception as exc:
+                    logger.warning(
+                        "TimescaleDB refused %s rows of %s, loading them one by one: %s",
+                        len(chunk),
+                        segment.name,
+                        exc,
+                    )
+                    chunk_inserted, chunk_rejected = write_each(
+                        lambda row: write_batch(self.conn, row, WRITE_INSERT), chunk
+                    )
+                    inserted += chunk_inserted
+                    rejected.extend(chunk_rejected)
+            for row, exc in rejected:
+                logger.error(
+                    "TimescaleDB rejected spilled signal %s for %s at %s, setting it aside: %s",
+                    row[0],
+                    row[2],
+                    row[1],
+                    exc,
+                )
+            if rejected:
+                self.spill.set_aside([row for row, _ in rejected], segment.stem)
+        except OperationalError:
+            raise
+        except Exception as exc:
+            logger.error("Failed to load spill segment %s, retrying later: %s", segment, exc)
+            return 0
+        self.spill.remove(segment)
+        loaded = len(rows) - len(rejected)
+        logger.info(
+            "Drained %s spilled signals from %s (%s duplicates skipped, %s rejected)",
+            loaded,
+            segment.name,
+            loaded - inserted,
+            len(rejected),
+        )
+        return loaded
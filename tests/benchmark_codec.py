@@ -0,0 +1,84 @@
+"""Compare the typed msgpack codec against the previous json.dumps/json.loads round trip.
+
+Usage:
+    python tests/benchmark_codec.py [rounds]
+
+Encodes and decodes the recorded hunter events (raw-events) and a triage payload built
+from them, printing bytes on the wire and per-message encode+decode time for each.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmark_normalizer import load_recorded_events  # noqa: E402
+
+from messaging.codec import RAW_EVENT, TRIAGE_PAYLOAD, MessageCodec  # noqa: E402
+
+
+def json_round_trip(message):
+    return json.loads(json.dumps(message).encode("utf-8").decode("utf-8"))
+
+
+def codec_round_trip(codec):
+    def round_trip(message):
+        return codec.decode(*codec.encode(message))
+
+    return round_trip
+
+
+def measure(round_trip, messages, rounds, repeats=5):
+    """Best-of-repeats seconds per message (the minimum is the least noisy estimate)."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message in messages:
+                round_trip(message)
+        timings.append((time.perf_counter() - start) / (rounds * len(messages)))
+    return min(timings)
+
+
+def triage_payloads(events):
+    return [
+        {
+            "ticker": event["ticker"],
+            "timestamp_utc": "2026-04-21T14:02:11Z",
+            "confluence_count": 2,
+            "confluence_sources": [event["hunter"], "insider"],
+            "liquidity_metrics": {"price": 24.87, "volume": 8412330, "relative_volume": 2.61},
+            "signals": [
+                {"source_hunter": event["hunter"], "signal_data": event},
+                {"source_hunter": "insider", "signal_data": events[2]},
+            ],
+            "float_shares": 298_000_000.0,
+            "market_cap": 7_410_000_000,
+        }
+        for event in events
+    ]
+
+
+def report(label, messages, codec, rounds):
+    json_bytes = sum(len(json.dumps(message).encode("utf-8")) for message in messages)
+    codec_bytes = sum(len(codec.encode(message)[0]) for message in messages)
+    before = measure(json_round_trip, messages, rounds)
+    after = measure(codec_round_trip(codec), messages, rounds)
+    print(f"{label}: {len(messages)} messages x {rounds} rounds")
+    print(f"  json      {json_bytes / len(messages):8.0f} B/msg {before * 1e6:8.2f} us/msg")
+    print(f"  msgpack   {codec_bytes / len(messages):8.0f} B/msg {after * 1e6:8.2f} us/msg")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    events = [event for event in load_recorded_events() if "hunter" in event]
+    report("raw-events", events, MessageCodec(RAW_EVENT, "msgpack"), rounds)
+    report(
+        "triage-priority", triage_payloads(events), MessageCodec(TRIAGE_PAYLOAD, "msgpack"), rounds
+    )
+
+
+if __name__ == "__main__":
+    main()
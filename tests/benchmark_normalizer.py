@@ -0,0 +1,332 @@
+"""Compare gatekeeper normalize_event against the normalizer it replaced.
+
+Usage:
+    python tests/benchmark_normalizer.py [rounds]
+
+Runs the recorded events in tests/fixtures/raw_events.json (all five hunters) through
+normalize_event and through BaselineNormalizer, the gatekeeper's per-source coercers
+copied unchanged from the baseline commit (2212a9b). Checks both agree, then prints
+per-event time and speedup.
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from gatekeeper.normalizer import normalize_event  # noqa: E402
+
+RECORDED_EVENTS = Path(__file__).resolve().parent / "fixtures" / "raw_events.json"
+
+
+def load_recorded_events():
+    return json.loads(RECORDED_EVENTS.read_text())
+
+
+class BaselineNormalizer:
+    """GatekeeperService.normalize_event and its helpers as of 2212a9b, unchanged."""
+
+    def normalize_event(self, raw_event):
+        if not isinstance(raw_event, dict):
+            return None
+
+        source_hunter = self.detect_source(raw_event)
+        coercers = {
+            "squeeze": self.coerce_squeeze,
+            "insider": self.coerce_insider,
+            "whale": self.coerce_whale,
+            "biotech": self.coerce_biotech,
+            "drifter": self.coerce_drifter,
+        }
+
+        coercer = coercers.get(source_hunter)
+        if not coercer:
+            return None
+
+        normalized = coercer(raw_event)
+        if not normalized.get("ticker"):
+            return None
+        return normalized
+
+    def detect_source(self, raw_event):
+        for field in ("source_hunter", "hunter", "source"):
+            value = raw_event.get(field)
+            if isinstance(value, str) and value:
+                return value.strip().lower()
+
+        signal_data = raw_event.get("signal_data", {})
+        if isinstance(signal_data, dict):
+            value = signal_data.get("source_hunter")
+            if isinstance(value, str) and value:
+                return value.strip().lower()
+
+        if "short_float" in raw_event or "short_float_pct" in signal_data:
+            return "squeeze"
+        if "transaction_code" in raw_event or "transaction_code" in signal_data:
+            return "insider"
+        if "option_type" in raw_event or "option_type" in signal_data:
+            return "whale"
+        if "drug_name" in raw_event or "event_date" in signal_data:
+            return "biotech"
+        if "surprise_percent" in raw_event or "surprise_percent" in signal_data:
+            return "drifter"
+        return None
+
+    def coerce_squeeze(self, raw_event):
+        signal_fields = {
+            "short_float_pct": self.normalize_short_float_pct(
+                self.first(raw_event, "short_float_pct", "short_float"),
+                is_fraction=False,
+            ),
+            "days_to_cover": self.first(raw_event, "days_to_cover", "short_ratio"),
+            "borrow_fee_rate": self.first(raw_event, "borrow_fee_rate", "borrow_fee"),
+        }
+        return self.build_event("squeeze", raw_event, signal_fields)
+
+    def coerce_insider(self, raw_event):
+        signal_fields = {
+            "transaction_code": self.first(raw_event, "transaction_code", "code"),
+            "transaction_amount_usd": self.first(
+                raw_event,
+                "transaction_amount_usd",
+                "amount_usd",
+                "transaction_value_usd",
+            ),
+            "insider_name": self.first(raw_event, "insider_name", "name"),
+            "insider_title": self.first(raw_event, "insider_title", "title"),
+            "shares_traded": self.first(raw_event, "shares_traded", "shares"),
+        }
+        return self.build_event("insider", raw_event, signal_fields)
+
+    def coerce_whale(self, raw_event):
+        signal_fields = {
+            "option_type": self.first(raw_event, "option_type", "type"),
+            "strike_price": self.first(raw_event, "strike_price", "strike"),
+            "expiration_date": self.first(raw_event, "expiration_date", "expiry"),
+            "volume": self.first(raw_event, "option_volume", "contracts", "volume"),
+            "open_interest": self.first(raw_event, "open_interest", "oi"),
+            "vol_oi_ratio": self.first(raw_event, "vol_oi_ratio", "volume_open_interest_ratio"),
+            "premium_paid_usd": self.first(raw_event, "premium_paid_usd", "premium"),
+        }
+        liquidity_overrides = {
+            "volume": self.first(raw_event, "market_volume", "stock_volume", "underlying_volume"),
+        }
+        return self.build_event("whale", raw_event, signal_fields, liquidity_overrides)
+
+    def coerce_biotech(self, raw_event):
+        signal_fields = {
+            "catalyst_type": self.first(raw_event, "catalyst_type"),
+            "stage": self.first(raw_event, "stage"),
+            "drug_name": self.first(raw_event, "drug_name"),
+            "event_date": self.first(raw_event, "event_date"),
+            "notes": self.first(raw_event, "notes"),
+        }
+        return self.build_event("biotech", raw_event, signal_fields)
+
+    def coerce_drifter(self, raw_event):
+        signal_fields = {
+            "surprise_percent": self.first(
+                raw_event, "surprise_percent", "earnings_surprise_percent"
+            ),
+            "eps_estimate": self.first(raw_event, "eps_estimate"),
+            "eps_actual": self.first(raw_event, "eps_actual"),
+            "revenue_estimate": self.first(raw_event, "revenue_estimate"),
+            "revenue_actual": self.first(raw_event, "revenue_actual"),
+        }
+        return self.build_event("drifter", raw_event, signal_fields)
+
+    def build_event(self, source_hunter, raw_event, signal_fields, liquidity_overrides=None):
+        liquidity_metrics = self.extract_liquidity_metrics(raw_event, liquidity_overrides or {})
+        signal_data = self.extract_signal_data(raw_event, signal_fields)
+        technical_score = self.first(raw_event, "_technical_score", "technical_score")
+        if technical_score is None and isinstance(signal_data, dict):
+            technical_score = signal_data.get("_technical_score") or signal_data.get(
+                "technical_score"
+            )
+
+        return {
+            "source_hunter": source_hunter,
+            "ticker": self.normalize_ticker(self.first(raw_event, "ticker", "symbol")),
+            "timestamp_utc": self.normalize_timestamp(
+                self.first(raw_event, "timestamp_utc", "timestamp", "ts", "created_at")
+            ),
+            "liquidity_metrics": liquidity_metrics,
+            "signal_data": signal_data,
+            "_technical_score": self.to_float(technical_score, default=0.0),
+            "float_shares": self.to_float(self.first(raw_event, "float_shares", "float")),
+            "market_cap": self.first(raw_event, "market_cap", "cap"),
+        }
+
+    def extract_liquidity_metrics(self, raw_event, overrides):
+        nested = raw_event.get("liquidity_metrics", {})
+        if not isinstance(nested, dict):
+            nested = {}
+
+        price = self.first_from_values(
+            overrides.get("price"),
+            nested.get("price"),
+            raw_event.get("price"),
+            raw_event.get("last_price"),
+            raw_event.get("close"),
+        )
+        volume = self.first_from_values(
+            overrides.get("volume"),
+            nested.get("volume"),
+            raw_event.get("volume"),
+            raw_event.get("vol"),
+        )
+        relative_volume = self.first_from_values(
+            overrides.get("relative_volume"),
+            nested.get("relative_volume"),
+            raw_event.get("relative_volume"),
+            raw_event.get("relativeVolume"),
+            raw_event.get("rel_volume"),
+            raw_event.get("rvol"),
+        )
+        return {
+            "price": self.to_float(price),
+            "volume": self.to_float(volume, default=0.0),
+            "relative_volume": self.to_float(relative_volume, default=0.0),
+        }
+
+    def extract_signal_data(self, raw_event, source_specific_fields):
+        if isinstance(raw_event.get("signal_data"), dict):
+            signal_data = dict(raw_event["signal_data"])
+        else:
+            signal_data = {}
+
+        for key, value in source_specific_fields.items():
+            if value is not None:
+                signal_data[key] = value
+
+        ignored_keys = {
+            "_technical_score",
+            "created_at",
+            "hunter",
+            "liquidity_metrics",
+            "price",
+            "relative_volume",
+            "relativeVolume",
+            "rel_volume",
+            "rvol",
+            "short_float",
+            "source",
+            "source_hunter",
+            "signal_data",
+            "symbol",
+            "ticker",
+            "technical_score",
+            "timestamp",
+            "timestamp_utc",
+            "ts",
+            "vol",
+            "volume",
+        }
+
+        for key, value in raw_event.items():
+            if key in ignored_keys or key in signal_data or value is None:
+                continue
+            signal_data[key] = value
+
+        return signal_data
+
+    @staticmethod
+    def first(raw_event, *keys):
+        signal_data = raw_event.get("signal_data", {})
+        for key in keys:
+            if key in raw_event and raw_event[key] is not None:
+                return raw_event[key]
+            if (
+                isinstance(signal_data, dict)
+                and key in signal_data
+                and signal_data[key] is not None
+            ):
+                return signal_data[key]
+        return None
+
+    @staticmethod
+    def first_from_values(*values):
+        for value in values:
+            if value is not None:
+                return value
+        return None
+
+    @staticmethod
+    def normalize_ticker(value):
+        if value is None:
+            return None
+        return str(value).strip().upper()
+
+    @staticmethod
+    def normalize_timestamp(value):
+        if isinstance(value, str) and value.strip():
+            return value
+        return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+    @staticmethod
+    def normalize_short_float_pct(value, is_fraction=False):
+        numeric_value = BaselineNormalizer.to_float(value, default=0.0)
+        if numeric_value is None:
+            return 0.0
+
+        # Only treat as a fraction when explicitly indicated or when clearly in (0,1]
+        # and scaling would still keep the result within 0–100%.
+        if is_fraction or (0 < numeric_value <= 1.0 and numeric_value * 100.0 <= 100.0):
+            numeric_value *= 100.0
+
+        numeric_value = round(numeric_value, 4)
+        # Clamp to a realistic percentage range.
+        if numeric_value < 0.0:
+            numeric_value = 0.0
+        if numeric_value > 100.0:
+            numeric_value = 100.0
+        return numeric_value
+
+    @staticmethod
+    def to_float(value, default=None):
+        if value is None or value == "":
+            return default
+        try:
+            if isinstance(value, str):
+                cleaned = value.replace(",", "").replace("%", "").strip()
+                if cleaned == "":
+                    return default
+                value = cleaned
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+
+
+def measure(normalize, events, rounds, repeats=5):
+    """Best-of-repeats seconds per event (the minimum is the least noisy estimate)."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for event in events:
+                normalize(event)
+        timings.append((time.perf_counter() - start) / (rounds * len(events)))
+    return min(timings)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    events = load_recorded_events()
+    baseline = BaselineNormalizer()
+    for event in events:
+        assert normalize_event(event) == baseline.normalize_event(event), event
+
+    before = measure(baseline.normalize_event, events, rounds)
+    after = measure(normalize_event, events, rounds)
+    print(f"{len(events)} recorded events x {rounds} rounds")
+    print(f"baseline    {before * 1e6:8.2f} us/event")
+    print(f"tables      {after * 1e6:8.2f} us/event")
+    print(f"speedup     {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
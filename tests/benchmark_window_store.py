@@ -0,0 +1,95 @@
+"""Compare per-event latency of the gatekeeper window-store backends.
+
+Usage:
+    python tests/benchmark_window_store.py [events]
+
+Uses the Redis at REDIS_HOST/REDIS_PORT when reachable, otherwise fakeredis
+(which understates real network cost).
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+import redis as redis_lib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from gatekeeper.window_store import (  # noqa: E402
+    InMemoryWindowStore,
+    RedisWindowStore,
+    SignalRequest,
+    WriteBehindWindowStore,
+)
+
+KEYS = ("bench:signals:{ticker}", "bench:sources:{ticker}", "bench:sent:{ticker}")
+WINDOW_ARGS = (300, 200, 2)
+SOURCES = ["squeeze", "insider", "biotech", "whale", "drifter"]
+TICKERS = [f"T{i:03d}" for i in range(250)]
+
+
+def connect():
+    client = redis_lib.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+        socket_connect_timeout=1,
+    )
+    try:
+        client.ping()
+        return client, "redis"
+    except redis_lib.exceptions.ConnectionError:
+        import fakeredis
+
+        return fakeredis.FakeRedis(decode_responses=True), "fakeredis"
+
+
+def make_events(count):
+    rng = random.Random(7)
+    events = []
+    event_time = time.time()
+    for _ in range(count):
+        event_time += rng.random() * 0.05
+        source = rng.choice(SOURCES)
+        encoded = json.dumps(
+            {"source_hunter": source, "signal_data": {"score": rng.randint(0, 100)}}
+        )
+        events.append(SignalRequest(rng.choice(TICKERS), source, encoded, False, event_time))
+    return events
+
+
+def measure(name, store, events):
+    start = time.perf_counter()
+    for event in events:
+        store.check_confluence([event])
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<14} {elapsed / len(events) * 1e6:10.1f} us/event {len(events) / elapsed:12,.0f} events/sec"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    client, label = connect()
+    events = make_events(count)
+    print(f"{count} events, {len(TICKERS)} tickers, Redis tier: {label}")
+
+    for key in client.scan_iter("bench:*"):
+        client.delete(key)
+
+    measure("memory", InMemoryWindowStore(*WINDOW_ARGS), events)
+    measure("redis", RedisWindowStore(client, KEYS, *WINDOW_ARGS), events)
+    write_behind = WriteBehindWindowStore(client, KEYS, *WINDOW_ARGS, flush_interval_seconds=0.5)
+    try:
+        measure("write-behind", write_behind, events)
+    finally:
+        write_behind.close()
+
+    for key in client.scan_iter("bench:*"):
+        client.delete(key)
+
+
+if __name__ == "__main__":
+    main()
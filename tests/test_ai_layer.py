@@ -1,6 +1,46 @@
-"""Unit tests for AI Layer normalize_analysis, strip_code_fences, normalize_key_risks."""
+"""Unit tests for the AI layer: response normalization and the analysis worker pool."""
 
-from ai_layer.ai_service import AIAnalysisService
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import pytest
+from kafka.structs import OffsetAndMetadata, TopicPartition
+
+from ai_layer.ai_service import GEMINI_MAX_RETRIES, AIAnalysisService
+from ai_layer.prompt_builder import build_analysis_prompt
+from ai_layer.rate_limiter import AdaptiveRateLimiter
+from ai_layer.retry import AnalysisRetryError, CircuitBreaker, DelayedRetryQueue
+from ai_layer.scheduler import STALE_DROP, AnalysisScheduler
+
+TRIAGE_TP = TopicPartition("triage-priority", 0)
+
+
+def triage_record(ticker, offset):
+    value = json.dumps({"ticker": ticker, "timestamp_utc": "2026-04-21T14:02:11Z"}).encode()
+    return MagicMock(offset=offset, value=value, headers=[])
+
+
+@pytest.fixture
+def service():
+    """AIAnalysisService with mocked Gemini and Kafka clients."""
+    server = fakeredis.FakeServer()
+    with (
+        patch("ai_layer.ai_service.GEMINI_API_KEY", "test-key"),
+        patch("ai_layer.ai_service.genai"),
+        patch("ai_layer.ai_service.KafkaConsumer"),
+        patch("ai_layer.ai_service.BatchingProducer") as producer,
+        patch(
+            "ai_layer.ai_service.Redis",
+            lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True),
+        ),
+    ):
+        producer.return_value.flush.return_value = 0
+        svc = AIAnalysisService()
+    yield svc
+    svc.executor.shutdown(wait=True)
 
 
 class TestStripCodeFences:
@@ -76,3 +116,582 @@ class TestNormalizeAnalysis:
         out = AIAnalysisService.normalize_analysis(parsed)
         assert out["is_trap"] is True
         assert out["trap_reason"] == "Fake pump"
+
+
+class TestAnalysisPool:
+    def test_commits_highest_contiguous_finished_offset(self, service):
+        gates = {ticker: threading.Event() for ticker in ("AAA", "BBB", "CCC")}
+
+        def process_event(payload):
+            gates[payload["ticker"]].wait(5)
+
+        service.process_event = process_event
+
+        for offset, ticker in enumerate(("AAA", "BBB", "CCC")):
+            service.dispatch(TRIAGE_TP, triage_record(ticker, offset))
+        gates["BBB"].set()
+        gates["CCC"].set()
+        wait_until(lambda: service.in_flight_count() == 1)
+        service.commit_finished()
+        service.consumer.commit_async.assert_not_called()
+
+        gates["AAA"].set()
+        service.drain()
+        service.commit_finished()
+        offsets = service.consumer.commit_async.call_args.args[0]
+        assert offsets == {TRIAGE_TP: OffsetAndMetadata(3, "")}
+        service.producer.flush.assert_called()
+
+    def test_analyses_run_concurrently(self, service):
+        service.process_event = lambda payload: time.sleep(0.2)
+        start = time.perf_counter()
+        for offset in range(4):
+            service.dispatch(TRIAGE_TP, triage_record(f"T{offset}", offset))
+        service.drain()
+        assert time.perf_counter() - start < 0.6
+
+    def test_skips_commit_when_signals_were_not_acknowledged(self, service):
+        service.process_event = lambda payload: None
+        service.dispatch(TRIAGE_TP, triage_record("AAA", 0))
+        service.drain()
+        service.producer.flush.return_value = 1
+        service.commit_finished()
+        service.consumer.commit_async.assert_not_called()
+
+    def test_offset_waits_for_the_signal_to_be_delivered(self, service):
+        deliveries = []
+
+        def send(topic, value, key=None):
+            deliveries.append(MagicMock())
+            return deliveries[-1]
+
+        def flush():
+            # The broker answers the sends queued since the last flush: the first fails.
+            for index, future in enumerate(deliveries):
+                if index == 0 and flush.calls == 0:
+                    future.add_errback.call_args.args[0](RuntimeError("broker down"))
+                else:
+                    future.add_callback.call_args.args[0](None)
+            deliveries.clear()
+            flush.calls += 1
+            return int(flush.calls == 1)
+
+        flush.calls = 0
+        service.producer.send.side_effect = send
+        service.producer.flush.side_effect = flush
+        service.client.models.generate_content.return_value = MagicMock(
+            text=json.dumps({"conviction_score": 90})
+        )
+        service.consumer.poll.return_value = {}
+        service.consumer.assignment.return_value = {TRIAGE_TP}
+        service.consumer.paused.return_value = set()
+        clock = FakeClock()
+        service.retries = DelayedRetryQueue(clock=clock)
+
+        service.dispatch(TRIAGE_TP, triage_record("AAA", 0))
+        service.drain()
+        service.commit_finished()  # the send fails; the record is parked again
+        service.commit_finished()
+        service.consumer.commit_async.assert_not_called()
+        assert len(service.retries) == 1
+
+        clock.now = 60
+        service.poll_once()
+        service.drain()
+        service.commit_finished()
+        assert service.producer.send.call_count == 2
+        assert service.consumer.commit_async.call_args.args[0] == {
+            TRIAGE_TP: OffsetAndMetadata(1, "")
+        }
+
+    def test_undecodable_record_counts_as_finished(self, service):
+        service.dispatch(TRIAGE_TP, MagicMock(offset=0, value=b"{not json", headers=[]))
+        service.commit_finished()
+        assert service.consumer.commit_async.call_args.args[0] == {
+            TRIAGE_TP: OffsetAndMetadata(1, "")
+        }
+
+    def test_pauses_fetching_while_pool_is_full(self, service):
+        release = threading.Event()
+
+        def process_event(payload):
+            release.wait(5)
+
+        service.process_event = process_event
+        service.consumer.poll.return_value = {}
+        service.consumer.assignment.return_value = {TRIAGE_TP}
+        with patch("ai_layer.ai_service.MAX_IN_FLIGHT", 8):
+            for offset in range(8):
+                service.dispatch(TRIAGE_TP, triage_record(f"T{offset}", offset))
+
+            service.poll_once()
+            service.consumer.pause.assert_called_once_with(TRIAGE_TP)
+
+            release.set()
+            service.drain()
+            service.consumer.paused.return_value = {TRIAGE_TP}
+            service.poll_once()
+            service.consumer.resume.assert_called_once_with(TRIAGE_TP)
+
+    def test_revoke_drains_and_commits_synchronously(self, service):
+        service.process_event = lambda payload: time.sleep(0.05)
+        service.dispatch(TRIAGE_TP, triage_record("AAA", 7))
+        service.release_partitions([TRIAGE_TP])
+        service.consumer.commit.assert_called_once_with({TRIAGE_TP: OffsetAndMetadata(8, "")})
+
+
+class TestAnalyzeWithRetry:
+    def test_quota_error_backs_off_through_the_limiter(self, service):
+        quota_error = Exception("429 RESOURCE_EXHAUSTED")
+        quota_error.code = 429
+        service.client.models.generate_content.side_effect = quota_error
+        service.limiter = AdaptiveRateLimiter(
+            rate=100, max_rate=100, min_rate=1, max_concurrency=4, rate_increase=0
+        )
+        with pytest.raises(AnalysisRetryError) as excinfo:
+            service.analyze_with_retry("prompt")
+        assert not excinfo.value.circuit_open
+        assert service.client.models.generate_content.call_count == 1
+        assert service.limiter.rate == 50
+        assert service.limiter.snapshot()["throttles"] == 1
+        assert service.breaker.failures == 0
+
+    def test_permanent_error_is_not_retried(self, service):
+        bad_request = Exception("400 INVALID_ARGUMENT")
+        bad_request.code = 400
+        service.client.models.generate_content.side_effect = bad_request
+        with pytest.raises(Exception, match="INVALID_ARGUMENT") as excinfo:
+            service.analyze_with_retry("prompt")
+        assert not isinstance(excinfo.value, AnalysisRetryError)
+        assert service.breaker.failures == 0
+
+    def test_parse_errors_do_not_cut_the_rate(self, service):
+        service.client.models.generate_content.return_value = MagicMock(text="not json")
+        service.limiter = AdaptiveRateLimiter(
+            rate=100, max_rate=200, min_rate=1, max_concurrency=4, rate_increase=1
+        )
+        with pytest.raises(RuntimeError):
+            service.analyze_with_retry("prompt")
+        assert service.limiter.snapshot()["throttles"] == 0
+        assert service.limiter.rate == 103
+
+
+class TestStructuredOutput:
+    def test_repairable_response_does_not_retry(self, service):
+        service.client.models.generate_content.return_value = MagicMock(
+            text='Sure! {"conviction_score": 77, "catalyst_type": "scalper",}'
+        )
+        analysis = service.analyze_with_retry("prompt")
+        assert analysis["conviction_score"] == 77
+        assert service.client.models.generate_content.call_count == 1
+        assert service.parse_counts == [1, 1, 0]
+
+    def test_unparseable_response_retries_without_backoff(self, service):
+        service.client.models.generate_content.side_effect = [
+            MagicMock(text="No JSON today."),
+            MagicMock(text='{"conviction_score": 60}'),
+        ]
+        service.limiter = AdaptiveRateLimiter(
+            rate=100, max_rate=100, min_rate=1, max_concurrency=4, rate_increase=0
+        )
+        with patch("ai_layer.ai_service.time.sleep") as sleep:
+            assert service.analyze_with_retry("prompt")["conviction_score"] == 60
+        sleep.assert_not_called()
+        assert service.parse_counts == [2, 0, 1]
+
+    def test_response_schema_only_on_ungrounded_config_by_default(self, service):
+        assert service.screen_config.response_mime_type == "application/json"
+        assert service.screen_config.response_schema["required"][0] == "conviction_score"
+        assert service.generation_config.response_schema is None
+        assert service.generation_config.tools
+
+
+class TestStaticPreamble:
+    def test_prompt_is_sent_with_system_instruction(self, service):
+        service.client.models.generate_content.return_value = MagicMock(
+            text='{"conviction_score": 80}'
+        )
+        service.analyze({"ticker": "GME"}, "TRIAGE METADATA: ...")
+        call = service.client.models.generate_content.call_args.kwargs
+        assert call["contents"] == "TRIAGE METADATA: ..."
+        assert call["config"].system_instruction.startswith("ROLE:")
+        assert service.preamble is None
+
+    def test_cached_mode_references_cached_content(self):
+        with (
+            patch("ai_layer.ai_service.GEMINI_PREAMBLE_MODE", "cached"),
+            patch("ai_layer.ai_service.GEMINI_API_KEY", "test-key"),
+            patch("ai_layer.ai_service.genai"),
+            patch("ai_layer.ai_service.KafkaConsumer"),
+            patch("ai_layer.ai_service.BatchingProducer") as producer,
+            patch("ai_layer.ai_service.Redis", side_effect=ConnectionError("no redis")),
+        ):
+            producer.return_value.flush.return_value = 0
+            svc = AIAnalysisService()
+        try:
+            svc.client.caches.create.return_value.name = "cachedContents/preamble"
+            svc.client.models.generate_content.return_value = MagicMock(
+                text='{"conviction_score": 80}'
+            )
+            svc.analyze({"ticker": "GME"}, "TRIAGE METADATA: ...")
+            config = svc.client.models.generate_content.call_args.kwargs["config"]
+            assert config.cached_content == "cachedContents/preamble"
+            assert config.system_instruction is None
+            svc.shutdown()
+            svc.client.caches.delete.assert_called_once_with(name="cachedContents/preamble")
+        finally:
+            svc.executor.shutdown(wait=True)
+
+
+class TestAnalysisCaching:
+    def test_repeat_payload_reuses_cached_analysis(self, service):
+        service.client.models.generate_content.return_value = MagicMock(
+            text='{"conviction_score": 80, "catalyst_type": "SUPERNOVA"}'
+        )
+        payload = {
+            "ticker": "GME",
+            "timestamp_utc": "2026-04-21T14:02:11Z",
+            "confluence_sources": ["squeeze", "whale"],
+            "liquidity_metrics": {"price": 24.87, "volume": 8412330, "relative_volume": 2.61},
+            "signals": [{"source_hunter": "squeeze", "signal_data": {"short_float": 31.42}}],
+        }
+        service.process_event(payload)
+        service.process_event({**payload, "timestamp_utc": "2026-04-21T14:09:30Z"})
+
+        assert service.client.models.generate_content.call_count == 1
+        first, second = (call.args[1] for call in service.producer.send.call_args_list)
+        assert first["analysis_cached"] is False
+        assert second["analysis_cached"] is True
+        assert second["conviction_score"] == 80
+        assert second["timestamp_utc"] == "2026-04-21T14:09:30Z"
+        assert second["signal_id"] != first["signal_id"]
+        assert service.analysis_cache.stats()["hits"] == 1
+
+    def test_unfingerprintable_payload_is_analyzed_uncached(self, service):
+        service.client.models.generate_content.return_value = MagicMock(
+            text='{"conviction_score": 80}'
+        )
+        payload = {"ticker": "GME", "liquidity_metrics": {"price": "n/a"}}
+        service.process_event(payload)
+
+        assert service.client.models.generate_content.call_count == 1
+        assert service.producer.send.call_count == 1
+        assert service.analysis_cache.stats()["entries"] == 0
+
+    def test_low_conviction_analyses_are_cached_too(self, service):
+        service.client.models.generate_content.return_value = MagicMock(
+            text='{"conviction_score": 10}'
+        )
+        payload = {"ticker": "JUNK", "confluence_sources": ["squeeze"]}
+        service.process_event(payload)
+        service.process_event(payload)
+        assert service.client.models.generate_content.call_count == 1
+        service.producer.send.assert_not_called()
+
+
+def scheduled_record(ticker, offset, confluence_count, timestamp_utc="2026-04-21T14:02:11Z"):
+    value = json.dumps(
+        {"ticker": ticker, "timestamp_utc": timestamp_utc, "confluence_count": confluence_count}
+    ).encode()
+    return MagicMock(offset=offset, value=value, headers=[])
+
+
+class TestScheduling:
+    def test_backlog_is_analyzed_by_priority(self, service):
+        release = threading.Event()
+        order = []
+
+        def process_event(payload):
+            release.wait(5)
+            order.append(payload["ticker"])
+
+        service.process_event = process_event
+        with patch("ai_layer.ai_service.ANALYSIS_CONCURRENCY", 1):
+            service.dispatch(TRIAGE_TP, scheduled_record("FIRST", 0, 2))
+            service.dispatch(TRIAGE_TP, scheduled_record("SINGLE", 1, 1))
+            service.dispatch(TRIAGE_TP, scheduled_record("QUAD", 2, 4))
+            assert service.in_flight_count() == 3
+            release.set()
+            service.drain()
+        assert order == ["FIRST", "QUAD", "SINGLE"]
+
+    def test_priority_reaches_past_the_worker_pool(self, service):
+        release = threading.Event()
+        order = []
+
+        def process_event(payload):
+            release.wait(5)
+            order.append(payload["ticker"])
+
+        backlog = [scheduled_record(f"T{offset}", offset, 1) for offset in range(15)]
+        backlog.append(scheduled_record("QUAD", 15, 4))
+
+        def poll(timeout_ms, max_records):
+            polled, backlog[:] = backlog[:max_records], backlog[max_records:]
+            return {TRIAGE_TP: polled} if polled else {}
+
+        service.process_event = process_event
+        service.consumer.poll.side_effect = poll
+        service.consumer.assignment.return_value = {TRIAGE_TP}
+        with patch("ai_layer.ai_service.ANALYSIS_CONCURRENCY", 1):
+            service.poll_once()
+            assert service.in_flight_count() == 16
+            release.set()
+            service.drain()
+        assert order[:2] == ["T0", "QUAD"]
+
+    def test_stale_payload_is_dropped_but_committed(self, service):
+        service.scheduler = AnalysisScheduler(
+            deadline_seconds=300, stale_policy=STALE_DROP, clock=time.time
+        )
+        service.process_event = MagicMock()
+        service.dispatch(TRIAGE_TP, scheduled_record("OLD", 0, 4, "2026-04-21T14:02:11Z"))
+        service.drain()
+        service.process_event.assert_not_called()
+        service.commit_finished()
+        assert service.consumer.commit_async.call_args.args[0] == {
+            TRIAGE_TP: OffsetAndMetadata(1, "")
+        }
+        assert service.scheduler.snapshot()["dropped"] == 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNonBlockingRetry:
+    @pytest.fixture
+    def retrying(self, service):
+        clock = FakeClock()
+        service.retries = DelayedRetryQueue(clock=clock)
+        service.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=clock)
+        service.consumer.poll.return_value = {}
+        service.consumer.assignment.return_value = {TRIAGE_TP}
+        service.consumer.paused.return_value = set()
+        return service, clock
+
+    def test_transient_failure_parks_record_and_pauses_partition(self, retrying):
+        service, clock = retrying
+        calls = []
+
+        def process_event(payload):
+            calls.append(payload["ticker"])
+            if len(calls) == 1:
+                raise AnalysisRetryError("503 UNAVAILABLE")
+
+        service.process_event = process_event
+        service.dispatch(TRIAGE_TP, triage_record("AAA", 0))
+        service.drain()
+        assert len(service.retries) == 1
+        assert service.in_flight_count() == 1
+
+        service.poll_once()
+        service.consumer.pause.assert_called_once_with(TRIAGE_TP)
+        service.consumer.poll.assert_called()
+        service.consumer.commit_async.assert_not_called()
+
+        clock.now = 1.0
+        service.consumer.paused.return_value = {TRIAGE_TP}
+        service.poll_once()
+        service.drain()
+        assert calls == ["AAA", "AAA"]
+        service.consumer.resume.assert_called_once_with(TRIAGE_TP)
+
+        service.commit_finished()
+        assert service.consumer.commit_async.call_args.args[0] == {
+            TRIAGE_TP: OffsetAndMetadata(1, "")
+        }
+
+    def test_gives_up_after_max_attempts(self, retrying):
+        service, clock = retrying
+
+        def process_event(payload):
+            raise AnalysisRetryError("503 UNAVAILABLE")
+
+        service.process_event = process_event
+        service.dispatch(TRIAGE_TP, triage_record("AAA", 0))
+        for _ in range(3):
+            service.drain()
+            clock.now += 60
+            service.poll_once()
+        service.drain()
+        assert len(service.retries) == 0
+        service.commit_finished()
+        assert service.consumer.commit_async.call_args.args[0] == {
+            TRIAGE_TP: OffsetAndMetadata(1, "")
+        }
+
+    def test_open_breaker_fails_fast_and_pauses_everything(self, retrying):
+        service, clock = retrying
+        service.client.models.generate_content.side_effect = Exception("503 UNAVAILABLE")
+        for _ in range(2):
+            with pytest.raises(AnalysisRetryError):
+                service.analyze_with_retry("prompt")
+        assert service.breaker.is_open()
+
+        with pytest.raises(AnalysisRetryError) as excinfo:
+            service.analyze_with_retry("prompt")
+        assert excinfo.value.circuit_open
+        assert excinfo.value.delay == 30
+        assert service.client.models.generate_content.call_count == 2
+
+        service.poll_once()
+        service.consumer.pause.assert_called_once_with(TRIAGE_TP)
+
+    def test_traffic_resumes_after_a_probe_fails_on_its_last_attempt(self, retrying):
+        service, clock = retrying
+        service.client.models.generate_content.side_effect = Exception("503 UNAVAILABLE")
+        for _ in range(2):
+            with pytest.raises(AnalysisRetryError):
+                service.analyze_with_retry("prompt")
+        service.poll_once()
+        service.consumer.pause.assert_called_once_with(TRIAGE_TP)
+        service.consumer.paused.return_value = {TRIAGE_TP}
+
+        clock.now = 30
+        service.offsets.start(TRIAGE_TP, 0)
+        service.analyze_record(TRIAGE_TP, 0, {"ticker": "AAA"}, attempt=GEMINI_MAX_RETRIES)
+        assert service.client.models.generate_content.call_count == 3
+        assert len(service.retries) == 0
+        assert service.breaker.state == CircuitBreaker.OPEN
+
+        clock.now = 59
+        service.poll_once()
+        service.consumer.resume.assert_not_called()
+        clock.now = 60
+        service.poll_once()
+        service.consumer.resume.assert_called_once_with(TRIAGE_TP)
+
+    def test_revoke_drops_parked_records(self, retrying):
+        service, _ = retrying
+        service.process_event = MagicMock(side_effect=AnalysisRetryError("503"))
+        service.dispatch(TRIAGE_TP, triage_record("AAA", 3))
+        service.drain()
+        service.release_partitions([TRIAGE_TP])
+        assert len(service.retries) == 0
+        service.consumer.commit.assert_not_called()
+
+
+DRIFTER_SIGNAL = {
+    "source_hunter": "drifter",
+    "signal_data": {
+        "eps_actual": 1.12,
+        "eps_estimate": 0.95,
+        "revenue_actual": 2.1e9,
+        "revenue_estimate": 1.9e9,
+    },
+}
+
+
+class TestAdaptiveGrounding:
+    def test_complete_catalyst_uses_plain_config(self, service):
+        service.client.models.generate_content.return_value = gemini_response(70)
+        service.process_event({"ticker": "NVDA", "signals": [DRIFTER_SIGNAL]})
+        call = service.client.models.generate_content.call_args
+        assert call.kwargs["config"] is service.plain_config
+        assert call.kwargs["model"] == service.model_name
+        assert "news today" not in call.kwargs["contents"]
+        assert set(service.cascade_stats.snapshot()["stages"]) == {"ungrounded"}
+
+    def test_grounded_result_is_reused_for_the_same_ticker(self, service):
+        service.client.models.generate_content.return_value = MagicMock(
+            text=json.dumps(
+                {"conviction_score": 70, "news_sentiment": "bullish", "rationale": "FDA nod."}
+            )
+        )
+        service.process_event({"ticker": "GME", "signals": [{"source_hunter": "squeeze"}]})
+        first = service.client.models.generate_content.call_args
+        assert first.kwargs["config"] is service.generation_config
+
+        service.process_event(
+            {"ticker": "GME", "signals": [{"source_hunter": "whale", "signal_data": {"x": 1}}]}
+        )
+        second = service.client.models.generate_content.call_args
+        assert second.kwargs["config"] is service.plain_config
+        assert "news_sentiment=bullish: FDA nod." in second.kwargs["contents"]
+        assert service.grounding.snapshot()["grounded_ratio"] == 0.5
+
+
+def gemini_response(conviction_score):
+    return MagicMock(text=json.dumps({"conviction_score": conviction_score}))
+
+
+class TestModelCascade:
+    @pytest.fixture
+    def cascade(self, service):
+        service.screen_model_name = "screen-model"
+        service.model_name = "grounded-model"
+        service.limiter = AdaptiveRateLimiter(
+            rate=100, max_rate=100, min_rate=1, max_concurrency=4, rate_increase=0
+        )
+        scores = {}
+
+        def generate_content(model, contents, config):
+            return gemini_response(scores[model])
+
+        service.client.models.generate_content.side_effect = generate_content
+        with patch("ai_layer.ai_service.CASCADE_ENABLED", True):
+            yield service, scores
+
+    def models_called(self, service):
+        return [call.kwargs["model"] for call in service.client.models.generate_content.mock_calls]
+
+    def test_clear_accept_skips_grounded_stage(self, cascade):
+        service, scores = cascade
+        scores.update({"screen-model": 90})
+        assert service.analyze({"ticker": "GME"}, "prompt")["conviction_score"] == 90
+        assert self.models_called(service) == ["screen-model"]
+        call = service.client.models.generate_content.mock_calls[0]
+        assert call.kwargs["config"] is service.screen_config
+
+    def test_clear_reject_skips_grounded_stage(self, cascade):
+        service, scores = cascade
+        scores.update({"screen-model": 10})
+        assert service.analyze({"ticker": "GME"}, "prompt")["conviction_score"] == 10
+        assert self.models_called(service) == ["screen-model"]
+
+    def test_borderline_score_escalates(self, cascade):
+        service, scores = cascade
+        scores.update({"screen-model": 55, "grounded-model": 72})
+        assert service.analyze({"ticker": "GME"}, "prompt")["conviction_score"] == 72
+        assert self.models_called(service) == ["screen-model", "grounded-model"]
+        stats = service.cascade_stats.snapshot()
+        assert stats["escalation_rate"] == 1.0
+        assert set(stats["stages"]) == {"screen", "grounded"}
+
+    def test_only_the_escalation_is_asked_to_search(self, cascade):
+        service, scores = cascade
+        scores.update({"screen-model": 55, "grounded-model": 72})
+        payload = {"ticker": "GME", "signals": []}
+        service.analyze(payload, build_analysis_prompt(payload, grounded=True))
+        screen, escalation = [
+            call.kwargs["contents"] for call in service.client.models.generate_content.mock_calls
+        ]
+        assert "news today" not in screen
+        assert "Search is not available for this call." in screen
+        assert '"GME news today"' in escalation
+
+    def test_failed_screen_escalates(self, cascade):
+        service, scores = cascade
+        scores.update({"grounded-model": 72})
+        assert service.analyze({"ticker": "GME"}, "prompt")["conviction_score"] == 72
+        assert service.cascade_stats.snapshot()["stages"]["screen"]["failures"] == 1
+
+    def test_disabled_uses_grounded_model_only(self, service):
+        service.client.models.generate_content.return_value = gemini_response(55)
+        service.analyze({"ticker": "GME"}, "prompt")
+        call = service.client.models.generate_content.call_args
+        assert call.kwargs["model"] == service.model_name
+        assert call.kwargs["config"] is service.generation_config
+        assert service.cascade_stats.snapshot()["screened"] == 0
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
@@ -0,0 +1,153 @@
+"""Unit tests for the AI layer's fingerprint-keyed analysis cache."""
+
+import fakeredis
+
+from ai_layer.analysis_cache import AnalysisCache, fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def triage_payload(**overrides):
+    payload = {
+        "ticker": "GME",
+        "timestamp_utc": "2026-04-21T14:02:11Z",
+        "confluence_count": 2,
+        "confluence_sources": ["squeeze", "whale"],
+        "liquidity_metrics": {"price": 24.87, "volume": 8412330, "relative_volume": 2.61},
+        "signals": [
+            {
+                "source_hunter": "squeeze",
+                "signal_data": {"short_float": 31.42, "timestamp": "2026-04-21T14:02:11"},
+            },
+            {"source_hunter": "whale", "signal_data": {"option_type": "CALL", "premium": 1.2e6}},
+        ],
+    }
+    payload.update(overrides)
+    return payload
+
+
+class TestFingerprint:
+    def test_ignores_timestamps_order_and_duplicates(self):
+        base = triage_payload()
+        signals = base["signals"]
+        replay = triage_payload(
+            timestamp_utc="2026-04-21T14:10:00Z",
+            confluence_sources=["whale", "squeeze"],
+            signals=[
+                signals[1],
+                {
+                    "source_hunter": "squeeze",
+                    "signal_data": {"short_float": 31.42, "timestamp": "2026-04-21T14:09:58"},
+                },
+                signals[1],
+            ],
+        )
+        assert fingerprint(base) == fingerprint(replay)
+
+    def test_small_liquidity_moves_share_a_bucket(self):
+        moved = triage_payload(
+            liquidity_metrics={"price": 24.6, "volume": 8900000, "relative_volume": 2.9}
+        )
+        assert fingerprint(triage_payload()) == fingerprint(moved)
+
+    def test_material_changes_change_the_fingerprint(self):
+        base = fingerprint(triage_payload())
+        assert fingerprint(triage_payload(ticker="AMC")) != base
+        assert fingerprint(triage_payload(confluence_sources=["squeeze"])) != base
+        assert (
+            fingerprint(
+                triage_payload(
+                    liquidity_metrics={"price": 31.0, "volume": 8412330, "relative_volume": 2.61}
+                )
+            )
+            != base
+        )
+        changed = triage_payload()
+        changed["signals"][1]["signal_data"]["option_type"] = "PUT"
+        assert fingerprint(changed) != base
+
+    def test_non_finite_values_have_their_own_buckets(self):
+        nan_signal = triage_payload(
+            signals=[{"source_hunter": "squeeze", "signal_data": {"short_float": float("nan")}}]
+        )
+        inf_liquidity = triage_payload(
+            liquidity_metrics={
+                "price": float("inf"),
+                "volume": float("inf"),
+                "relative_volume": "nan",
+            }
+        )
+        assert fingerprint(nan_signal) == fingerprint(nan_signal)
+        assert fingerprint(nan_signal) != fingerprint(triage_payload())
+        assert fingerprint(inf_liquidity) != fingerprint(triage_payload())
+
+
+class TestAnalysisCache:
+    def test_hit_returns_a_copy(self):
+        cache = AnalysisCache(60, 10, clock=FakeClock())
+        cache.put("k", {"conviction_score": 80})
+        hit = cache.get("k")
+        hit["conviction_score"] = 0
+        assert cache.get("k") == {"conviction_score": 80}
+        assert cache.stats()["hits"] == 2
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = AnalysisCache(60, 10, clock=clock)
+        cache.put("k", {"conviction_score": 80})
+        clock.now = 60.0
+        assert cache.get("k") is None
+        assert cache.stats() == {
+            "hits": 0,
+            "local_hits": 0,
+            "shared_hits": 0,
+            "misses": 1,
+            "hit_rate": 0.0,
+            "entries": 0,
+        }
+
+    def test_evicts_least_recently_used(self):
+        cache = AnalysisCache(60, 2, clock=FakeClock())
+        cache.put("a", {"conviction_score": 1})
+        cache.put("b", {"conviction_score": 2})
+        cache.get("a")
+        cache.put("c", {"conviction_score": 3})
+        assert list(cache.entries) == ["a", "c"]
+
+    def test_redis_tier_is_shared_between_instances(self):
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        writer = AnalysisCache(60, 10, redis=redis, clock=FakeClock())
+        reader = AnalysisCache(60, 10, redis=redis, clock=FakeClock())
+        writer.put("k", {"conviction_score": 80})
+
+        assert reader.get("k") == {"conviction_score": 80}
+        assert redis.ttl("ai:v1:analysis:k") == 60
+        stats = reader.stats()
+        assert (stats["shared_hits"], stats["local_hits"]) == (1, 0)
+        reader.get("k")
+        assert reader.stats()["local_hits"] == 1
+
+    def test_redis_errors_degrade_to_misses(self):
+        class BrokenRedis:
+            def get(self, key):
+                raise ConnectionError("redis down")
+
+            def set(self, *args, **kwargs):
+                raise ConnectionError("redis down")
+
+        cache = AnalysisCache(60, 10, redis=BrokenRedis(), clock=FakeClock())
+        cache.put("k", {"conviction_score": 80})
+        assert cache.get("k") == {"conviction_score": 80}
+        assert cache.get("other") is None
+
+    def test_zero_ttl_disables_the_cache(self):
+        cache = AnalysisCache(0, 10, clock=FakeClock())
+        cache.put("k", {"conviction_score": 80})
+        assert cache.get("k") is None
+        assert cache.stats()["misses"] == 0
@@ -37,3 +37,37 @@ def test_executions_me_requires_bearer_token():
         res = client.get("/executions/me")
     assert res.status_code == 401
     assert "Bearer token required" in res.json()["detail"]
+
+
+class _EvidenceConn:
+    def __init__(self, row):
+        self.row = row
+        self.args = None
+
+    async def fetchrow(self, query, *args):
+        self.args = args
+        return self.row
+
+
+def test_signal_evidence_is_fetched_by_signal_id():
+    signal_id = "5b0a3c57-3c1e-4c55-9a56-7d2f0c1f8e21"
+    conn = _EvidenceConn(
+        {
+            "signal_id": signal_id,
+            "timestamp_utc": "2026-04-21T14:02:11+00:00",
+            "signals": '[{"source_hunter": "squeeze", "signal_data": {"short_float": 31.4}}]',
+        }
+    )
+
+    async def _evidence_conn() -> AsyncGenerator[_EvidenceConn, None]:
+        yield conn
+
+    with make_test_client() as client:
+        client.app.dependency_overrides[db.get_conn] = _evidence_conn
+        res = client.get(f"/signals/{signal_id}/evidence")
+        conn.row = None
+        missing = client.get(f"/signals/{signal_id}/evidence")
+    assert res.status_code == 200
+    assert res.json()["signals"][0]["source_hunter"] == "squeeze"
+    assert str(conn.args[0]) == signal_id
+    assert missing.status_code == 404
@@ -0,0 +1,49 @@
+"""Unit tests for the AI layer's screening/escalation cascade bookkeeping."""
+
+import pytest
+
+from ai_layer.cascade import CascadeStats, should_escalate
+
+
+class TestShouldEscalate:
+    @pytest.mark.parametrize(
+        ("score", "expected"),
+        [(20, False), (34, False), (35, True), (50, True), (64, True), (65, False), (95, False)],
+    )
+    def test_band_around_threshold(self, score, expected):
+        assert should_escalate(score, threshold=50, band=15) is expected
+
+    def test_zero_band_never_escalates(self):
+        assert not should_escalate(50, threshold=50, band=0)
+
+
+class TestCascadeStats:
+    def test_latency_and_escalation_rate(self):
+        stats = CascadeStats()
+        stats.record_call("screen", 0.5)
+        stats.record_call("screen", 1.5)
+        stats.record_call("grounded", 6.0, failed=True)
+        stats.record_screening(escalated=False)
+        stats.record_screening(escalated=True)
+
+        snapshot = stats.snapshot()
+        assert snapshot["stages"]["screen"] == {
+            "calls": 2,
+            "failures": 0,
+            "avg_seconds": 1.0,
+            "max_seconds": 1.5,
+        }
+        assert snapshot["stages"]["grounded"]["failures"] == 1
+        assert snapshot["escalation_rate"] == 0.5
+
+    def test_snapshot_can_reset(self):
+        stats = CascadeStats()
+        stats.record_call("screen", 0.5)
+        stats.record_screening(escalated=True)
+        stats.snapshot(reset=True)
+        assert stats.snapshot() == {
+            "stages": {},
+            "screened": 0,
+            "escalated": 0,
+            "escalation_rate": 0.0,
+        }
@@ -0,0 +1,157 @@
+"""Unit tests for the typed message schemas and header-negotiated codec."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from benchmark_normalizer import load_recorded_events
+from kafka.future import Future
+
+from messaging.codec import (
+    CONTENT_TYPE_HEADER,
+    JSON_CONTENT_TYPE,
+    MSGPACK_CONTENT_TYPE,
+    RAW_EVENT,
+    TRADE_ORDER,
+    TRIAGE_PAYLOAD,
+    VALIDATED_SIGNAL,
+    MessageCodec,
+    MessageDecodeError,
+    codecs_for,
+    header_value,
+)
+from messaging.producer import BatchingProducer
+from messaging.schemas import validated_signal_id
+
+HUNTER_EVENTS = [event for event in load_recorded_events() if "hunter" in event]
+
+TRIAGE = {
+    "ticker": "GME",
+    "timestamp_utc": "2026-04-21T14:02:11Z",
+    "confluence_count": 2,
+    "confluence_sources": ["insider", "squeeze"],
+    "technical_score": 72.5,
+    "liquidity_metrics": {"price": 24.87, "volume": 8412330, "relative_volume": 2.61},
+    "signals": [
+        {"source_hunter": "squeeze", "signal_data": {"short_float_pct": 31.42}},
+        {"source_hunter": "insider", "signal_data": {"transaction_code": "P"}},
+    ],
+    "float_shares": None,
+    "market_cap": None,
+}
+
+TRADE = {
+    "ticker": "NVDA",
+    "timestamp_utc": "2026-02-03T14:35:05Z",
+    "action": "BUY",
+    "strategy_used": "Supernova",
+    "recommended_size_usd": 12400.0,
+    "limit_price": 105.5,
+    "stop_loss": 98.0,
+    "target_price": 125.0,
+    "rationale": "Supernova Pattern identified by Gemini.",
+}
+
+
+def without_nulls(event):
+    return {key: value for key, value in event.items() if value is not None}
+
+
+class TestRawEvents:
+    def test_hunter_events_round_trip_as_msgpack(self):
+        codec = MessageCodec(RAW_EVENT, "msgpack")
+        for event in HUNTER_EVENTS:
+            value, headers = codec.encode(event)
+            assert header_value(headers, CONTENT_TYPE_HEADER) == MSGPACK_CONTENT_TYPE
+            assert len(value) < len(json.dumps(event))
+            assert codec.decode(value, headers) == without_nulls(event)
+
+    def test_numpy_scalars_are_encoded(self):
+        codec = MessageCodec(RAW_EVENT, "msgpack")
+        event = {"hunter": "squeeze", "ticker": "GME", "price": np.float64(24.87)}
+        assert codec.decode(*codec.encode(event)) == {**event, "price": 24.87}
+
+    def test_headerless_json_stays_untyped(self):
+        codec = MessageCodec(RAW_EVENT)
+        alias_event = load_recorded_events()[-1]
+        assert codec.decode(json.dumps(alias_event).encode()) == alias_event
+
+    def test_typed_record_is_validated(self):
+        codec = MessageCodec(RAW_EVENT, "msgpack")
+        value, headers = codec.encode({"hunter": "whale", "ticker": "NVDA", "strike_price": "x"})
+        with pytest.raises(MessageDecodeError, match="strike_price"):
+            codec.decode(value, headers)
+        value, headers = codec.encode({"ticker": "NVDA"})
+        with pytest.raises(MessageDecodeError, match="hunter"):
+            codec.decode(value, headers)
+
+
+class TestTopicSchemas:
+    def test_triage_payload_round_trip(self):
+        codec = MessageCodec(TRIAGE_PAYLOAD, "msgpack")
+        assert codec.decode(*codec.encode(TRIAGE)) == TRIAGE
+
+    def test_validated_signal_fills_defaults(self):
+        codec = MessageCodec(VALIDATED_SIGNAL)
+        injected = {"ticker": "NVDA", "conviction_score": 85, "catalyst_type": "EARNINGS"}
+        decoded = codec.decode(json.dumps(injected).encode())
+        assert decoded["is_trap"] is False
+        assert decoded["liquidity_metrics"] == {"price": None, "volume": 0, "relative_volume": 0}
+
+    def test_signal_id_is_stable_across_replays(self):
+        signal_id = validated_signal_id("gme", "2026-04-21T14:02:11Z", ["whale", "squeeze"])
+        assert signal_id == validated_signal_id("GME", "2026-04-21T14:02:11Z", ["squeeze", "whale"])
+        assert signal_id != validated_signal_id("GME", "2026-04-21T14:09:30Z", ["squeeze", "whale"])
+        decoded = MessageCodec(VALIDATED_SIGNAL, "msgpack").decode(
+            *MessageCodec(VALIDATED_SIGNAL, "msgpack").encode(
+                {"signal_id": signal_id, "ticker": "GME", "conviction_score": 80}
+            )
+        )
+        assert decoded["signal_id"] == signal_id
+
+    def test_validated_signal_requires_conviction(self):
+        with pytest.raises(MessageDecodeError, match="conviction_score"):
+            MessageCodec(VALIDATED_SIGNAL).decode(b'{"ticker": "NVDA"}')
+
+    def test_java_trade_order_decodes_without_headers(self):
+        codec = MessageCodec(TRADE_ORDER)
+        assert codec.decode(json.dumps(TRADE).encode(), []) == TRADE
+
+    def test_schema_header_must_match_topic(self):
+        value, headers = MessageCodec(TRIAGE_PAYLOAD, "json").encode(TRIAGE)
+        with pytest.raises(MessageDecodeError, match="triage-payload/v1"):
+            MessageCodec(TRADE_ORDER).decode(value, headers)
+
+    def test_unknown_content_type_is_rejected(self):
+        with pytest.raises(MessageDecodeError, match="content type"):
+            MessageCodec(TRADE_ORDER).decode(b"", [(CONTENT_TYPE_HEADER, b"text/csv")])
+
+    def test_java_topics_stay_json(self):
+        codecs = codecs_for(VALIDATED_SIGNAL, "validated-signals", "validated-signals-replay")
+        assert codecs["validated-signals"].wire_format == "json"
+        assert codecs["validated-signals-replay"].wire_format == "msgpack"
+        value, headers = codecs["validated-signals"].encode({"ticker": "NVDA"})
+        assert json.loads(value) == {"ticker": "NVDA"}
+        assert header_value(headers, CONTENT_TYPE_HEADER) == JSON_CONTENT_TYPE
+
+
+class TestProducerCodecs:
+    def test_registered_topic_is_encoded_with_headers(self):
+        codec = MessageCodec(TRIAGE_PAYLOAD, "msgpack")
+        with patch("messaging.producer.KafkaProducer"):
+            producer = BatchingProducer(
+                bootstrap_servers="localhost:9092",
+                compression_type="none",
+                codecs={"triage-priority": codec},
+            )
+        producer.kafka = MagicMock()
+        producer.kafka.send.return_value = Future()
+
+        producer.send("triage-priority", TRIAGE, key="GME")
+        producer.send("audit", {"ticker": "GME"})
+
+        (topic, *_), kwargs = producer.kafka.send.call_args_list[0]
+        assert topic == "triage-priority"
+        assert codec.decode(kwargs["value"], kwargs["headers"]) == TRIAGE
+        assert producer.kafka.send.call_args_list[1].kwargs["headers"] is None
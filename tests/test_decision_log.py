@@ -0,0 +1,101 @@
+"""Unit tests for the gatekeeper's aggregated decision logging."""
+
+import io
+import logging
+
+import pytest
+
+from gatekeeper.decision_log import DecisionCounter, start_queue_logging
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def decision_logger():
+    logger = logging.getLogger("test.decisions")
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestDecisionCounter:
+    def test_summary_aggregates_by_decision_reason_source_and_ticker(
+        self, decision_logger, clock, caplog
+    ):
+        counter = DecisionCounter(decision_logger, 60, clock=clock)
+        for _ in range(3):
+            counter.record("dropped", "JUNK", "squeeze", "low_volume")
+        counter.record("dropped", "PENNY", "whale", "price_below_min")
+        counter.record("buffered", "GME", "squeeze")
+        counter.record("unknown_schema")
+        clock.now = 61.0
+
+        with caplog.at_level(logging.INFO, logger="test.decisions"):
+            counter.maybe_report()
+
+        assert len(caplog.records) == 1
+        summary = caplog.records[0].getMessage()
+        assert "Decisions in 61.0s: 6 events (dropped=4 buffered=1 unknown_schema=1)" in summary
+        assert "reasons=[low_volume=3 price_below_min=1]" in summary
+        assert "sources=[squeeze=4 whale=1]" in summary
+        assert "top_tickers=[JUNK=3 PENNY=1 GME=1]" in summary
+
+    def test_reports_once_per_interval_and_skips_idle_intervals(
+        self, decision_logger, clock, caplog
+    ):
+        counter = DecisionCounter(decision_logger, 60, clock=clock)
+        counter.record("deduped", "GME", "squeeze")
+        with caplog.at_level(logging.INFO, logger="test.decisions"):
+            clock.now = 30.0
+            counter.maybe_report()
+            clock.now = 60.0
+            counter.maybe_report()
+            clock.now = 130.0
+            counter.maybe_report()
+        assert len(caplog.records) == 1
+
+    def test_individual_lines_are_sampled(self, decision_logger, clock):
+        counter = DecisionCounter(decision_logger, 60, sample_rate=0.1, clock=clock)
+        draws = iter([0.05, 0.5, 0.09, 0.99])
+        counter.sample = lambda: next(draws)
+        logged = [counter.record("dropped", "JUNK", "squeeze", "low_volume") for _ in range(4)]
+        assert logged == [True, False, True, False]
+        assert counter.decisions["dropped"] == 4
+
+    def test_sampling_disabled_by_default(self, decision_logger, clock):
+        counter = DecisionCounter(decision_logger, 60, clock=clock)
+        assert not counter.record("dropped", "JUNK", "squeeze", "low_volume")
+
+    def test_debug_logs_every_event(self, decision_logger, clock):
+        decision_logger.setLevel(logging.DEBUG)
+        counter = DecisionCounter(decision_logger, 60, clock=clock)
+        assert counter.record("buffered", "GME", "squeeze")
+
+
+class TestQueueLogging:
+    def test_records_are_formatted_on_the_listener_thread(self):
+        root = logging.getLogger("test.queue_logging")
+        root.propagate = False
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        root.handlers = [handler]
+
+        listener = start_queue_logging(root)
+        try:
+            assert root.handlers[0] is not handler
+            root.warning("Dropped %s: %s", "JUNK", "volume below minimum")
+        finally:
+            listener.stop()
+
+        assert stream.getvalue() == "WARNING Dropped JUNK: volume below minimum\n"
@@ -1,11 +1,31 @@
 """Unit tests for Gatekeeper coercers, filters, and static helpers."""
 
+import json
+import logging
 from unittest.mock import MagicMock, patch
 
+import fakeredis
 import pytest
+from kafka.structs import OffsetAndMetadata, TopicPartition
 
 # Import after conftest has set up path
 from gatekeeper.gatekeeper import GatekeeperService
+from messaging.codec import RAW_EVENT, MessageCodec
+
+
+def raw_record(event, offset, partition=0):
+    value, headers = MessageCodec(RAW_EVENT, "msgpack").encode(event)
+    return MagicMock(
+        topic="raw-events", partition=partition, offset=offset, value=value, headers=headers
+    )
+
+
+def sent_payloads(gk):
+    return [call.args[1] for call in gk.producer.send.call_args_list]
+
+
+class EndOfRecordsError(Exception):
+    """Ends a consume loop driven by a test."""
 
 
 @pytest.fixture
@@ -13,16 +33,34 @@ def gatekeeper():
     """GatekeeperService with mocked Redis and Kafka."""
     with patch("gatekeeper.gatekeeper.Redis") as mock_redis:
         with patch("gatekeeper.gatekeeper.KafkaConsumer"):
-            with patch("gatekeeper.gatekeeper.KafkaProducer"):
+            with patch("gatekeeper.gatekeeper.BatchingProducer"):
                 mock_redis.return_value.ping.return_value = True
                 gk = GatekeeperService()
                 gk.redis = MagicMock()
-                gk.redis.smembers.return_value = set()
-                gk.redis.lrange.return_value = []
                 gk.redis.exists.return_value = False
                 return gk
 
 
+def make_windowed_gatekeeper(server):
+    """GatekeeperService backed by an in-process Redis (with Lua) and mocked Kafka."""
+    redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    with patch("gatekeeper.gatekeeper.Redis", return_value=redis):
+        with patch("gatekeeper.gatekeeper.KafkaConsumer"):
+            with patch("gatekeeper.gatekeeper.BatchingProducer") as mock_producer:
+                mock_producer.return_value.flush.return_value = 0
+                return GatekeeperService()
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def windowed_gatekeeper(redis_server):
+    return make_windowed_gatekeeper(redis_server)
+
+
 class TestGatekeeperStaticHelpers:
     """Tests for @staticmethod helpers."""
 
@@ -46,20 +84,6 @@ class TestGatekeeperStaticHelpers:
         assert GatekeeperService.normalize_ticker("  nvda  ") == "NVDA"
         assert GatekeeperService.normalize_ticker(None) is None
 
-    def test_first_from_values(self):
-        assert GatekeeperService.first_from_values(None, None, 5) == 5
-        assert GatekeeperService.first_from_values(0, 1) == 0
-        assert GatekeeperService.first_from_values(None, None) is None
-
-    def test_first_raw_event(self):
-        evt = {"ticker": "NVDA", "signal_data": {"volume": 100}}
-        assert GatekeeperService.first(evt, "ticker") == "NVDA"
-        assert GatekeeperService.first(evt, "volume") == 100  # from signal_data
-        evt2 = {"volume": 50, "signal_data": {"volume": 99}}
-        assert GatekeeperService.first(evt2, "volume") == 50  # raw_event takes precedence
-        evt3 = {"ticker": "X"}
-        assert GatekeeperService.first(evt3, "missing_key") is None
-
     def test_normalize_short_float_pct_percent_string(self):
         assert GatekeeperService.normalize_short_float_pct("23.40%", is_fraction=False) == 23.4
 
@@ -113,11 +137,20 @@ class TestGatekeeperDropReason:
         # price=0 bypasses price checks (if price > 0)
         assert gatekeeper.get_drop_reason(norm) is None
 
+    def test_check_liquidity_returns_reason_code(self, gatekeeper):
+        norm = {
+            "ticker": "X",
+            "liquidity_metrics": {"price": 900.0, "volume": 100_000.0, "relative_volume": 2.0},
+        }
+        code, reason = gatekeeper.check_liquidity(norm)
+        assert code == "price_above_max"
+        assert reason == gatekeeper.get_drop_reason(norm)
+
 
-class TestGatekeeperCoercers:
-    """Tests for source-specific coercers."""
+class TestGatekeeperSourceFields:
+    """Tests for source-specific field mappings."""
 
-    def test_coerce_squeeze(self, gatekeeper):
+    def test_normalize_squeeze(self, gatekeeper):
         raw = {
             "ticker": "GME",
             "short_float": "35.5%",
@@ -126,14 +159,14 @@ class TestGatekeeperCoercers:
             "volume": 500_000,
             "relative_volume": 2.5,
         }
-        norm = gatekeeper.coerce_squeeze(raw)
+        norm = gatekeeper.normalize_event(raw)
         assert norm["source_hunter"] == "squeeze"
         assert norm["ticker"] == "GME"
         assert norm["liquidity_metrics"]["price"] == 25.0
         assert norm["liquidity_metrics"]["volume"] == 500_000.0
         assert norm["signal_data"]["short_float_pct"] == 35.5
 
-    def test_coerce_insider(self, gatekeeper):
+    def test_normalize_insider(self, gatekeeper):
         raw = {
             "ticker": "AAPL",
             "transaction_code": "P",
@@ -142,13 +175,13 @@ class TestGatekeeperCoercers:
             "volume": 1_000_000,
             "relative_volume": 1.8,
         }
-        norm = gatekeeper.coerce_insider(raw)
+        norm = gatekeeper.normalize_event(raw)
         assert norm["source_hunter"] == "insider"
         assert norm["ticker"] == "AAPL"
         assert norm["liquidity_metrics"]["price"] == 180.0
         assert norm["signal_data"]["transaction_code"] == "P"
 
-    def test_coerce_biotech(self, gatekeeper):
+    def test_normalize_biotech(self, gatekeeper):
         raw = {
             "ticker": "SRNE",
             "drug_name": "ABC-123",
@@ -158,7 +191,7 @@ class TestGatekeeperCoercers:
             "volume": 80_000,
             "relative_volume": 1.5,
         }
-        norm = gatekeeper.coerce_biotech(raw)
+        norm = gatekeeper.normalize_event(raw)
         assert norm["source_hunter"] == "biotech"
         assert norm["ticker"] == "SRNE"
         assert norm["signal_data"]["drug_name"] == "ABC-123"
@@ -178,3 +211,283 @@ class TestGatekeeperNormalizeEvent:
     def test_detect_source_from_signal_data(self, gatekeeper):
         evt = {"signal_data": {"source_hunter": "biotech"}}
         assert gatekeeper.detect_source(evt) == "biotech"
+
+
+BURST_EVENTS = [
+    {
+        "hunter": "squeeze",
+        "ticker": "gme",
+        "short_float": "35%",
+        "price": 25.0,
+        "volume": 500_000,
+        "relative_volume": 2.5,
+        "timestamp": "2026-04-01T13:30:00Z",
+    },
+    {
+        "hunter": "whale",
+        "ticker": "GME",
+        "option_type": "CALL",
+        "strike": 30,
+        "price": 25.1,
+        "volume": 900_000,
+        "relative_volume": 3.0,
+        "timestamp": "2026-04-01T13:30:05Z",
+    },
+    {
+        "hunter": "squeeze",
+        "ticker": "AMC",
+        "short_float": "28%",
+        "price": 4.0,
+        "volume": 100,
+        "relative_volume": 2.5,
+        "timestamp": "2026-04-01T13:30:06Z",
+    },
+    {"foo": "bar"},
+    {
+        "hunter": "insider",
+        "ticker": "gme",
+        "transaction_code": "P",
+        "price": 25.2,
+        "timestamp": "2026-04-01T13:30:07Z",
+    },
+    {
+        "hunter": "drifter",
+        "ticker": "NVDA",
+        "surprise_percent": 12.0,
+        "price": 120.0,
+        "volume": 2_000_000,
+        "relative_volume": 1.8,
+        "technical_score": 85,
+        "timestamp": "2026-04-01T13:30:08Z",
+    },
+    {
+        "hunter": "biotech",
+        "ticker": "SRNE",
+        "drug_name": "ABC-123",
+        "price": 5.0,
+        "volume": 80_000,
+        "relative_volume": 1.6,
+        "timestamp": "2026-04-01T13:30:09Z",
+    },
+]
+
+
+class TestGatekeeperConfluence:
+    """Server-side confluence decisions and batch equivalence."""
+
+    def test_batch_matches_per_event_output(self, redis_server):
+        per_event = make_windowed_gatekeeper(redis_server)
+        for event in BURST_EVENTS:
+            per_event.process_event(event)
+        expected = sent_payloads(per_event)
+
+        batched = make_windowed_gatekeeper(fakeredis.FakeServer())
+        batched.process_batch(BURST_EVENTS)
+
+        assert sent_payloads(batched) == expected
+        assert [payload["ticker"] for payload in expected] == ["GME", "NVDA"]
+        assert expected[0]["confluence_sources"] == ["squeeze", "whale"]
+
+    def test_batch_respects_existing_window_state(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.process_event(BURST_EVENTS[0])
+        gk.mark_sent("NVDA")
+        gk.process_batch(BURST_EVENTS[1:])
+
+        payloads = sent_payloads(gk)
+        assert [payload["ticker"] for payload in payloads] == ["GME"]
+        signals = payloads[0]["signals"]
+        assert [signal["source_hunter"] for signal in signals] == ["whale", "squeeze"]
+        assert gk.was_recently_sent("GME")
+
+    def test_batch_uses_one_round_trip(self, windowed_gatekeeper):
+        store = windowed_gatekeeper.window_store
+        store.redis = MagicMock(wraps=store.redis)
+        windowed_gatekeeper.process_batch(BURST_EVENTS)
+        assert [name for name, _, _ in store.redis.method_calls] == ["pipeline"]
+
+    def test_replicas_forward_a_ticker_once(self, redis_server):
+        first = make_windowed_gatekeeper(redis_server)
+        second = make_windowed_gatekeeper(redis_server)
+        first.process_event(BURST_EVENTS[0])
+        second.process_event(BURST_EVENTS[1])
+        first.process_event(BURST_EVENTS[4])
+
+        assert len(sent_payloads(second)) == 1
+        assert sent_payloads(first) == []
+
+    def test_replayed_backlog_uses_event_time(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        stale_squeeze = dict(BURST_EVENTS[0], timestamp="2026-04-01T13:20:00Z")
+        gk.process_batch([stale_squeeze, BURST_EVENTS[1]])
+        assert sent_payloads(gk) == []
+        assert gk.get_sources("GME") == ["whale"]
+
+    def test_event_time_parses_timestamp_utc(self):
+        assert GatekeeperService.event_time({"timestamp_utc": "2026-04-01T13:30:00Z"}) == (
+            1775050200.0
+        )
+        assert GatekeeperService.event_time(
+            {"timestamp_utc": "2026-04-01T13:30:00"}
+        ) == GatekeeperService.event_time({"timestamp_utc": "2026-04-01T13:30:00+00:00"})
+
+    def test_reloads_script_after_cache_flush(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.window_store.redis.script_flush()
+        gk.process_event(BURST_EVENTS[5])
+        assert [payload["ticker"] for payload in sent_payloads(gk)] == ["NVDA"]
+
+
+class TestGatekeeperPartitionOwnership:
+    def test_subscribes_with_rebalance_listener(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.consumer.subscribe.assert_called_once()
+        assert gk.consumer.subscribe.call_args.args[0] == ["raw-events"]
+
+    def test_forwards_keyed_by_ticker(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.process_event(BURST_EVENTS[5])
+        assert gk.producer.send.call_args.kwargs["key"] == "NVDA"
+        assert gk.commits.commit_requested
+
+    def test_release_commits_after_successful_flush(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.producer.flush.return_value = 0
+        gk.commits.mark(raw_record(BURST_EVENTS[0], offset=7))
+        gk.release_partitions([TopicPartition("raw-events", 0)])
+        gk.consumer.commit.assert_called_once_with(
+            {TopicPartition("raw-events", 0): OffsetAndMetadata(8, "")}
+        )
+        assert gk.commits.pending == {}
+
+    def test_release_skips_commit_when_delivery_failed(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.producer.flush.return_value = 2
+        gk.commits.mark(raw_record(BURST_EVENTS[0], offset=7))
+        gk.release_partitions([TopicPartition("raw-events", 0)])
+        gk.consumer.commit.assert_not_called()
+        assert gk.commits.pending == {}
+
+    def test_undelivered_forward_is_replayed_before_its_offset_is_committed(
+        self, windowed_gatekeeper
+    ):
+        gk = windowed_gatekeeper
+        tp = TopicPartition("raw-events", 0)
+        records = [
+            raw_record(BURST_EVENTS[0], offset=0),
+            raw_record(BURST_EVENTS[1], offset=1),  # confluence: forwards GME
+            raw_record(BURST_EVENTS[2], offset=2),
+        ]
+        position = [0]
+
+        def poll(timeout_ms, max_records):
+            if position[0] >= len(records):
+                raise EndOfRecordsError
+            batch = records[position[0] : position[0] + max_records]
+            position[0] += len(batch)
+            return {tp: batch}
+
+        gk.consumer.poll.side_effect = poll
+        gk.consumer.seek.side_effect = lambda _tp, offset: position.__setitem__(0, offset)
+
+        # The broker rejects the first forward only; flush() reports it once.
+        outcomes = iter([False, True])
+        futures = []
+
+        def send(topic, value, key=None):
+            futures.append(MagicMock(succeeded=MagicMock(return_value=next(outcomes))))
+            return futures[-1]
+
+        def flush():
+            failed = sum(not future.succeeded() for future in futures)
+            futures.clear()
+            return failed
+
+        gk.producer.send.side_effect = send
+        gk.producer.flush.side_effect = flush
+        with patch("gatekeeper.gatekeeper.BATCH_SIZE", 10), pytest.raises(EndOfRecordsError):
+            gk.run()
+
+        committed = [call.args[0][tp].offset for call in gk.consumer.commit_async.call_args_list]
+        assert committed == [1, 3]
+        gk.consumer.seek.assert_called_once_with(tp, 1)
+        assert [payload["ticker"] for payload in sent_payloads(gk)] == ["GME", "GME"]
+
+
+class TestGatekeeperOffsetCommits:
+    def test_buffered_and_dropped_events_commit_on_shutdown(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        junk = {**BURST_EVENTS[0], "ticker": "JUNK", "volume": 1000}
+        gk.consumer.__iter__.return_value = [
+            raw_record(BURST_EVENTS[0], offset=40),
+            raw_record(junk, offset=41),
+        ]
+        gk.run()
+
+        gk.consumer.commit_async.assert_not_called()
+        gk.consumer.commit.assert_called_once_with(
+            {TopicPartition("raw-events", 0): OffsetAndMetadata(42, "")}
+        )
+        gk.consumer.close.assert_called_once_with(autocommit=False)
+
+    def test_forward_commits_asynchronously_without_waiting_for_interval(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.consumer.__iter__.return_value = [
+            raw_record(BURST_EVENTS[0], offset=3),
+            raw_record(BURST_EVENTS[1], offset=4, partition=1),
+        ]
+        gk.run()
+
+        gk.consumer.commit_async.assert_called_once()
+        offsets = gk.consumer.commit_async.call_args.args[0]
+        assert offsets == {
+            TopicPartition("raw-events", 0): OffsetAndMetadata(4, ""),
+            TopicPartition("raw-events", 1): OffsetAndMetadata(5, ""),
+        }
+        # Nothing left for the shutdown commit.
+        gk.consumer.commit.assert_not_called()
+
+    def test_commit_waits_for_write_behind_flush(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        gk.window_store.flush = MagicMock(side_effect=ConnectionError("redis down"))
+        gk.commits.mark(raw_record(BURST_EVENTS[0], offset=7))
+        gk.commit_offsets(sync=False)
+        gk.consumer.commit_async.assert_not_called()
+        assert gk.commits.pending
+
+
+class TestGatekeeperDecoding:
+    def test_decodes_typed_and_legacy_records(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        event = {"hunter": "squeeze", "ticker": "GME", "price": 24.87}
+        value, headers = MessageCodec(RAW_EVENT, "msgpack").encode(event)
+        assert gk.decode_message(MagicMock(value=value, headers=headers)) == event
+        legacy = MagicMock(value=json.dumps(event).encode(), headers=[])
+        assert gk.decode_message(legacy) == event
+
+    def test_skips_records_that_fail_the_schema(self, windowed_gatekeeper):
+        gk = windowed_gatekeeper
+        value, headers = MessageCodec(RAW_EVENT, "msgpack").encode({"ticker": "GME"})
+        assert gk.decode_message(MagicMock(value=value, headers=headers)) is None
+
+
+class TestGatekeeperDecisionLogging:
+    def test_drops_and_buffers_are_counted_not_logged(self, windowed_gatekeeper, caplog):
+        gk = windowed_gatekeeper
+        junk = {**BURST_EVENTS[0], "ticker": "JUNK", "volume": 1000}
+        with caplog.at_level(logging.INFO, logger="gatekeeper"):
+            gk.process_batch([junk, BURST_EVENTS[0], {"unexpected": True}])
+
+        assert caplog.records == []
+        assert gk.decisions.decisions == {"dropped": 1, "buffered": 1, "unknown_schema": 1}
+        assert gk.decisions.reasons == {"low_volume": 1}
+        assert gk.decisions.tickers == {"JUNK": 1, "GME": 1}
+
+    def test_forwards_are_always_logged(self, windowed_gatekeeper, caplog):
+        gk = windowed_gatekeeper
+        with caplog.at_level(logging.INFO, logger="gatekeeper"):
+            gk.process_batch(BURST_EVENTS[:2])
+        assert [record.getMessage().split(" to ")[0] for record in caplog.records] == [
+            "Forwarded GME"
+        ]
+        assert gk.decisions.decisions == {"buffered": 1, "forwarded": 1}
@@ -0,0 +1,83 @@
+"""Unit tests for the AI layer's per-payload search grounding policy."""
+
+from ai_layer.grounding import (
+    GROUNDING_ALWAYS,
+    GROUNDING_NEVER,
+    REASON_COMPLETE_CATALYST,
+    REASON_NEEDS_SEARCH,
+    REASON_RECENT_NEWS,
+    GroundingPolicy,
+    has_complete_catalyst,
+)
+
+DRIFTER = {
+    "source_hunter": "drifter",
+    "signal_data": {
+        "surprise_percent": 18.2,
+        "eps_actual": 1.12,
+        "eps_estimate": 0.95,
+        "revenue_actual": 2.1e9,
+        "revenue_estimate": 1.9e9,
+    },
+}
+SQUEEZE = {"source_hunter": "squeeze", "signal_data": {"short_float_pct": 31.4}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def payload(*signals, ticker="GME"):
+    return {"ticker": ticker, "signals": list(signals)}
+
+
+def test_complete_catalyst_signals():
+    assert has_complete_catalyst(payload(SQUEEZE, DRIFTER))
+    assert has_complete_catalyst(
+        payload({"source_hunter": "biotech", "signal_data": {"event_date": "2026-05-01"}})
+    )
+    partial = {"source_hunter": "drifter", "signal_data": {"surprise_percent": 18.2}}
+    assert not has_complete_catalyst(payload(SQUEEZE, partial))
+    assert not has_complete_catalyst(
+        payload({"source_hunter": "biotech", "signal_data": {"event_date": ""}})
+    )
+
+
+def test_adaptive_decisions():
+    policy = GroundingPolicy(clock=FakeClock())
+    assert policy.decide(payload(SQUEEZE)) == (True, REASON_NEEDS_SEARCH)
+    assert policy.decide(payload(SQUEEZE, DRIFTER)) == (False, REASON_COMPLETE_CATALYST)
+
+    policy.record_search("GME", {"news_sentiment": "bullish", "rationale": "Squeeze news."})
+    assert policy.decide(payload(SQUEEZE)) == (False, REASON_RECENT_NEWS)
+    assert policy.decide(payload(SQUEEZE, ticker="AMC")) == (True, REASON_NEEDS_SEARCH)
+
+    stats = policy.snapshot(reset=True)
+    assert stats["total"] == 4
+    assert stats["grounded"] == 2
+    assert stats["grounded_ratio"] == 0.5
+    assert policy.snapshot()["total"] == 0
+
+
+def test_recent_search_expires():
+    clock = FakeClock()
+    policy = GroundingPolicy(recent_seconds=600, clock=clock)
+    policy.record_search("GME", {"news_sentiment": "bearish", "rationale": "Offering."})
+    clock.now = 300
+    assert policy.recent_search("GME") == {
+        "age_minutes": 5,
+        "news_sentiment": "bearish",
+        "rationale": "Offering.",
+    }
+    clock.now = 601
+    assert policy.recent_search("GME") is None
+    assert policy.decide(payload(SQUEEZE)) == (True, REASON_NEEDS_SEARCH)
+
+
+def test_fixed_modes_bypass_the_policy():
+    assert GroundingPolicy(GROUNDING_ALWAYS).decide(payload(DRIFTER))[0]
+    assert not GroundingPolicy(GROUNDING_NEVER).decide(payload(SQUEEZE))[0]
@@ -0,0 +1,127 @@
+"""Unit tests for the shared batching Kafka producer."""
+
+from unittest.mock import patch
+
+import pytest
+from kafka.future import Future
+from kafka.structs import OffsetAndMetadata, TopicPartition
+
+from hunters.common.kafka_client import KafkaClient
+from messaging.offsets import OrderedOffsetTracker
+from messaging.producer import BatchingProducer, resolve_compression, ticker_key
+
+
+@pytest.fixture
+def producer():
+    with patch("messaging.producer.KafkaProducer") as mock_producer:
+        batching = BatchingProducer(bootstrap_servers="localhost:9092", compression_type="none")
+        batching.kafka = mock_producer.return_value
+        return batching
+
+
+class TestResolveCompression:
+    def test_none_disables_compression(self):
+        assert resolve_compression("none") is None
+        assert resolve_compression("") is None
+
+    def test_unknown_codec_falls_back(self):
+        assert resolve_compression("brotli") is None
+
+    def test_missing_codec_library_falls_back(self):
+        with patch.dict("messaging.producer.CODEC_CHECKS", {"zstd": lambda: False}):
+            assert resolve_compression("zstd") is None
+
+    def test_available_codec_is_used(self):
+        with patch.dict("messaging.producer.CODEC_CHECKS", {"lz4": lambda: True}):
+            assert resolve_compression("LZ4") == "lz4"
+
+
+class TestBatchingProducer:
+    def test_send_does_not_flush(self, producer):
+        producer.kafka.send.return_value = Future()
+        producer.send("raw-events", {"ticker": "GME"})
+        producer.kafka.flush.assert_not_called()
+        assert producer.metrics.snapshot()["in_flight"] == 1
+
+    def test_flush_reports_failures_since_last_flush(self, producer):
+        ok, failed = Future(), Future()
+        producer.kafka.send.side_effect = [ok, failed]
+        producer.send("raw-events", {"ticker": "GME"})
+        producer.send("raw-events", {"ticker": "AMC"})
+        ok.success(None)
+        failed.failure(RuntimeError("broker unavailable"))
+
+        assert producer.flush() == 1
+        assert producer.flush() == 0
+        snapshot = producer.metrics.snapshot()
+        assert snapshot["delivered"] == 1
+        assert snapshot["failed_by_topic"] == {"raw-events": 1}
+
+    def test_synchronous_send_error_is_counted(self, producer):
+        producer.kafka.send.side_effect = ValueError("bad record")
+        with pytest.raises(ValueError):
+            producer.send("raw-events", {"ticker": "GME"})
+        assert producer.metrics.snapshot()["failed"] == 1
+
+
+class TestTickerKey:
+    def test_normalizes_like_gatekeeper(self):
+        assert ticker_key({"ticker": "  gme "}) == "GME"
+        assert ticker_key({"symbol": "nvda"}) == "NVDA"
+
+    def test_missing_ticker_has_no_key(self):
+        assert ticker_key({"ticker": "  "}) is None
+        assert ticker_key({}) is None
+        assert ticker_key(["GME"]) is None
+
+    def test_hunters_send_keyed_by_ticker(self):
+        with patch.object(KafkaClient, "_producer") as producer:
+            KafkaClient.send_message("raw-events", {"hunter": "squeeze", "ticker": "gme"})
+        producer.send.assert_called_once_with(
+            "raw-events", {"hunter": "squeeze", "ticker": "gme"}, key="GME"
+        )
+
+
+class TestOrderedOffsetTracker:
+    def test_commits_only_contiguous_finished_offsets(self):
+        tracker = OrderedOffsetTracker()
+        tp = TopicPartition("triage-priority", 0)
+        for offset in (10, 11, 12):
+            tracker.start(tp, offset)
+
+        tracker.finish(tp, 11)
+        tracker.finish(tp, 12)
+        assert tracker.committable() == {}
+        assert tracker.in_flight() == 3
+
+        tracker.finish(tp, 10)
+        assert tracker.committable() == {tp: OffsetAndMetadata(13, "")}
+        assert tracker.in_flight() == 0
+
+    def test_partitions_advance_independently(self):
+        tracker = OrderedOffsetTracker()
+        first, second = TopicPartition("t", 0), TopicPartition("t", 1)
+        tracker.start(first, 0)
+        tracker.start(second, 5)
+        tracker.start(second, 6)
+        tracker.finish(second, 5)
+        assert tracker.committable() == {second: OffsetAndMetadata(6, "")}
+
+    def test_committed_offsets_are_not_repeated(self):
+        tracker = OrderedOffsetTracker()
+        tp = TopicPartition("t", 0)
+        tracker.start(tp, 0)
+        tracker.finish(tp, 0)
+        tracker.mark_committed(tracker.committable())
+        assert tracker.committable() == {}
+        tracker.start(tp, 1)
+        tracker.finish(tp, 1)
+        assert tracker.committable() == {tp: OffsetAndMetadata(2, "")}
+
+    def test_finish_after_revoke_is_ignored(self):
+        tracker = OrderedOffsetTracker()
+        tp = TopicPartition("t", 0)
+        tracker.start(tp, 0)
+        tracker.forget([tp])
+        tracker.finish(tp, 0)
+        assert tracker.committable() == {}
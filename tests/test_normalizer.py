@@ -0,0 +1,74 @@
+"""Unit tests for the table-driven gatekeeper normalizers."""
+
+import json
+from pathlib import Path
+
+import pytest
+from benchmark_normalizer import BaselineNormalizer, load_recorded_events
+
+from gatekeeper.normalizer import NORMALIZERS, alias_lookup, detect_source, normalize_event
+
+RECORDED = load_recorded_events()
+# Output of the coercers the tables replaced, for each recorded event.
+EXPECTED = json.loads(
+    (Path(__file__).resolve().parent / "fixtures" / "normalized_events.json").read_text()
+)
+
+
+class TestTableNormalizers:
+    @pytest.mark.parametrize(
+        ("raw_event", "expected"),
+        list(zip(RECORDED, EXPECTED)),
+        ids=[event.get("ticker", "?") for event in RECORDED],
+    )
+    def test_matches_previous_coercers_on_recorded_events(self, raw_event, expected):
+        assert normalize_event(raw_event) == expected
+        assert BaselineNormalizer().normalize_event(raw_event) == expected
+
+    def test_recorded_events_cover_every_hunter(self):
+        assert {detect_source(event) for event in RECORDED} == set(NORMALIZERS)
+
+    def test_alias_order_beats_event_level(self):
+        raw = {
+            "hunter": "squeeze",
+            "symbol": "gme",
+            "signal_data": {"ticker": "AMC", "short_float": 10, "short_float_pct": 40},
+            "short_float": 20,
+        }
+        normalized = normalize_event(raw)
+        assert normalized["ticker"] == "AMC"
+        assert normalized["signal_data"]["short_float_pct"] == 40.0
+
+    def test_event_level_beats_signal_data_for_the_same_alias(self):
+        raw = {"hunter": "whale", "ticker": "NVDA", "oi": 50, "signal_data": {"oi": 99}}
+        assert normalize_event(raw)["signal_data"]["open_interest"] == 50
+
+    @pytest.mark.parametrize("aliases", [("a",), ("a", "b"), ("a", "b", "c", "d")])
+    def test_alias_lookup_returns_first_present(self, aliases):
+        lookup = alias_lookup(aliases)
+        assert lookup({}.get) is None
+        assert lookup({aliases[-1]: 0}.get) == 0
+        assert lookup({aliases[0]: None, aliases[-1]: 7}.get) == 7
+        assert lookup({alias: alias for alias in aliases}.get) == "a"
+
+    def test_earlier_alias_wins_and_none_is_skipped(self):
+        raw = {"hunter": "insider", "ticker": "PLTR", "code": "S", "transaction_code": None}
+        assert normalize_event(raw)["signal_data"]["transaction_code"] == "S"
+
+    def test_whale_liquidity_volume_override(self):
+        raw = {"hunter": "whale", "ticker": "RIVN", "volume": 9400, "stock_volume": "38,000,000"}
+        normalized = normalize_event(raw)
+        assert normalized["signal_data"]["volume"] == 9400
+        assert normalized["liquidity_metrics"]["volume"] == 38_000_000.0
+
+    def test_extras_pass_through_without_overriding_signal_fields(self):
+        raw = {
+            "hunter": "drifter",
+            "ticker": "CRWD",
+            "surprise_percent": 14.2,
+            "earnings_date": "2026-04-17",
+            "note": None,
+            "signal_data": {"earnings_date": "2026-04-18"},
+        }
+        signal_data = normalize_event(raw)["signal_data"]
+        assert signal_data == {"surprise_percent": 14.2, "earnings_date": "2026-04-18"}
@@ -0,0 +1,92 @@
+"""Unit tests for the gatekeeper's commit cadence bookkeeping."""
+
+from types import SimpleNamespace
+
+from kafka.structs import OffsetAndMetadata, TopicPartition
+
+from gatekeeper.offsets import CommitTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def record(offset, partition=0):
+    return SimpleNamespace(topic="raw-events", partition=partition, offset=offset)
+
+
+class TestCommitTracker:
+    def test_tracks_next_offset_per_partition(self):
+        tracker = CommitTracker(5, 1000, clock=FakeClock())
+        for offset, partition in [(10, 0), (11, 0), (3, 1)]:
+            tracker.mark(record(offset, partition))
+        assert tracker.offsets() == {
+            TopicPartition("raw-events", 0): OffsetAndMetadata(12, ""),
+            TopicPartition("raw-events", 1): OffsetAndMetadata(4, ""),
+        }
+
+    def test_due_after_interval(self):
+        clock = FakeClock()
+        tracker = CommitTracker(5, 1000, clock=clock)
+        tracker.mark(record(0))
+        clock.now = 4.9
+        assert not tracker.due()
+        clock.now = 5.0
+        assert tracker.due()
+
+    def test_due_after_max_events(self):
+        tracker = CommitTracker(5, 3, clock=FakeClock())
+        for offset in range(2):
+            tracker.mark(record(offset))
+        assert not tracker.due()
+        tracker.mark(record(2))
+        assert tracker.due()
+
+    def test_requested_commit_is_due_immediately(self):
+        tracker = CommitTracker(5, 1000, clock=FakeClock())
+        tracker.request_commit()
+        assert not tracker.due()  # nothing processed yet
+        tracker.mark(record(0))
+        assert tracker.due()
+
+    def test_committed_resets_cadence(self):
+        clock = FakeClock()
+        tracker = CommitTracker(5, 2, clock=clock)
+        tracker.mark(record(0))
+        tracker.mark(record(1))
+        clock.now = 6.0
+        tracker.committed()
+        assert tracker.pending == {}
+        tracker.mark(record(2))
+        assert not tracker.due()
+
+    def test_failed_attempt_keeps_offsets_and_waits_an_interval(self):
+        clock = FakeClock()
+        tracker = CommitTracker(5, 1000, clock=clock)
+        tracker.mark(record(0))
+        tracker.request_commit()
+        tracker.attempted()
+        assert not tracker.due()
+        clock.now = 5.0
+        assert tracker.due()
+        assert tracker.offsets() == {TopicPartition("raw-events", 0): OffsetAndMetadata(1, "")}
+
+    def test_forget_revoked_partitions(self):
+        tracker = CommitTracker(5, 1000, clock=FakeClock())
+        tracker.mark(record(0, partition=0))
+        tracker.mark(record(0, partition=1))
+        tracker.forget([TopicPartition("raw-events", 1)])
+        assert list(tracker.offsets()) == [TopicPartition("raw-events", 0)]
+
+    def test_rewind_holds_the_commit_at_the_earliest_replayed_record(self):
+        tracker = CommitTracker(5, 1000, clock=FakeClock())
+        for offset in (10, 11, 12):
+            tracker.mark(record(offset))
+        tp = TopicPartition("raw-events", 0)
+        tracker.rewind(tp, 11)
+        tracker.rewind(tp, 12)
+        assert tracker.offsets() == {tp: OffsetAndMetadata(11, "")}
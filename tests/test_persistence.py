@@ -0,0 +1,585 @@
+"""Unit tests for the batched validated-signal writer and the persistence consumer."""
+
+import asyncio
+import json
+import math
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from kafka.structs import OffsetAndMetadata, TopicPartition
+from psycopg import DataError, OperationalError
+
+from messaging.schemas import SIGNAL_ID_NAMESPACE, validated_signal_id
+from persistence.async_worker import AsyncSignalPersister, PartitionWriter
+from persistence.batch_writer import (
+    COPY_TYPES,
+    EVIDENCE,
+    EVIDENCE_COPY_TYPES,
+    ROW_TYPES,
+    SIGNALS,
+    WRITE_INSERT,
+    insert_rows,
+    signal_row,
+    split_rows,
+    write_batch,
+    write_batch_pipelined,
+    write_each,
+)
+from persistence.consumer import MIGRATED_SIGNAL_ID_SQL, SignalPersister, move_signals_to_evidence
+from persistence.spill import SpillLog
+
+TP = TopicPartition("validated-signals", 0)
+TP1 = TopicPartition("validated-signals", 1)
+# Kafka record timestamp (2026-04-21T14:02:11Z) for payloads without a timestamp_utc.
+RECORDED_AT_MS = 1_776_780_131_000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+RAW_SIGNALS = [
+    {"source_hunter": "squeeze", "signal_data": {"short_float": 31.42}},
+    {"source_hunter": "whale", "signal_data": {"premium": 1.2e6}},
+]
+
+
+def signal_record(ticker, offset):
+    value = json.dumps(
+        {"ticker": ticker, "timestamp_utc": "2026-04-21T14:02:11Z", "conviction_score": 72}
+    ).encode()
+    return MagicMock(offset=offset, value=value, headers=[], timestamp=RECORDED_AT_MS)
+
+
+class TestSignalRow:
+    def test_row_matches_row_types(self):
+        row = signal_row(
+            {"ticker": "GME", "conviction_score": "72", "key_risks": ["dilution"]}, RECORDED_AT_MS
+        )
+        assert len(row) == len(ROW_TYPES)
+        assert row[2:4] == ("GME", 72)
+        assert row[15] == ["dilution"]
+
+    def test_raw_signals_are_split_into_evidence(self):
+        with_evidence = signal_row({"ticker": "GME", "signals": RAW_SIGNALS}, RECORDED_AT_MS)
+        without = signal_row({"ticker": "AMC"}, RECORDED_AT_MS)
+        signal_rows, evidence_rows = split_rows([with_evidence, without])
+        assert [len(row) for row in signal_rows] == [len(COPY_TYPES)] * 2
+        assert [row[11] for row in signal_rows] == [2, 0]  # signal_count
+        assert evidence_rows == [(with_evidence[0], with_evidence[1], RAW_SIGNALS)]
+
+    def test_timestamps_are_timezone_aware(self):
+        naive = signal_row({"timestamp_utc": "2026-04-21T14:02:11"})[1]
+        assert naive == datetime(2026, 4, 21, 14, 2, 11, tzinfo=timezone.utc)
+
+    def test_missing_timestamp_falls_back_to_the_record_timestamp(self):
+        replayed = [signal_row({"ticker": "GME"}, RECORDED_AT_MS) for _ in range(2)]
+        assert replayed[0][:2] == replayed[1][:2]
+        assert replayed[0][1] == datetime(2026, 4, 21, 14, 2, 11, tzinfo=timezone.utc)
+        for record_timestamp_ms in (None, -1):
+            with pytest.raises(ValueError):
+                signal_row({"ticker": "GME"}, record_timestamp_ms)
+
+    def test_values_postgres_refuses_are_cleaned(self):
+        row = signal_row(
+            {
+                "ticker": "GME",
+                "rationale": "Squeeze\x00 setup",
+                "liquidity_metrics": {"price": float("nan"), "volume": float("inf")},
+                "signals": [{"source_hunter": "squeeze", "signal_data": {"x\x00": -math.inf}}],
+            },
+            RECORDED_AT_MS,
+        )
+        assert row[7] == "Squeeze setup"
+        assert row[10] == {"price": None, "volume": None}
+        assert row[-1] == [{"source_hunter": "squeeze", "signal_data": {"x": None}}]
+        assert "NaN" not in SIGNALS.params(row[:-1])[10]
+
+    def test_insert_params_refuse_non_finite_json(self):
+        row = list(signal_row({"ticker": "GME"}, RECORDED_AT_MS)[:-1])
+        row[10] = {"price": float("nan")}
+        with pytest.raises(ValueError):
+            SIGNALS.params(tuple(row))
+
+    def test_signal_id_is_carried_or_derived(self):
+        payload = {
+            "ticker": "GME",
+            "timestamp_utc": "2026-04-21T14:02:11Z",
+            "confluence_sources": ["squeeze", "whale"],
+        }
+        derived = signal_row(payload)[0]
+        assert derived == uuid.UUID(
+            validated_signal_id("GME", "2026-04-21T14:02:11Z", ["whale", "squeeze"])
+        )
+        carried = str(uuid.uuid4())
+        assert signal_row({**payload, "signal_id": carried}, RECORDED_AT_MS)[0] == uuid.UUID(
+            carried
+        )
+
+
+class FakePipelineCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def executemany(self, sql, params_seq):
+        self.rowcount = 0
+        for params in params_seq:
+            key = (sql.split()[2], params[0])
+            self.conn.statements.append(sql)
+            self.conn.pending.append((self, int(key not in self.conn.existing)))
+            self.conn.existing.add(key)
+
+
+class FakePipelineConnection:
+    """psycopg pipeline semantics for rowcount: executemany() resets it, and the rows each
+    statement affected only reach the cursor when the pipeline syncs."""
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.pending = []
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakePipelineCursor(self)
+
+    @asynccontextmanager
+    async def pipeline(self):
+        yield
+        self.sync()
+
+    def sync(self):
+        for cursor, affected in self.pending:
+            cursor.rowcount += affected
+        self.pending = []
+
+    async def commit(self):
+        self.commits += 1
+        self.sync()
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class TestWriteBatch:
+    def test_multi_row_insert_is_one_statement_per_table(self):
+        conn = MagicMock()
+        rows = [
+            signal_row({"ticker": "AAA", "signals": RAW_SIGNALS}, RECORDED_AT_MS),
+            signal_row({"ticker": "B"}, RECORDED_AT_MS),
+        ]
+        insert_rows(conn, rows)
+        cursor = conn.cursor.return_value.__enter__.return_value
+        (signal_sql, params), (evidence_sql, evidence_params) = (
+            call.args for call in cursor.execute.call_args_list
+        )
+        assert signal_sql.startswith("INSERT INTO validated_signals (")
+        assert signal_sql.count("), (") == 1
+        assert signal_sql.endswith("ON CONFLICT (signal_id, time) DO NOTHING")
+        assert len(params) == 2 * len(COPY_TYPES)
+        assert all(isinstance(params[index], str) for index in SIGNALS.json_columns)
+        assert evidence_sql.startswith("INSERT INTO validated_signal_evidence (")
+        assert json.loads(evidence_params[2]) == RAW_SIGNALS
+
+    def test_copy_stages_rows_then_skips_duplicates(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.rowcount = 1
+        copy = cursor.copy.return_value.__enter__()
+        rows = [
+            signal_row({"ticker": "AAA", "signals": RAW_SIGNALS}, RECORDED_AT_MS),
+            signal_row({"ticker": "B"}, RECORDED_AT_MS),
+        ]
+        inserted = write_batch(conn, rows)
+        assert [call.args[0] for call in copy.set_types.call_args_list] == [
+            COPY_TYPES,
+            EVIDENCE_COPY_TYPES,
+        ]
+        assert copy.write_row.call_count == 3
+        executed = [call.args[0] for call in cursor.execute.call_args_list]
+        assert SIGNALS.merge_staging_sql in executed
+        assert executed[-1] == EVIDENCE.merge_staging_sql
+        assert SIGNALS.merge_staging_sql.endswith("ON CONFLICT (signal_id, time) DO NOTHING")
+        assert inserted == 1
+        conn.commit.assert_called_once()
+
+    def test_pipelined_write_sends_every_row_then_commits(self):
+        duplicate = signal_row({"ticker": "AAA", "signals": RAW_SIGNALS}, RECORDED_AT_MS)
+        conn = FakePipelineConnection(existing={("validated_signals", duplicate[0])})
+        rows = [duplicate, signal_row({"ticker": "BBB", "signals": RAW_SIGNALS}, RECORDED_AT_MS)]
+        rows.append(signal_row({"ticker": "CCC"}, RECORDED_AT_MS))
+        assert asyncio.run(write_batch_pipelined(conn, rows)) == 2
+        assert conn.statements == [SIGNALS.insert_one_sql] * 3 + [EVIDENCE.insert_one_sql] * 2
+        assert (conn.commits, conn.rollbacks) == (1, 0)
+
+    def test_write_each_collects_rejected_rows(self):
+        rows = [signal_row({"ticker": ticker}, RECORDED_AT_MS) for ticker in ("AAA", "BAD", "CCC")]
+
+        def write(chunk):
+            if chunk[0][2] == "BAD":
+                raise DataError("invalid input syntax for type json")
+            return 1
+
+        inserted, rejected = write_each(write, rows)
+        assert inserted == 2
+        assert [(row[2], type(exc)) for row, exc in rejected] == [("BAD", DataError)]
+
+        with pytest.raises(RuntimeError):
+            write_each(MagicMock(side_effect=RuntimeError("db down")), rows)
+
+    def test_failed_write_rolls_back(self):
+        conn = MagicMock()
+        conn.cursor.side_effect = RuntimeError("connection lost")
+        with pytest.raises(RuntimeError):
+            write_batch(conn, [signal_row({}, RECORDED_AT_MS)], WRITE_INSERT)
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+
+
+class TestSchemaMigration:
+    def test_inline_signals_get_ids_in_the_signal_id_namespace(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.fetchone.return_value = (1,)
+        move_signals_to_evidence(conn)
+        statements = [call.args[0] for call in cur.execute.call_args_list]
+        assert "gen_random_uuid" not in "".join(statements)
+        cur.execute.assert_any_call(MIGRATED_SIGNAL_ID_SQL, (str(SIGNAL_ID_NAMESPACE),))
+        conn.commit.assert_called_once()
+
+    def test_schema_sql_migrates_with_the_same_namespace(self):
+        schema = (Path(__file__).resolve().parent.parent / "persistence" / "schema.sql").read_text()
+        assert f"'{SIGNAL_ID_NAMESPACE}'::uuid" in schema
+
+
+@pytest.fixture
+def persister():
+    clock = FakeClock()
+    consumer = MagicMock()
+    consumer.paused.return_value = set()
+    consumer.assignment.return_value = {TP}
+    conn = MagicMock(closed=False)
+    with (
+        patch("persistence.consumer.BATCH_SIZE", 3),
+        patch("persistence.consumer.BATCH_MAX_WAIT_MS", 1000),
+    ):
+        yield SignalPersister(conn, consumer, connect=MagicMock(), clock=clock), clock
+
+
+class TestSignalPersister:
+    def test_writes_when_batch_is_full_and_commits_once(self, persister):
+        persister, _ = persister
+        persister.consumer.poll.return_value = {
+            TP: [signal_record(ticker, offset) for offset, ticker in enumerate("ABC")]
+        }
+        with patch("persistence.consumer.write_batch", return_value=2) as write:
+            persister.poll_once()
+        assert len(write.call_args.args[1]) == 3
+        assert persister.duplicates_skipped == 1
+        persister.consumer.commit.assert_called_once_with({TP: OffsetAndMetadata(3, "")})
+        assert len(persister.batch) == 0
+
+    def test_partial_batch_waits_for_the_time_threshold(self, persister):
+        persister, clock = persister
+        persister.consumer.poll.return_value = {TP: [signal_record("AAA", 7)]}
+        with patch("persistence.consumer.write_batch") as write:
+            persister.poll_once()
+            write.assert_not_called()
+            persister.consumer.poll.return_value = {}
+            clock.now = 1.0
+            persister.poll_once()
+        write.assert_called_once()
+        persister.consumer.commit.assert_called_once_with({TP: OffsetAndMetadata(8, "")})
+
+    def test_undecodable_record_is_skipped_but_committed(self, persister):
+        persister, clock = persister
+        bad = MagicMock(offset=4, value=b"{not json", headers=[])
+        persister.consumer.poll.return_value = {TP: [bad]}
+        with patch("persistence.consumer.write_batch") as write:
+            persister.poll_once()
+            persister.consumer.poll.return_value = {}
+            clock.now = 1.0
+            persister.poll_once()
+        write.assert_not_called()
+        persister.consumer.commit.assert_called_once_with({TP: OffsetAndMetadata(5, "")})
+
+    def test_failed_write_keeps_batch_and_pauses_fetching(self, persister):
+        persister, clock = persister
+        persister.consumer.poll.return_value = {
+            TP: [signal_record(ticker, offset) for offset, ticker in enumerate("ABC")]
+        }
+        with patch("persistence.consumer.write_batch", side_effect=RuntimeError("db down")):
+            persister.poll_once()
+        persister.consumer.commit.assert_not_called()
+        assert len(persister.batch) == 3
+
+        persister.consumer.poll.return_value = {}
+        with patch("persistence.consumer.write_batch") as write:
+            persister.poll_once()
+            persister.consumer.pause.assert_called_once_with(TP)
+            write.assert_not_called()  # still backing off
+
+            clock.now = 1.0
+            persister.consumer.paused.return_value = {TP}
+            persister.poll_once()
+        write.assert_called_once()
+        persister.consumer.commit.assert_called_once_with({TP: OffsetAndMetadata(3, "")})
+
+        persister.poll_once()
+        persister.consumer.resume.assert_called_once_with(TP)
+
+    def test_unreachable_database_spills_and_commits(self, persister, tmp_path):
+        persister, clock = persister
+        persister.spill = SpillLog(tmp_path)
+        persister.consumer.poll.return_value = {
+            TP: [signal_record(ticker, offset) for offset, ticker in enumerate("ABC")]
+        }
+        down = OperationalError("connection refused")
+        with (
+            patch("persistence.consumer.SPILL_RETRY_SECONDS", 5),
+            patch("persistence.consumer.write_batch", side_effect=down) as write,
+        ):
+            persister.poll_once()
+            persister.consumer.commit.assert_called_once_with({TP: OffsetAndMetadata(3, "")})
+            persister.consumer.poll.return_value = {
+                TP: [signal_record(ticker, offset) for offset, ticker in enumerate("DEF", 3)]
+            }
+            persister.poll_once()  # still inside the spill window: no database attempt
+            assert write.call_count == 1
+            clock.now = 5
+            persister.consumer.poll.return_value = {
+                TP: [signal_record(ticker, offset) for offset, ticker in enumerate("GHI", 6)]
+            }
+            persister.poll_once()
+            assert write.call_count == 2
+        spilled = persister.spill.read(persister.spill.seal()[0])
+        assert [row[2] for row in spilled] == list("ABCDEFGHI")
+        assert persister.consumer.commit.call_args.args[0] == {TP: OffsetAndMetadata(9, "")}
+
+    def test_rejected_row_is_set_aside_and_the_rest_committed(self, persister, tmp_path):
+        persister, _ = persister
+        persister.spill = SpillLog(tmp_path)
+        persister.consumer.poll.return_value = {
+            TP: [signal_record(ticker, offset) for offset, ticker in enumerate("ABC")]
+        }
+
+        def write_batch(conn, rows, method):
+            if any(row[2] == "B" for row in rows):
+                raise DataError("unsupported Unicode escape sequence")
+            return len(rows)
+
+        with patch("persistence.consumer.write_batch", side_effect=write_batch) as write:
+            persister.poll_once()
+        assert [len(call.args[1]) for call in write.call_args_list] == [3, 1, 1, 1]
+        persister.consumer.commit.assert_called_once_with({TP: OffsetAndMetadata(3, "")})
+        assert (persister.rows_written, persister.duplicates_skipped) == (2, 0)
+        rejected = persister.spill.read(tmp_path / "signals.rejected")
+        assert [row[2] for row in rejected] == ["B"]
+        assert len(persister.spill) == 0
+
+    def test_revoke_drops_unwritten_rows(self, persister):
+        persister, _ = persister
+        persister.consumer.poll.return_value = {TP: [signal_record("AAA", 0)]}
+        persister.poll_once()
+        with patch("persistence.consumer.write_batch", side_effect=RuntimeError("db down")):
+            persister.release_partitions([TP])
+        assert len(persister.batch) == 0
+        assert persister.batch.offsets == {}
+        persister.consumer.commit.assert_not_called()
+
+
+class FakePool:
+    def __init__(self):
+        self.connections = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        self.connections += 1
+        yield MagicMock()
+
+    async def close(self):
+        pass
+
+
+class RecordingWrites:
+    """Stands in for write_batch_pipelined and tracks how many writes overlap."""
+
+    def __init__(self, delay=0.02, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self.tickers = []
+
+    async def __call__(self, conn, rows):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("db down")
+            self.tickers.append([row[2] for row in rows])
+            return len(rows)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def async_batches():
+    with (
+        patch("persistence.async_worker.BATCH_SIZE", 2),
+        patch("persistence.async_worker.BATCH_MAX_WAIT_MS", 10),
+    ):
+        yield
+
+
+def async_persister():
+    consumer = MagicMock()
+    consumer.paused.return_value = set()
+    consumer.poll.return_value = {}
+    return AsyncSignalPersister(FakePool(), consumer)
+
+
+class TestPartitionWriter:
+    def test_batches_of_one_partition_are_written_in_order(self, async_batches):
+        writes = RecordingWrites()
+
+        async def scenario():
+            writer = PartitionWriter(TP, FakePool()).start()
+            for offset, ticker in enumerate("ABCDE"):
+                writer.put(offset, signal_row({"ticker": ticker}, RECORDED_AT_MS))
+            writer.stop()
+            await writer.task
+            return writer
+
+        with patch("persistence.async_worker.write_batch_pipelined", writes):
+            writer = asyncio.run(scenario())
+        assert writes.tickers == [["A", "B"], ["C", "D"], ["E"]]
+        assert writes.max_active == 1
+        assert writer.written_offset == 5
+
+    def test_unreachable_database_spills_the_batch(self, async_batches, tmp_path):
+        spill = SpillLog(tmp_path)
+
+        async def scenario():
+            writer = PartitionWriter(TP, FakePool(), spill=spill).start()
+            writer.put(0, signal_row({"ticker": "AAA"}, RECORDED_AT_MS))
+            writer.stop()
+            await writer.task
+            return writer
+
+        down = AsyncMock(side_effect=OperationalError("connection refused"))
+        with patch("persistence.async_worker.write_batch_pipelined", down):
+            writer = asyncio.run(scenario())
+        assert writer.written_offset == 1
+        assert writer.snapshot()["rows_spilled"] == 1
+        assert len(spill.read(spill.seal()[0])) == 1
+
+    def test_rejected_row_is_set_aside_and_the_partition_moves_on(self, async_batches, tmp_path):
+        spill = SpillLog(tmp_path)
+        calls = []
+
+        async def write(conn, rows):
+            calls.append([row[2] for row in rows])
+            if any(row[2] == "BAD" for row in rows):
+                raise DataError("invalid input syntax for type json")
+            return len(rows)
+
+        async def scenario():
+            writer = PartitionWriter(TP, FakePool(), spill=spill).start()
+            for offset, ticker in enumerate(["AAA", "BAD", "CCC"]):
+                writer.put(offset, signal_row({"ticker": ticker}, RECORDED_AT_MS))
+            writer.stop()
+            await writer.task
+            return writer
+
+        with patch("persistence.async_worker.write_batch_pipelined", write):
+            writer = asyncio.run(scenario())
+        assert calls == [["AAA", "BAD"], ["AAA"], ["BAD"], ["CCC"]]
+        assert writer.written_offset == 3
+        assert writer.snapshot()["rows_written"] == 2
+        assert [row[2] for row in spill.read(tmp_path / "signals.rejected")] == ["BAD"]
+
+    def test_failed_write_is_given_up_on_stop(self, async_batches):
+        writes = RecordingWrites(delay=0, fail=True)
+
+        async def scenario():
+            writer = PartitionWriter(TP, FakePool()).start()
+            writer.put(0, signal_row({"ticker": "AAA"}, RECORDED_AT_MS))
+            await asyncio.sleep(0.05)  # first attempt fails, writer backs off
+            writer.stop()
+            await asyncio.wait_for(writer.task, 1)
+            return writer
+
+        with patch("persistence.async_worker.write_batch_pipelined", writes):
+            writer = asyncio.run(scenario())
+        assert writer.written_offset is None
+
+
+class TestAsyncSignalPersister:
+    def test_partitions_are_written_concurrently_and_committed_per_partition(self, async_batches):
+        writes = RecordingWrites()
+        persister = async_persister()
+        persister.consumer.poll.return_value = {
+            TP: [signal_record(ticker, offset) for offset, ticker in enumerate("AB")],
+            TP1: [signal_record(ticker, offset) for offset, ticker in enumerate("CDE")],
+        }
+
+        async def scenario():
+            await persister.poll_once()
+            persister.consumer.poll.return_value = {}
+            await asyncio.sleep(0.1)
+            await persister.poll_once()
+
+        with patch("persistence.async_worker.write_batch_pipelined", writes):
+            asyncio.run(scenario())
+        assert writes.max_active == 2
+        persister.consumer.commit.assert_called_once_with(
+            {TP: OffsetAndMetadata(2, ""), TP1: OffsetAndMetadata(3, "")}
+        )
+
+    def test_backlogged_partition_is_paused(self, async_batches):
+        persister = async_persister()
+        persister.consumer.poll.return_value = {
+            TP: [signal_record("AAA", offset) for offset in range(5)]
+        }
+
+        async def scenario():
+            await persister.poll_once()
+            persister.consumer.poll.return_value = {}
+            await persister.poll_once()
+            for writer in persister.writers.values():
+                writer.task.cancel()
+
+        with patch("persistence.async_worker.write_batch_pipelined", RecordingWrites(delay=1)):
+            asyncio.run(scenario())
+        persister.consumer.pause.assert_called_once_with(TP)
+
+    def test_revoke_finishes_writes_and_returns_offsets(self, async_batches):
+        persister = async_persister()
+        persister.consumer.poll.return_value = {TP: [signal_record("AAA", 7)]}
+
+        async def scenario():
+            await persister.poll_once()
+            return await persister.release_partitions([TP])
+
+        with patch("persistence.async_worker.write_batch_pipelined", RecordingWrites()):
+            offsets = asyncio.run(scenario())
+        assert offsets == {TP: OffsetAndMetadata(8, "")}
+        assert persister.writers == {}
@@ -0,0 +1,102 @@
+"""Unit tests for registering the static prompt preamble as Gemini cached content."""
+
+from unittest.mock import MagicMock
+
+from google.genai import types
+
+from ai_layer.preamble import PreambleCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def grounded_config():
+    return types.GenerateContentConfig(
+        temperature=0.2,
+        tools=[types.Tool(google_search=types.GoogleSearch())],
+        system_instruction="ROLE: analyst",
+    )
+
+
+def make_cache(clock):
+    client = MagicMock()
+    client.caches.create.return_value.name = "cachedContents/abc"
+    return client, PreambleCache(client, "ROLE: analyst", 3600, 300, clock=clock)
+
+
+class TestPreambleCache:
+    def test_registers_once_and_references_cache(self):
+        clock = FakeClock()
+        client, cache = make_cache(clock)
+        base = grounded_config()
+
+        config = cache.config_for("grounded", "gemini-1.5-pro", base)
+        cache.config_for("grounded", "gemini-1.5-pro", base)
+
+        client.caches.create.assert_called_once()
+        create = client.caches.create.call_args.kwargs
+        assert create["model"] == "gemini-1.5-pro"
+        assert create["config"].system_instruction == "ROLE: analyst"
+        assert create["config"].tools == base.tools
+        assert create["config"].ttl == "3600s"
+        assert config.cached_content == "cachedContents/abc"
+        assert config.system_instruction is None and config.tools is None
+        assert config.temperature == 0.2
+        assert base.system_instruction == "ROLE: analyst"
+
+    def test_each_stage_and_model_gets_its_own_entry(self):
+        client, cache = make_cache(FakeClock())
+        cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        cache.config_for("screen", "gemini-flash-lite", types.GenerateContentConfig())
+        assert client.caches.create.call_count == 2
+
+    def test_extends_ttl_before_expiry(self):
+        clock = FakeClock()
+        client, cache = make_cache(clock)
+        cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        clock.now = 3299.0
+        cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        client.caches.update.assert_not_called()
+
+        clock.now = 3400.0
+        cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        client.caches.update.assert_called_once()
+        assert client.caches.update.call_args.kwargs["name"] == "cachedContents/abc"
+        assert cache.entries[("grounded", "gemini-1.5-pro")].expires_at == 7000.0
+        assert client.caches.create.call_count == 1
+
+    def test_recreates_when_extension_fails(self):
+        clock = FakeClock()
+        client, cache = make_cache(clock)
+        cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        client.caches.update.side_effect = RuntimeError("404 NOT_FOUND")
+        clock.now = 3400.0
+        config = cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        assert client.caches.create.call_count == 2
+        assert config.cached_content == "cachedContents/abc"
+
+    def test_falls_back_to_system_instruction_and_retries_after_ttl(self):
+        clock = FakeClock()
+        client, cache = make_cache(clock)
+        client.caches.create.side_effect = RuntimeError("400 content too small")
+        base = grounded_config()
+
+        assert cache.config_for("grounded", "gemini-1.5-pro", base) is base
+        assert cache.config_for("grounded", "gemini-1.5-pro", base) is base
+        assert client.caches.create.call_count == 1
+
+        clock.now = 3600.0
+        cache.config_for("grounded", "gemini-1.5-pro", base)
+        assert client.caches.create.call_count == 2
+
+    def test_close_deletes_registered_caches(self):
+        client, cache = make_cache(FakeClock())
+        cache.config_for("grounded", "gemini-1.5-pro", grounded_config())
+        cache.close()
+        client.caches.delete.assert_called_once_with(name="cachedContents/abc")
+        assert cache.entries == {}
@@ -0,0 +1,152 @@
+"""Unit tests for prompt compaction and the prompt token budget."""
+
+import json
+
+from ai_layer.prompt_builder import (
+    SYSTEM_INSTRUCTION,
+    build_analysis_prompt,
+    dedupe_signals,
+    estimate_input_tokens,
+    estimate_tokens,
+    format_signal_blocks,
+    summarize_payloads,
+)
+
+
+def squeeze(short_float, **extra):
+    return {"source_hunter": "squeeze", "signal_data": {"short_float": short_float, **extra}}
+
+
+def insider(name, shares):
+    return {"source_hunter": "insider", "signal_data": {"insider_name": name, "shares": shares}}
+
+
+def triage_payload(signals):
+    return {
+        "ticker": "GME",
+        "timestamp_utc": "2026-04-21T14:02:11Z",
+        "confluence_count": 2,
+        "confluence_sources": ["squeeze", "insider"],
+        "liquidity_metrics": {"price": 24.87, "volume": 8412330, "relative_volume": 2.61},
+        "signals": signals,
+    }
+
+
+def noisy_signals(distinct_rows=150, repeats=2):
+    """A hot ticker's window, newest first: the same squeeze rows over and over, plus one
+    insider buy."""
+    rows = [
+        squeeze(30 + index / 10, days_to_cover=4.3, note=f"row {index:03d} " + "x" * 40)
+        for index in reversed(range(distinct_rows))
+    ]
+    return [insider("Karp Alexander C.", 50000)] + rows * repeats
+
+
+class TestSignalCompaction:
+    def test_identical_payloads_are_deduplicated(self):
+        signals = [squeeze(31.4), squeeze(31.4), insider("Karp", 100), squeeze(31.4)]
+        assert dedupe_signals(signals) == [squeeze(31.4), insider("Karp", 100)]
+
+    def test_small_sources_are_listed_as_compact_json(self):
+        block = format_signal_blocks([squeeze(31.4), squeeze(31.4), insider("Karp", 100)])
+        assert block.splitlines() == [
+            "3 signals, 2 distinct, grouped by source:",
+            '- squeeze: {"short_float":31.4}',
+            '- insider: {"insider_name":"Karp","shares":100}',
+        ]
+
+    def test_repeated_source_collapses_into_counts_and_ranges(self):
+        # Newest first, as the gatekeeper delivers them.
+        signals = [squeeze(31.0, days_to_cover=4.3, tier="B")]
+        signals += [squeeze(30.0 + index, days_to_cover=4.3, tier="A") for index in range(5)]
+        block = format_signal_blocks(signals)
+        header, line = block.splitlines()
+        assert header == "6 signals, 6 distinct, grouped by source:"
+        assert line.startswith("- squeeze x6 (summary): ")
+        summary = json.loads(line.split(": ", 1)[1])
+        assert summary == {
+            "count": 6,
+            "fields": {
+                "days_to_cover": 4.3,
+                "short_float": {"min": 30.0, "max": 34.0, "latest": 31.0},
+                "tier": {"distinct": 2, "values": ["B", "A"]},
+            },
+        }
+
+    def test_ranges_only_summary_drops_varying_values(self):
+        payloads = [{"tier": "A", "desk": "NY"}, {"tier": "B", "desk": "NY"}]
+        assert summarize_payloads(payloads, keep_varying=False) == {
+            "count": 2,
+            "fields": {"desk": "NY", "tier": {"distinct": 2}},
+        }
+
+    def test_no_signals(self):
+        assert format_signal_blocks([]) == "No accumulated signals were provided."
+
+
+class TestPromptBudget:
+    def test_prompt_has_no_template_indentation(self):
+        prompt = build_analysis_prompt(triage_payload([squeeze(31.4)]))
+        assert prompt.startswith('TRIAGE METADATA:\n{"confluence_count":2')
+        assert '- "GME news today"' in prompt
+        assert '"ticker":"GME"' in prompt
+
+    def test_ungrounded_prompt_does_not_ask_for_search(self):
+        prompt = build_analysis_prompt(triage_payload([squeeze(31.4)]), grounded=False)
+        assert "news today" not in prompt
+        assert 'set\nnews_sentiment to "unknown"' in prompt
+
+        recent = {"age_minutes": 12, "news_sentiment": "bullish", "rationale": "Squeeze chatter."}
+        prompt = build_analysis_prompt(
+            triage_payload([squeeze(31.4)]), grounded=False, recent_search=recent
+        )
+        assert "A search for GME 12 minutes ago" in prompt
+        assert "news_sentiment=bullish: Squeeze chatter." in prompt
+
+    def test_static_sections_live_in_the_system_instruction(self):
+        prompt = build_analysis_prompt(triage_payload([squeeze(31.4)]))
+        for section in ("ROLE:", "TRAP GUIDE:", "CONVICTION CALIBRATION:", "OUTPUT SCHEMA:"):
+            assert section in SYSTEM_INSTRUCTION
+            assert section not in prompt
+        assert "GME" not in SYSTEM_INSTRUCTION
+        assert '  "conviction_score": 0,' in SYSTEM_INSTRUCTION
+
+    def test_noisy_window_stays_small(self):
+        prompt = build_analysis_prompt(triage_payload(noisy_signals()))
+        assert "301 signals, 151 distinct" in prompt
+        assert "- squeeze x150 (summary):" in prompt
+        assert '"short_float":{"latest":44.9,"max":44.9,"min":30.0}' in prompt
+        assert estimate_tokens(prompt) < 1000
+
+    def test_budget_reduces_detail_until_prompt_fits(self):
+        signals = [
+            {
+                "source_hunter": f"hunter{source}",
+                "signal_data": {"value": row, "note": f"{source}-{row} " + "x" * 60},
+            }
+            for source in range(30)
+            for row in range(3)
+        ]
+        payload = triage_payload(signals)
+        unbounded = build_analysis_prompt(payload)
+        assert "- hunter0: " in unbounded
+
+        prompt = build_analysis_prompt(payload, token_budget=1500)
+        assert estimate_input_tokens(prompt) <= 1500 < estimate_input_tokens(unbounded)
+        assert "- hunter0 x3 (summary): " in prompt
+        assert '"note":{"distinct":3}' in prompt
+        assert "omitted" not in prompt
+
+    def test_truncates_signal_section_as_last_resort(self):
+        signals = [
+            {"source_hunter": f"hunter{index}", "signal_data": {"value": index}}
+            for index in range(200)
+        ]
+        prompt = build_analysis_prompt(triage_payload(signals), token_budget=1000)
+        assert estimate_input_tokens(prompt) <= 1000
+        assert "more lines omitted to fit the token budget" in prompt
+        assert "- hunter0 x1 (summary): " in prompt
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcde") == 2
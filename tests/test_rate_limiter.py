@@ -0,0 +1,164 @@
+"""Unit tests for the AI layer's adaptive Gemini rate limiter."""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from ai_layer.rate_limiter import (
+    AdaptiveRateLimiter,
+    QuotaExceededError,
+    is_quota_error,
+    retry_after_seconds,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class QuotaError(Exception):
+    def __init__(self, code=429, status="RESOURCE_EXHAUSTED", headers=None, details=None):
+        super().__init__(f"{code} {status}")
+        self.code = code
+        self.status = status
+        self.response = SimpleNamespace(headers=headers or {})
+        self.details = details or {}
+
+
+def make_limiter(clock, **overrides):
+    settings = dict(
+        rate=2.0,
+        max_rate=4.0,
+        min_rate=0.1,
+        max_concurrency=4,
+        rate_increase=0.5,
+        decrease_factor=0.5,
+        clock=clock,
+    )
+    settings.update(overrides)
+    return AdaptiveRateLimiter(**settings)
+
+
+class TestQuotaErrors:
+    def test_classifies_429_and_resource_exhausted(self):
+        assert is_quota_error(QuotaError())
+        assert is_quota_error(QuotaError(code=None))
+        assert not is_quota_error(QuotaError(code=500, status="INTERNAL"))
+        assert not is_quota_error(ValueError("bad json"))
+
+    def test_retry_after_header(self):
+        assert retry_after_seconds(QuotaError(headers={"Retry-After": "7"})) == 7.0
+
+    def test_retry_info_in_error_body(self):
+        details = {
+            "error": {
+                "details": [
+                    {"@type": "type.googleapis.com/google.rpc.QuotaFailure"},
+                    {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "17s"},
+                ]
+            }
+        }
+        assert retry_after_seconds(QuotaError(details=details)) == 17.0
+
+    def test_no_hint(self):
+        assert retry_after_seconds(QuotaError()) is None
+
+
+class TestAdaptiveRateLimiter:
+    def test_token_bucket_paces_calls(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+        started_at, _ = limiter.try_acquire()
+        limiter.release(started_at)
+        assert limiter.try_acquire() == (None, pytest.approx(1 / limiter.rate))
+        clock.now = 1.0
+        assert limiter.try_acquire()[0] == 1.0
+
+    def test_success_grows_rate_additively(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+        for _ in range(3):
+            started_at, _ = limiter.try_acquire()
+            limiter.release(started_at)
+            clock.now += 10
+        assert limiter.rate == 3.5
+        assert limiter.snapshot()["successes"] == 3
+
+    def test_rate_capped_at_max(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+        for _ in range(10):
+            started_at, _ = limiter.try_acquire()
+            limiter.release(started_at)
+            clock.now += 10
+        assert limiter.rate == 4.0
+
+    def test_throttle_cuts_rate_and_concurrency_multiplicatively(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+        started_at, _ = limiter.try_acquire()
+        limiter.release(started_at, throttled=True)
+        assert limiter.rate == 1.0
+        assert limiter.concurrency_limit == 2
+
+    def test_burst_of_throttles_from_one_window_cuts_once(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock, burst=4.0)
+        limiter.tokens = 4.0
+        tickets = [limiter.try_acquire()[0] for _ in range(4)]
+        clock.now = 0.5
+        for started_at in tickets:
+            limiter.release(started_at, throttled=True)
+        assert limiter.rate == 1.0
+        assert limiter.snapshot()["throttles"] == 4
+
+    def test_concurrency_limit_blocks_extra_calls(self):
+        limiter = make_limiter(FakeClock(), max_concurrency=1, burst=5.0)
+        limiter.tokens = 5.0
+        assert limiter.try_acquire()[0] is not None
+        assert limiter.try_acquire() == (None, None)
+
+    def test_retry_after_blocks_new_calls(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+        started_at, _ = limiter.try_acquire()
+        limiter.release(started_at, throttled=True, retry_after=30)
+        clock.now = 10.0
+        assert limiter.try_acquire() == (None, 20.0)
+        clock.now = 30.0
+        assert limiter.try_acquire()[0] == 30.0
+
+    def test_slot_translates_quota_errors(self):
+        limiter = make_limiter(FakeClock())
+        with pytest.raises(QuotaExceededError):
+            with limiter.slot():
+                raise QuotaError()
+        assert limiter.rate == 1.0
+        assert limiter.active == 0
+
+    def test_slot_leaves_limits_alone_on_other_errors(self):
+        limiter = make_limiter(FakeClock())
+        with pytest.raises(ValueError):
+            with limiter.slot():
+                raise ValueError("bad json")
+        assert limiter.rate == 2.0
+        assert limiter.active == 0
+        assert limiter.snapshot()["successes"] == 0
+
+    def test_acquire_waits_for_a_release(self):
+        limiter = AdaptiveRateLimiter(
+            rate=1000, max_rate=1000, min_rate=1, max_concurrency=1, rate_increase=0
+        )
+        first = limiter.acquire()
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        waiter.start()
+        assert not acquired.wait(0.1)
+        limiter.release(first)
+        assert acquired.wait(1)
+        waiter.join()
@@ -0,0 +1,42 @@
+"""Unit tests for local repair of Gemini analysis responses."""
+
+import pytest
+
+from ai_layer.response_parser import ResponseParseError, parse_analysis_json
+
+
+class TestParseAnalysisJson:
+    def test_valid_json_is_not_repaired(self):
+        assert parse_analysis_json('{"conviction_score": 85}') == ({"conviction_score": 85}, False)
+
+    def test_code_fences_are_not_a_repair(self):
+        text = '```json\n{"conviction_score": 85}\n```'
+        assert parse_analysis_json(text) == ({"conviction_score": 85}, False)
+
+    def test_extracts_object_from_surrounding_prose(self):
+        text = 'Here is my analysis:\n{"conviction_score": 72, "is_trap": false}\nGood luck!'
+        assert parse_analysis_json(text) == ({"conviction_score": 72, "is_trap": False}, True)
+
+    def test_drops_trailing_commas_and_smart_quotes(self):
+        text = '{“conviction_score”: 64, "key_risks": ["dilution",],}'
+        parsed, repaired = parse_analysis_json(text)
+        assert parsed == {"conviction_score": 64, "key_risks": ["dilution"]}
+        assert repaired
+
+    def test_closes_truncated_response(self):
+        text = '{"conviction_score": 91, "key_risks": ["halt risk", "dilu'
+        parsed, repaired = parse_analysis_json(text)
+        assert parsed == {"conviction_score": 91, "key_risks": ["halt risk", "dilu"]}
+        assert repaired
+
+    def test_truncated_before_required_key_is_rejected(self):
+        with pytest.raises(ResponseParseError):
+            parse_analysis_json('{"catalyst_type": "SUPERNOVA", "rationale": "Squeeze')
+
+    def test_non_object_is_rejected(self):
+        with pytest.raises(ResponseParseError):
+            parse_analysis_json("[1, 2, 3]")
+
+    def test_prose_only_is_rejected(self):
+        with pytest.raises(ResponseParseError):
+            parse_analysis_json("I could not find any news for this ticker.")
@@ -0,0 +1,118 @@
+"""Unit tests for the AI layer's delayed retry queue and circuit breaker."""
+
+from types import SimpleNamespace
+
+from kafka.structs import TopicPartition
+
+from ai_layer.retry import (
+    CircuitBreaker,
+    DelayedRetryQueue,
+    ParkedRecord,
+    backoff_delay,
+    is_permanent_error,
+)
+
+TP0 = TopicPartition("triage-priority", 0)
+TP1 = TopicPartition("triage-priority", 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_backoff_doubles_up_to_the_cap():
+    assert [backoff_delay(attempt, 1, 5) for attempt in range(1, 5)] == [1, 2, 4, 5]
+
+
+def test_permanent_errors_are_client_errors_other_than_timeout_and_quota():
+    assert is_permanent_error(SimpleNamespace(code=400))
+    assert is_permanent_error(SimpleNamespace(code=403))
+    assert not is_permanent_error(SimpleNamespace(code=408))
+    assert not is_permanent_error(SimpleNamespace(code=429))
+    assert not is_permanent_error(SimpleNamespace(code=503))
+    assert not is_permanent_error(ValueError("no code"))
+
+
+class TestDelayedRetryQueue:
+    def test_pops_records_once_due_in_due_order(self):
+        clock = FakeClock()
+        queue = DelayedRetryQueue(clock=clock)
+        queue.park(ParkedRecord(TP0, 1, {"ticker": "LATE"}, 2), delay=5)
+        queue.park(ParkedRecord(TP1, 4, {"ticker": "SOON"}, 2), delay=1)
+        assert queue.pop_due() == []
+
+        clock.now = 5
+        assert [record.payload["ticker"] for record in queue.pop_due()] == ["SOON", "LATE"]
+        assert len(queue) == 0
+
+    def test_partitions_and_forget(self):
+        queue = DelayedRetryQueue(clock=FakeClock())
+        queue.park(ParkedRecord(TP0, 1, {}, 2), delay=1)
+        queue.park(ParkedRecord(TP0, 2, {}, 2), delay=1)
+        queue.park(ParkedRecord(TP1, 7, {}, 2), delay=1)
+        assert queue.partitions() == {TP0, TP1}
+
+        assert queue.forget([TP0]) == 2
+        assert queue.partitions() == {TP1}
+        assert len(queue) == 1
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=FakeClock())
+        assert not breaker.record_failure()
+        breaker.record_success()
+        assert not breaker.record_failure()
+        assert not breaker.record_failure()
+        assert breaker.record_failure()
+        assert breaker.is_open()
+        assert not breaker.allow()
+        assert breaker.trips == 1
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.retry_in() == 20
+
+        clock.now = 30
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert not breaker.is_open()
+        assert breaker.allow()
+
+    def test_is_open_ends_when_a_probe_is_due(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        assert breaker.is_open()
+        clock.now = 30
+        assert not breaker.is_open()
+        assert breaker.allow()
+        assert breaker.is_open()
+
+    def test_callers_turned_away_during_a_probe_wait_a_full_reset(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 45
+        assert breaker.retry_in() == 0
+        assert breaker.allow()
+        assert not breaker.allow()
+        assert breaker.retry_in() == 30
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 30
+        assert breaker.allow()
+        assert breaker.record_failure()
+        assert breaker.retry_in() == 30
+        assert breaker.trips == 2
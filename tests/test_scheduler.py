@@ -0,0 +1,131 @@
+"""Unit tests for the AI layer's priority- and deadline-aware payload scheduler."""
+
+from datetime import datetime, timezone
+
+from kafka.structs import TopicPartition
+
+from ai_layer.scheduler import (
+    STALE_DOWNGRADE,
+    STALE_DROP,
+    AnalysisScheduler,
+    event_time,
+    technical_score,
+)
+
+TP0 = TopicPartition("triage-priority", 0)
+TP1 = TopicPartition("triage-priority", 1)
+NOW = 1_776_780_000.0  # 2026-04-21T14:00:00Z
+
+
+class FakeClock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def payload(ticker, confluence=2, score=0.0, age=0):
+    timestamp = datetime.fromtimestamp(NOW - age, tz=timezone.utc)
+    return {
+        "ticker": ticker,
+        "timestamp_utc": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "confluence_count": confluence,
+        "technical_score": score,
+    }
+
+
+def drain_tickers(scheduler):
+    tickers = []
+    while True:
+        item, _ = scheduler.pop()
+        if item is None:
+            return tickers
+        tickers.append(item.payload["ticker"])
+
+
+def test_event_time_reads_utc_timestamps():
+    assert event_time({"timestamp_utc": "2026-04-21T14:00:00Z"}) == NOW
+    assert event_time({"timestamp_utc": "2026-04-21T14:00:00"}) == NOW
+    assert event_time({"timestamp_utc": "yesterday"}) is None
+    assert event_time({}) is None
+
+
+def test_technical_score_falls_back_to_signals():
+    assert technical_score({"technical_score": 40}) == 40
+    signals = [
+        {"source_hunter": "squeeze", "signal_data": {"technical_score": 85}},
+        {"source_hunter": "insider", "signal_data": {}},
+    ]
+    assert technical_score({"signals": signals}) == 85
+    assert technical_score({}) == 0.0
+
+
+def test_ranks_by_confluence_then_score_then_age():
+    scheduler = AnalysisScheduler(deadline_seconds=300, clock=FakeClock())
+    scheduler.push(TP0, 0, payload("OLD_SINGLE", confluence=1, age=120))
+    scheduler.push(TP0, 1, payload("FRESH_FOUR", confluence=4))
+    scheduler.push(TP0, 2, payload("TWO_LOW", confluence=2, score=10))
+    scheduler.push(TP1, 0, payload("TWO_HIGH", confluence=2, score=90))
+    scheduler.push(TP1, 1, payload("TWO_HIGH_OLDER", confluence=2, score=90, age=30))
+    assert drain_tickers(scheduler) == [
+        "FRESH_FOUR",
+        "TWO_HIGH_OLDER",
+        "TWO_HIGH",
+        "TWO_LOW",
+        "OLD_SINGLE",
+    ]
+
+
+def test_stale_payloads_are_dropped_and_counted():
+    clock = FakeClock()
+    scheduler = AnalysisScheduler(deadline_seconds=300, stale_policy=STALE_DROP, clock=clock)
+    scheduler.push(TP0, 0, payload("STALE", confluence=4, age=600))
+    scheduler.push(TP0, 1, payload("FRESH", confluence=2))
+
+    item, dropped = scheduler.pop()
+    assert item.payload["ticker"] == "FRESH"
+    assert [(stale.tp, stale.offset) for stale in dropped] == [(TP0, 0)]
+    assert scheduler.snapshot()["dropped"] == 1
+
+
+def test_stale_payloads_are_downgraded_behind_fresh_ones():
+    scheduler = AnalysisScheduler(
+        deadline_seconds=300, stale_policy=STALE_DOWNGRADE, clock=FakeClock()
+    )
+    scheduler.push(TP0, 0, payload("STALE", confluence=4, age=600))
+    scheduler.push(TP0, 1, payload("FRESH", confluence=1))
+    assert drain_tickers(scheduler) == ["FRESH", "STALE"]
+    assert scheduler.snapshot()["downgraded"] == 1
+
+
+def test_payload_without_timestamp_ages_from_when_it_was_queued():
+    clock = FakeClock()
+    scheduler = AnalysisScheduler(deadline_seconds=300, stale_policy=STALE_DROP, clock=clock)
+    scheduler.push(TP0, 0, {"ticker": "NOTS", "confluence_count": 2})
+    clock.now += 301
+    item, dropped = scheduler.pop()
+    assert item is None
+    assert len(dropped) == 1
+
+
+def test_zero_deadline_never_expires():
+    scheduler = AnalysisScheduler(deadline_seconds=0, stale_policy=STALE_DROP, clock=FakeClock())
+    scheduler.push(TP0, 0, payload("ANCIENT", age=3000))
+    assert drain_tickers(scheduler) == ["ANCIENT"]
+
+
+def test_forget_and_snapshot():
+    clock = FakeClock()
+    scheduler = AnalysisScheduler(deadline_seconds=300, clock=clock)
+    scheduler.push(TP0, 0, payload("A"))
+    scheduler.push(TP1, 0, payload("B"))
+    assert scheduler.forget([TP0]) == 1
+    clock.now += 2
+    scheduler.pop()
+
+    stats = scheduler.snapshot(reset=True)
+    assert stats["scheduled"] == 1
+    assert stats["avg_wait_seconds"] == 2
+    assert stats["queued"] == 0
+    assert scheduler.snapshot()["scheduled"] == 0
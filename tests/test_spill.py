@@ -0,0 +1,111 @@
+"""Unit tests for the persistence spill log and its drainer."""
+
+from unittest.mock import MagicMock, patch
+
+from psycopg import OperationalError
+
+from persistence.batch_writer import signal_row
+from persistence.spill import SpillDrainer, SpillLog, decode_row, encode_row
+
+
+def rows(*tickers):
+    return [
+        signal_row(
+            {
+                "ticker": ticker,
+                "timestamp_utc": "2026-04-21T14:02:11Z",
+                "confluence_sources": ["squeeze", "whale"],
+                "liquidity_metrics": {"price": 24.87},
+                "key_risks": ["dilution"],
+                "signals": [{"source_hunter": "squeeze", "signal_data": {"short_float": 31.4}}],
+            }
+        )
+        for ticker in tickers
+    ]
+
+
+def test_rows_round_trip():
+    row = rows("GME")[0]
+    assert decode_row(encode_row(row)) == row
+
+
+def test_segments_roll_and_survive_a_restart(tmp_path):
+    spill = SpillLog(tmp_path, segment_bytes=1)
+    assert spill.append(rows("AAA"))
+    assert spill.append(rows("BBB", "CCC"))
+    segments = spill.seal()
+    assert [segment.name for segment in segments] == ["000000000001.log", "000000000002.log"]
+    assert [row[2] for row in spill.read(segments[1])] == ["BBB", "CCC"]
+
+    reopened = SpillLog(tmp_path)
+    assert reopened.size_bytes == spill.size_bytes
+    reopened.append(rows("DDD"))
+    assert reopened.seal()[-1].name == "000000000003.log"
+
+
+def test_full_log_refuses_appends(tmp_path):
+    spill = SpillLog(tmp_path, max_bytes=10)
+    assert not spill.append(rows("AAA"))
+    assert len(spill) == 0
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    spill = SpillLog(tmp_path)
+    spill.append(rows("AAA"))
+    (segment,) = spill.seal()
+    with open(segment, "ab") as f:
+        f.write(b'["half a row')
+    assert [row[2] for row in spill.read(segment)] == ["AAA"]
+
+
+class TestSpillDrainer:
+    def test_loads_and_removes_segments(self, tmp_path):
+        spill = SpillLog(tmp_path, segment_bytes=1)
+        spill.append(rows("AAA", "BBB"))
+        spill.append(rows("CCC"))
+        drainer = SpillDrainer(spill, connect=MagicMock(), chunk_rows=1)
+        with patch("persistence.spill.write_batch", return_value=1) as write:
+            assert drainer.drain_once() == 3
+        assert write.call_count == 3
+        assert len(spill) == 0
+        assert spill.size_bytes == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_unreachable_database_keeps_the_active_segment_open(self, tmp_path):
+        spill = SpillLog(tmp_path)
+        spill.append(rows("AAA"))
+        drainer = SpillDrainer(spill, connect=MagicMock(side_effect=OperationalError("down")))
+        assert drainer.drain_once() == 0
+        spill.append(rows("BBB"))
+        assert len(spill.seal()) == 1
+
+    def test_only_rejected_rows_are_set_aside(self, tmp_path):
+        spill = SpillLog(tmp_path)
+        spill.append(rows("AAA", "BAD", "CCC", "DDD"))
+        drainer = SpillDrainer(spill, connect=MagicMock(), chunk_rows=2)
+
+        def write_batch(conn, chunk, method):
+            if any(row[2] == "BAD" for row in chunk):
+                raise ValueError("bad row")
+            return len(chunk)
+
+        with patch("persistence.spill.write_batch", side_effect=write_batch) as write:
+            assert drainer.drain_once() == 3
+        assert [[row[2] for row in call.args[1]] for call in write.call_args_list] == [
+            ["AAA", "BAD"],
+            ["AAA"],
+            ["BAD"],
+            ["CCC", "DDD"],
+        ]
+        assert len(spill) == 0
+        assert [path.name for path in tmp_path.iterdir()] == ["000000000001.rejected"]
+        assert [row[2] for row in spill.read(tmp_path / "000000000001.rejected")] == ["BAD"]
+
+    def test_segment_is_kept_when_the_failure_is_not_the_rows(self, tmp_path):
+        spill = SpillLog(tmp_path)
+        spill.append(rows("AAA"))
+        drainer = SpillDrainer(spill, connect=MagicMock())
+        with patch("persistence.spill.write_batch", side_effect=RuntimeError("no table")):
+            assert drainer.drain_once() == 0
+        assert [path.name for path in tmp_path.iterdir()] == ["000000000001.log"]
+        assert len(spill) == 1
@@ -0,0 +1,233 @@
+"""Unit tests for the gatekeeper window-store backends."""
+
+import json
+from unittest.mock import MagicMock
+
+import fakeredis
+import pytest
+
+from gatekeeper.window_store import (
+    DECISION_BUFFERED,
+    DECISION_DEDUPED,
+    DECISION_FORWARD,
+    InMemoryWindowStore,
+    RedisWindowStore,
+    SignalRequest,
+    WriteBehindWindowStore,
+)
+
+KEYS = ("gk:v2:signals:{ticker}", "gk:v2:sources:{ticker}", "gk:v2:sent:{ticker}")
+WINDOW_ARGS = (300, 200, 2)
+T0 = 1_775_050_200.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def request(ticker, source, at=0.0, technical=False, note=None):
+    encoded = json.dumps({"source_hunter": source, "signal_data": {"note": note, "at": at}})
+    return SignalRequest(ticker, source, encoded, technical, T0 + at)
+
+
+SEQUENCE = [
+    request("GME", "squeeze", at=0, note=1),
+    request("AMC", "squeeze", at=1),
+    request("GME", "whale", at=2, note=2),
+    request("GME", "insider", at=3, note=3),
+    request("NVDA", "drifter", at=4, technical=True),
+    request("NVDA", "drifter", at=5, technical=True),
+]
+
+# One ticker that never goes quiet: each source is only ever alone inside 300s.
+STEADY_STREAM = [
+    request("GME", "squeeze", at=0),
+    request("GME", "squeeze", at=200),
+    request("GME", "whale", at=520),
+    request("GME", "whale", at=700),
+    request("GME", "insider", at=1010),
+]
+
+
+def comparable(results):
+    return [(result[0], sorted(result[1]), *result[2:]) for result in results]
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture(params=["redis", "memory"])
+def store(request, redis):
+    if request.param == "redis":
+        return RedisWindowStore(redis, KEYS, *WINDOW_ARGS)
+    return InMemoryWindowStore(*WINDOW_ARGS)
+
+
+@pytest.fixture
+def write_behind(redis):
+    store = WriteBehindWindowStore(redis, KEYS, *WINDOW_ARGS, flush_interval_seconds=60)
+    yield store
+    store.close()
+
+
+class TestBackendParity:
+    def test_memory_matches_redis(self, redis):
+        expected = RedisWindowStore(redis, KEYS, *WINDOW_ARGS).check_confluence(SEQUENCE)
+        actual = InMemoryWindowStore(*WINDOW_ARGS).check_confluence(SEQUENCE)
+
+        assert comparable(actual) == comparable(expected)
+        decisions = [result[0] for result in expected]
+        assert decisions == [
+            DECISION_BUFFERED,
+            DECISION_BUFFERED,
+            DECISION_FORWARD,
+            DECISION_DEDUPED,
+            DECISION_FORWARD,
+            DECISION_DEDUPED,
+        ]
+
+    def test_write_behind_mirrors_redis_layout(self, write_behind):
+        mirror = fakeredis.FakeRedis(decode_responses=True)
+        expected_store = RedisWindowStore(mirror, KEYS, *WINDOW_ARGS)
+        expected_store.check_confluence(SEQUENCE)
+
+        write_behind.check_confluence(SEQUENCE)
+        write_behind.flush()
+
+        for key in ("gk:v2:signals:GME", "gk:v2:signals:NVDA", "gk:v2:sources:GME"):
+            assert write_behind.redis.zrange(key, 0, -1, withscores=True) == mirror.zrange(
+                key, 0, -1, withscores=True
+            )
+        for key in ("gk:v2:sent:GME", "gk:v2:sent:NVDA"):
+            assert float(write_behind.redis.get(key)) == float(mirror.get(key))
+
+
+class TestEventTimeWindow:
+    def test_steady_stream_does_not_keep_stale_sources(self, store):
+        results = store.check_confluence(STEADY_STREAM)
+        assert [result[0] for result in results] == [DECISION_BUFFERED] * 5
+        assert [sorted(result[1]) for result in results[2:]] == [
+            ["whale"],
+            ["whale"],
+            ["insider"],
+        ]
+        assert len(store.get_accumulated_signals("GME")) == 1
+
+    def test_confluence_only_inside_window(self, store):
+        results = store.check_confluence(STEADY_STREAM[:2] + [request("GME", "whale", at=450)])
+        assert results[2][0] == DECISION_FORWARD
+        assert sorted(results[2][1]) == ["squeeze", "whale"]
+        assert len(results[2][2]) == 2
+
+    def test_dedupe_follows_event_time(self, store):
+        store.check_confluence([request("NVDA", "drifter", at=0, technical=True)])
+        results = store.check_confluence(
+            [
+                request("NVDA", "drifter", at=299, technical=True),
+                request("NVDA", "drifter", at=300, technical=True),
+            ]
+        )
+        assert [result[0] for result in results] == [DECISION_DEDUPED, DECISION_FORWARD]
+
+    def test_late_event_is_ordered_by_event_time(self, store):
+        store.check_confluence(
+            [request("GME", "squeeze", at=10, note=10), request("GME", "whale", at=5, note=5)]
+        )
+        notes = [json.loads(s)["signal_data"]["note"] for s in store.get_accumulated_signals("GME")]
+        assert notes == [10, 5]
+
+
+class TestClearSent:
+    def test_undelivered_forward_is_forwarded_again(self, store):
+        store.check_confluence(SEQUENCE[:3])
+        store.clear_sent("GME", T0 + 2)
+        assert not store.was_recently_sent("GME")
+        results = store.check_confluence([request("GME", "whale", at=2, note=2)])
+        assert results[0][0] == DECISION_FORWARD
+
+    def test_keeps_a_newer_marker(self, store):
+        store.mark_sent("GME", T0 + 400)
+        store.clear_sent("GME", T0 + 2)
+        assert store.was_recently_sent("GME")
+
+    def test_write_behind_clears_the_mirror(self, redis, write_behind):
+        write_behind.check_confluence(SEQUENCE[:3])
+        write_behind.flush()
+        assert redis.exists("gk:v2:sent:GME")
+        write_behind.clear_sent("GME", T0 + 2)
+        write_behind.flush()
+        assert not redis.exists("gk:v2:sent:GME")
+
+
+class TestInMemoryWindowStore:
+    def test_idle_window_is_collected_on_wall_clock(self):
+        clock = FakeClock()
+        store = InMemoryWindowStore(*WINDOW_ARGS, clock=clock)
+        store.check_confluence([request("GME", "squeeze", at=0)])
+        clock.now += 200
+        store.check_confluence([request("GME", "squeeze", at=1)])
+        clock.now += 200
+        assert store.get_sources("GME") == ["squeeze"]
+
+        clock.now += 301
+        assert store.get_sources("GME") == []
+        assert store.windows == {}
+
+    def test_sent_marker_expires(self):
+        clock = FakeClock()
+        store = InMemoryWindowStore(*WINDOW_ARGS, clock=clock)
+        store.mark_sent("GME", T0)
+        assert store.was_recently_sent("GME")
+        clock.now += 301
+        assert not store.was_recently_sent("GME")
+        assert store.sent == {}
+
+    def test_ring_buffer_keeps_newest_signals(self):
+        store = InMemoryWindowStore(300, 3, 2)
+        store.check_confluence([request("GME", "squeeze", at=n, note=n) for n in range(5)])
+        notes = [json.loads(s)["signal_data"]["note"] for s in store.get_accumulated_signals("GME")]
+        assert notes == [4, 3, 2]
+
+    def test_evict_drops_owned_tickers(self):
+        store = InMemoryWindowStore(*WINDOW_ARGS)
+        store.check_confluence(SEQUENCE)
+        store.evict(lambda ticker: ticker != "AMC")
+        assert list(store.windows) == ["AMC"]
+        assert store.sent == {}
+
+
+class TestWriteBehindWindowStore:
+    def test_hydrate_restores_owned_tickers(self, redis, write_behind):
+        write_behind.check_confluence(SEQUENCE[:3])
+        write_behind.flush()
+
+        restored = WriteBehindWindowStore(redis, KEYS, *WINDOW_ARGS, flush_interval_seconds=60)
+        try:
+            restored.hydrate(lambda ticker: ticker == "GME")
+            assert restored.get_sources("GME") == ["squeeze", "whale"]
+            assert restored.was_recently_sent("GME")
+            assert "AMC" not in restored.windows
+            results = restored.check_confluence([request("GME", "insider", at=10)])
+            assert results[0][0] == DECISION_DEDUPED
+        finally:
+            restored.close()
+
+    def test_failed_flush_keeps_pending_writes(self, write_behind):
+        write_behind.check_confluence(SEQUENCE[:1])
+        original = write_behind.redis
+        write_behind.redis = MagicMock()
+        write_behind.redis.pipeline.return_value.execute.side_effect = ConnectionError("down")
+        with pytest.raises(ConnectionError):
+            write_behind.flush()
+        assert len(write_behind.pending) == 1
+
+        write_behind.redis = original
+        write_behind.flush()
+        assert write_behind.pending == []
+        assert original.zrange("gk:v2:sources:GME", 0, -1) == ["squeeze"]